@@ -0,0 +1,137 @@
+#!/bin/env python3
+
+import sys, os, time, argparse, json, gzip
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import restconf, scripts, vlanbulk, xmlstream, yangjson
+from nexusprog.vlanset import VlanSet
+# Fix input vs raw_input between Python 2.x and 3.x
+try: input = raw_input
+except NameError: pass
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-04-02"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+# Size on the wire and parse/encode time of RESTCONF payloads in XML (application/yang.data+xml) against JSON
+# (application/yang.data+json): a full tree pull, the VLAN table, one interface, and the bodies of a bulk VLAN create
+# and of an access port change. The replies are synthetic (the JSON ones are the same tree as the XML ones, with the
+# module prefix on the top member as the device sends it) unless -H is given, then the read paths are also fetched
+# from a device in both encodings.
+
+NS = 'http://cisco.com/ns/yang/cisco-nx-os-device'
+
+def phys_entry(port):
+    return ('<PhysIf-list><id>eth1/%d</id><adminSt>down</adminSt><layer>Layer2</layer><mode>access</mode>'
+            '<accessVlan>vlan-%d</accessVlan><trunkVlans>1-4094</trunkVlans><mtu>1500</mtu><speed>auto</speed>'
+            '<duplex>auto</duplex><descr>Server %d</descr><autoNeg>on</autoNeg><medium>broadcast</medium>'
+            '<phys-items><operSt>down</operSt><operSpeed>auto</operSpeed><operMtu>1500</operMtu><lastLinkStChg>2018-03-01T10:00:00</lastLinkStChg></phys-items>'
+            '</PhysIf-list>' % (port, port % 4000 + 1, port))
+
+def bd_entry(vlan):
+    return ('<BD-list><fabEncap>vlan-%d</fabEncap><name>VLAN%04d</name><adminSt>active</adminSt><mode>CE</mode>'
+            '<BdState>active</BdState><accEncap>vxlan-%d</accEncap></BD-list>' % (vlan, vlan, 300000 + vlan))
+
+def synthetic_replies(interfaces, vlans):
+    # name -> (XML reply, JSON reply) of the read paths
+    phys = ''.join(phys_entry(port) for port in range(1, interfaces + 1))
+    bds = ''.join(bd_entry(vlan) for vlan in range(1, vlans + 1))
+    stp = ''.join('<Vlan-list><id>%d</id><priority>32768</priority></Vlan-list>' % vlan for vlan in range(1, vlans + 1))
+    xml = {
+        'full tree': '<System xmlns="' + NS + '"><intf-items><phys-items>' + phys + '</phys-items></intf-items>'
+                     '<bd-items><bd-items>' + bds + '</bd-items></bd-items><stp-items><inst-items><vlan-items>' + stp +
+                     '</vlan-items></inst-items></stp-items></System>',
+        'vlan table': '<bd-items xmlns="' + NS + '">' + bds + '</bd-items>',
+        'one interface': '<PhysIf-list xmlns="' + NS + '">' + phys_entry(1)[len('<PhysIf-list>'):],
+    }
+    replies = {}
+    for name, text in xml.items():
+        replies[name] = (text.encode('utf-8'), yangjson.dumps(yangjson.from_xml(text)).encode('utf-8'))
+    return replies
+
+def best(call, rounds):
+    fastest = None
+    for _ in range(rounds):
+        start = time.time()
+        call()
+        elapsed = time.time() - start
+        fastest = elapsed if fastest is None else min(fastest, elapsed)
+    return fastest
+
+def read_cases(replies, rounds):
+    results = []
+    for name, (xml, jsn) in replies.items():
+        cases = [('xml', 'tree', xml, lambda: yangjson.from_xml(xml)),
+                 ('json', 'tree', jsn, lambda: yangjson.loads(jsn))]
+        if(name == 'vlan table'):
+            # What the VLAN check actually needs: the fabEncap leaves
+            cases += [('xml', 'fabEncap', xml, lambda: VlanSet.of(xmlstream.leaf_texts(xml, 'fabEncap'))),
+                      ('json', 'fabEncap', jsn, lambda: VlanSet.of(yangjson.leaf_values(yangjson.loads(jsn), 'fabEncap')))]
+        for encoding, parse, payload, call in cases:
+            results.append({'case': name, 'encoding': encoding, 'work': 'parse ' + parse, 'bytes': len(payload),
+                            'gzip_bytes': len(gzip.compress(payload)), 'ms': round(best(call, rounds) * 1e3, 3)})
+    return results
+
+def write_cases(vlans, rounds):
+    # Request bodies: the XML the templates render and the JSON document client.encode() sends in its place
+    entries = vlanbulk.plan(VlanSet.of(range(100, 100 + vlans)), None, 'TENANT1-{vlan}', None, 300000, 4096)
+    port = scripts.load(scripts.RESTCONF_INTERFACE).INTERFACE_TEMPLATE
+    results = []
+    for name, render in (('create %d vlans' % vlans, lambda: vlanbulk.system_bodies(entries)[0]),
+                         ('access port', lambda: port.render(interface='eth1/1', vlan=22, descr='Server A'))):
+        cases = [('xml', lambda: render()), ('json', lambda: yangjson.xml_to_json(render()))]
+        for encoding, call in cases:
+            body = call().encode('utf-8')
+            results.append({'case': name, 'encoding': encoding, 'work': 'encode', 'bytes': len(body),
+                            'gzip_bytes': len(gzip.compress(body)), 'ms': round(best(call, rounds) * 1e3, 3)})
+    return results
+
+def device_cases(host, user, passwd, rounds):
+    # The read paths from a device, wall clock time of the GET plus the parse, in both encodings
+    paths = (('full tree', ''), ('vlan table', 'bd-items/bd-items'), ('one interface', 'intf-items/phys-items/PhysIf-list=eth1%2F1'))
+    rc = restconf.RestconfClient(host, user, passwd)
+    results = []
+    for name, path in paths:
+        for encoding in ('xml', 'json'):
+            rc.encoding = restconf.ENCODINGS[encoding]
+            size = [0]
+            def call():
+                response = rc.get(path)
+                response.raise_for_status()
+                size[0] = len(response.content)
+                if(encoding == 'json'):
+                    yangjson.loads(response.content)
+                else:
+                    yangjson.from_xml(response.content)
+            elapsed = best(call, rounds)
+            results.append({'case': name, 'encoding': encoding, 'work': 'device GET + parse', 'bytes': size[0], 'gzip_bytes': None, 'ms': round(elapsed * 1e3, 3)})
+    rc.close()
+    return results
+
+if __name__ == "__main__":
+    # Example syntax for runtime "python3 NXOS-bench-restconf-encoding.py -i 384 -v 2000 -O encoding.json"
+    parser = argparse.ArgumentParser(description='Nexus RESTCONF Encoding Benchmark')
+    parser.add_argument('-i', '--Interfaces', type=int, default=384, help='Interfaces of the synthetic switch (Default 384)')
+    parser.add_argument('-v', '--Vlans', type=int, default=2000, help='VLANs of the synthetic switch (Default 2000)')
+    parser.add_argument('-b', '--BulkVlans', type=int, default=200, help='VLANs in the bulk create body (Default 200)')
+    parser.add_argument('-r', '--Rounds', type=int, default=5, help='Timed rounds per case, the best one is reported (Default 5)')
+    parser.add_argument('-H', '--HostIP', type=str, help='Also read the paths from this device (Optional)')
+    parser.add_argument('-U', '--Username', type=str, help='Username for RESTCONF Access with -H')
+    parser.add_argument('-P', '--Password', type=str, help='Password for RESTCONF Access with -H')
+    parser.add_argument('-O', '--Output', type=str, help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = read_cases(synthetic_replies(args.Interfaces, args.Vlans), args.Rounds)
+    results += write_cases(args.BulkVlans, args.Rounds)
+    if(args.HostIP):
+        user = args.Username or input("Please Enter the Username for RESTCONF Device Access > ")
+        passwd = args.Password or input("Please Enter the Password for RESTCONF Device Access > ")
+        results += device_cases(args.HostIP, user, passwd, args.Rounds)
+    print("%-16s %-8s %-20s %12s %12s %10s" % ('case', 'encoding', 'work', 'bytes', 'gzip bytes', 'ms'))
+    for result in results:
+        print("%-16s %-8s %-20s %12d %12s %10.3f" % (result['case'], result['encoding'], result['work'], result['bytes'], '-' if result['gzip_bytes'] is None else result['gzip_bytes'], result['ms']))
+    if(args.Output):
+        with open(args.Output, 'w') as handle:
+            json.dump(results, handle, indent=2)
@@ -0,0 +1,115 @@
+#!/bin/env python3
+
+import sys, os, time, argparse, json, subprocess
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import scripts
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-04-07"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+# Start up cost of a run, the single device scripts (before) against the same work through python3 -m nexusprog
+# (after). Every case starts a new interpreter, like cron does, and points it at an address where nothing listens so
+# the run ends at its first connection attempt: what is measured is the interpreter, the imports and the argument
+# handling, everything a run pays before it talks to the device. A second run with -X importtime tells which
+# libraries the case loaded and how long the imports took. No device needed.
+
+HEAVY = ('ncclient', 'requests', 'lxml', 'paramiko')
+
+def cases(ADDRESS):
+    login = ['-H', ADDRESS, '-U', 'admin', '-P', 'password']
+    return [
+        ('help', None, ['-h']),
+        ('vlan restconf', [scripts.RESTCONF_VLAN] + login + ['-NV', '100', '-NI'], ['vlan'] + login + ['-T', 'restconf', '-NV', '100']),
+        ('vlan netconf', [scripts.NETCONF_VLAN] + login + ['-NV', '100', '-NI'], ['vlan'] + login + ['-NV', '100']),
+        ('user restconf', [scripts.RESTCONF_USER] + login + ['-NU', 'bob', '-NP', 'secret', '-NR', 'network-operator'],
+         ['user'] + login + ['-T', 'restconf', '-NU', 'bob', '-NP', 'secret', '-NR', 'network-operator']),
+        ('save nxapi', [scripts.RESTCONF_COPYRUNSTART] + login, ['save'] + login + ['-T', 'restconf']),
+        ('save xmlagent', [scripts.NETCONF_COPYRUNSTART] + login, ['save'] + login),
+        ('backup nxapi', ['Restconf/Snippets/NXOS-restconf-ins-shrunconfig.py'] + login, ['backup'] + login + ['-T', 'nxapi']),
+        ('backup xmlagent', ['Netconf/Snippets/NXOS-ncclient-XMLMGR-shrunconfig.py'] + login, ['backup'] + login),
+        ('port access', [scripts.ACCESS_PORT] + login + ['-I', 'eth1/1', '-V', '10'], ['port'] + login + ['-I', 'eth1/1', '-V', '10']),
+    ]
+
+def command(LEGACY, CLI):
+    # Interpreter command line of one side of a case
+    if(LEGACY is not None):
+        return [sys.executable, os.path.join(scripts.REPO_ROOT, LEGACY[0])] + LEGACY[1:]
+    return [sys.executable, '-m', 'nexusprog'] + CLI
+
+def wall_ms(ARGVS, ROUNDS, DEBUG):
+    # Median and best wall clock time of ROUNDS runs of every command line. The command lines take turns so a busy
+    # moment of the machine hits the before and the after side alike. The runs fail at the connect on purpose, the
+    # exit code is not looked at, the output only with -D.
+    times = [[] for argv in ARGVS]
+    for index in range(ROUNDS):
+        for argv, runs in zip(ARGVS, times):
+            start = time.perf_counter()
+            proc = subprocess.run(argv, cwd=scripts.REPO_ROOT, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            runs.append((time.perf_counter() - start) * 1000)
+            if(DEBUG and index == 0):
+                print(' '.join(argv) + "\n" + proc.stdout.decode('utf-8', 'replace')[-600:])
+    return [(sorted(runs)[len(runs) // 2], min(runs)) for runs in times]
+
+def imports(ARGV):
+    # Total import time (ms) and the heavy libraries loaded, from the -X importtime report of one run
+    proc = subprocess.run([ARGV[0], '-X', 'importtime'] + ARGV[1:], cwd=scripts.REPO_ROOT, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    total = 0
+    loaded = set()
+    for line in proc.stderr.decode('utf-8', 'replace').splitlines():
+        if(not line.startswith('import time:') or 'cumulative' in line):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if(not name.startswith('  ')):
+            # Top level import, its cumulative time holds everything it pulled in
+            total += int(cumulative)
+        package = name.strip().split('.')[0]
+        if(package in HEAVY):
+            loaded.add(package)
+    return total / 1000.0, sorted(loaded)
+
+def run(ADDRESS, ROUNDS, DEBUG):
+    # The interpreter alone first, the floor every case starts from
+    results = []
+    sides = [[('python -c pass', 'floor', [sys.executable, '-c', 'pass'])]]
+    for name, legacy, cli in cases(ADDRESS):
+        case = [(name, 'after', command(None, cli))]
+        if(legacy is not None):
+            case.insert(0, (name, 'before', command(legacy, None)))
+        sides.append(case)
+    for case in sides:
+        for (name, side, argv), (median, best) in zip(case, wall_ms([argv for name, side, argv in case], ROUNDS, DEBUG)):
+            import_ms, loaded = imports(argv)
+            results.append({'case': name, 'side': side, 'median_ms': round(median, 1), 'best_ms': round(best, 1),
+                            'import_ms': round(import_ms, 1), 'loaded': loaded})
+    return results
+
+def print_results(RESULTS):
+    print("%-16s %-7s %10s %10s %10s  %s" % ('case', 'side', 'median ms', 'best ms', 'import ms', 'libraries loaded'))
+    for result in RESULTS:
+        print("%-16s %-7s %10.1f %10.1f %10.1f  %s" % (result['case'], result['side'], result['median_ms'], result['best_ms'],
+                                                      result['import_ms'], ', '.join(result['loaded']) or '-'))
+    before = dict((result['case'], result['median_ms']) for result in RESULTS if result['side'] == 'before')
+    after = dict((result['case'], result['median_ms']) for result in RESULTS if result['side'] == 'after' and result['case'] in before)
+    if(after):
+        saved = sum(before[case] - after[case] for case in after) / len(after)
+        print("%.1f ms saved per run on average, %.0f s per 10000 cron runs" % (saved, saved * 10))
+
+if __name__ == "__main__":
+    # Example syntax for runtime "python3 NXOS-bench-startup.py -r 20 -O startup.json"
+    parser = argparse.ArgumentParser(description='Nexus Script Start Up Benchmark')
+    parser.add_argument('-a', '--Address', type=str, default='127.0.0.9', help='Address the runs connect to, nothing may listen on 22, 830 or 443 there (Default 127.0.0.9)')
+    parser.add_argument('-r', '--Rounds', type=int, default=10, help='Runs per case and side, the median and the best are reported (Default 10)')
+    parser.add_argument('-O', '--Output', type=str, help='Write the results to this JSON file')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Print the output of the first run of every case')
+    args = parser.parse_args()
+
+    results = run(args.Address, max(1, args.Rounds), args.Debug)
+    print_results(results)
+    if(args.Output):
+        with open(args.Output, 'w') as handle:
+            json.dump(results, handle, indent=2)
+        print("Results written to " + args.Output)
@@ -0,0 +1,115 @@
+#!/bin/env python3
+
+import sys, os, time, argparse, json, random
+from xml.sax.saxutils import escape as xml_escape
+from lxml import etree
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import scripts
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-31"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+# Time and size of building the access port edit_config payloads of a fleet plan, the string concatenation the
+# provisioning script used (before) against the precompiled nexusprog.template it renders now (after). Synthetic
+# ports, no device needed. The payloads of both have to be the same XML once the indentation is ignored.
+
+def concat_payload(PORTS):
+    # nx_accessport_payload as it was, string literals and parameters concatenated for every port
+    phys = ''
+    stp = ''
+    for INTERFACE, IFVLAN, DESC in PORTS:
+        phys = phys + '''
+                        <PhysIf-list>
+                            <id>''' + INTERFACE + '''</id>
+                            <layer>Layer2</layer>
+                            <accessVlan>vlan-''' + str(IFVLAN) + '''</accessVlan>
+                            <adminSt>up</adminSt>'''
+        if(DESC):
+            phys = phys + '''
+                            <descr>''' + xml_escape(DESC) + '''</descr>'''
+        phys = phys + '''
+                        </PhysIf-list>'''
+        stp = stp + '''
+                            <If-list>
+                                <id>''' + INTERFACE + '''</id>
+                                <mode>edge</mode>
+                                <bpduguard>enable</bpduguard>
+                            </If-list>'''
+    return '''
+        <config>
+		    <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
+                <intf-items>
+                    <phys-items>''' + phys + '''
+                    </phys-items>
+                </intf-items>
+                <stp-items>
+                    <inst-items>
+                        <if-items>''' + stp + '''
+                        </if-items>
+                    </inst-items>
+                </stp-items>
+ 		    </System>
+        </config>'''
+
+def synthetic_plan(payloads, ports, seed):
+    # ports (interface, vlan, description) tuples for each of payloads devices, every third port without description
+    rng = random.Random(seed)
+    plan = []
+    for _ in range(payloads):
+        plan.append([('eth1/%d' % port, rng.randint(2, 4094), None if port % 3 == 0 else 'Server %d rack %s & row %d' % (rng.randint(1, 999), rng.choice('ABCD'), rng.randint(1, 40)))
+                     for port in range(1, ports + 1)])
+    return plan
+
+def canonical(payload):
+    # The XML of a payload without the whitespace between the tags, to compare the before and after payloads
+    parser = etree.XMLParser(remove_blank_text=True)
+    return etree.tostring(etree.fromstring(payload.strip() if isinstance(payload, str) else payload, parser), method='c14n')
+
+def run(plan, rounds):
+    payload = scripts.load(scripts.ACCESS_PORT).nx_accessport_payload
+    template = scripts.load(scripts.ACCESS_PORT).ACCESSPORT_TEMPLATE
+    def render_bytes(PORTS):
+        return template.render_bytes(ports=[{'interface': INTERFACE, 'vlan': IFVLAN, 'descr': DESC} for INTERFACE, IFVLAN, DESC in PORTS])
+    cases = [('concat', concat_payload), ('template', payload), ('template bytes', render_bytes)]
+    ports = sum(len(device) for device in plan)
+    results = []
+    outputs = {}
+    for case, build in cases:
+        best = None
+        for _ in range(rounds):
+            start = time.time()
+            built = [build(device) for device in plan]
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        outputs[case] = built
+        size = sum(len(item.encode('utf-8') if isinstance(item, str) else item) for item in built)
+        results.append({'case': case, 'payloads': len(plan), 'ports': ports, 'seconds': round(best, 4),
+                        'us_per_payload': round(best / len(plan) * 1e6, 2), 'us_per_port': round(best / ports * 1e6, 3),
+                        'bytes_per_payload': int(size / len(plan))})
+    # Every approach has to produce the same XML for every payload
+    for case in outputs:
+        if([canonical(item) for item in outputs[case]] != [canonical(item) for item in outputs['concat']]):
+            sys.exit("The " + case + " payloads differ from the concatenated ones")
+    return results
+
+if __name__ == "__main__":
+    # Example syntax for runtime "python3 NXOS-bench-template.py -n 2000 -p 48 -O template.json"
+    parser = argparse.ArgumentParser(description='Nexus Payload Template Benchmark')
+    parser.add_argument('-n', '--Payloads', type=int, default=2000, help='Number of payloads, one per device (Default 2000)')
+    parser.add_argument('-p', '--Ports', type=int, default=48, help='Access ports per payload (Default 48)')
+    parser.add_argument('-r', '--Rounds', type=int, default=3, help='Timed rounds per case, the best one is reported (Default 3)')
+    parser.add_argument('-s', '--Seed', type=int, default=1, help='Random seed of the synthetic ports (Default 1)')
+    parser.add_argument('-O', '--Output', type=str, help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = run(synthetic_plan(args.Payloads, args.Ports, args.Seed), args.Rounds)
+    print("%-16s %8s %8s %10s %14s %12s %16s" % ('case', 'payloads', 'ports', 'seconds', 'us per payload', 'us per port', 'bytes per payload'))
+    for result in results:
+        print("%-16s %8d %8d %10.4f %14.2f %12.3f %16d" % (result['case'], result['payloads'], result['ports'], result['seconds'], result['us_per_payload'], result['us_per_port'], result['bytes_per_payload']))
+    if(args.Output):
+        with open(args.Output, 'w') as handle:
+            json.dump(results, handle, indent=2)
@@ -0,0 +1,105 @@
+#!/bin/env python3
+
+import sys, os, time, argparse, json, random
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import vlanset
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-29"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+# Time per trunk port of checking its allowed VLAN range against the VLAN table of the switch, the set of 'vlan-N'
+# dicts the TrunkEdge pre-check built (before) against nexusprog.vlanset bitmaps (after). Synthetic switches and
+# trunk ranges, no device needed.
+
+def synthetic_fleet(devices, ports, seed):
+    # Per device: the VLAN table as the device returns it (fabEncap values) and the trunkVlans string of every port
+    rng = random.Random(seed)
+    fleet = []
+    for _ in range(devices):
+        vlans = sorted(rng.sample(range(1, 4095), rng.randint(200, 2000)))
+        trunks = []
+        for _ in range(ports):
+            parts = []
+            for _ in range(rng.randint(1, 8)):
+                low = rng.choice(vlans)
+                high = min(4094, low + rng.choice((0, 0, 5, 50, 400)))
+                parts.append(str(low) if low == high else '%d-%d' % (low, high))
+            trunks.append(','.join(parts))
+        fleet.append((['vlan-%d' % vlan for vlan in vlans], trunks))
+    return fleet
+
+def check_dicts(FABENCAPS, IFVLAN):
+    # The pre-check as it was: the switch VLANs into a dict, the requested range split into a set and then a dict
+    switchvlanrange = {}
+    for vlan in FABENCAPS:
+       switchvlanrange[vlan] = vlan
+    VLANIDs = str(IFVLAN)
+    VLANIDs=VLANIDs.join(VLANIDs.split())
+    r=set()
+    for x in VLANIDs.split(','):
+        t=x.split('-')
+        r.add(int(t[0])) if len(t)==1 else r.update(set(range(int(t[0]),int(t[1])+1)))
+    l=list(r)
+    l.sort()
+    vlanrange = {}
+    for myelement in l:
+        vlanrange['vlan-' + str(myelement)] = 'vlan-' + str(myelement)
+    return set(vlanrange).issubset(set(switchvlanrange))
+
+def check_dicts_reused(SWITCHVLANS, IFVLAN):
+    # Same, but with the switch VLAN set built once per device instead of once per port
+    r=set()
+    for x in IFVLAN.split(','):
+        t=x.split('-')
+        r.add(int(t[0])) if len(t)==1 else r.update(set(range(int(t[0]),int(t[1])+1)))
+    return set('vlan-' + str(vlan) for vlan in r).issubset(SWITCHVLANS)
+
+def run(fleet):
+    ports = sum(len(trunks) for _, trunks in fleet)
+    results = []
+    verdicts = {}
+    cases = [('dicts per port', lambda vlans: vlans, check_dicts),
+             ('sets per device', lambda vlans: set(vlans), check_dicts_reused),
+             ('vlanset', vlanset.VlanSet.of, lambda switch, trunk: vlanset.parse(trunk).issubset(switch))]
+    for case, prepare, check in cases:
+        prepare_time = 0.0
+        check_time = 0.0
+        verdict = []
+        for vlans, trunks in fleet:
+            start = time.time()
+            switch = prepare(vlans)
+            prepare_time += time.time() - start
+            start = time.time()
+            for trunk in trunks:
+                verdict.append(check(switch, trunk))
+            check_time += time.time() - start
+        verdicts[case] = verdict
+        results.append({'case': case, 'devices': len(fleet), 'ports': ports, 'seconds': round(prepare_time + check_time, 3),
+                        'ms_per_device': round(prepare_time / len(fleet) * 1e3, 3), 'us_per_port': round(check_time / ports * 1e6, 2)})
+    # Every approach has to come to the same verdict for every port
+    if(len(set(tuple(verdict) for verdict in verdicts.values())) != 1):
+        sys.exit("The approaches disagree on at least one port")
+    return results
+
+if __name__ == "__main__":
+    # Example syntax for runtime "python3 NXOS-bench-vlanset.py -d 100 -p 48 -O vlanset.json"
+    parser = argparse.ArgumentParser(description='Nexus Trunk VLAN Check Benchmark')
+    parser.add_argument('-d', '--Devices', type=int, default=100, help='Number of synthetic switches (Default 100)')
+    parser.add_argument('-p', '--Ports', type=int, default=48, help='Trunk ports per switch (Default 48)')
+    parser.add_argument('-s', '--Seed', type=int, default=1, help='Random seed of the synthetic fleet (Default 1)')
+    parser.add_argument('-O', '--Output', type=str, help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = run(synthetic_fleet(args.Devices, args.Ports, args.Seed))
+    # ms per device is the time spent on the VLAN table of a switch (once per device), us per port the check of one
+    # trunk range against it
+    print("%-16s %8s %10s %14s %12s" % ('case', 'ports', 'seconds', 'ms per device', 'us per port'))
+    for result in results:
+        print("%-16s %8d %10.3f %14.3f %12.2f" % (result['case'], result['ports'], result['seconds'], result['ms_per_device'], result['us_per_port']))
+    if(args.Output):
+        with open(args.Output, 'w') as handle:
+            json.dump(results, handle, indent=2)
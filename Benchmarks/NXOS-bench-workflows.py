@@ -0,0 +1,313 @@
+#!/bin/env python3
+
+import sys, os, io, time, json, shutil, logging, argparse, tempfile, platform, statistics, contextlib, collections
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import backup, emulator, restconf, scripts, yangxml
+from nexusprog.session import NxSession
+# Fix input vs raw_input between Python 2.x and 3.x
+try: input = raw_input
+except NameError: pass
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-04-06"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+# End to end timing of the workflows of this repository against an emulated switch (nexusprog/emulator.py). Every
+# workflow calls the functions of the real scripts, step by step, and every step gets its wall clock time plus the
+# RPCs/HTTP requests, new connections and payload bytes the emulated device counted while it ran. A round starts from
+# a fresh device tree, empty script caches and no pooled RESTCONF connections, like a new run of the script. The same
+# operation is run over each transport that can do it (NETCONF, RESTCONF in XML and JSON, XML Agent, NX-API), the
+# results go to a JSON file and a run compared with an earlier one (-B) lists the steps that got slower or chattier.
+
+USER = 'admin'
+PASS = 'password'
+ACCESS_INTERFACE = 'eth1/10'
+TRUNK_INTERFACE = 'eth1/11'
+ACCESS_VLAN = '20'
+TRUNK_VLANS = '10-30'
+NEW_USER = 'benchuser'
+NEW_ROLE = 'network-operator'
+SNIPPET_TRANSPORTS = ('netconf', 'restconf-xml', 'restconf-json')
+UNDERLAY_PHYS = {'eth1/1': '10.1.1.2/30', 'eth1/2': '10.1.1.6/30'}
+UNDERLAY_LOOP = {'lo0': '192.168.1.1/32'}
+
+class StepFailed(Exception):
+    pass
+
+class StepRecorder(object):
+    # Runs the steps of one workflow run and takes what each of them cost from the counters of the emulated device
+
+    def __init__(self, device):
+        self.device = device
+        self.steps = []
+
+    def step(self, name, call, *args):
+        before = self.device.stats()
+        output = io.StringIO()
+        error = None
+        start = time.time()
+        try:
+            # The scripts print their progress and exit() on a failed check
+            with contextlib.redirect_stdout(output):
+                result = call(*args)
+        except (Exception, SystemExit) as e:
+            error = "%s: %s" % (type(e).__name__, e)
+        elapsed = time.time() - start
+        after = self.device.stats()
+        delta = dict((key, after.get(key, 0) - before.get(key, 0)) for key in after)
+        self.steps.append({'step': name, 'ms': elapsed * 1e3,
+                           'rpcs': sum(value for key, value in delta.items() if key.startswith('rpc:') or key.startswith('http:')),
+                           'connections': delta.get('ssh_connects', 0) + delta.get('https_connects', 0),
+                           'request_bytes': delta.get('bytes_in', 0), 'reply_bytes': delta.get('bytes_out', 0), 'error': error})
+        if(error):
+            raise StepFailed(name + " - " + error + (" (" + output.getvalue().strip()[-200:] + ")" if output.getvalue().strip() else ""))
+        return result
+
+def wf_accessport_provision(REC, HOST, TRANSPORT):
+    # NXOS-Access-Port-Provision.py as its main() runs it, one NxSession for all steps
+    prov = scripts.load(scripts.ACCESS_PORT)
+    with NxSession(HOST, USER, PASS) as session:
+        REC.step('precheck', prov.nx_config_precheck, session, ACCESS_INTERFACE, ACCESS_VLAN, False)
+        REC.step('backup pre', prov.nx_config_backup_pre, session, False)
+        REC.step('rollback capture', prov.nx_config_rollback_capture, session, ACCESS_INTERFACE, False)
+        REC.step('change', prov.nx_config_accessport, session, ACCESS_INTERFACE, ACCESS_VLAN, False)
+        REC.step('save', prov.nx_config_wrme, session, False)
+        REC.step('backup post', prov.nx_config_backup_post, session, False)
+        REC.step('close', session.close)
+
+def wf_trunkedge_provision(REC, HOST, TRANSPORT):
+    prov = scripts.load(scripts.TRUNKEDGE_PORT)
+    with NxSession(HOST, USER, PASS) as session:
+        REC.step('precheck', prov.nx_config_precheck, session, TRUNK_INTERFACE, TRUNK_VLANS, False)
+        REC.step('backup pre', prov.nx_config_backup_pre, session, False)
+        REC.step('rollback capture', prov.nx_config_rollback_capture, session, TRUNK_INTERFACE, False)
+        REC.step('change', prov.nx_config_accessport, session, TRUNK_INTERFACE, TRUNK_VLANS, False)
+        REC.step('save', prov.nx_config_wrme, session, False)
+        REC.step('backup post', prov.nx_config_backup_post, session, False)
+        REC.step('close', session.close)
+
+def snippet(TRANSPORT, NETCONF, RESTCONF):
+    return scripts.load(NETCONF if TRANSPORT == 'netconf' else RESTCONF)
+
+def wf_accessport(REC, HOST, TRANSPORT):
+    # The interfaceaccess snippets: VLAN check, interface check, change
+    mod = snippet(TRANSPORT, scripts.NETCONF_INTERFACE, scripts.RESTCONF_INTERFACE)
+    if(not REC.step('check vlan', mod.check_vlan_yang, HOST, USER, PASS, ACCESS_VLAN)):
+        raise StepFailed("check vlan - VLAN " + ACCESS_VLAN + " not found")
+    if(not REC.step('check interface', mod.check_interface_yang, HOST, USER, PASS, ACCESS_INTERFACE)):
+        raise StepFailed("check interface - " + ACCESS_INTERFACE + " is not free")
+    REC.step('change', mod.configure_interface_yang, HOST, USER, PASS, ACCESS_INTERFACE, ACCESS_VLAN, 'Benchmark')
+
+def wf_vlan_create(REC, HOST, TRANSPORT, VLANS):
+    mod = snippet(TRANSPORT, scripts.NETCONF_VLAN, scripts.RESTCONF_VLAN)
+    if(not REC.step('check', mod.check_vlan_yang, HOST, USER, PASS, VLANS)):
+        raise StepFailed("check - VLANs " + VLANS + " exist already")
+    REC.step('create', mod.configure_vlan_yang, HOST, USER, PASS, VLANS, 'BENCH-{vlan}', None, '8192', '10000')
+
+def wf_user_create(REC, HOST, TRANSPORT):
+    mod = snippet(TRANSPORT, scripts.NETCONF_USER, scripts.RESTCONF_USER)
+    REC.step('check role', mod.check_role_yang, HOST, USER, PASS, NEW_ROLE)
+    if(not REC.step('check user', mod.check_user_yang, HOST, USER, PASS, NEW_USER)):
+        raise StepFailed("check user - " + NEW_USER + " exists already")
+    REC.step('create', mod.create_user_yang, HOST, USER, PASS, NEW_USER, 'Bench-Passw0rd', NEW_ROLE)
+
+def wf_backup(REC, HOST, TRANSPORT):
+    # Full tree (NETCONF, RESTCONF) or running configuration (XML Agent, NX-API) to a file
+    REC.step('fetch', backup.backup_device, HOST, USER, PASS, TRANSPORT, '.')
+
+def wf_vxlan_leaf(REC, HOST, TRANSPORT):
+    # -LEAF of NXOS-ncclient-vxlanevpn-leaf.py: feature check and enable, then the whole leaf in one transaction
+    leaf = scripts.load(scripts.VXLAN_LEAF)
+    with NxSession(HOST, USER, PASS) as session:
+        missing = REC.step('feature check', leaf.feature_check, session)
+        if(missing):
+            REC.step('feature enable', leaf.feature_enable, session, missing)
+        batch = yangxml.ConfigBatch()
+        def build():
+            leaf.configure_underlay(batch, 'ospf', '0', UNDERLAY_PHYS, UNDERLAY_LOOP)
+            leaf.config_mcast_underlay(batch, None, None)
+            leaf.create_l2fabric(batch, None, None)
+            leaf.create_l3fabric(batch, None, None)
+            leaf.create_evpn_ctrl(batch, None, None)
+        REC.step('build payloads', build)
+        res = REC.step('push', batch.push, session.netconf)
+        if(res is None or not res.ok):
+            raise StepFailed("push - the device did not accept the leaf configuration")
+        REC.step('close', session.close)
+
+def workflows(ARGS):
+    # name -> (transports, callable(recorder, host, transport))
+    vlans = str(ARGS.FirstVlan) + "-" + str(ARGS.FirstVlan + ARGS.NewVlans - 1)
+    return collections.OrderedDict([
+        ('accessport-provision', (('netconf',), wf_accessport_provision)),
+        ('trunkedge-provision', (('netconf',), wf_trunkedge_provision)),
+        ('accessport', (SNIPPET_TRANSPORTS, wf_accessport)),
+        ('vlan-create', (SNIPPET_TRANSPORTS, lambda rec, host, transport: wf_vlan_create(rec, host, transport, vlans))),
+        ('user-create', (SNIPPET_TRANSPORTS, wf_user_create)),
+        ('backup', (backup.TRANSPORTS, wf_backup)),
+        ('vxlan-leaf', (('netconf',), wf_vxlan_leaf)),
+    ])
+
+def fresh_round(DEVICE, HOST):
+    # What a new run of a script starts with: the initial device configuration, no cached state, no open connections
+    DEVICE.reset()
+    restconf.close_all()
+    for relpath in (scripts.NETCONF_VLAN, scripts.RESTCONF_VLAN, scripts.NETCONF_INTERFACE):
+        scripts.load(relpath).STATE_CACHE.invalidate(HOST)
+
+def run_workflow(DEVICE, HOST, NAME, TRANSPORT, CALL, ROUNDS):
+    # Step results of one workflow over one transport, the time of every step is the median of the rounds
+    rounds = []
+    for _ in range(ROUNDS):
+        fresh_round(DEVICE, HOST)
+        restconf.set_encoding(HOST, 'json' if TRANSPORT.endswith('-json') else 'xml')
+        recorder = StepRecorder(DEVICE)
+        try:
+            CALL(recorder, HOST, TRANSPORT)
+        except StepFailed as e:
+            return [{'workflow': NAME, 'transport': TRANSPORT, 'step': 'total', 'error': str(e)}]
+        rounds.append(recorder.steps)
+    results = []
+    for index, step in enumerate(rounds[-1]):
+        times = [steps[index]['ms'] for steps in rounds]
+        results.append(dict(step, workflow=NAME, transport=TRANSPORT, ms=round(statistics.median(times), 3), ms_min=round(min(times), 3)))
+    total = {'workflow': NAME, 'transport': TRANSPORT, 'step': 'total', 'error': None,
+             'ms': round(statistics.median([sum(step['ms'] for step in steps) for steps in rounds]), 3),
+             'ms_min': round(min(sum(step['ms'] for step in steps) for steps in rounds), 3)}
+    for key in ('rpcs', 'connections', 'request_bytes', 'reply_bytes'):
+        total[key] = sum(step[key] for step in results)
+    return results + [total]
+
+def result_key(RESULT):
+    return (RESULT['workflow'], RESULT['transport'], RESULT['step'])
+
+def regressions(RESULTS, BASELINE, THRESHOLD, MIN_MS):
+    # Steps that take more than THRESHOLD percent (and MIN_MS) longer than in the baseline, send more RPCs or open
+    # more connections, or move THRESHOLD percent more bytes. Steps that failed now but not in the baseline as well.
+    before = dict((result_key(result), result) for result in BASELINE)
+    found = []
+    for result in RESULTS:
+        old = before.get(result_key(result))
+        if(old is None):
+            continue
+        label = "%s/%s %s" % result_key(result)
+        if(result.get('error')):
+            if(not old.get('error')):
+                found.append(label + ": failed (" + result['error'] + ")")
+            continue
+        if(old.get('error')):
+            continue
+        if(result['ms'] > old['ms'] * (1 + THRESHOLD / 100.0) and result['ms'] - old['ms'] > MIN_MS):
+            found.append(label + ": %.1f ms, was %.1f ms (+%.0f%%)" % (result['ms'], old['ms'], (result['ms'] / old['ms'] - 1) * 100 if old['ms'] else 0))
+        for key in ('rpcs', 'connections'):
+            if(result[key] > old[key]):
+                found.append(label + ": %d %s, was %d" % (result[key], key, old[key]))
+        for key in ('request_bytes', 'reply_bytes'):
+            if(result[key] > old[key] * (1 + THRESHOLD / 100.0)):
+                found.append(label + ": %d %s, was %d" % (result[key], key.replace('_', ' '), old[key]))
+    return found
+
+def print_results(RESULTS):
+    print("%-21s %-14s %-17s %10s %10s %5s %5s %10s %10s" % ('workflow', 'transport', 'step', 'ms', 'min ms', 'rpcs', 'conns', 'req bytes', 'reply bytes'))
+    for result in RESULTS:
+        if(result.get('error')):
+            print("%-21s %-14s %-17s FAILED %s" % (result['workflow'], result['transport'], result['step'], result['error']))
+            continue
+        print("%-21s %-14s %-17s %10.1f %10.1f %5d %5d %10d %10d" % (result['workflow'], result['transport'], result['step'], result['ms'], result['ms_min'],
+                                                                     result['rpcs'], result['connections'], result['request_bytes'], result['reply_bytes']))
+
+def print_comparison(RESULTS):
+    # Workflow totals of the operations that run over more than one transport, fastest first
+    totals = collections.OrderedDict()
+    for result in RESULTS:
+        if(result['step'] == 'total' and not result.get('error')):
+            totals.setdefault(result['workflow'], []).append(result)
+    for workflow, runs in totals.items():
+        if(len(runs) < 2):
+            continue
+        runs = sorted(runs, key=lambda result: result['ms'])
+        print(workflow + ": " + ", ".join("%s %.1f ms (x%.2f, %d rpcs)" % (result['transport'], result['ms'], result['ms'] / runs[0]['ms'] if runs[0]['ms'] else 1, result['rpcs']) for result in runs))
+
+if __name__ == "__main__":
+    # Example syntax for runtime "sudo python3 NXOS-bench-workflows.py -r 5 -l 10 -O workflows.json -B last-workflows.json"
+    parser = argparse.ArgumentParser(description='Nexus Workflow Benchmark')
+    parser.add_argument('-w', '--Workflow', type=str, action='append', dest='Workflows', help='Workflow to run, repeat for more (Default all)')
+    parser.add_argument('-T', '--Transport', type=str, action='append', dest='Transports', help='Only run over this transport, repeat for more (Default all)')
+    parser.add_argument('-r', '--Rounds', type=int, default=3, help='Rounds per workflow and transport, the median is reported (Default 3)')
+    parser.add_argument('-a', '--Address', type=str, default='127.0.1.1', help='Loopback address of the emulated device (Default 127.0.1.1)')
+    parser.add_argument('-I', '--Interfaces', type=int, default=96, help='Interfaces of the emulated device (Default 96)')
+    parser.add_argument('-V', '--Vlans', type=int, default=500, help='VLANs of the emulated device (Default 500)')
+    parser.add_argument('-N', '--NewVlans', type=int, default=100, help='VLANs created by vlan-create (Default 100)')
+    parser.add_argument('-F', '--FirstVlan', type=int, default=2000, help='First VLAN created by vlan-create (Default 2000)')
+    parser.add_argument('-l', '--Latency', type=float, default=0.0, help='Milliseconds the device adds to every reply (Default 0)')
+    parser.add_argument('-c', '--CopyTime', type=float, default=0.0, help='Seconds a copy running-config startup-config takes (Default 0)')
+    parser.add_argument('-O', '--Output', type=str, help='Write the results to this JSON file')
+    parser.add_argument('-B', '--Baseline', type=str, help='Results of an earlier run (-O) to check this run against')
+    parser.add_argument('-t', '--Threshold', type=float, default=20.0, help='Percent a step may get slower or bigger before it is a regression (Default 20)')
+    parser.add_argument('-m', '--MinMs', type=float, default=5.0, help='Slowdowns of less than this many milliseconds are ignored (Default 5)')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
+    args = parser.parse_args()
+    if(args.Debug):
+        print("Debug Mode On")
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    selected = workflows(args)
+    for name in args.Workflows or []:
+        if(name not in selected):
+            sys.exit("Unknown workflow " + name + ", use one of " + ", ".join(selected))
+    baseline = None
+    if(args.Baseline):
+        with open(args.Baseline) as handle:
+            baseline = json.load(handle)
+
+    device = emulator.EmulatedDevice(args.Address, interfaces=args.Interfaces, vlans=args.Vlans, credentials={USER: PASS},
+                                     latency=args.Latency / 1000.0, copy_time=args.CopyTime)
+    emulated = emulator.Emulator([device])
+    try:
+        emulated.start()
+    except OSError as e:
+        sys.exit("Could not start the emulated device on " + args.Address + " (" + str(e) + "), ports 22, 830 and 443 need root")
+    # The scripts write their backups to the current directory
+    workdir = tempfile.mkdtemp(prefix='nxos-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    results = []
+    run_start = time.time()
+    try:
+        for name, (transports, call) in selected.items():
+            if(args.Workflows and name not in args.Workflows):
+                continue
+            for transport in transports:
+                if(args.Transports and transport not in args.Transports):
+                    continue
+                results += run_workflow(device, args.Address, name, transport, call, args.Rounds)
+    finally:
+        restconf.close_all()
+        emulated.stop()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results)
+    print("")
+    print_comparison(results)
+    print("%d workflow run(s) in %.1fs" % (len([result for result in results if result['step'] == 'total']), time.time() - run_start))
+    if(args.Output):
+        meta = {'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(), 'rounds': args.Rounds,
+                'interfaces': args.Interfaces, 'vlans': args.Vlans, 'new_vlans': args.NewVlans, 'latency_ms': args.Latency}
+        with open(args.Output, 'w') as handle:
+            json.dump({'meta': meta, 'results': results}, handle, indent=2)
+        print("Results written to " + args.Output)
+    failed = [result for result in results if result.get('error')]
+    found = regressions(results, baseline['results'], args.Threshold, args.MinMs) if baseline else []
+    if(baseline):
+        print("")
+        print(str(len(found)) + " regression(s) against " + args.Baseline + " (" + baseline['meta']['date'] + ")")
+        for line in found:
+            print("  " + line)
+    if(failed or found):
+        sys.exit(1)
@@ -0,0 +1,86 @@
+#!/bin/env python3
+
+import sys, os, time, argparse, json, resource, subprocess, tracemalloc, io
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-19"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+# Peak memory and time of pulling data out of large XML Agent / NETCONF replies, the minidom code the scripts used
+# (before) against nexusprog.xmlstream (after). Every case runs in its own child process so the peak RSS of one case
+# does not hide the next one. tracemalloc only sees Python allocations, the RSS column covers libxml2 as well.
+
+def xmlagent_reply(size_mb):
+    # Synthetic "show running-config all" reply of roughly size_mb MB, same envelope as the XML Agent sends
+    block = ''.join('interface Ethernet1/%d\n  description uplink &amp; test\n  no shutdown\n  mtu 9216\n' % port for port in range(1, 49))
+    count = max(1, int(size_mb * 1048576 / len(block)))
+    return ('<?xml version="1.0" encoding="ISO-8859-1"?>\n<nf:rpc-reply xmlns:nf="urn:ietf:params:xml:ns:netconf:base:1.0" '
+            'xmlns="http://www.cisco.com/nxos:1.0"><data>\n!Command: show running-config all\n' + block * count + '</data></nf:rpc-reply>')
+
+def yang_reply(size_mb):
+    # Synthetic NETCONF get reply with interface lists, the operSt/fabEncap leaves the pre-checks look for
+    entry = '<PhysIf-list><id>eth1/%d</id><adminSt>up</adminSt><mtu>9216</mtu><descr>test</descr><operSt>down</operSt></PhysIf-list>'
+    block = ''.join(entry % port for port in range(1, 49))
+    count = max(1, int(size_mb * 1048576 / len(block)))
+    return ('<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="101"><data><System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">'
+            '<intf-items><phys-items>' + block * count + '</phys-items></intf-items></System></data></rpc-reply>')
+
+def run_case(case, size_mb):
+    # Executed in the child process: build the reply, then measure only the extraction.
+    if(case.endswith('data')):
+        reply = xmlagent_reply(size_mb)
+    else:
+        reply = yang_reply(size_mb)
+    out = io.StringIO()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    start = time.time()
+    if(case == 'minidom-data'):
+        import xml.dom.minidom
+        xml_doc = xml.dom.minidom.parseString(reply)
+        out.write(xml_doc.getElementsByTagName('data')[0].firstChild.nodeValue)
+    elif(case == 'xmlstream-data'):
+        from nexusprog import xmlstream
+        xmlstream.write_data_text(reply, out)
+    elif(case == 'minidom-leaf'):
+        import xml.dom.minidom
+        xml_doc = xml.dom.minidom.parseString(reply)
+        values = [node.firstChild.nodeValue for node in xml_doc.getElementsByTagName('operSt')]
+        out.write(str(len(values)))
+    elif(case == 'xmlstream-leaf'):
+        from nexusprog import xmlstream
+        out.write(str(len(xmlstream.leaf_texts(reply, 'operSt'))))
+    elapsed = time.time() - start
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux
+    return {'case': case, 'reply_mb': round(len(reply) / 1048576.0, 1), 'seconds': round(elapsed, 3),
+            'traced_peak_mb': round(traced_peak / 1048576.0, 1), 'rss_growth_mb': round((rss_peak - rss_before) / 1024.0, 1)}
+
+if __name__ == "__main__":
+    # Example syntax for runtime "python3 NXOS-bench-xmlparse.py -S 20 -O xmlparse.json"
+    parser = argparse.ArgumentParser(description='Nexus XML Reply Parsing Memory Benchmark')
+    parser.add_argument('-S', '--SizeMB', type=float, default=20, help='Approximate size of the synthetic replies in MB (Default 20)')
+    parser.add_argument('-O', '--Output', type=str, help='Write the results to this JSON file')
+    parser.add_argument('--case', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if(args.case):
+        print(json.dumps(run_case(args.case, args.SizeMB)))
+        sys.exit(0)
+
+    results = []
+    for case in ('minidom-data', 'xmlstream-data', 'minidom-leaf', 'xmlstream-leaf'):
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--case', case, '-S', str(args.SizeMB)])
+        results.append(json.loads(output.decode('utf-8').strip().splitlines()[-1]))
+    print('%-16s %9s %9s %15s %15s' % ('case', 'reply MB', 'seconds', 'traced peak MB', 'RSS growth MB'))
+    for result in results:
+        print('%-16s %9s %9s %15s %15s' % (result['case'], result['reply_mb'], result['seconds'], result['traced_peak_mb'], result['rss_growth_mb']))
+    if(args.Output):
+        with open(args.Output, 'w') as handle:
+            json.dump(results, handle, indent=2)
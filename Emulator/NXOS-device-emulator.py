@@ -0,0 +1,104 @@
+#!/bin/env python3
+
+import sys, os, time, json, logging, argparse
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import emulator
+# Fix input vs raw_input between Python 2.x and 3.x
+try: input = raw_input
+except NameError: pass
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-04-05"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+def build_devices(ARGS):
+    credentials = {ARGS.Username: ARGS.Password} if ARGS.Username else None
+    devices = []
+    for address in emulator.addresses(ARGS.Address, ARGS.Devices):
+        devices.append(emulator.EmulatedDevice(address, interfaces=ARGS.Interfaces, vlans=ARGS.Vlans, users=ARGS.Users,
+                                               features=ARGS.Features.split(','), credentials=credentials,
+                                               latency=ARGS.Latency / 1000.0, jitter=ARGS.Jitter / 1000.0,
+                                               max_sessions=ARGS.MaxSessions, max_requests=ARGS.MaxRequests,
+                                               copy_time=ARGS.CopyTime, candidate=not ARGS.NoCandidate))
+    return devices
+
+def print_stats(STATS):
+    print("%-16s %8s %8s %8s %8s %12s %12s %8s" % ('device', 'sessions', 'rpcs', 'http', 'cli', 'bytes in', 'bytes out', 'refused'))
+    for address, counters in STATS.items():
+        sessions = counters.get('netconf_sessions', 0) + counters.get('xmlagent_sessions', 0)
+        rpcs = sum(value for name, value in counters.items() if name.startswith('rpc:'))
+        http = sum(value for name, value in counters.items() if name.startswith('http:'))
+        refused = counters.get('sessions_refused', 0) + counters.get('requests_refused', 0)
+        print("%-16s %8d %8d %8d %8d %12d %12d %8d" % (address, sessions, rpcs, http, counters.get('cli_commands', 0),
+                                                      counters.get('bytes_in', 0), counters.get('bytes_out', 0), refused))
+
+if __name__ == "__main__":
+    # Setup Arguments to be processed at runtime. This will prevent any stagnant settings
+    # Example syntax for runtime "sudo python3 NXOS-device-emulator.py -n 50 -V 500 -l 20 -U admin -P password -o emulated-inventory"
+    # Parse Incomming Runtime Variables using argparse library
+    parser = argparse.ArgumentParser(description='Nexus Device Emulator')
+    parser.add_argument('-a', '--Address', type=str, default='127.0.1.1', help='Address of the first device, the others take the next ones (Default 127.0.1.1)')
+    parser.add_argument('-n', '--Devices', type=int, default=1, help='Number of devices (Default 1)')
+    parser.add_argument('-I', '--Interfaces', type=int, default=48, help='Ethernet interfaces per device (Default 48)')
+    parser.add_argument('-V', '--Vlans', type=int, default=100, help='VLANs per device (Default 100)')
+    parser.add_argument('-u', '--Users', type=int, default=2, help='Local users per device (Default 2)')
+    parser.add_argument('-f', '--Features', type=str, default='nxapi', help='Comma separated features enabled at start (Default nxapi)')
+    parser.add_argument('-U', '--Username', type=str, help='Username the devices accept, any login is accepted without -U')
+    parser.add_argument('-P', '--Password', type=str, help='Password the devices accept with -U')
+    parser.add_argument('-l', '--Latency', type=float, default=0.0, help='Milliseconds added to every reply (Default 0)')
+    parser.add_argument('-j', '--Jitter', type=float, default=0.0, help='Up to this many more milliseconds added at random (Default 0)')
+    parser.add_argument('-m', '--MaxSessions', type=int, default=emulator.DEFAULT_MAX_SESSIONS, help='NETCONF/XML Agent sessions per device, more are refused (Default 8)')
+    parser.add_argument('-r', '--MaxRequests', type=int, default=emulator.DEFAULT_MAX_REQUESTS, help='HTTPS requests in flight per device, more get a 503 (Default 16)')
+    parser.add_argument('-c', '--CopyTime', type=float, default=0.0, help='Seconds a copy running-config startup-config takes (Default 0)')
+    parser.add_argument('-N', '--NoCandidate', action='store_true', default=False, help='Do not offer the candidate datastore, changes go to running')
+    parser.add_argument('-p', '--Ports', type=str, help='Other ports as xmlagent=PORT,netconf=PORT,https=PORT (the scripts use 22, 830 and 443)')
+    parser.add_argument('-o', '--Inventory', type=str, help='Write an Ansible inventory of the devices to this file for the fleet tools')
+    parser.add_argument('-s', '--Stats', type=str, help='Write the per device counters to this JSON file on exit')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
+    args = parser.parse_args()
+    if(args.Debug):
+        print("Debug Mode On")
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        # paramiko logs every client that goes away without closing its session
+        logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+
+    if(args.Username and not args.Password):
+        args.Password = input("Please Enter the Password the Devices accept > ")
+    ports = {}
+    if(args.Ports):
+        for item in args.Ports.split(','):
+            name, _, port = item.partition('=')
+            if(name not in emulator.PORTS or not port.isdigit()):
+                sys.exit("Unknown port setting " + item + ", use " + ",".join(name + "=PORT" for name in emulator.PORTS))
+            ports[name] = int(port)
+
+    devices = build_devices(args)
+    emulated = emulator.Emulator(devices, ports)
+    try:
+        emulated.start()
+    except (OSError, PermissionError) as e:
+        sys.exit("Could not listen on the device ports (" + str(e) + "), ports below 1024 need root")
+    ports = emulated.ports
+    print("Emulating " + str(len(devices)) + " device(s) " + devices[0].address + (" - " + devices[-1].address if len(devices) > 1 else "") +
+          ", XML Agent port " + str(ports['xmlagent']) + ", NETCONF port " + str(ports['netconf']) + ", HTTPS port " + str(ports['https']))
+    if(args.Inventory):
+        emulator.write_inventory(devices, args.Inventory)
+        print("Inventory written to " + args.Inventory)
+    print("Press Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulated.stop()
+    stats = emulated.stats()
+    print_stats(stats)
+    if(args.Stats):
+        with open(args.Stats, 'w') as handle:
+            json.dump(stats, handle, indent=2)
+        print("Counters written to " + args.Stats)
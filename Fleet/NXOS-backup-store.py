@@ -0,0 +1,95 @@
+#!/bin/env python3
+
+import sys, os, time, argparse
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog.store import BackupStore
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-21"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+def list_backups(STORE, DEVICES):
+    # One line per backup: time, snapshot id, size and label. Without devices every device of the store is listed.
+    for device in DEVICES or STORE.devices():
+        print(device)
+        for entry in STORE.history(device):
+            print("  %s  %s  %10d  %s" % (format_time(entry['time']), entry['snapshot'][:12], entry['size'], entry['label']))
+    return()
+
+def restore_backup(STORE, DEVICE, REF, OUTPUT):
+    # Write a backup out as a plain file (or to stdout), REF is a snapshot id prefix or "latest"
+    try:
+        snapshot = STORE.resolve(DEVICE, REF)
+    except KeyError as e:
+        sys.exit(str(e.args[0]))
+    if(OUTPUT):
+        with open(OUTPUT, 'wb') as handle:
+            size = STORE.restore(snapshot, handle)
+        print("Snapshot " + snapshot[:12] + " of " + DEVICE + " written to " + OUTPUT + " (" + str(size) + " bytes)")
+    else:
+        STORE.restore(snapshot, sys.stdout.buffer)
+    return()
+
+def prune_backups(STORE, DEVICES, KEEPLAST, MAXAGE, KEEPDAILY):
+    # Apply the retention policies to the index of every device then free the objects no backup refers to any more
+    for device in DEVICES or STORE.devices():
+        removed = STORE.prune(device, KEEPLAST, MAXAGE, KEEPDAILY)
+        print(device + ": " + str(len(removed)) + " backup(s) removed")
+    try:
+        objects, freed = STORE.collect()
+    except ValueError as e:
+        sys.exit(str(e))
+    print("%d object(s) removed, %.1f MB freed" % (objects, freed / 1048576.0))
+    return()
+
+def print_stats(STORE):
+    stats = STORE.stats()
+    logical = stats['logical_bytes']
+    stored = stats['stored_bytes']
+    print("%d backup(s) of %d device(s)" % (stats['backups'], len(STORE.devices())))
+    print("%.1f MB of configuration held in %d object(s) taking %.1f MB" % (logical / 1048576.0, stats['objects'], stored / 1048576.0))
+    if(stored):
+        print("Reduction %.1fx" % (float(logical) / stored))
+    return()
+
+if __name__ == "__main__":
+    # Setup Arguments to be processed at runtime. This will prevent any stagnant settings
+    # Example syntax for runtime "python3 NXOS-backup-store.py -s /backups/store prune --KeepLast 10 --KeepDaily 30"
+    # Parse Incomming Runtime Variables using argparse library
+    parser = argparse.ArgumentParser(description='Nexus Backup Store Management')
+    parser.add_argument('-s', '--StoreDir', type=str, required=True, help='Directory of the backup store')
+    subparsers = parser.add_subparsers(dest='Command')
+    subparsers.required = True
+    list_parser = subparsers.add_parser('list', help='List the backups of the given devices (Default all)')
+    list_parser.add_argument('Devices', nargs='*')
+    restore_parser = subparsers.add_parser('restore', help='Write a backup out as a plain file')
+    restore_parser.add_argument('Device')
+    restore_parser.add_argument('Ref', nargs='?', default='latest', help='Snapshot id or a unique prefix of one (Default latest)')
+    restore_parser.add_argument('-o', '--Output', type=str, help='File to write to (Default stdout)')
+    prune_parser = subparsers.add_parser('prune', help='Apply retention policies and free the space of dropped backups')
+    prune_parser.add_argument('Devices', nargs='*')
+    prune_parser.add_argument('--KeepLast', type=int, help='Keep the newest N backups of each device')
+    prune_parser.add_argument('--MaxAgeDays', type=float, help='Keep every backup younger than N days')
+    prune_parser.add_argument('--KeepDaily', type=int, help='Keep the last backup of each of the N most recent days')
+    subparsers.add_parser('stats', help='Space used against the size of the backups as plain files')
+    args = parser.parse_args()
+
+    if(not os.path.isdir(args.StoreDir)):
+        sys.exit("No backup store at " + args.StoreDir)
+    store = BackupStore(args.StoreDir)
+    if(args.Command == 'list'):
+        list_backups(store, args.Devices)
+    elif(args.Command == 'restore'):
+        restore_backup(store, args.Device, args.Ref, args.Output)
+    elif(args.Command == 'prune'):
+        if(args.KeepLast is None and args.MaxAgeDays is None and args.KeepDaily is None):
+            sys.exit("Give at least one of --KeepLast, --MaxAgeDays or --KeepDaily")
+        prune_backups(store, args.Devices, args.KeepLast, args.MaxAgeDays, args.KeepDaily)
+    elif(args.Command == 'stats'):
+        print_stats(store)
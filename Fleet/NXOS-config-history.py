@@ -0,0 +1,121 @@
+#!/bin/env python3
+
+import sys, os, time, argparse, difflib
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import snapshot
+from nexusprog.history import ConfigHistory
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-23"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+def parse_time(value):
+    # "YYYY-MM-DD", "YYYY-MM-DD HH:MM" or "YYYY-MM-DD HH:MM:SS" in local time, or seconds since the epoch
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(value, fmt))
+        except ValueError:
+            pass
+    return float(value)
+
+def select_version(HISTORY, DEVICE, VERSION, AT):
+    # Version given with -V, the one in effect at -A, or the newest one
+    if(VERSION):
+        return VERSION
+    if(AT):
+        version = HISTORY.version_at(DEVICE, parse_time(AT))
+    else:
+        log = HISTORY.log(DEVICE)
+        version = log[-1][0] if log else None
+    if(version is None):
+        sys.exit("No version of " + DEVICE + " found")
+    return version
+
+def add_files(HISTORY, DEVICE, FILES, LABEL):
+    # Import existing backup files (plain or compressed) in the order given, using their modification time
+    for filename in FILES:
+        with snapshot.open_snapshot(filename) as handle:
+            version = HISTORY.add(DEVICE, handle.read(), LABEL or os.path.basename(filename), os.path.getmtime(filename))
+        print(filename + " added as version " + str(version) + " of " + DEVICE)
+    return()
+
+def print_log(HISTORY, DEVICE):
+    for version, timestamp, label, size, base, changed in HISTORY.log(DEVICE):
+        print("v%-6d %s  %10d  %-5s %6d line(s) changed  %s" % (version, format_time(timestamp), size, 'base' if base else '', changed, label or ''))
+    return()
+
+def print_diff(HISTORY, DEVICE, OLD, NEW):
+    old = HISTORY.get(DEVICE, OLD).splitlines(True)
+    new = HISTORY.get(DEVICE, NEW).splitlines(True)
+    sys.stdout.writelines(difflib.unified_diff(old, new, DEVICE + '@v' + str(OLD), DEVICE + '@v' + str(NEW)))
+    return()
+
+def print_changes(HISTORY, LINE, DEVICE, SUBSTRING):
+    rows = HISTORY.changes(LINE, DEVICE, SUBSTRING)
+    if(not rows):
+        print("No change of that line recorded")
+    for device, version, timestamp, op, line in rows:
+        print("%s  %-16s v%-6d %s %s" % (format_time(timestamp), device, version, 'added  ' if op == '+' else 'removed', line))
+    return()
+
+def print_stats(HISTORY):
+    stats = HISTORY.stats()
+    print("%d version(s) of %d device(s), %d of them full base snapshots" % (stats['versions'], len(HISTORY.devices()), stats['bases']))
+    print("%.1f MB of configuration, %.1f MB of compressed bases and deltas, %.1f MB database with the line index" % (
+        stats['logical_bytes'] / 1048576.0, stats['stored_bytes'] / 1048576.0, stats['file_bytes'] / 1048576.0))
+    return()
+
+if __name__ == "__main__":
+    # Setup Arguments to be processed at runtime. This will prevent any stagnant settings
+    # Example syntax for runtime "python3 NXOS-config-history.py -y /backups/history show 10.1.1.1 -A '2018-03-01 14:00'"
+    # Parse Incomming Runtime Variables using argparse library
+    parser = argparse.ArgumentParser(description='Nexus Configuration History')
+    parser.add_argument('-y', '--HistoryDir', type=str, required=True, help='Directory of the configuration history')
+    parser.add_argument('-B', '--BaseEvery', type=int, default=24, help='Store a full snapshot every N versions when adding (Default 24)')
+    subparsers = parser.add_subparsers(dest='Command')
+    subparsers.required = True
+    add_parser = subparsers.add_parser('add', help='Add backup files as new versions of a device')
+    add_parser.add_argument('Device')
+    add_parser.add_argument('Files', nargs='+')
+    add_parser.add_argument('-l', '--Label', type=str, help='Label of the versions (Default file name)')
+    log_parser = subparsers.add_parser('log', help='List the versions of a device')
+    log_parser.add_argument('Device')
+    show_parser = subparsers.add_parser('show', help='Print the configuration of a device at a version or point in time')
+    show_parser.add_argument('Device')
+    show_parser.add_argument('-V', '--Version', type=int, help='Version number')
+    show_parser.add_argument('-A', '--At', type=str, help='Point in time, "YYYY-MM-DD HH:MM" (Default newest)')
+    diff_parser = subparsers.add_parser('diff', help='Unified diff between two versions of a device')
+    diff_parser.add_argument('Device')
+    diff_parser.add_argument('Old', type=int)
+    diff_parser.add_argument('New', type=int)
+    changes_parser = subparsers.add_parser('changes', help='When was a configuration line added or removed')
+    changes_parser.add_argument('Line')
+    changes_parser.add_argument('-d', '--Device', type=str, help='Only this device (Default all)')
+    changes_parser.add_argument('-s', '--Substring', action='store_true', default=False, help='Match the text anywhere in the line')
+    subparsers.add_parser('stats', help='Size of the history against full copies')
+    args = parser.parse_args()
+
+    history = ConfigHistory(args.HistoryDir, args.BaseEvery)
+    try:
+        if(args.Command == 'add'):
+            add_files(history, args.Device, args.Files, args.Label)
+        elif(args.Command == 'log'):
+            print_log(history, args.Device)
+        elif(args.Command == 'show'):
+            sys.stdout.write(history.get(args.Device, select_version(history, args.Device, args.Version, args.At)))
+        elif(args.Command == 'diff'):
+            print_diff(history, args.Device, args.Old, args.New)
+        elif(args.Command == 'changes'):
+            print_changes(history, args.Line, args.Device, args.Substring)
+        elif(args.Command == 'stats'):
+            print_stats(history)
+    except KeyError as e:
+        sys.exit(str(e.args[0]))
+    finally:
+        history.close()
@@ -0,0 +1,112 @@
+#!/bin/env python3
+
+import sys, os, time, logging, argparse
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import changefile, fleet, inventory, metrics, scripts
+from nexusprog.session import NxSession
+from nexusprog.store import BackupStore
+# Fix input vs raw_input between Python 2.x and 3.x
+try: input = raw_input
+except NameError: pass
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-30"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+def bulk_task(ARGS, USER, PASS, CHANGES):
+    # Per device callable for the fleet runner: the NXOS-Access-Port-Provision.py workflow once per device for all of
+    # its ports. One pre-check covering every VLAN and interface, one backup, one edit_config with every port, one
+    # copy run start and one post change backup. A failed change is rolled back on all ports of the device.
+    prov = scripts.load(scripts.ACCESS_PORT)
+    def task(host):
+        ports = CHANGES[host.name]
+        interfaces = [port.interface for port in ports]
+        user, passwd = inventory.credentials(host, USER, PASS)
+        with NxSession(host.address, user, passwd, debug=ARGS.Debug) as session:
+            prov.nx_config_precheck_bulk(session, ports, ARGS.Debug)
+            if(ARGS.DryRun):
+                print(prov.nx_accessport_payload([(port.interface, port.vlan, port.description) for port in ports]))
+                return("checked " + str(len(ports)) + " port(s), no changes made")
+            prov.nx_config_backup_pre(session, ARGS.Debug)
+            pre_yang = prov.nx_config_rollback_capture(session, interfaces, ARGS.Debug)
+            try:
+                prov.nx_config_accessport_bulk(session, [(port.interface, port.vlan, port.description) for port in ports], ARGS.Debug)
+            except Exception:
+                prov.nx_config_rollback(session, interfaces, pre_yang, ARGS.Debug)
+                raise
+            prov.nx_config_wrme(session, ARGS.Debug)
+            prov.nx_config_backup_post(session, ARGS.Debug)
+        return("configured " + str(len(ports)) + " port(s)")
+    task.debug = ARGS.Debug
+    return task
+
+def change_hosts(CHANGES, INVENTORY, GROUP):
+    # The devices of the change file. When an inventory is given its address and credential variables are used for
+    # the devices it lists, the others are reached by the name in the file.
+    known = {}
+    if(INVENTORY):
+        known = dict((host.name, host) for host in inventory.load_hosts(INVENTORY, None, GROUP))
+    return [known.get(name, inventory.InventoryHost(name, name, {})) for name in CHANGES]
+
+if __name__ == "__main__":
+    # Setup Arguments to be processed at runtime. This will prevent any stagnant settings
+    # Example syntax for runtime "python3 NXOS-fleet-accessport-bulk.py -F onboarding.csv -U admin -P password -W 16"
+    # Parse Incomming Runtime Variables using argparse library
+    parser = argparse.ArgumentParser(description='Nexus Bulk Access Port Config')
+    parser.add_argument('-F', '--ChangeFile', type=str, help='CSV or JSON file of host,interface,vlan,description rows', required=True)
+    parser.add_argument('-i', '--Inventory', type=str, help='Ansible style inventory file for the address and credentials of the hosts (Optional)')
+    parser.add_argument('-G', '--Group', type=str, default='nxos', help='Inventory group to read (Default nxos)')
+    parser.add_argument('-U', '--Username', type=str, help='Username for Device Access')
+    parser.add_argument('-P', '--Password', type=str, help='Password for Device Access')
+    parser.add_argument('-W', '--Workers', type=int, default=fleet.DEFAULT_WORKERS, help='Number of devices worked on at the same time (Default 16)')
+    parser.add_argument('-S', '--Store', type=str, help='Keep the pre/post change backups in the deduplicating backup store in this directory')
+    parser.add_argument('-N', '--DryRun', action='store_true', default=False, help='Run the pre-checks and print the payload of every device without changing anything')
+    parser.add_argument('-O', '--Output', type=str, help='Write the per device results to this JSON file')
+    parser.add_argument('-MF', '--MetricsFile', type=str, help='Write connect, request and parse times per device and operation to this Prometheus text file')
+    parser.add_argument('-TF', '--TraceFile', type=str, help='Write every connect, RPC and HTTP request to this JSON trace (chrome://tracing, ui.perfetto.dev)')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
+    args = parser.parse_args()
+    if(args.Debug):
+        print("Debug Mode On")
+        logging.basicConfig(level=logging.DEBUG)
+
+    # Every row is checked before any device is touched
+    try:
+        changes = changefile.by_host(changefile.load_ports(args.ChangeFile))
+    except changefile.ChangeFileError as e:
+        sys.exit("Change file " + args.ChangeFile + " has errors, no changes made:\n" + str(e))
+    if(not changes):
+        sys.exit("Change file " + args.ChangeFile + " has no ports")
+
+    if(args.Username):
+        user = args.Username
+    else:
+        user = input("Please Enter the Username for Device Access > ")
+
+    if(args.Password):
+        passwd = args.Password
+    else:
+        passwd = input("Please Enter the Password for Device Access > ")
+
+    if(args.Store):
+        scripts.load(scripts.ACCESS_PORT).BACKUP_STORE = BackupStore(args.Store)
+    hosts = change_hosts(changes, args.Inventory, args.Group)
+    print(str(sum(len(ports) for ports in changes.values())) + " port(s) on " + str(len(hosts)) + " device(s)")
+    if(args.MetricsFile or args.TraceFile):
+        metrics.enable()
+    run_start = time.time()
+    results = fleet.run_fleet(hosts, bulk_task(args, user, passwd, changes), args.Workers, progress=fleet.print_progress)
+    if(args.DryRun or args.Debug):
+        for result in results:
+            print("----- " + result.host + " -----\n" + result.output)
+    fleet.print_summary(results, run_start)
+    if(args.Output):
+        fleet.write_results(results, args.Output)
+        print("Per device results written to " + args.Output)
+    if(args.MetricsFile or args.TraceFile):
+        metrics.export(args.MetricsFile, args.TraceFile)
+    if(any(not result.ok for result in results)):
+        sys.exit(1)
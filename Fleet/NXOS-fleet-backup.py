@@ -0,0 +1,105 @@
+#!/bin/env python3
+
+import sys, os, time, logging, argparse
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import backup, fleet, inventory, metrics, restconf
+from nexusprog.store import BackupStore
+from nexusprog.history import ConfigHistory
+# Fix input vs raw_input between Python 2.x and 3.x
+try: input = raw_input
+except NameError: pass
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-14"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+def backup_task(ARGS, USER, PASS, STORE):
+    # Per device callable for the fleet runner. Each device is backed up over its own session(s) so the number of
+    # sessions in flight is the number of workers.
+    def task(host):
+        user, passwd = inventory.credentials(host, USER, PASS)
+        result = backup.backup_device(host.address, user, passwd, ARGS.Transport, ARGS.Directory, ARGS.Timeout, ARGS.All, ARGS.Compress, ARGS.Pretty, STORE)
+        return result
+    task.debug = ARGS.Debug
+    return task
+
+def print_backup_summary(results, started):
+    # Successes, failures and the amount of configuration fetched for the whole run
+    fetched = sum(result.value['bytes'] for result in results if result.ok)
+    stored = sum(result.value['stored'] for result in results if result.ok)
+    fleet.print_summary(results, started)
+    print("%d bytes fetched (%.1f MB), %d bytes stored (%.1f MB)" % (fetched, fetched / 1048576.0, stored, stored / 1048576.0))
+    return()
+
+if __name__ == "__main__":
+    # Setup Arguments to be processed at runtime. This will prevent any stagnant settings
+    # Example syntax for runtime "python3 NXOS-fleet-backup.py -i ../Ansible/Snippets/device-inventory -U admin -P password -T nxapi -W 32 -t 60 -d /backups"
+    # Parse Incomming Runtime Variables using argparse library
+    parser = argparse.ArgumentParser(description='Nexus Fleet Configuration Backup')
+    parser.add_argument('-i', '--Inventory', type=str, help='Ansible style inventory file ([nxos] group)')
+    parser.add_argument('-L', '--HostList', type=str, help='Comma separated hosts or a file with one host per line')
+    parser.add_argument('-G', '--Group', type=str, default='nxos', help='Inventory group to run against (Default nxos)')
+    parser.add_argument('-U', '--Username', type=str, help='Username for Device Access')
+    parser.add_argument('-P', '--Password', type=str, help='Password for Device Access')
+    parser.add_argument('-T', '--Transport', choices=backup.TRANSPORTS, default='xmlagent', help='Interface used for the backup (Default xmlagent)')
+    parser.add_argument('-A', '--All', action='store_true', default=False, help='Include defaults (show running-config all), xmlagent and nxapi only')
+    parser.add_argument('-C', '--Compress', choices=['gz', 'xz'], help='Compress the backups with gzip or xz')
+    parser.add_argument('-PP', '--PrettyPrint', action='store_true', default=False, dest='Pretty', help='Re-indent the XML of netconf/restconf backups after the pull')
+    parser.add_argument('-W', '--Workers', type=int, default=fleet.DEFAULT_WORKERS, help='Maximum number of devices backed up at the same time (Default 16)')
+    parser.add_argument('-t', '--Timeout', type=int, default=60, help='Per device connect and request timeout in seconds (Default 60)')
+    parser.add_argument('-d', '--Directory', type=str, default='.', help='Directory the backups are written to (Default current)')
+    parser.add_argument('-S', '--Store', type=str, help='Put the backups into the deduplicating backup store in this directory instead of files')
+    parser.add_argument('-Y', '--History', type=str, help='Add the backups as new versions to the configuration history in this directory')
+    parser.add_argument('-O', '--Output', type=str, help='Write the per device results to this JSON file')
+    parser.add_argument('-MF', '--MetricsFile', type=str, help='Write connect, request and parse times per device and operation to this Prometheus text file')
+    parser.add_argument('-TF', '--TraceFile', type=str, help='Write every connect, RPC and HTTP request to this JSON trace (chrome://tracing, ui.perfetto.dev)')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
+    args = parser.parse_args()
+    if(args.Debug):
+        print("Debug Mode On")
+        logging.basicConfig(level=logging.DEBUG)
+
+    hosts = inventory.load_hosts(args.Inventory, args.HostList, args.Group)
+    if(not hosts):
+        sys.exit("No devices found, use -i and/or -L to select the devices")
+
+    if(args.Username):
+        user = args.Username
+    else:
+        user = input("Please Enter the Username for Device Access > ")
+
+    if(args.Password):
+        passwd = args.Password
+    else:
+        passwd = input("Please Enter the Password for Device Access > ")
+
+    if(args.Store and args.History):
+        sys.exit("Use either -S or -Y, not both")
+    if(args.Store):
+        store = BackupStore(args.Store)
+    elif(args.History):
+        store = ConfigHistory(args.History)
+    else:
+        store = None
+        if(not os.path.isdir(args.Directory)):
+            os.makedirs(args.Directory)
+
+    print("Backing up " + str(len(hosts)) + " device(s) over " + args.Transport + ", " + str(args.Workers) + " at a time")
+    if(args.MetricsFile or args.TraceFile):
+        metrics.enable()
+    run_start = time.time()
+    try:
+        results = fleet.run_fleet(hosts, backup_task(args, user, passwd, store), args.Workers, progress=fleet.print_progress)
+    finally:
+        restconf.close_all()
+    print_backup_summary(results, run_start)
+    if(args.Output):
+        fleet.write_results(results, args.Output)
+        print("Per device results written to " + args.Output)
+    if(args.MetricsFile or args.TraceFile):
+        metrics.export(args.MetricsFile, args.TraceFile)
+    if(any(not result.ok for result in results)):
+        sys.exit(1)
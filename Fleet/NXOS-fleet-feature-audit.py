@@ -0,0 +1,94 @@
+#!/bin/env python3
+
+import sys, os, time, logging, argparse
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import features, fleet, inventory, metrics, restconf
+from nexusprog.session import NxSession
+# Fix input vs raw_input between Python 2.x and 3.x
+try: input = raw_input
+except NameError: pass
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-16"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+def audit_task(ARGS, USER, PASS, FEATURELIST):
+    # Per device callable for the fleet runner. One session and one request per device return the state of every
+    # feature in the list.
+    def task(host):
+        user, passwd = inventory.credentials(host, USER, PASS)
+        if(ARGS.Transport == 'restconf'):
+            rc = restconf.client(host.address, user, passwd, timeout=ARGS.Timeout)
+            return features.fetch_restconf(rc, FEATURELIST)
+        with NxSession(host.address, user, passwd, timeout=ARGS.Timeout) as session:
+            return features.fetch_netconf(session.netconf, FEATURELIST)
+    task.debug = ARGS.Debug
+    return task
+
+if __name__ == "__main__":
+    # Setup Arguments to be processed at runtime. This will prevent any stagnant settings
+    # Example syntax for runtime "python3 NXOS-fleet-feature-audit.py -i ../Ansible/Snippets/device-inventory -U admin -P password -W 32 -R"
+    # Parse Incomming Runtime Variables using argparse library
+    parser = argparse.ArgumentParser(description='Nexus Fleet Feature Audit')
+    parser.add_argument('-i', '--Inventory', type=str, help='Ansible style inventory file ([nxos] group)')
+    parser.add_argument('-L', '--HostList', type=str, help='Comma separated hosts or a file with one host per line')
+    parser.add_argument('-G', '--Group', type=str, default='nxos', help='Inventory group to run against (Default nxos)')
+    parser.add_argument('-U', '--Username', type=str, help='Username for Device Access')
+    parser.add_argument('-P', '--Password', type=str, help='Password for Device Access')
+    parser.add_argument('-F', '--Features', type=str, default=','.join(features.VXLAN_FEATURES), help='Comma separated features to audit or "all" (Default the VXLAN EVPN features: ' + ','.join(features.VXLAN_FEATURES) + ')')
+    parser.add_argument('-T', '--Transport', choices=['netconf', 'restconf'], default='netconf', help='Interface used to read the feature state (Default netconf)')
+    parser.add_argument('-R', '--Require', action='store_true', default=False, help='Exit with an error unless every device has every audited feature enabled')
+    parser.add_argument('-W', '--Workers', type=int, default=fleet.DEFAULT_WORKERS, help='Number of devices audited at the same time (Default 16)')
+    parser.add_argument('-t', '--Timeout', type=int, default=30, help='Per device connect and request timeout in seconds (Default 30)')
+    parser.add_argument('-O', '--Output', type=str, help='Write the per device results to this JSON file')
+    parser.add_argument('-MF', '--MetricsFile', type=str, help='Write connect, request and parse times per device and operation to this Prometheus text file')
+    parser.add_argument('-TF', '--TraceFile', type=str, help='Write every connect, RPC and HTTP request to this JSON trace (chrome://tracing, ui.perfetto.dev)')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
+    args = parser.parse_args()
+    if(args.Debug):
+        print("Debug Mode On")
+        logging.basicConfig(level=logging.DEBUG)
+
+    if(args.Features == 'all'):
+        featurelist = tuple(features.FEATURES)
+    else:
+        featurelist = tuple(name.strip() for name in args.Features.split(',') if name.strip())
+        unknown = [name for name in featurelist if name not in features.FEATURES]
+        if(unknown):
+            sys.exit("Unknown feature(s) " + ', '.join(unknown) + ", known features are " + ', '.join(features.FEATURES))
+
+    hosts = inventory.load_hosts(args.Inventory, args.HostList, args.Group)
+    if(not hosts):
+        sys.exit("No devices found, use -i and/or -L to select the devices")
+
+    if(args.Username):
+        user = args.Username
+    else:
+        user = input("Please Enter the Username for Device Access > ")
+
+    if(args.Password):
+        passwd = args.Password
+    else:
+        passwd = input("Please Enter the Password for Device Access > ")
+
+    if(args.MetricsFile or args.TraceFile):
+        metrics.enable()
+    run_start = time.time()
+    try:
+        results = fleet.run_fleet(hosts, audit_task(args, user, passwd, featurelist), args.Workers)
+    finally:
+        restconf.close_all()
+    print(features.matrix([(result.host, result.value if result.ok else result.error) for result in results], featurelist))
+    print("Y = enabled, - = disabled, ? = not reported by the device")
+    ready = [result for result in results if result.ok and not features.missing(result.value)]
+    print("%d of %d devices have all audited features enabled (%.1fs)" % (len(ready), len(results), time.time() - run_start))
+    if(args.Output):
+        fleet.write_results(results, args.Output)
+        print("Per device results written to " + args.Output)
+    if(args.MetricsFile or args.TraceFile):
+        metrics.export(args.MetricsFile, args.TraceFile)
+    if(any(not result.ok for result in results) or (args.Require and len(ready) != len(results))):
+        sys.exit(1)
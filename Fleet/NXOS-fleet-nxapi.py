@@ -0,0 +1,159 @@
+#!/bin/env python3
+
+import sys, os, time, json, logging, argparse
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import backup, fleet, inventory, metrics, nxapi, restconf, snapshot
+from nexusprog.store import BackupStore
+from nexusprog.history import ConfigHistory
+# Fix input vs raw_input between Python 2.x and 3.x
+try: input = raw_input
+except NameError: pass
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-04-04"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+def load_commands(COMMANDS, FILENAME):
+    # Commands given with -c plus the lines of the -F file, "#" starts a comment
+    commands = list(COMMANDS or [])
+    if(FILENAME):
+        with open(FILENAME) as handle:
+            for line in handle:
+                line = line.split('#', 1)[0].strip()
+                if(line):
+                    commands.append(line)
+    return commands
+
+def build_batch(ARGS, COMMANDS):
+    # Checks first, then the checkpoint, then the backup, all in one JSON-RPC batch. Returns the batch and the position
+    # of the running configuration in its results (None without -B).
+    batch = nxapi.Batch(nxapi.CLI if ARGS.Structured else nxapi.CLI_ASCII)
+    batch.extend(COMMANDS)
+    if(ARGS.Checkpoint):
+        batch.add("checkpoint " + ARGS.Checkpoint, nxapi.CLI_ASCII)
+    config = None
+    if(ARGS.Backup):
+        config = batch.add('show running-config all' if ARGS.All else 'show running-config', nxapi.CLI_ASCII)
+    return batch, config
+
+def nxapi_task(ARGS, USER, PASS, BATCH, CONFIG, STORE):
+    # Per device callable for the fleet runner. The whole batch is one POST (or one per --MaxBatch commands) over the
+    # pooled client of the device.
+    def task(host):
+        user, passwd = inventory.credentials(host, USER, PASS)
+        rc = restconf.client(host.address, user, passwd, timeout=ARGS.Timeout)
+        results = nxapi.run(rc, BATCH, max_batch=ARGS.MaxBatch, timeout=ARGS.Timeout)
+        # A failed command stops the batch, the requests after the one holding it are not sent
+        failures = nxapi.failed(results)
+        last = results.index(failures[0]) if failures else len(BATCH) - 1
+        requests = last // ARGS.MaxBatch + 1
+        summary = str(len(results)) + " command(s) in " + str(requests) + " request(s)"
+        if(CONFIG is not None and results[CONFIG].ok):
+            if(STORE is not None):
+                with STORE.writer(host.address, label='nxapi') as writer:
+                    writer.write(results[CONFIG].output)
+            else:
+                with snapshot.SnapshotWriter(backup.backup_filename(host.address, 'nxapi', ARGS.Directory), ARGS.Compress) as writer:
+                    writer.write(results[CONFIG].output)
+            summary = summary + ", backup " + writer.path
+        outputs = [result.as_dict() for index, result in enumerate(results) if index != CONFIG]
+        if(ARGS.Directory and outputs):
+            # Outputs of the other commands, next to the backups
+            filename = os.path.join(ARGS.Directory, host.address + "-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+            with open(filename, 'w') as handle:
+                json.dump(outputs, handle, indent=2)
+        if(ARGS.Debug):
+            for result in results:
+                print(result.cmd + ": " + (str(result.output) if result.ok else "ERROR " + result.error))
+        failed = nxapi.failed(results)
+        if(failed):
+            raise nxapi.NxapiError(summary + ", failed: " + "; ".join(result.cmd + " (" + result.error + ")" for result in failed))
+        return(summary)
+    task.debug = ARGS.Debug
+    return task
+
+if __name__ == "__main__":
+    # Setup Arguments to be processed at runtime. This will prevent any stagnant settings
+    # Example syntax for runtime "python3 NXOS-fleet-nxapi.py -i ../Ansible/Snippets/device-inventory -U admin -P password -c 'show version' -c 'show interface status' -K pre-change -B -d /backups"
+    # Parse Incomming Runtime Variables using argparse library
+    parser = argparse.ArgumentParser(description='Nexus Fleet NX-API Batch')
+    parser.add_argument('-i', '--Inventory', type=str, help='Ansible style inventory file ([nxos] group)')
+    parser.add_argument('-L', '--HostList', type=str, help='Comma separated hosts or a file with one host per line')
+    parser.add_argument('-G', '--Group', type=str, default='nxos', help='Inventory group to run against (Default nxos)')
+    parser.add_argument('-U', '--Username', type=str, help='Username for Device Access')
+    parser.add_argument('-P', '--Password', type=str, help='Password for Device Access')
+    parser.add_argument('-c', '--Command', type=str, action='append', dest='Commands', help='Command to run, repeat for more commands')
+    parser.add_argument('-F', '--CommandFile', type=str, help='File with one command per line')
+    parser.add_argument('-J', '--Structured', action='store_true', default=False, help='Run the -c/-F commands with the cli method, structured output instead of text')
+    parser.add_argument('-K', '--Checkpoint', type=str, help='Take a configuration checkpoint with this name after the commands')
+    parser.add_argument('-B', '--Backup', action='store_true', default=False, help='Save the running configuration as well, same file names as NXOS-fleet-backup.py')
+    parser.add_argument('-A', '--All', action='store_true', default=False, help='Include defaults in the backup (show running-config all)')
+    parser.add_argument('-C', '--Compress', choices=['gz', 'xz'], help='Compress the backups with gzip or xz')
+    parser.add_argument('-d', '--Directory', type=str, help='Directory the backups and the command outputs (hostname-timestamp.json) are written to')
+    parser.add_argument('-S', '--Store', type=str, help='Put the backups into the deduplicating backup store in this directory instead of files')
+    parser.add_argument('-Y', '--History', type=str, help='Add the backups as new versions to the configuration history in this directory')
+    parser.add_argument('-M', '--MaxBatch', type=int, default=nxapi.MAX_BATCH, help='Most commands sent in one request (Default 50)')
+    parser.add_argument('-W', '--Workers', type=int, default=fleet.DEFAULT_WORKERS, help='Number of devices worked on at the same time (Default 16)')
+    parser.add_argument('-t', '--Timeout', type=int, default=60, help='Per device request timeout in seconds (Default 60)')
+    parser.add_argument('-O', '--Output', type=str, help='Write the per device results to this JSON file')
+    parser.add_argument('-MF', '--MetricsFile', type=str, help='Write connect, request and parse times per device and operation to this Prometheus text file')
+    parser.add_argument('-TF', '--TraceFile', type=str, help='Write every connect, RPC and HTTP request to this JSON trace (chrome://tracing, ui.perfetto.dev)')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
+    args = parser.parse_args()
+    if(args.Debug):
+        print("Debug Mode On")
+        logging.basicConfig(level=logging.DEBUG)
+
+    commands = load_commands(args.Commands, args.CommandFile)
+    if(not commands and not args.Checkpoint and not args.Backup):
+        sys.exit("Nothing to run, use -c/-F for commands, -K for a checkpoint and/or -B for a backup")
+    if(args.MaxBatch < 1):
+        sys.exit("-M has to be at least 1")
+
+    hosts = inventory.load_hosts(args.Inventory, args.HostList, args.Group)
+    if(not hosts):
+        sys.exit("No devices found, use -i and/or -L to select the devices")
+
+    if(args.Username):
+        user = args.Username
+    else:
+        user = input("Please Enter the Username for Device Access > ")
+
+    if(args.Password):
+        passwd = args.Password
+    else:
+        passwd = input("Please Enter the Password for Device Access > ")
+
+    if(args.Store and args.History):
+        sys.exit("Use either -S or -Y, not both")
+    if(args.Store):
+        store = BackupStore(args.Store)
+    elif(args.History):
+        store = ConfigHistory(args.History)
+    else:
+        store = None
+    if(args.Backup and store is None and not args.Directory):
+        args.Directory = '.'
+    if(args.Directory and not os.path.isdir(args.Directory)):
+        os.makedirs(args.Directory)
+
+    batch, config = build_batch(args, commands)
+    print("Running " + str(len(batch)) + " command(s) on " + str(len(hosts)) + " device(s), " + str(args.Workers) + " at a time")
+    if(args.MetricsFile or args.TraceFile):
+        metrics.enable()
+    run_start = time.time()
+    try:
+        results = fleet.run_fleet(hosts, nxapi_task(args, user, passwd, batch, config, store), args.Workers, progress=fleet.print_progress)
+    finally:
+        restconf.close_all()
+    fleet.print_summary(results, run_start)
+    if(args.Output):
+        fleet.write_results(results, args.Output)
+        print("Per device results written to " + args.Output)
+    if(args.MetricsFile or args.TraceFile):
+        metrics.export(args.MetricsFile, args.TraceFile)
+    if(any(not result.ok for result in results)):
+        sys.exit(1)
@@ -0,0 +1,144 @@
+#!/bin/env python3
+
+import sys, os, time, logging, argparse
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import fleet, inventory, metrics, restconf, scripts
+from nexusprog.session import NxSession
+# Fix input vs raw_input between Python 2.x and 3.x
+try: input = raw_input
+except NameError: pass
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-12"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+# The operations below call the functions of the single device scripts unchanged, one call per device. The fleet
+# module runs them with a bounded number of devices in flight and keeps the result and the output of every device.
+
+def op_accessport(HOST, USER, PASS, ARGS):
+    # Full Access Port workflow from NXOS-Access-Port-Provision.py: pre-check, backup, change, save, backup. A failed
+    # pre-check stops this device only, the other devices carry on. A failed change is rolled back on that device.
+    prov = scripts.load(scripts.ACCESS_PORT)
+    with NxSession(HOST, USER, PASS, debug=ARGS.Debug) as session:
+        prov.nx_config_precheck(session, ARGS.Interface, ARGS.InterfaceVLAN, ARGS.Debug)
+        prov.nx_config_backup_pre(session, ARGS.Debug)
+        pre_yang = prov.nx_config_rollback_capture(session, ARGS.Interface, ARGS.Debug)
+        try:
+            prov.nx_config_accessport(session, ARGS.Interface, ARGS.InterfaceVLAN, ARGS.Debug)
+        except Exception:
+            prov.nx_config_rollback(session, ARGS.Interface, pre_yang, ARGS.Debug)
+            raise
+        if(ARGS.Save):
+            prov.nx_config_wrme(session, ARGS.Debug)
+        prov.nx_config_backup_post(session, ARGS.Debug)
+    return("configured " + ARGS.Interface + " vlan " + str(ARGS.InterfaceVLAN))
+
+def op_vlan(HOST, USER, PASS, ARGS):
+    # check_vlan_yang / configure_vlan_yang from the NETCONF or the RESTCONF vlancreate snippet.
+    if(ARGS.Transport == 'restconf'):
+        snippet = scripts.load(scripts.RESTCONF_VLAN)
+    else:
+        snippet = scripts.load(scripts.NETCONF_VLAN)
+    if(not snippet.check_vlan_yang(HOST, USER, PASS, ARGS.NewVlan)):
+        return("vlan " + str(ARGS.NewVlan) + " exists, no changes made")
+    snippet.configure_vlan_yang(HOST, USER, PASS, ARGS.NewVlan, ARGS.NewVlanName, ARGS.VxlanVNID, ARGS.StpPri, ARGS.VniOffset)
+    if(ARGS.Save):
+        op_copyrunstart(HOST, USER, PASS, ARGS)
+    return("vlan " + str(ARGS.NewVlan) + " created")
+
+def op_copyrunstart(HOST, USER, PASS, ARGS):
+    # copy_run_start from the XML Agent or the NX-API snippet.
+    if(ARGS.Transport == 'restconf'):
+        snippet = scripts.load(scripts.RESTCONF_COPYRUNSTART)
+    else:
+        snippet = scripts.load(scripts.NETCONF_COPYRUNSTART)
+    snippet.copy_run_start(HOST, USER, PASS)
+    return("saved")
+
+OPERATIONS = {'accessport': op_accessport, 'vlan': op_vlan, 'copyrunstart': op_copyrunstart}
+
+def device_task(ARGS, USER, PASS):
+    # Build the per device callable handed to the fleet runner. Credentials from the inventory win over -U/-P.
+    operation = OPERATIONS[ARGS.Operation]
+    def task(host):
+        user, passwd = inventory.credentials(host, USER, PASS)
+        restconf.set_encoding(host.address, ARGS.Encoding)
+        return operation(host.address, user, passwd, ARGS)
+    task.debug = ARGS.Debug
+    return task
+
+if __name__ == "__main__":
+    # Setup Arguments to be processed at runtime. This will prevent any stagnant settings
+    # Example syntax for runtime "python3 NXOS-fleet-runner.py -i ../Ansible/Snippets/device-inventory -U admin -P password -W 32 vlan -NV 22 -NN WEB"
+    # Parse Incomming Runtime Variables using argparse library
+    parser = argparse.ArgumentParser(description='Nexus Fleet Runner')
+    parser.add_argument('-i', '--Inventory', type=str, help='Ansible style inventory file ([nxos] group)')
+    parser.add_argument('-L', '--HostList', type=str, help='Comma separated hosts or a file with one host per line')
+    parser.add_argument('-G', '--Group', type=str, default='nxos', help='Inventory group to run against (Default nxos)')
+    parser.add_argument('-U', '--Username', type=str, help='Username for Device Access')
+    parser.add_argument('-P', '--Password', type=str, help='Password for Device Access')
+    parser.add_argument('-W', '--Workers', type=int, default=fleet.DEFAULT_WORKERS, help='Number of devices worked on at the same time (Default 16)')
+    parser.add_argument('-T', '--Transport', choices=['netconf', 'restconf'], default='netconf', help='Interface used by the vlan and copyrunstart operations')
+    parser.add_argument('-E', '--Encoding', choices=['xml', 'json'], default='xml', help='RESTCONF encoding with -T restconf (Default xml)')
+    parser.add_argument('-S', '--Save', action='store_true', default=False, help='Copy running to startup after the change')
+    parser.add_argument('-O', '--Output', type=str, help='Write the per device results to this JSON file')
+    parser.add_argument('-MF', '--MetricsFile', type=str, help='Write connect, request and parse times per device and operation to this Prometheus text file')
+    parser.add_argument('-TF', '--TraceFile', type=str, help='Write every connect, RPC and HTTP request to this JSON trace (chrome://tracing, ui.perfetto.dev)')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
+    operations = parser.add_subparsers(dest='Operation')
+    accessport = operations.add_parser('accessport', help='Access port workflow of NXOS-Access-Port-Provision.py (always saves)')
+    accessport.add_argument('-I', '--Interface', type=str, help='Interface for Configuration', required=True)
+    accessport.add_argument('-V', '--InterfaceVLAN', type=str, help='Desired VLAN for Interface Memebership', required=True)
+    vlan = operations.add_parser('vlan', help='Create a VLAN (or a range of VLANs) with the vlancreate snippet')
+    vlan.add_argument('-NV', '--NewVlan', type=str, help='New VLAN ID Desired, or a range of them Ex. 100-199,300', required=True)
+    vlan.add_argument('-NN', '--NewVlanName', type=str, help='Vlan Name for the New ID, {vlan} and {index} are replaced per VLAN (Optional)')
+    vlan.add_argument('-VN', '--VNSegmentID', type=str, dest='VxlanVNID', help='Overlay vn-segment ID (Optional)')
+    vlan.add_argument('-VO', '--VNIOffset', type=str, dest='VniOffset', help='vn-segment ID of every VLAN is this offset plus the VLAN ID (Optional)')
+    vlan.add_argument('-SP', '--STPPriority', type=str, dest='StpPri', help='Spanning Tree Priority (Optional)')
+    operations.add_parser('copyrunstart', help='Copy running-config to startup-config')
+    args = parser.parse_args()
+    if(not args.Operation):
+        parser.error("an operation is required (accessport, vlan or copyrunstart)")
+    if(args.Operation == 'accessport'):
+        # The access port workflow has always ended with a save
+        args.Save = True
+    if(args.Debug):
+        print("Debug Mode On")
+        logging.basicConfig(level=logging.DEBUG)
+
+    hosts = inventory.load_hosts(args.Inventory, args.HostList, args.Group)
+    if(not hosts):
+        sys.exit("No devices found, use -i and/or -L to select the devices")
+
+    if(args.Username):
+        user = args.Username
+    else:
+        user = input("Please Enter the Username for Device Access > ")
+
+    if(args.Password):
+        passwd = args.Password
+    else:
+        passwd = input("Please Enter the Password for Device Access > ")
+
+    print("Running " + args.Operation + " on " + str(len(hosts)) + " device(s), " + str(args.Workers) + " at a time")
+    if(args.MetricsFile or args.TraceFile):
+        metrics.enable()
+    run_start = time.time()
+    try:
+        results = fleet.run_fleet(hosts, device_task(args, user, passwd), args.Workers, progress=fleet.print_progress)
+    finally:
+        restconf.close_all()
+    if(args.Debug):
+        for result in results:
+            print("----- " + result.host + " -----\n" + result.output)
+    fleet.print_summary(results, run_start)
+    if(args.Output):
+        fleet.write_results(results, args.Output)
+        print("Per device results written to " + args.Output)
+    if(args.MetricsFile or args.TraceFile):
+        metrics.export(args.MetricsFile, args.TraceFile)
+    if(any(not result.ok for result in results)):
+        sys.exit(1)
@@ -0,0 +1,105 @@
+#!/bin/env python3
+
+import sys, os, time, logging, argparse
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import fleet, inventory, metrics, vlanset
+from nexusprog.session import NxSession
+# Fix input vs raw_input between Python 2.x and 3.x
+try: input = raw_input
+except NameError: pass
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-29"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+def trunk_task(ARGS, USER, PASS, REQUIRED):
+    # Per device callable for the fleet runner. Two gets per device (the VLAN table and the interface table), the
+    # trunk ports are then checked locally against VLAN bitmaps.
+    def task(host):
+        user, passwd = inventory.credentials(host, USER, PASS)
+        with NxSession(host.address, user, passwd, timeout=ARGS.Timeout) as session:
+            vlans = session.state.vlan_set()
+            interfaces = session.state.interfaces()
+        check_start = time.time()
+        trunks, problems = vlanset.trunk_problems(interfaces, vlans, REQUIRED)
+        return {'trunks': trunks, 'problems': problems, 'check_us': round((time.time() - check_start) * 1e6, 1)}
+    task.debug = ARGS.Debug
+    return task
+
+def print_problems(RESULTS):
+    # One line per trunk port with a problem, devices in inventory order and ports in name order
+    for result in RESULTS:
+        if(not result.ok):
+            continue
+        for port in sorted(result.value['problems']):
+            problem = result.value['problems'][port]
+            if(problem['missing']):
+                print(result.host + " " + port + ": allows VLAN(s) " + problem['missing'] + " not defined on the device")
+            if(problem['not_allowed']):
+                print(result.host + " " + port + ": does not carry required VLAN(s) " + problem['not_allowed'])
+    return()
+
+if __name__ == "__main__":
+    # Setup Arguments to be processed at runtime. This will prevent any stagnant settings
+    # Example syntax for runtime "python3 NXOS-fleet-trunk-check.py -i ../Ansible/Snippets/device-inventory -U admin -P password -V 10,20-30"
+    # Parse Incomming Runtime Variables using argparse library
+    parser = argparse.ArgumentParser(description='Nexus Fleet Trunk VLAN Check')
+    parser.add_argument('-i', '--Inventory', type=str, help='Ansible style inventory file ([nxos] group)')
+    parser.add_argument('-L', '--HostList', type=str, help='Comma separated hosts or a file with one host per line')
+    parser.add_argument('-G', '--Group', type=str, default='nxos', help='Inventory group to run against (Default nxos)')
+    parser.add_argument('-U', '--Username', type=str, help='Username for Device Access')
+    parser.add_argument('-P', '--Password', type=str, help='Password for Device Access')
+    parser.add_argument('-V', '--RequiredVLANs', type=str, help='VLAN range every trunk port has to carry, ex. 10,20-30 (Optional)')
+    parser.add_argument('-W', '--Workers', type=int, default=fleet.DEFAULT_WORKERS, help='Number of devices checked at the same time (Default 16)')
+    parser.add_argument('-t', '--Timeout', type=int, default=30, help='Per device connect and request timeout in seconds (Default 30)')
+    parser.add_argument('-O', '--Output', type=str, help='Write the per device results to this JSON file')
+    parser.add_argument('-MF', '--MetricsFile', type=str, help='Write connect, request and parse times per device and operation to this Prometheus text file')
+    parser.add_argument('-TF', '--TraceFile', type=str, help='Write every connect, RPC and HTTP request to this JSON trace (chrome://tracing, ui.perfetto.dev)')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
+    args = parser.parse_args()
+    if(args.Debug):
+        print("Debug Mode On")
+        logging.basicConfig(level=logging.DEBUG)
+
+    try:
+        required = vlanset.parse(args.RequiredVLANs)
+    except ValueError as e:
+        sys.exit("Required VLANs \"" + str(args.RequiredVLANs) + "\" are not valid: " + str(e))
+
+    hosts = inventory.load_hosts(args.Inventory, args.HostList, args.Group)
+    if(not hosts):
+        sys.exit("No devices found, use -i and/or -L to select the devices")
+
+    if(args.Username):
+        user = args.Username
+    else:
+        user = input("Please Enter the Username for Device Access > ")
+
+    if(args.Password):
+        passwd = args.Password
+    else:
+        passwd = input("Please Enter the Password for Device Access > ")
+
+    if(args.MetricsFile or args.TraceFile):
+        metrics.enable()
+    run_start = time.time()
+    results = fleet.run_fleet(hosts, trunk_task(args, user, passwd, required), args.Workers)
+    print_problems(results)
+    checked = [result for result in results if result.ok]
+    trunks = sum(result.value['trunks'] for result in checked)
+    bad = sum(len(result.value['problems']) for result in checked)
+    check_us = sum(result.value['check_us'] for result in checked)
+    print("%d trunk port(s) on %d of %d devices checked, %d with problems (%.1fs, %.2fus per port)" % (trunks, len(checked), len(results), bad, time.time() - run_start, check_us / trunks if trunks else 0))
+    for result in results:
+        if(not result.ok):
+            print(result.host + ": " + str(result.error))
+    if(args.Output):
+        fleet.write_results(results, args.Output)
+        print("Per device results written to " + args.Output)
+    if(args.MetricsFile or args.TraceFile):
+        metrics.export(args.MetricsFile, args.TraceFile)
+    if(bad or len(checked) != len(results)):
+        sys.exit(1)
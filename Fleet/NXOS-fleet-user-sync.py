@@ -0,0 +1,95 @@
+#!/bin/env python3
+
+import sys, os, time, logging, argparse
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import changefile, fleet, inventory, metrics, statecache, usersync
+from nexusprog.session import NxSession
+# Fix input vs raw_input between Python 2.x and 3.x
+try: input = raw_input
+except NameError: pass
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-31"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+def sync_task(ARGS, USER, PASS, DESIRED, KEEP):
+    # Per device callable for the fleet runner. One get of every user and role, the diff against the user file is
+    # done locally and every add, role change, password and removal goes out in one edit_config.
+    def task(host):
+        user, passwd = inventory.credentials(host, USER, PASS)
+        with NxSession(host.address, user, passwd, timeout=ARGS.Timeout, debug=ARGS.Debug) as session:
+            users, roles = usersync.fetch_accounts(session.netconf)
+            # The account used for the sync is never pruned, the run would lock itself out
+            user_plan = usersync.plan(DESIRED, users, roles, ARGS.Prune, KEEP + [user], ARGS.RotatePasswords)
+            if(ARGS.DryRun or not len(user_plan)):
+                return(user_plan.summary())
+            usersync.apply_netconf(session.netconf, user_plan)
+            session.state.changed(statecache.USERS)
+        return(user_plan.summary())
+    task.debug = ARGS.Debug
+    return task
+
+if __name__ == "__main__":
+    # Setup Arguments to be processed at runtime. This will prevent any stagnant settings
+    # Example syntax for runtime "python3 NXOS-fleet-user-sync.py -i ../Ansible/Snippets/device-inventory -U admin -P password -F users.csv -R"
+    # Parse Incomming Runtime Variables using argparse library
+    parser = argparse.ArgumentParser(description='Nexus Fleet User Sync')
+    parser.add_argument('-F', '--UserFile', type=str, help='CSV or JSON file of name,password,roles rows', required=True)
+    parser.add_argument('-i', '--Inventory', type=str, help='Ansible style inventory file ([nxos] group)')
+    parser.add_argument('-L', '--HostList', type=str, help='Comma separated hosts or a file with one host per line')
+    parser.add_argument('-G', '--Group', type=str, default='nxos', help='Inventory group to run against (Default nxos)')
+    parser.add_argument('-U', '--Username', type=str, help='Username for Device Access')
+    parser.add_argument('-P', '--Password', type=str, help='Password for Device Access')
+    parser.add_argument('-R', '--RotatePasswords', action='store_true', default=False, help='Set the password from the file on existing users as well')
+    parser.add_argument('-X', '--Prune', action='store_true', default=False, help='Remove users the file does not list (admin and the login user are kept)')
+    parser.add_argument('-K', '--Keep', type=str, default='', help='Comma separated users never removed by --Prune')
+    parser.add_argument('-N', '--DryRun', action='store_true', default=False, help='Print what every device needs without changing anything')
+    parser.add_argument('-W', '--Workers', type=int, default=fleet.DEFAULT_WORKERS, help='Number of devices worked on at the same time (Default 16)')
+    parser.add_argument('-t', '--Timeout', type=int, default=30, help='Per device connect and request timeout in seconds (Default 30)')
+    parser.add_argument('-O', '--Output', type=str, help='Write the per device results to this JSON file')
+    parser.add_argument('-MF', '--MetricsFile', type=str, help='Write connect, request and parse times per device and operation to this Prometheus text file')
+    parser.add_argument('-TF', '--TraceFile', type=str, help='Write every connect, RPC and HTTP request to this JSON trace (chrome://tracing, ui.perfetto.dev)')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
+    args = parser.parse_args()
+    if(args.Debug):
+        print("Debug Mode On")
+        logging.basicConfig(level=logging.DEBUG)
+
+    # Every row is checked before any device is touched
+    try:
+        desired = usersync.load_users(args.UserFile)
+    except changefile.ChangeFileError as e:
+        sys.exit("User file " + args.UserFile + " has errors, no changes made:\n" + str(e))
+    if(not desired):
+        sys.exit("User file " + args.UserFile + " has no users")
+
+    hosts = inventory.load_hosts(args.Inventory, args.HostList, args.Group)
+    if(not hosts):
+        sys.exit("No devices found, use -i and/or -L to select the devices")
+
+    if(args.Username):
+        user = args.Username
+    else:
+        user = input("Please Enter the Username for Device Access > ")
+
+    if(args.Password):
+        passwd = args.Password
+    else:
+        passwd = input("Please Enter the Password for Device Access > ")
+
+    keep = [name.strip() for name in args.Keep.split(',') if name.strip()]
+    if(args.MetricsFile or args.TraceFile):
+        metrics.enable()
+    run_start = time.time()
+    results = fleet.run_fleet(hosts, sync_task(args, user, passwd, desired, keep), args.Workers, progress=fleet.print_progress)
+    fleet.print_summary(results, run_start)
+    if(args.Output):
+        fleet.write_results(results, args.Output)
+        print("Per device results written to " + args.Output)
+    if(args.MetricsFile or args.TraceFile):
+        metrics.export(args.MetricsFile, args.TraceFile)
+    if(any(not result.ok for result in results)):
+        sys.exit(1)
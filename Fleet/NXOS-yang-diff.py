@@ -0,0 +1,69 @@
+#!/bin/env python3
+
+import sys, os, time, argparse, json
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import yangdiff
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-26"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+def print_changes(CHANGES, VERBOSE):
+    # One line per change. Added and removed containers / list entries are one line, -v lists their leaves as well.
+    for change in CHANGES:
+        if(change.op == 'changed'):
+            print("~ " + change.path + ": " + str(change.old) + " -> " + str(change.new))
+            continue
+        sign = '+' if change.op == 'added' else '-'
+        value = change.new if change.op == 'added' else change.old
+        if(isinstance(value, yangdiff.Node)):
+            print(sign + " " + change.path)
+            if(VERBOSE):
+                parent = change.path.rsplit('/', 1)[0]
+                for path, leaf in value.items(parent):
+                    print(sign + "     " + path + " = " + leaf)
+        else:
+            print(sign + " " + change.path + " = " + str(value))
+    return()
+
+def change_record(change):
+    # JSON form, added/removed subtrees as a path -> value table of their leaves
+    record = change.as_dict()
+    for field in ('old', 'new'):
+        if(isinstance(record[field], yangdiff.Node)):
+            parent = change.path.rsplit('/', 1)[0]
+            record[field] = dict(record[field].items(parent))
+    return record
+
+if __name__ == "__main__":
+    # Setup Arguments to be processed at runtime. This will prevent any stagnant settings
+    # Example syntax for runtime "python3 NXOS-yang-diff.py 10.1.1.1-20180301-140000.xml 10.1.1.1-20180301-150000.xml"
+    # Parse Incomming Runtime Variables using argparse library
+    parser = argparse.ArgumentParser(description='Nexus YANG Snapshot Structural Diff')
+    parser.add_argument('Old', type=str, help='Earlier snapshot (show_run_all_yang output, plain, .gz or .xz)')
+    parser.add_argument('New', type=str, help='Later snapshot')
+    parser.add_argument('-r', '--Root', type=str, default='System', help='Container to compare from (Default System)')
+    parser.add_argument('-v', '--Verbose', action='store_true', default=False, help='List the leaves of added and removed subtrees')
+    parser.add_argument('-O', '--Output', type=str, help='Write the changes to this JSON file')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Print timings and the number of nodes compared')
+    args = parser.parse_args()
+
+    build_start = time.time()
+    old = yangdiff.build(args.Old)
+    new = yangdiff.build(args.New)
+    old = yangdiff.find(old, args.Root) or old
+    new = yangdiff.find(new, args.Root) or new
+    diff_start = time.time()
+    stats = yangdiff.DiffStats()
+    changes = yangdiff.diff(old, new, stats)
+    diff_end = time.time()
+    print_changes(changes, args.Verbose)
+    if(args.Debug):
+        print("Hash trees built in %.2fs, diff took %.4fs comparing %d node(s)" % (diff_start - build_start, diff_end - diff_start, stats.compared))
+    if(args.Output):
+        with open(args.Output, 'w') as handle:
+            json.dump([change_record(change) for change in changes], handle, indent=2)
+    print(str(len(changes)) + " change(s)")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import sys, os, time, argparse, logging
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog.session import NxSession
+from nexusprog import rollback, snapshot
+
+__author__ = "Joshua Proano"
+__version__ = "0.1"
+__date__ = "2018-03-28"
+__email__ = "jproano@cisco.com"
+__status__ = "Beta"
+
+def read_snapshot(FILENAME):
+    # Pre change YANG snapshot as written by the provisioning scripts (-preChange.xml) or show_run_all_yang, plain or
+    # compressed
+    with snapshot.open_snapshot(FILENAME) as handle:
+        return handle.read()
+
+def nx_rollback(SESSION, PRE, SUBTREE, DRYRUN, DEBUGON):
+    # This routine reads the current configuration in the scope of the snapshot (or of SUBTREE), works out the inverse
+    # of what changed since and sends it as one edit_config. With DRYRUN the payload is only printed.
+    with SESSION.netconf_session() as device:
+        payload = rollback.rollback(device, PRE, SUBTREE, dry_run=DRYRUN)
+    if(payload is None):
+        print("Device configuration matches the snapshot, nothing to roll back")
+    elif(DRYRUN):
+        print(payload)
+    else:
+        print("Rollback applied")
+        if(DEBUGON):
+            print(payload)
+    return(payload)
+
+if __name__ == "__main__":
+    # Setup Arguments to be processed at runtime. This will prevent any stagnant settings
+    # Example syntax for runtime "python3 NXOS-Rollback.py -H 10.1.1.1 -U admin -P password -S 10.1.1.1-OPPID4242-20180301-140000-preChange.xml -N"
+    # Parse Incomming Runtime Variables using argparse library
+    parser = argparse.ArgumentParser(description='Nexus YANG Configuration Rollback')
+    parser.add_argument('-H', '--HostIP', type=str, help='IP Address of the Device', required=True)
+    parser.add_argument('-U', '--Username', type=str, help='Username for NETCONF Access', required=True)
+    parser.add_argument('-P', '--Password', type=str, help='Password for NETCONF Access', required=True)
+    parser.add_argument('-S', '--Snapshot', type=str, help='Pre change YANG snapshot to return to', required=True)
+    parser.add_argument('-I', '--Interface', type=str, help='Limit the rollback to the interface the snapshot was taken for (Default scope of the snapshot)')
+    parser.add_argument('-N', '--DryRun', action='store_true', default=False, help='Print the rollback payload without sending it')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
+    args = parser.parse_args()
+    if(args.Debug):
+        DebugON = True
+        print("Debug Mode On")
+        # Enable This for Super Debugging
+        # logging.basicConfig(level=logging.DEBUG)
+    else:
+        DebugON = False
+    pre = read_snapshot(args.Snapshot)
+    if(args.Interface):
+        subtree = rollback.interface_filter(args.Interface)
+    else:
+        subtree = None
+    run_start = time.time()
+    with NxSession(args.HostIP, args.Username, args.Password, debug=DebugON) as session:
+        try:
+            nx_rollback(session, pre, subtree, args.DryRun, DebugON)
+        except ValueError as e:
+            sys.exit(str(e))
+    if(DebugON):
+        print("Rollback completed in %.1fs" % (time.time() - run_start))
@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 
-import sys, os, warnings, time, argparse, logging, xml.dom.minidom, random
-from ncclient import manager, operations, xml_, debug
+import sys, os, warnings, time, argparse, logging, random
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog.session import NxSession
+from nexusprog import metrics, readiness, rollback, statecache, template, vlanset, xmlstream
+from nexusprog.store import BackupStore
 
 __author__ = "Joshua Proano"
 __version__ = "0.1"
@@ -10,135 +14,107 @@ __email__ = "jproano@cisco.com"
 __status__ = "Beta"
 
 operation_id = random.randint(1,100000)
+# Deduplicating backup store the pre/post change backups go into when -S is given, plain files otherwise
+BACKUP_STORE = None
 
-def nx_config_precheck(HOST, PORT, USER, PASS, INTERFACE, IFVLAN, DEBUGON):
+def nx_config_precheck(SESSION, INTERFACE, IFVLAN, DEBUGON):
     # This Routine connects to a Nexus Device and performs pre-check operations. These pre-check operations
     # validate that there are no conflicting elements to the port such as "its online" as well as 
     # order of operation checks like the desired VLAN that the port is to be assigned is created.
     # Why we do this.. If the VLAN doesnt exist the aplication of the VLAN on the access port 
     # will not happen correctly so thats why we want to run pre-checks.
 
-    with manager.connect(host=HOST, port=PORT, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as m:
-        # Get all VLANs that exists on the Device. Parse VLANs and compare against the VLAN List
-        vlan_filter = '''
-		<System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
-            <bd-items>
-                <bd-items>
-                    <BD-list>
-                        <fabEncap/>
-                    </BD-list>
-                </bd-items>
-            </bd-items>
-		</System>'''
-        vlanres = m.get(('subtree', vlan_filter))
-        if(DEBUGON):
-            print (xml_.to_xml(vlanres.data_ele, pretty_print=True))
-        # Parse the number of VLANs returned by the VLAN filter and add the results into a
-        # dictionary, format the dictionary as KVP's with the vlan {'vlan-5' : 'vlan-5'}
-        xml_doc = xml.dom.minidom.parseString(vlanres.xml)
-        numofvlans = xml_doc.getElementsByTagName('fabEncap').length
-        vlans = xml_doc.getElementsByTagName('fabEncap')
-        switchvlanrange = {}
-        for count in range(numofvlans):
-           switchvlanrange[str(vlans[count].firstChild.nodeValue)] = str(vlans[count].firstChild.nodeValue)
-        # Take the user requested VLAN range and break up the range values to provide an ordered
-        # list, take the list and convert it into a dictionaory that is formatted in a
-        # similar way to the switch result, with the vlan-### : vlan-### in the key value pairs
-        VLANIDs = str(IFVLAN)
-        VLANIDs=VLANIDs.join(VLANIDs.split())
-        r=set()
-        for x in VLANIDs.split(','):
-            t=x.split('-')
-            if len(t) not in [1,2]: raise SyntaxError("hash_range is given its arguement as "+VLANIDs+" which seems not correctly formated.")
-            r.add(int(t[0])) if len(t)==1 else r.update(set(range(int(t[0]),int(t[1])+1)))
-        l=list(r)
-        l.sort()
-        vlanrange = {}
-        for myelement in l:
-            vlanrange['vlan-' + str(myelement)] = 'vlan-' + str(myelement)
-        # Now compare the two dictionaries. The user requested vlans should be a subset of
-        # the overall available VLANs on the switch. If not then data will not pass correctly
-        if(DEBUGON):
-            print("User Range")
-            print(vlanrange)
-            print("On Switch Range")
-            print(switchvlanrange)
-        if(set(vlanrange).issubset(set(switchvlanrange)) == False):
-            sys.exit("At least 1 VLAN in the Range: \"" + str(IFVLAN) + "\" does not exist in the switch. Terminating without changes")
-        if(DEBUGON):
-            print("VLAN Check OK")
+    # The VLAN table and the interface states come from the state cache of the session: fetched once over NETCONF,
+    # then reused by the next port (and, with -K, by the next run) until they expire or the device config changes.
+    # Parse the user requested VLAN range ("10,20-30") and the VLANs of the switch into VLAN bitmaps (vlanset).
+    # The user requested vlans should be a subset of the overall available VLANs on the switch. If not then data
+    # will not pass correctly
+    try:
+        vlanrange = vlanset.parse(IFVLAN)
+    except ValueError as e:
+        sys.exit("VLAN Range \"" + str(IFVLAN) + "\" is not valid: " + str(e) + ". Terminating without changes")
+    switchvlanrange = SESSION.state.vlan_set()
+    if(DEBUGON):
+        print("User Range")
+        print(vlanrange)
+        print("On Switch Range")
+        print(switchvlanrange)
+    if(not vlanrange.issubset(switchvlanrange)):
+        # Report the missing VLANs in the same compact range form
+        sys.exit("VLAN(s) " + str(vlanrange - switchvlanrange) + " in the Range: \"" + str(IFVLAN) + "\" do not exist in the switch. Terminating without changes")
+    if(DEBUGON):
+        print("VLAN Check OK")
 
-        # Second Test: Check if Interface is currently UP.. if so this could be damaging
-        int_filter = '''
-        <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
-            <intf-items>
-                <phys-items>
-                    <PhysIf-list>
-                        <id>''' + INTERFACE + '''</id>   
-                    </PhysIf-list>
-                </phys-items>
-            </intf-items>
-        </System>
-        '''
-        res = m.get(('subtree', int_filter))
-        # print (xml_.to_xml(res.data_ele, pretty_print=True))
-        xml_doc = xml.dom.minidom.parseString(res.xml)
-        INT_UP = xml_doc.getElementsByTagName('operSt')
-        if (INT_UP[0].firstChild.nodeValue == 'up'):
-            sys.exit("Interface " + str(INTERFACE) + " is UP! Terminating without changes")
-        
-        if(DEBUGON):
-            print("Interface Check OK")
+    # Second Test: Check if Interface is currently UP.. if so this could be damaging
+    INT_STATE = SESSION.state.interface(INTERFACE)
+    if(DEBUGON):
+        print(INT_STATE)
+    if INT_STATE is None:
+        sys.exit("Interface " + str(INTERFACE) + " Does not exist terminating without changes")
+    # The link state is read from the device every time, the state cache only knows about configuration changes
+    if (SESSION.state.oper_state(INTERFACE) == 'up'):
+        sys.exit("Interface " + str(INTERFACE) + " is UP! Terminating without changes")
+
+    if(DEBUGON):
+        print("Interface Check OK")
     return()
 
-def nx_config_accessport(HOST, PORT, USER, PASS, INTERFACE, IFVLAN, DEBUGON):
-    # This routine performs the changes via the yang module to a nexus device. This has been tested
-    # on NX versions 7.0.3.I6 and 7.0.3.I7 code. The changes are specific to a single interface called
-    # from the switch "ex eth1/3" and is designed to set the switchport command "layer2", set the 
-    # access vlan to the vlan specified during runtime of the script "accessvlan", and enabling the port
-    # by ensuring the admin state is "up" which effectivly is a no shutdown command. In addition the 
-    # spanning tree is configured for port type edge, and bpdu guard is enabled. 
-    with manager.connect(host=HOST, port=PORT, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
-        interface_data = '''
+# Payloads of nx_config_accessport, compiled once: the PhysIf-list entry (switchport "layer2", mode trunk, the allowed
+# VLANs, no shutdown) and the spanning tree If-list entry (port type trunk, bpdu guard) of the port
+TRUNKPORT_TEMPLATE = template.compile('''
         <config>
 		    <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
                 <intf-items>
                     <phys-items>
                         <PhysIf-list>
-                            <id>''' + INTERFACE + '''</id>
+                            <id>{interface}</id>
                             <layer>Layer2</layer>
                             <mode>trunk</mode>
-                            <trunkVlans>''' + str(IFVLAN) + '''<trunkVlans>
+                            <trunkVlans>{vlans}</trunkVlans>
                             <adminSt>up</adminSt>
                         </PhysIf-list>
                     </phys-items>
                 </intf-items>
  		    </System>
-        </config>'''
-        stp_update = '''
+        </config>''')
+TRUNKSTP_TEMPLATE = template.compile('''
         <config>
 		    <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
                 <stp-items>
                     <inst-items>
                         <if-items>
                             <If-list>
-                                <id>eth1/9</id>
+                                <id>{interface}</id>
                                 <mode>trunk</mode>
                                 <bpduguard>enable</bpduguard>
                             </If-list>
-                        </if-items> 
+                        </if-items>
                     </inst-items>
                 </stp-items>
  		    </System>
-        </config>'''
-        res = device.edit_config(target='running', config=interface_data)
+        </config>''')
+
+def nx_config_accessport(SESSION, INTERFACE, IFVLAN, DEBUGON):
+    # This routine performs the changes via the yang module to a nexus device. This has been tested
+    # on NX versions 7.0.3.I6 and 7.0.3.I7 code. The changes are specific to a single interface called
+    # from the switch "ex eth1/3" and is designed to set the switchport command "layer2", set the 
+    # access vlan to the vlan specified during runtime of the script "accessvlan", and enabling the port
+    # by ensuring the admin state is "up" which effectivly is a no shutdown command. In addition the 
+    # spanning tree is configured for port type edge, and bpdu guard is enabled. 
+    with SESSION.netconf_session() as device:
+        interface_data = TRUNKPORT_TEMPLATE.render(interface=INTERFACE, vlans=vlanset.parse(IFVLAN).format())
+        stp_update = TRUNKSTP_TEMPLATE.render(interface=INTERFACE)
+        res = readiness.retry_busy(lambda: device.edit_config(target='running', config=interface_data))
         if(DEBUGON):
             print (str(res))
             #file = open('Modification.xml','w') 
             #file.write(str(res)) 
             #file.close()
             print("Interface Mode Config Changes Pushed")
-        res = device.edit_config(target='running', config=stp_update)
+        res = readiness.retry_busy(lambda: device.edit_config(target='running', config=stp_update))
+        # The interface table in the state cache is out of date now. Recorded after both edits, so the token of the
+        # cache is the one after the last of our writes.
+        SESSION.state.changed(statecache.INTERFACES)
         if(DEBUGON):
             print (str(res))
             #file = open('Modification.xml','w') 
@@ -147,7 +123,7 @@ def nx_config_accessport(HOST, PORT, USER, PASS, INTERFACE, IFVLAN, DEBUGON):
             print("Interface STP Config Changes Pushed")
     return()
 
-def nx_config_backup_pre(HOST, USER, PASS, DEBUGON):
+def nx_config_backup_pre(SESSION, DEBUGON):
     # This routine uses the XML manager interface to get the human readable running configuration
     # of the system and save the confguration - pre change for backup purposes. One idea for this
     # is to also use this routine to backup the XML config using yang and be able to diff and roll-
@@ -156,56 +132,95 @@ def nx_config_backup_pre(HOST, USER, PASS, DEBUGON):
     # config was elected to ensure that the script wasnt doing anything it wasnt suppose to do for
     # the system.
     #  
-    # Sleep for 10 Seconds just to be sure any check/config change sessions are complete within the NX device
-    time.sleep(10)
-    # Connect to NX device via XML Manager Interface (Port 22) and execute a show run and backup to file
-    with manager.connect(host=HOST, port=22, username=USER, password=PASS, device_params={'name':'nexus'}, hostkey_verify=False, look_for_keys=False) as device:
+    # Use the XML Manager Interface (Port 22) session of the run and execute a show run and backup to file
+    with SESSION.xmlagent_session() as device:
+        # Poll the device session list until any check/config change sessions are complete within the NX device.
+        # This returns on the first check when the device is idle instead of always sleeping 10 seconds.
+        readiness.settle(device, SESSION.session_ids(), debug=DEBUGON)
         res = device.exec_command({'show running-config'})
-        xml_doc = xml.dom.minidom.parseString(res.xml)
-        runningconfig = xml_doc.getElementsByTagName('data')
-        # print(runningconfig[0].firstChild.nodeValue)
-        timestr = time.strftime("%Y%m%d-%H%M%S")
-        filename = HOST + "-OPPID" + str(operation_id) + "-" + timestr + "-preChange.log"
-        file = open(filename,'w') 
-        file.write(runningconfig[0].firstChild.nodeValue)
+        # Stream the <data> text of the reply straight into the backup file instead of building a DOM of the reply.
+        # With a backup store only the parts of the configuration the store does not hold yet take space.
+        if(BACKUP_STORE):
+            file = BACKUP_STORE.writer(SESSION.host, label="OPPID" + str(operation_id) + "-preChange")
+        else:
+            timestr = time.strftime("%Y%m%d-%H%M%S")
+            filename = SESSION.host + "-OPPID" + str(operation_id) + "-" + timestr + "-preChange.log"
+            file = open(filename,'w') 
+        xmlstream.write_data_text(res.xml, file)
         file.close()
         if(DEBUGON):
             print ("PreChange File Written")
     return()
 
-def nx_config_backup_post(HOST, USER, PASS, DEBUGON):
+def nx_config_backup_post(SESSION, DEBUGON):
     # This routine uses the XML manager interface to get the human readable running configuration
     # of the system and save the confguration - prost change for backup/audit/diff purposes. 
     #
-    # Sleep for 10 Seconds just to be sure any check/config change sessions are complete within the NX device
-    time.sleep(10)
-    # Connect to NX device via XML Manager Interface (Port 22) and execute a show run and backup to file
-    with manager.connect(host=HOST, port=22, username=USER, password=PASS, device_params={'name':'nexus'}, hostkey_verify=False, look_for_keys=False) as device:
+    # Use the XML Manager Interface (Port 22) session of the run and execute a show run and backup to file
+    with SESSION.xmlagent_session() as device:
+        # Poll the device session list until any check/config change sessions are complete within the NX device.
+        # This returns on the first check when the device is idle instead of always sleeping 10 seconds.
+        readiness.settle(device, SESSION.session_ids(), debug=DEBUGON)
         res = device.exec_command({'show running-config'})
-        xml_doc = xml.dom.minidom.parseString(res.xml)
-        runningconfig = xml_doc.getElementsByTagName('data')
-        # print(runningconfig[0].firstChild.nodeValue)
-        timestr = time.strftime("%Y%m%d-%H%M%S")
-        filename = HOST + "-OPPID" + str(operation_id) + "-" + timestr + "-postChange.log"
-        file = open(filename,'w') 
-        file.write(runningconfig[0].firstChild.nodeValue)
+        # Stream the <data> text of the reply straight into the backup file instead of building a DOM of the reply.
+        # With a backup store only the parts of the configuration the store does not hold yet take space.
+        if(BACKUP_STORE):
+            file = BACKUP_STORE.writer(SESSION.host, label="OPPID" + str(operation_id) + "-postChange")
+        else:
+            timestr = time.strftime("%Y%m%d-%H%M%S")
+            filename = SESSION.host + "-OPPID" + str(operation_id) + "-" + timestr + "-postChange.log"
+            file = open(filename,'w') 
+        xmlstream.write_data_text(res.xml, file)
         file.close()
         if(DEBUGON):
             print ("Post Change File Written")
     return()
 
-def nx_config_wrme(HOST, PORT, USER, PASS, DEBUGON):
+def nx_config_rollback_capture(SESSION, INTERFACE, DEBUGON):
+    # This routine saves the YANG configuration of the interface (and its spanning tree settings) before the change.
+    # The snapshot is kept for NXOS-Rollback.py and handed back so a failed change can be undone right away with one
+    # edit_config of only what the change touched.
+    with SESSION.netconf_session() as device:
+        pre = rollback.capture(device, rollback.interface_filter(INTERFACE))
+    if(BACKUP_STORE):
+        file = BACKUP_STORE.writer(SESSION.host, label="OPPID" + str(operation_id) + "-preChange-yang")
+    else:
+        timestr = time.strftime("%Y%m%d-%H%M%S")
+        file = open(SESSION.host + "-OPPID" + str(operation_id) + "-" + timestr + "-preChange.xml", 'w')
+    file.write(pre)
+    file.close()
+    if(DEBUGON):
+        print ("PreChange YANG Snapshot Written")
+    return(pre)
+
+def nx_config_rollback(SESSION, INTERFACE, PRE, DEBUGON):
+    # This routine compares the interface configuration with the pre change snapshot and pushes the inverse of what
+    # changed (merge back old leaves, delete what was added) in a single RPC.
+    with SESSION.netconf_session() as device:
+        payload = rollback.rollback(device, PRE, rollback.interface_filter(INTERFACE))
+    SESSION.state.changed(statecache.INTERFACES)
+    if(payload is None):
+        print("Nothing to roll back on " + INTERFACE)
+    else:
+        print("Rolled back the changes on " + INTERFACE)
+        if(DEBUGON):
+            print(payload)
+    return()
+
+def nx_config_wrme(SESSION, DEBUGON):
     # This routine access the XML Manager interface to write the running config to startup. This is done
     # in lieu of a traditional netconf copy_config since the startup config capapbility isnt yet exposed
     # to the netconf/yang interface.
     #   
-    # Sleep for 10 Seconds just to be sure any configuration changes are complete within the NX device
-    time.sleep(10)
-    # Connect to NX device via XML Manager Interface (Port 22) and execute a copy run to start
-    with manager.connect(host=HOST, port=PORT, username=USER, password=PASS, device_params={'name':'nexus'}, hostkey_verify=False, look_for_keys=False) as device:
+    # Use the XML Manager Interface (Port 22) session of the run and execute a copy run to start
+    with SESSION.xmlagent_session() as device:
+        # Make sure any configuration sessions are complete within the NX device before saving
+        readiness.settle(device, SESSION.session_ids(), debug=DEBUGON)
         res = device.exec_command({'copy running-config startup-config'})
-        time.sleep(10)
-        if(DEBUGON):
+        # The reply normally already confirms the copy. Only poll the device if it does not.
+        if(not readiness.wait_for_copy(device, res, debug=DEBUGON)):
+            print ("Write Mem could not be confirmed, the change may not be saved to the startup configuration")
+        elif(DEBUGON):
             print ("Write Mem Command Submitted")
     return()
 
@@ -220,6 +235,10 @@ if __name__ == "__main__":
     parser.add_argument('-P', '--Password', type=str, help='Password for NETCONF/XMLAGENT Access', required=True)
     parser.add_argument('-I', '--Interface', type=str, help='Interface for Configuration', required=True)
     parser.add_argument('-V', '--InterfaceVLAN', type=str, help='Desired VLAN for Interface Memebership', required=True)
+    parser.add_argument('-S', '--Store', type=str, help='Keep the pre/post change backups in the deduplicating backup store in this directory')
+    parser.add_argument('-K', '--Cache', type=str, help='Keep the VLAN table and interface states read by the pre-checks in this directory for the next runs')
+    parser.add_argument('-MF', '--MetricsFile', type=str, help='Write connect, request and parse times per operation to this Prometheus text file')
+    parser.add_argument('-TF', '--TraceFile', type=str, help='Write every connect and RPC of the run to this JSON trace (chrome://tracing, ui.perfetto.dev)')
     parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
     args = parser.parse_args()
     if(args.Debug):
@@ -229,13 +248,40 @@ if __name__ == "__main__":
         # logging.basicConfig(level=logging.DEBUG)
     else:
         DebugON = False
-    # Perform Interface and VLAN Pre-Checks
-    nx_config_precheck(args.HostIP,830,args.Username,args.Password,args.Interface,args.InterfaceVLAN,DebugON)
-    # Connect to Device and Backup Raw config - Pre-Change
-    nx_config_backup_pre(args.HostIP,args.Username,args.Password,DebugON)
-    # Connect to the Yang Interface to Modify configuration
-    nx_config_accessport(args.HostIP,830,args.Username,args.Password,args.Interface,args.InterfaceVLAN,DebugON)
-    # Connect to the XML Agent Interface to Save Configuration
-    nx_config_wrme(args.HostIP,22,args.Username,args.Password,DebugON)
-    # Connect to Device and Backup Raw config and Yang Config - Post-Change
-    nx_config_backup_post(args.HostIP,args.Username,args.Password,DebugON)
\ No newline at end of file
+    if(args.Store):
+        BACKUP_STORE = BackupStore(args.Store)
+    # With -MF/-TF every connect and RPC of the run is timed, the files are written even when a step fails
+    if(args.MetricsFile or args.TraceFile):
+        metrics.enable()
+    # One NETCONF (830) and one XML Agent (22) session are opened for the whole run and handed to every step
+    # instead of connecting once per step. The sessions are closed when the block exits, even on a failed pre-check.
+    run_start = time.time()
+    # With -K the state read by the pre-checks is kept on disk, a probe of the device accounting log makes sure a
+    # configuration change by someone else since the last run is not missed
+    if(args.Cache):
+        state_cache = statecache.StateCache(args.Cache)
+    else:
+        state_cache = None
+    try:
+        with NxSession(args.HostIP, args.Username, args.Password, debug=DebugON, cache=state_cache, probe=bool(args.Cache)) as session:
+            # Perform Interface and VLAN Pre-Checks
+            nx_config_precheck(session,args.Interface,args.InterfaceVLAN,DebugON)
+            # Backup Raw config - Pre-Change
+            nx_config_backup_pre(session,DebugON)
+            pre_yang = nx_config_rollback_capture(session,args.Interface,DebugON)
+            # Use the Yang Interface to Modify configuration, undo whatever part of it was applied if it fails
+            try:
+                nx_config_accessport(session,args.Interface,args.InterfaceVLAN,DebugON)
+            except Exception as e:
+                print("Configuration change failed: " + str(e))
+                nx_config_rollback(session,args.Interface,pre_yang,DebugON)
+                raise
+            # Use the XML Agent Interface to Save Configuration
+            nx_config_wrme(session,DebugON)
+            # Backup Raw config - Post-Change
+            nx_config_backup_post(session,DebugON)
+        # Report what reusing the sessions saved compared to the previous one connection per step behaviour
+        print("Run completed in %.1fs using %d connection(s), approx %.1fs of handshakes saved vs %d separate connections" % (time.time() - run_start, session.connects, session.handshake_savings(5), 5))
+    finally:
+        if(args.MetricsFile or args.TraceFile):
+            metrics.export(args.MetricsFile, args.TraceFile)
@@ -1,7 +1,10 @@
 #!/bin/env python3
 
 import sys, os, warnings, time, argparse, logging
-from ncclient import manager, operations, xml_, debug
+from ncclient import manager
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import readiness
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -14,15 +17,17 @@ __status__ = "Beta"
 
 def copy_run_start(HOST, USER, PASS):
     # This function connects to the XML Manager of the device an sends a command to copy the running configuration to startup 
-    # to ensure any previous NETCONF or configuration session is completed the routine will sleep for 2 seconds before executing
-    # and wait two seconds after sending the command. I did it this way since the startup config isnt exposed in yang (yet)
+    # to ensure any previous NETCONF or configuration session is completed the routine polls the device session list before executing
+    # and checks the reply for the copy completion after sending the command. I did it this way since the startup config isnt exposed in yang (yet)
     # where a copy configuration would work. Port 22 or 830 should work for the xmlagent subsystem but left the port 22 as
     # that port should work regardless of the netconf service being activated on port 830.
-    time.sleep(2)
     with manager.connect(host=HOST, port=22, username=USER, password=PASS, device_params={'name':'nexus',"ssh_subsystem_name": "xmlagent"}, hostkey_verify=False, look_for_keys=False) as device:
+        readiness.settle(device)
         res = device.exec_command({'copy running-config startup-config'})
-        if(res.ok):
+        if(readiness.wait_for_copy(device, res)):
             print ('Running Configuration Saved to Startup Successfully')
+        else:
+            sys.exit("copy running-config startup-config could not be confirmed, the configuration may not be saved")
     return()
     
 
@@ -1,7 +1,11 @@
 #!/bin/env python3
 
-import sys, os, warnings, time, argparse, logging, xml.dom.minidom
-from ncclient import manager, operations, xml_, debug
+import sys, os, warnings, time, argparse, logging
+from ncclient import manager
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import readiness, snapshot, xmlstream
+from nexusprog.store import BackupStore
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -12,30 +16,34 @@ __date__ = "2017-11-20"
 __email__ = "jproano@cisco.com"
 __status__ = "Beta"
 
-def show_run_all_human(HOST, USER, PASS):
-    # This routine will sleep for 10 seconds to ensure any previous NETCONF/XML sessions are cleaned up then will connect
+def show_run_all_human(HOST, USER, PASS, COMPRESS=None, STORE=None):
+    # This routine will poll the device until any previous NETCONF/XML sessions are cleaned up then will connect
     # via the XML Manager interface and retrieve the full running configuration of the Nexus Device. A file will be created
     # with the hostname-<year><month><day>-<hour><minute><second>.log format and the running configuration will be saved to
     # that log file. This routing allows for human readable differences to be compared or retrived during routines for audit
-    # purposes. 
-    time.sleep(10)
-        # Connect to NX device via XML Manager Interface (Port 22) and execute a copy run to start
+    # purposes. With a BackupStore in STORE the configuration is added to the store instead, an unchanged configuration
+    # takes no extra space there.
+    # Connect to NX device via XML Manager Interface (Port 22) and execute a show running-config all
     with manager.connect(host=HOST, port=22, username=USER, password=PASS, device_params={'name':'nexus',"ssh_subsystem_name": "xmlagent"}, hostkey_verify=False, look_for_keys=False) as device:
+        # Only wait if the device session list shows another session still working, instead of a fixed 10 second sleep
+        readiness.settle(device)
         res = device.exec_command({'show running-config all'})
         # If we received a successful RPC reply go into parsing.
         if(res.ok):
-            # Parse the XML RPC Reply and Extract the Data Tag out of the reply to get the RAW config. 
-            xml_doc = xml.dom.minidom.parseString(res.xml)
-            runningconfig = xml_doc.getElementsByTagName('data')
-            # If you want to see the data element without the debug uncomment the line below.
-            # print(runningconfig[0].firstChild.nodeValue)
-            # Save the RAW Config into a File derived from Host + TimeStamp of Run and save as log file type.
-            timestr = time.strftime("%Y%m%d-%H%M%S")
-            filename = HOST + "-" + timestr + ".log"
-            file = open(filename,'w') 
-            file.write(runningconfig[0].firstChild.nodeValue)
-            file.close()
-            print("File saved to: " + filename) 
+            # Stream the Data Tag out of the XML RPC Reply to get the RAW config, without building a DOM of the
+            # whole reply. If you want to see the data element without the debug uncomment the line below.
+            # print(xmlstream.data_text(res.xml))
+            # Save the RAW Config into a File derived from Host + TimeStamp of Run and save as log file type. COMPRESS
+            # ('gz' or 'xz') compresses the file, the file only shows up once complete.
+            if(STORE):
+                file = STORE.writer(HOST, label='show running-config all')
+            else:
+                timestr = time.strftime("%Y%m%d-%H%M%S")
+                filename = HOST + "-" + timestr + ".log"
+                file = snapshot.SnapshotWriter(filename, COMPRESS)
+            with file:
+                xmlstream.write_data_text(res.xml, file)
+            print("File saved to: " + file.path) 
     return()
 
 def main():
@@ -46,6 +54,8 @@ def main():
     parser.add_argument('-H', '--HostIP', type=str, dest='HostIP', help='IP Address of the Device')
     parser.add_argument('-U', '--Username', type=str,  dest='Username', help='Username for NETCONF/XMLAGENT Access')
     parser.add_argument('-P', '--Password', type=str,  dest='Password', help='Password for NETCONF/XMLAGENT Access')
+    parser.add_argument('-C', '--Compress', choices=['gz', 'xz'], dest='Compress', help='Compress the saved file with gzip or xz (Optional)')
+    parser.add_argument('-S', '--Store', type=str, dest='Store', help='Save into the deduplicating backup store in this directory instead of a file (Optional)')
     parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
     args = parser.parse_args()
     if(args.Debug):
@@ -67,7 +77,11 @@ def main():
     else:
         passwd = input("Please Enter the Password for NETCONF/XMLAGENT Device Access > ")
     
-    show_run_all_human(ip,user,passwd)
+    if(args.Store):
+        store = BackupStore(args.Store)
+    else:
+        store = None
+    show_run_all_human(ip,user,passwd,args.Compress,store)
     return()
 
 if __name__ == "__main__":
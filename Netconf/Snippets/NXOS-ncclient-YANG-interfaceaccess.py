@@ -1,8 +1,11 @@
 #!/bin/env python3
 
 import sys, os, warnings, time, logging, argparse
-from ncclient import manager, operations, xml_, debug
+from ncclient import manager
 from lxml import objectify, etree
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import statecache, template
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -13,90 +16,50 @@ __date__ = "2017-11-21"
 __email__ = "jproano@cisco.com"
 __status__ = "Beta"
 
+# VLAN tables and interface states read by the checks, kept per device so that configuring more interfaces on the
+# same device does not query it again. configure_interface_yang drops the interface states of the device it changed.
+STATE_CACHE = statecache.StateCache()
+
+def fetch_state(HOST, USER, PASS, FETCH):
+    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
+        return FETCH(device)
+
 def check_vlan_yang(HOST, USER, PASS, NEWVLAN):
     # This routine will connect via the NETCONF interface and query the VLANs for a match against the VLAN ID to
     # be created. If the VLAN ID already exists we will return a true to the main routine. If the VLAN doesnt exist
     # a false value will be returned. The VLAN needs to be defined before we can apply it to the interface.
-    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
-        # Lets see what we Can get looking at the Bridge Domain Yang Model for the configured VLANs. Also limiting to The encap (VLANID)
-        # name and VLAN mode.
-        bd_filter = '''
-		<System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
-            <bd-items>
-                <bd-items>
-                    <BD-list>
-                        <fabEncap>vlan-''' + str(NEWVLAN) + '''</fabEncap>
-                    </BD-list>
-                </bd-items>
-            </bd-items>
-		</System>'''
-        # Send the RPC request via get and save the XML reply to res. Once Saved parse the data and see if there is
-        # a Match for the VLAN.
-        res = device.get(('subtree', bd_filter))
-        # print (xml_.to_xml(res.data_ele, pretty_print=True))
-        xml_data = res.data_ele
-        try:
-            if(xml_data[0][0][0][0][0].text == ('vlan-' + str(NEWVLAN))):
-                return(True)
-        except:
-            return(False)
+    # The Bridge Domain Yang Model holds the configured VLANs, the fabEncap (VLANID) of every BD-list entry is read.
+    vlans = STATE_CACHE.get(HOST, statecache.VLANS, lambda: fetch_state(HOST, USER, PASS, statecache.fetch_vlans))
+    return('vlan-' + str(NEWVLAN) in vlans)
 
 def check_interface_yang(HOST,USER,PASS,INTERFACEID):
     # This routine will connect via the NETCONF interface and query the interface to check that the interface is
     # admin down (shutdown). If the interface is not Admin down then we will consider it a "provisioned" interface
     # Any number of additional checks could be made in place of admin down (Ex. OperStatus, TCAM Entries, etc).
     # Programatically this is an example of fields in the intf-items tree that can be looked at.
-    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
-        int_filter = '''
-        <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
-            <intf-items>
-                <phys-items>
-                    <PhysIf-list>
-                        <id>''' + INTERFACEID + '''</id>   
-                    </PhysIf-list>
-                </phys-items>
-            </intf-items>
-        </System>
-        '''
-        # Send the RPC request via get and save the XML reply to res. Once Saved parse the data and see if there is
-        # a Match for the admin state of the interface and that it is down == CLI equivalent to shutdown on the interface.
-        res = device.get(('subtree', int_filter))
-        print(xml_.to_xml(res.data_ele, pretty_print=True))
-        xml_data = res.data_ele
-        try:
-            if(xml_data[0][0][0][0][0].text == INTERFACEID):
-                if(xml_data[0][0][0][0][2].tag == "{http://cisco.com/ns/yang/cisco-nx-os-device}adminSt"):
-                    if(xml_data[0][0][0][0][2].text == "down"):
-                        return(True)
-                    else:
-                        return(False)
-                else:
-                    return(False)
-            else:
-                return(False)
-        except:
-            print('Interface Doesnt Exist or Yang Model Changed')
-            return(False)
+    # The adminSt and operSt of every PhysIf-list entry are read at once and cached for the next interface.
+    interfaces = STATE_CACHE.get(HOST, statecache.INTERFACES, lambda: fetch_state(HOST, USER, PASS, statecache.fetch_interfaces))
+    state = interfaces.get(INTERFACEID)
+    print(state)
+    if(state is None):
+        print('Interface Doesnt Exist or Yang Model Changed')
+        return(False)
+    # CLI equivalent to shutdown on the interface
+    return(state['adminSt'] == "down")
 
-def configure_interface_yang(HOST,USER,PASS,INTERFACEID,VLANID,DESC):
-    # This routine will connect to the NETCONF interface of an NX device and configure a designated port. The designated
-    # port will also have its description edited (DESC), Be set in access mode <mode>, have an access vlan configured (VLANID), and
-    # have the relevent STP items configured such as spanning-tree port type edge [<mode>edge], and spanning-tree bpduguard enabled [<bpduguard>enable].
-    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
-        # Programamtically this configuration set also shows that elements from multiple "itmes" tree's in the yang model can be relevenat to a what
-        # a human interface would be a single interface subtree as well as that multiple "items" can be configured at once in a single command set.
-        int_update = '''
+# Payload of configure_interface_yang, compiled once. The parameters are XML escaped when it is rendered.
+INTERFACE_TEMPLATE = template.compile('''
         <config>
 		    <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
                 <intf-items>
                     <phys-items>
                         <PhysIf-list>
-                            <id>'''+ INTERFACEID +'''</id>
+                            <id>{interface}</id>
                             <layer>Layer2</layer>
                             <mode>access</mode>
-                            <accessVlan>vlan-'''+ str(VLANID) + '''</accessVlan>
+                            <accessVlan>vlan-{vlan}</accessVlan>
                             <adminSt>up</adminSt>
-                            <descr>''' + str(DESC) + '''</descr>
+                            <descr>{descr}</descr>
                         </PhysIf-list>
                     </phys-items>
                 </intf-items>
@@ -104,18 +67,28 @@ def configure_interface_yang(HOST,USER,PASS,INTERFACEID,VLANID,DESC):
                     <inst-items>
                         <if-items>
                             <If-list>
-                                <id>'''+ INTERFACEID +'''</id>
+                                <id>{interface}</id>
                                 <mode>edge</mode>
                                 <bpduguard>enable</bpduguard>
                             </If-list>
-                        </if-items> 
+                        </if-items>
                     </inst-items>
                 </stp-items>
  		    </System>
-        </config>'''
+        </config>''')
+
+def configure_interface_yang(HOST,USER,PASS,INTERFACEID,VLANID,DESC):
+    # This routine will connect to the NETCONF interface of an NX device and configure a designated port. The designated
+    # port will also have its description edited (DESC), Be set in access mode <mode>, have an access vlan configured (VLANID), and
+    # have the relevent STP items configured such as spanning-tree port type edge [<mode>edge], and spanning-tree bpduguard enabled [<bpduguard>enable].
+    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
+        # Programamtically this configuration set also shows that elements from multiple "itmes" tree's in the yang model can be relevenat to a what
+        # a human interface would be a single interface subtree as well as that multiple "items" can be configured at once in a single command set.
+        int_update = INTERFACE_TEMPLATE.render(interface=INTERFACEID, vlan=VLANID, descr=DESC)
         # Edit the running configuration of the device with the above filter. NOTE: this will not save the running configuration to
         # startup. See other snippets to add that routine into the code if needed.
         res = device.edit_config(target='running', config=int_update)
+        STATE_CACHE.invalidate(HOST, [statecache.INTERFACES])
         if(res.ok):
             print("Interface " + str(INTERFACEID) + " successfully configured for L2 on VLAN: " + str(VLANID) + ".")
     return()
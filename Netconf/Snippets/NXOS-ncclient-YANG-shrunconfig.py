@@ -1,7 +1,10 @@
 #!/bin/env python3
 
 import sys, os, warnings, time, logging, argparse
-from ncclient import manager, operations, xml_, debug
+from ncclient import manager
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import readiness, snapshot
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -12,31 +15,35 @@ __date__ = "2017-11-20"
 __email__ = "jproano@cisco.com"
 __status__ = "Beta"
 
-def show_run_all_yang(HOST, USER, PASS):
-    # This routine will sleep for 10 seconds to ensure any previous NETCONF/XML sessions are cleaned up then will connect
+def show_run_all_yang(HOST, USER, PASS, COMPRESS=None, PRETTY=True):
+    # This routine will retry the get while the device reports previous NETCONF/XML sessions still busy. It will connect
     # via the NETCONF/YANG interface and retrieve the full yang modeled configuration of the Nexus Device. A file will be created
     # with the hostname-<year><month><day>-<hour><minute><second>.xml format and the running configuration will be saved to
     # that log file. This routing allows for human readable differences to be compared or retrived during routines for audit
     # purposes. IMPORTANT: The netcnfctrl service has to be started for this to work!!
-    time.sleep(10)
-    # Connect to NX device via NETCONF Interface (Port 830) and execute a copy run to start
+    # COMPRESS ('gz' or 'xz') compresses the file, PRETTY re-indents it once the session is closed.
+    # Connect to NX device via NETCONF Interface (Port 830) and retrieve the System tree
     with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False, device_params={'name':'nexus', "ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
         # Use Top Level Filter in the NX-OS-Device Yang model for tree retrieval.
         my_filter = '''
 		<System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
 		</System>'''
-        # Use get vs get_config to retrieve all readable configuration elements. 
-        res = device.get(('subtree', my_filter))
+        # Use get vs get_config to retrieve all readable configuration elements. The RPC reply itself tells us if the device
+        # is still busy, only then the get is retried with a back-off.
+        res = readiness.retry_busy(lambda: device.get(('subtree', my_filter)))
         if(res.ok):
             # If you want to see the data element without the debug uncomment the line below. Note: this is a HUGE amt of info!!!
             # print (xml_.to_xml(res.data_ele, pretty_print=True))
-            # Save the RAW Config into a File derived from Host + TimeStamp of Run and save as log file type.
+            # Save the RAW Config into a File derived from Host + TimeStamp of Run and save as log file type. The tree is
+            # serialised straight into the file instead of into one big string first, the file only shows up once complete.
             timestr = time.strftime("%Y%m%d-%H%M%S")
             filename = HOST + "-" + timestr + ".xml"
-            file = open(filename,'w') 
-            file.write(xml_.to_xml(res.data_ele, pretty_print=True)) 
-            file.close()
-            print("File saved to: " + filename) 
+            snap = snapshot.write_element(res.data_ele, filename, COMPRESS)
+    # Pretty print off the hot path, after the NETCONF session has been closed
+    if(res.ok):
+        if(PRETTY):
+            snapshot.pretty_print(snap.path)
+        print("File saved to: " + snap.path) 
     return()
 
 def main():
@@ -47,6 +54,8 @@ def main():
     parser.add_argument('-H', '--HostIP', type=str, dest='HostIP', help='IP Address of the Device')
     parser.add_argument('-U', '--Username', type=str,  dest='Username', help='Username for NETCONF/XMLAGENT Access')
     parser.add_argument('-P', '--Password', type=str,  dest='Password', help='Password for NETCONF/XMLAGENT Access')
+    parser.add_argument('-C', '--Compress', choices=['gz', 'xz'], dest='Compress', help='Compress the saved file with gzip or xz (Optional)')
+    parser.add_argument('-NP', '--NoPretty', action='store_false', default=True, dest='Pretty', help='Save the XML as received without re-indenting it')
     parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
     args = parser.parse_args()
     if(args.Debug):
@@ -68,7 +77,7 @@ def main():
     else:
         passwd = input("Please Enter the Password for NETCONF/XMLAGENT Device Access > ")
     
-    show_run_all_yang(ip,user,passwd)
+    show_run_all_yang(ip,user,passwd,args.Compress,args.Pretty)
     return()
 
 if __name__ == "__main__":
@@ -1,8 +1,11 @@
 #!/bin/env python3
 
 import sys, os, warnings, time, logging, argparse
-from ncclient import manager, operations, xml_, debug
+from ncclient import manager
 from lxml import objectify, etree
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import changefile, template, usersync
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -13,23 +16,60 @@ __date__ = "2017-11-21"
 __email__ = "jproano@cisco.com"
 __status__ = "Beta"
 
-def check_user_yang(HOST, USER, PASS, NEWUSER):
-    # This routine will connect to the NETCONF interface and check the new user against the existing user information. If a user is
-    # matched then we will expect data in the RPC reply. The Filter is configured so that only a matching user (CaSe SenSetive) will
-    # be returned vs all users. 
-    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
-        # The filter Expression below searches the <System><userext-items><user-items><User-list><name> with the value provided by the main
-        # function during runtime via switch or direct user input. 
-        user_filter = '''
+# Payloads compiled once, the user name, password and role are XML escaped when they are rendered
+USER_FILTER_TEMPLATE = template.compile('''
 		<System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
             <userext-items>
                 <user-items>
                     <User-list>
-                        <name>''' + NEWUSER + '''</name>
+                        <name>{name}</name>
                     </User-list>
                 </user-items>
             </userext-items>
-		</System>'''
+		</System>''')
+ROLE_FILTER_TEMPLATE = template.compile('''
+		<System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
+            <userext-items>
+                <role-items>
+                    <Role-list>
+                        <name>{name}</name>
+                    </Role-list>
+                </role-items>
+            </userext-items>
+		</System>''')
+USER_TEMPLATE = template.compile('''
+        <config>
+            <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
+                <userext-items>
+                    <user-items>
+                        <User-list>
+                            <name>{user}</name>
+                            <pwd>{passwd}</pwd>
+                            <pwdEncryptType>0</pwdEncryptType>
+                            <userdomain-items>
+                                <UserDomain-list>
+                                    <name>all</name>
+                                    <role-items>
+                                        <UserRole-list>
+                                            <name>{role}</name>
+                                        </UserRole-list>
+                                    </role-items>
+                                </UserDomain-list>
+                            </userdomain-items>
+                        </User-list>
+                    </user-items>
+                </userext-items>
+            </System>
+        </config>''')
+
+def check_user_yang(HOST, USER, PASS, NEWUSER):
+    # This routine will connect to the NETCONF interface and check the new user against the existing user information. If a user is
+    # matched then we will expect data in the RPC reply. The Filter is configured so that only a matching user (CaSe SenSetive) will
+    # be returned vs all users. 
+    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
+        # The filter Expression below searches the <System><userext-items><user-items><User-list><name> with the value provided by the main
+        # function during runtime via switch or direct user input. 
+        user_filter = USER_FILTER_TEMPLATE.render(name=NEWUSER)
         # Check existing configuration for the existance of the proposed new user
         res = device.get(('subtree', user_filter))
         # Uncomment the line below if its deisred for the XML repsonse to be pretty printed to stdout
@@ -54,16 +94,7 @@ def check_role_yang(HOST, USER, PASS, NEWROLE):
     with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
         # The filter Expression below searches the <System><userext-items><role-items><Role-list><name> with the role value provided by the main
         # function during runtime via switch or direct user input. 
-        user_filter = '''
-		<System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
-            <userext-items>
-                <role-items>
-                    <Role-list>
-                        <name>''' + NEWROLE + '''</name>
-                    </Role-list>
-                </role-items>
-            </userext-items>
-		</System>'''
+        user_filter = ROLE_FILTER_TEMPLATE.render(name=NEWROLE)
         # Check existing configuration for the existance of the proposed role assignment
         res = device.get(('subtree', user_filter))
         # Uncomment the line below if its deisred for the XML repsonse to be pretty printed to stdout
@@ -89,30 +120,7 @@ def create_user_yang(HOST, USER, PASS, NEWUSER, NEWPASSWD, NEWROLE):
     # goodjuju being the NEWPASSWORD variable and the network-admin being the NEWROLE variable. The pwdEncryptType being set to 0 is required
     # during existing user overwrites. 
     with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
-        user_create = '''
-        <config>
-            <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
-                <userext-items>
-                    <user-items>
-                        <User-list>
-                            <name>''' + NEWUSER + '''</name>
-                            <pwd>''' + NEWPASSWD + '''</pwd>
-                            <pwdEncryptType>0</pwdEncryptType>
-                            <userdomain-items>
-                                <UserDomain-list>
-                                    <name>all</name>
-                                    <role-items>
-                                        <UserRole-list>
-                                            <name>''' + NEWROLE + '''</name>
-                                        </UserRole-list>
-                                    </role-items>
-                                </UserDomain-list>
-                            </userdomain-items>
-                        </User-list>
-                    </user-items>
-                </userext-items>
-            </System>
-        </config>'''
+        user_create = USER_TEMPLATE.render(user=NEWUSER, passwd=NEWPASSWD, role=NEWROLE)
         # Edit the Running Configuration and configure the user. NOTE: this will NOT save the running config to startup. So look at the other
         # snippets on how that is accomplished. 
         res = device.edit_config(target='running', config=user_create)
@@ -122,6 +130,27 @@ def create_user_yang(HOST, USER, PASS, NEWUSER, NEWPASSWD, NEWROLE):
             print("User " + NEWUSER + " successfully created.")
     return()
 
+def sync_users_yang(HOST, USER, PASS, USERFILE, PRUNE=False, ROTATE=False):
+    # This routine brings the users of the device in line with a user file (name,password,roles rows) instead of one user per run.
+    # One get reads every user with its roles and every role, the difference is worked out locally and every add, role change,
+    # password and (with PRUNE) removal of users the file does not list goes out in a single edit_config. The login user and admin
+    # are never removed. ROTATE sets the password from the file on existing users as well.
+    try:
+        desired = usersync.load_users(USERFILE)
+    except changefile.ChangeFileError as e:
+        exit("User file " + USERFILE + " has errors, no changes made:\n" + str(e))
+    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
+        users, roles = usersync.fetch_accounts(device)
+        try:
+            user_plan = usersync.plan(desired, users, roles, PRUNE, [USER], ROTATE)
+        except ValueError as e:
+            exit(str(e) + "\nExiting without changes.")
+        # Uncomment the line below to see the payload that is sent
+        # print(usersync.system_body(user_plan))
+        usersync.apply_netconf(device, user_plan)
+    print(HOST + ": " + user_plan.summary())
+    return()
+
 def main():
     # Setup Arguments to be processed at runtime. This will prevent any stagnant settings 
     # Example syntax for runtime "python3 NXOS-ncclient-YANG-usercreate.py -H 10.1.1.1 -U admin -P password -NU newusername -NP newpassword -NR Role -F"
@@ -135,6 +164,9 @@ def main():
     parser.add_argument('-NR', '--NewRole', type=str,  dest='NewRole', help='Role for New user ex: network-admin')
     parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
     parser.add_argument('-F', '--Force', action='store_true', default=False, dest='Force', help='Force User Config over an Existing User')
+    parser.add_argument('-S', '--SyncFile', type=str, dest='SyncFile', help='Sync the users of the device with this CSV/JSON user file (name,password,roles) instead of creating one user')
+    parser.add_argument('-X', '--Prune', action='store_true', default=False, dest='Prune', help='With --SyncFile remove users the file does not list')
+    parser.add_argument('-R', '--RotatePasswords', action='store_true', default=False, dest='RotatePasswords', help='With --SyncFile set the password from the file on existing users as well')
     args = parser.parse_args()
     if(args.Debug):
         print("Debug Mode On")
@@ -155,6 +187,11 @@ def main():
     else:
         passwd = input("Please Enter the Password for NETCONF/XMLAGENT Device Access > ")
     
+    if(args.SyncFile):
+        # Sync mode, the whole user file in one pass instead of the single user checks below
+        sync_users_yang(ip,user,passwd,args.SyncFile,args.Prune,args.RotatePasswords)
+        return()
+
     if(args.NewUsername):
         newuser = args.NewUsername
     else:
@@ -1,8 +1,11 @@
 #!/bin/env python3
 
 import sys, os, warnings, time, logging, argparse
-from ncclient import manager, operations, xml_, debug
+from ncclient import manager
 from lxml import objectify, etree
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import statecache, vlanbulk, vlanset
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -13,87 +16,52 @@ __date__ = "2017-11-21"
 __email__ = "jproano@cisco.com"
 __status__ = "Beta"
 
+# VLAN tables read by check_vlan_yang, kept per device so that checking more VLANs on the same device (a range, the
+# fleet runner) does not query it again. configure_vlan_yang drops the table of the device it changed.
+STATE_CACHE = statecache.StateCache()
+
+def fetch_vlan_table(HOST, USER, PASS):
+    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
+        # Will look at the Bridge Domain items to get the details on if the VLAN exists. The Brdige domain set is what
+        # holds the VLAN details, name info, type, etc. Only the fabEncap (vlan-###) of every BD-list entry is asked for.
+        return statecache.fetch_vlans(device)
+
+def existing_vlans(HOST, USER, PASS):
+    # VLANs of the device as a VLAN bitmap, from the cache when the table was read already
+    return vlanset.VlanSet.of(STATE_CACHE.get(HOST, statecache.VLANS, lambda: fetch_vlan_table(HOST, USER, PASS)))
+
 def check_vlan_yang(HOST, USER, PASS, NEWVLAN):
     # This routine will connect via the NETCONF interface and query the VLANs for a match against the VLAN ID to
     # be created. If the VLAN ID already exists we will return a false to the main routine. If the VLAN doesnt exist
-    # a True value will be returned. 
-    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
-        # Will look at the Bridge Domain items to get the details on if the VLAN exists. The Brdige domain set is what
-        # holds the VLAN details, name info, type, etc. 
-        bd_filter = '''
-		<System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
-            <bd-items>
-                <bd-items>
-                    <BD-list>
-                        <fabEncap>vlan-''' + str(NEWVLAN) + '''</fabEncap>
-                    </BD-list>
-                </bd-items>
-            </bd-items>
-		</System>'''
-        # Get the VLAN data based on the filter above. If the VLAN doesnt exist the RPC reply should not contain any
-        # data. If the VLAN does exist the RPC reply will have data and we can match on the fabEncap tag on the reply.
-        res = device.get(('subtree', bd_filter))
-        # print (xml_.to_xml(res.data_ele, pretty_print=True))
-        xml_data = res.data_ele
-        try:
-            if(xml_data[0][0][0][0][0].text == ('vlan-' + str(NEWVLAN))):
-                return(False)
-        except:
-            return(True)
-        
+    # a True value will be returned. NEWVLAN may be a range ("100-199,300"), True is returned while at least one VLAN
+    # of it is missing.
+    return(not vlanset.parse(str(NEWVLAN)).issubset(existing_vlans(HOST, USER, PASS)))
 
-def configure_vlan_yang(HOST, USER, PASS, NEWVLAN, NEWVLNAME, VNI, STPPRI):
-    # This routine will connect to the NETCONF interface and configure the new vlan based on the credentials provided. If a vlan was matched
-    # its assumed we should not arrive at this point. 
+def configure_vlan_yang(HOST, USER, PASS, NEWVLAN, NEWVLNAME, VNI, STPPRI, VNIOFFSET=None, CHUNKBYTES=vlanbulk.DEFAULT_CHUNK_BYTES):
+    # This routine will connect to the NETCONF interface and configure the new vlans based on the credentials provided. VLANs
+    # that already exist are left as they are.
     # The following characteristics will be set by this filter. vlanID number, vlan name, vnsegmentID (for VXLAN), and the STP priority for 
     # the vlan. This is effecivly the same command set as "vlan xx; (in vlan config) name some_name ; vn-segment xxxx ; 
     # (Back at global) ; spanning-tree vlan xx priorit xxxx".
+    # NEWVLAN may be a range ("100-199,300"). NEWVLNAME may then be a template ("TENANT1-{vlan}") and VNIOFFSET gives
+    # every VLAN the vn-segment VNIOFFSET + VLAN ID. The BD-list entries (VLAN ID, name, vn-segment) and the STP Vlan-list
+    # entries of all new VLANs are stitched into one request, split in CHUNKBYTES sized requests for very large ranges.
+    vlans = vlanset.parse(str(NEWVLAN))
+    entries = vlanbulk.plan(vlans, existing_vlans(HOST, USER, PASS), NEWVLNAME, VNI, VNIOFFSET, STPPRI)
+    created = vlanset.VlanSet.of(entry.vlan for entry in entries)
+    if(vlans - created):
+        print("VLAN(s) " + str(vlans - created) + " already exist - No Changes made to them.")
+    if(not entries):
+        return()
     with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
-        # Stitch together the XML request based on the requested VLAN ID (required). The optional components are
-        # the VLAN Name, VXLAN vn-segment ID, and the STP priority. If those values exist they will be included
-        # in the XML request. 
-        vlan_update = '''
-        <config>
-            <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
-                <bd-items>
-                    <bd-items>
-                        <BD-list>
-                            <fabEncap>vlan-''' + str(NEWVLAN) + '''</fabEncap>'''
-        if(NEWVLNAME):
-            vlan_update = vlan_update + '''
-                            <name>''' + str(NEWVLNAME) + '''</name>'''
-        if(VNI):
-            vlan_update = vlan_update + '''
-                            <accEncap>vxlan-''' + str(VNI) + '''</accEncap>'''
-        vlan_update = vlan_update + '''
-                            <mode>CE</mode>
-                        </BD-list>
-                    </bd-items>
-                </bd-items>'''
-        if(STPPRI):
-            vlan_update = vlan_update + '''
-                <stp-items>
-                    <inst-items>
-                        <vlan-items>
-                            <Vlan-list>
-                                <id>''' + str(NEWVLAN) + '''</id>
-                                <priority>''' + str(STPPRI) + '''</priority>
-                            </Vlan-list>
-                        </vlan-items> 
-                    </inst-items>
-                </stp-items>'''
-        vlan_update = vlan_update + '''
-            </System>
-        </config>'''
         # If interested in seeing the completed request string to stdout uncomment out the line below.
-        # print(vlan_update)
-        # Edit the Running Configuration and configure the vlan. NOTE: this will NOT save the running config to startup. Look at the other
-        # snippets on how that is accomplished. 
-        res = device.edit_config(target='running', config=vlan_update)
-        # Looking for an RPC Reply. We could make this a TRY in the future for better error handling but a good positive confirmation that
-        # the device at least processed the RPC request that was sent. 
-        if(res.ok):
-            print("VLAN " + str(NEWVLAN) + " successfully created.")
+        # print(vlanbulk.netconf_payloads(entries, CHUNKBYTES))
+        # Edit the Running Configuration and configure the vlans. NOTE: this will NOT save the running config to startup. Look at the other
+        # snippets on how that is accomplished. A failed request raises an RPCError.
+        rpcs = vlanbulk.create_netconf(device, entries, CHUNKBYTES)
+    # The cached VLAN table of the device no longer holds every VLAN
+    STATE_CACHE.invalidate(HOST, [statecache.VLANS])
+    print("VLAN(s) " + str(created) + " successfully created in " + str(rpcs) + " request(s).")
     return()
 
 def main():
@@ -104,10 +72,12 @@ def main():
     parser.add_argument('-H', '--HostIP', type=str, dest='HostIP', help='IP Address of the Device')
     parser.add_argument('-U', '--Username', type=str,  dest='Username', help='Username for NETCONF/XMLAGENT Access')
     parser.add_argument('-P', '--Password', type=str,  dest='Password', help='Password for NETCONF/XMLAGENT Access')
-    parser.add_argument('-NV', '--NewVlan', type=str,  dest='NewVlan', help='New VLAN ID Desired')
-    parser.add_argument('-NN', '--NewVlanName', type=str,  dest='NewVlanName', help='Vlan Name for the New ID (Optional)')
+    parser.add_argument('-NV', '--NewVlan', type=str,  dest='NewVlan', help='New VLAN ID Desired, or a range of them Ex. 100-199,300')
+    parser.add_argument('-NN', '--NewVlanName', type=str,  dest='NewVlanName', help='Vlan Name for the New ID, {vlan} and {index} are replaced per VLAN Ex. TENANT1-{vlan} (Optional)')
     parser.add_argument('-VN', '--VNSegmentID', type=str,  dest='VxlanVNID', help='Overlay vn-segment ID (Optional)')
+    parser.add_argument('-VO', '--VNIOffset', type=str,  dest='VniOffset', help='vn-segment ID of every VLAN is this offset plus the VLAN ID, for ranges (Optional)')
     parser.add_argument('-SP', '--STPPriority', type=str,  dest='StpPri', help='Spanning Tree Priority (Optional)')
+    parser.add_argument('-CB', '--ChunkKB', type=int, default=vlanbulk.DEFAULT_CHUNK_BYTES // 1024, dest='ChunkKB', help='Split the request for large ranges in requests of at most this many KB (Default 128)')
     parser.add_argument('-NI', '--NonInteractive', action='store_false', default=True, dest='NonInteractive', help='Enable Non-Interactive Mode. Dont Prompt for Optional Input')
     parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
     args = parser.parse_args()
@@ -134,6 +104,10 @@ def main():
         newvlan = args.NewVlan
     else:
         newvlan = input("Please Enter the New VlanID for creation > ")
+    try:
+        vlans = vlanset.parse(newvlan)
+    except ValueError as e:
+        sys.exit("VLAN ID " + str(newvlan) + " is not valid: " + str(e))
     # Check for Non-Interactive Flag. That will determin to ask for input in the absense of additional
     # input or just set optional variables to None for processing te subsequent functions. 
     if(args.NonInteractive):
@@ -142,8 +116,14 @@ def main():
         else:
             newvlanname = input("Please Enter the New VLAN Name for creation (Enter for none) > ")
     
+        # A range of VLANs gets its vn-segments from an offset, a single VLAN its vn-segment ID
+        newvnioffset = args.VniOffset
         if(args.VxlanVNID):
             newvnid = args.VxlanVNID
+        elif(len(vlans) > 1):
+            newvnid = None
+            if(not newvnioffset):
+                newvnioffset = input("If an VXLAN overlay Please Enter the VNID offset, VNID = offset + VLAN ID (Or enter for none which will default to CE mode > ")
         else:
             newvnid = input("If an VXLAN overlay Please Enter the desired VNID (Or enter for none which will default to CE mode > ")
         
@@ -161,14 +141,19 @@ def main():
             newvnid = args.VxlanVNID
         else:
             newvnid = None
+        newvnioffset = args.VniOffset
         
         if(args.StpPri):
             stppri = args.StpPri
         else:
             stppri = None
     # The routine check VLAN should return True if no conflict exists or false if there already is a VLAN with that ID
+    # (for a range, if every VLAN of it exists already). The existing VLANs are read once and reused by configure.
     if(check_vlan_yang(ip,user,passwd,newvlan)):
-        configure_vlan_yang(ip,user,passwd,newvlan,newvlanname,newvnid,stppri)
+        try:
+            configure_vlan_yang(ip,user,passwd,newvlan,newvlanname,newvnid,stppri,newvnioffset,args.ChunkKB * 1024)
+        except ValueError as e:
+            sys.exit(str(e) + " - No Changes made.")
     else:
         print('VLAN Already Exists - No Changes made.')
     return()
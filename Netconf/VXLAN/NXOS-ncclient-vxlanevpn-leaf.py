@@ -1,8 +1,11 @@
 #!/bin/env python3
 
 import sys, os, warnings, time, argparse, json
-from ncclient import manager, operations, xml_, debug
 import logging
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import features, readiness, template, yangxml
+from nexusprog.session import NxSession
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -24,234 +27,146 @@ __status__ = "Alpha - Work in Progress!!!"
 #   - OSPF connections will be P2P and Area 1-n. Will reserve Area 0 for border use.
 #   - Underlay is hardcoded in the default VRF if a non-default VRF is desired that 
 #     should be changed in the code.
+# 4. Every step takes the NxSession of the run, so all steps share one NETCONF session. In leaf
+#    bring-up mode (-LEAF) the steps after the feature enablement hand their payloads to a
+#    ConfigBatch instead of the device, the payloads are merged and sent as one edit_config
+#    (staged in the candidate datastore and applied with one commit when the device supports it).
 
-def feature_check(HOST, USER, PASS):
-    ###############################################################################################
-    # This routine checks the running configuration of the device for the following features:
-    # feature interface-vlan ! ifvlan-items
-    # feature bgp ! bgp-items
-    # feature ospf ! ospf-items
-    # feature pim ! pim-items
-    # feature vn-segment-vlan-based ! vnsegment-items
-    # nv overlay evpn ! evpn-items
-    # feature nv overlay ! nvo-items
-    ################################################################################################
-    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus', "ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
-        vxlan_feature_check = '''
-		<System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
-            <fm-items>
-                <ifvlan-items/>
-                <bgp-items/>
-                <ospf-items/>
-                <pim-items/>
-                <vnsegment-items/>
-                <evpn-items/>
-                <nvo-items/>
-            </fm-items>
-        </System>
-        '''
-        rcfeatures = device.get(('subtree', vxlan_feature_check))
-        # print (xml_.to_xml(rcfeatures.data_ele, pretty_print=True))
-        featurelist = rcfeatures.data_ele
-        featuresforenablement = []
-        for elem in featurelist.iter(tag='{http://cisco.com/ns/yang/cisco-nx-os-device}ifvlan-items'):
-            try:
-                if elem[0].tag == '{http://cisco.com/ns/yang/cisco-nx-os-device}adminSt':
-                    if str(elem[0].text) != 'enabled':
-                        featuresforenablement.append('ifvlan')
-            except:
-                sys.exit("Features Unable to be checked, Terminating without further actions")
-        
-        for elem in featurelist.iter(tag='{http://cisco.com/ns/yang/cisco-nx-os-device}bgp-items'):
-            try:
-                if elem[0].tag == '{http://cisco.com/ns/yang/cisco-nx-os-device}adminSt':
-                    if str(elem[0].text) != 'enabled':
-                        featuresforenablement.append('bgp')
-            except:
-                sys.exit("Features Unable to be checked, Terminating without further actions")
-        
-        for elem in featurelist.iter(tag='{http://cisco.com/ns/yang/cisco-nx-os-device}ospf-items'):
-            try:
-                if elem[0].tag == '{http://cisco.com/ns/yang/cisco-nx-os-device}adminSt':
-                    if str(elem[0].text) != 'enabled':
-                        featuresforenablement.append('ospf')
-            except:
-                sys.exit("Features Unable to be checked, Terminating without further actions")
-        
-        for elem in featurelist.iter(tag='{http://cisco.com/ns/yang/cisco-nx-os-device}pim-items'):
-            try:
-                if elem[0].tag == '{http://cisco.com/ns/yang/cisco-nx-os-device}adminSt':
-                    if str(elem[0].text) != 'enabled':
-                        featuresforenablement.append('pim')
-            except:
-                sys.exit("Features Unable to be checked, Terminating without further actions")
-
-        for elem in featurelist.iter(tag='{http://cisco.com/ns/yang/cisco-nx-os-device}vnsegment-items'):
-            try:
-                if elem[0].tag == '{http://cisco.com/ns/yang/cisco-nx-os-device}adminSt':
-                    if str(elem[0].text) != 'enabled':
-                        featuresforenablement.append('vnsegment')
-            except:
-                sys.exit("Features Unable to be checked, Terminating without further actions")
-
-        for elem in featurelist.iter(tag='{http://cisco.com/ns/yang/cisco-nx-os-device}evpn-items'):
-            try:
-                if elem[0].tag == '{http://cisco.com/ns/yang/cisco-nx-os-device}adminSt':
-                    if str(elem[0].text) != 'enabled':
-                        featuresforenablement.append('evpn')
-            except:
-                sys.exit("Features Unable to be checked, Terminating without further actions")
-
-        for elem in featurelist.iter(tag='{http://cisco.com/ns/yang/cisco-nx-os-device}nvo-items'):
-            try:
-                if elem[0].tag == '{http://cisco.com/ns/yang/cisco-nx-os-device}adminSt':
-                    if str(elem[0].text) != 'enabled':
-                        featuresforenablement.append('nvo')
-            except:
-                sys.exit("Features Unable to be checked, Terminating without further actions")
+# fm-items containers feature_enable may turn on, in the order they are sent
+FEATURE_ORDER = ('ifvlan', 'bgp', 'ospf', 'pim', 'vnsegment', 'evpn', 'nvo')
 
-        return featuresforenablement
-
-def feature_enable(HOST, USER, PASS, FEATURELIST):
-    ################################################################################################
-    # This routine edits the running configuration of the device and enables the following features:
-    # feature interface-vlan ! ifvlan-items
-    # feature bgp ! bgp-items
-    # feature ospf ! ospf-items
-    # feature pim ! pim-items
-    # feature vn-segment-vlan-based ! vnsegment-items
-    # nv overlay evpn ! evpn-items
-    # feature nv overlay ! nvo-items
-    # Feature enablement is based on the list of features that where checked and found to be not
-    # Active in the check routine.
-    ################################################################################################
-    
-    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
-        # Header
-        vxlan_feature_update = '''
+# Payloads compiled once at import, the steps only render them with their parameters
+FEATURE_TEMPLATE = template.compile('''
         <config>
 	    <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
-                <fm-items>'''
-        # Add Tags Based on features needed
-        if 'ifvlan' in FEATURELIST:
-            vxlan_feature_update = vxlan_feature_update + '''
-                    <ifvlan-items>
-                        <adminSt>enabled</adminSt>
-                    </ifvlan-items>'''
-        if 'bgp' in FEATURELIST:
-            vxlan_feature_update = vxlan_feature_update + '''
-                    <bgp-items>
-                        <adminSt>enabled</adminSt>
-                    </bgp-items>'''
-        if 'ospf' in FEATURELIST:
-            vxlan_feature_update = vxlan_feature_update + '''                    
-                    <ospf-items>
-                        <adminSt>enabled</adminSt>
-                    </ospf-items>'''
-        if 'pim' in FEATURELIST:
-            vxlan_feature_update = vxlan_feature_update + '''
-                    <pim-items>
-                        <adminSt>enabled</adminSt>
-                    </pim-items>'''
-        if 'vnsegment' in FEATURELIST:
-            vxlan_feature_update = vxlan_feature_update + '''
-                    <vnsegment-items>
+                <fm-items>
+                    {#features}
+                    <{name}-items>
                         <adminSt>enabled</adminSt>
-                    </vnsegment-items>'''
-        if 'evpn' in FEATURELIST:
-            vxlan_feature_update = vxlan_feature_update + '''
-                    <evpn-items>
-                        <adminSt>enabled</adminSt>
-                    </evpn-items>'''
-        if 'nvo' in FEATURELIST:
-            vxlan_feature_update = vxlan_feature_update + '''
-                    <nvo-items>
-                        <adminSt>enabled</adminSt>
-                    </nvo-items>'''
-        # Footer
-        vxlan_feature_update = vxlan_feature_update + '''
+                    </{name}-items>
+                    {/features}
                 </fm-items>
  	    </System>
-        </config>'''
-        # print vxlan_feature_update
-        res = device.edit_config(target='running', config=vxlan_feature_update)
-        if res.ok:
-            # print("Features Configured")
-            return True
-        else:
-            return False
+        </config>''')
 
-def configure_underlay(HOST, USER, PASS, UL_Protocol, UL_Protocol_Area, UL_PhysList, UL_LoopList):
-    with manager.connect(host=HOST, port=830, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
-        # Create a Loopback for the Underlay to be used as the Router ID ; Configure the Designated Ethernet Ports for L3 mode and assign IP addressing
-        underlay_int_config = '''
+UNDERLAY_TEMPLATE = template.compile('''
         <config>
 	        <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
                 <intf-items>
-                    <lb-items>'''
-        for key in UL_LoopList:
-            underlay_int_config = underlay_int_config + '''
+                    <lb-items>
+                        {#loopbacks}
                         <LbRtdIf-list>
-                            <id>''' + str(key) + '''</id>
-                        </LbRtdIf-list>'''        
-        underlay_int_config = underlay_int_config + '''
+                            <id>{id}</id>
+                        </LbRtdIf-list>
+                        {/loopbacks}
                     </lb-items>
-                    <phys-items>'''
-        for key in UL_PhysList:
-            underlay_int_config = underlay_int_config + '''
+                    <phys-items>
+                        {#physical}
                         <PhysIf-list>
-                            <id>''' + str(key) + '''</id>
+                            <id>{id}</id>
                             <accessVlan>vlan-1</accessVlan>
                             <mode>access</mode>
                             <mtu>9216</mtu>
                             <layer>Layer3</layer>
                             <descr>To Spine</descr>
                             <adminSt>up</adminSt>
-                        </PhysIf-list>'''
-        underlay_int_config = underlay_int_config + '''
+                        </PhysIf-list>
+                        {/physical}
                     </phys-items>
                 </intf-items>
                 <ipv4-items>
                     <inst-items>
                         <dom-items>
                             <Dom-list>
-                            <name>default</name>
-                                <if-items>'''
-        for key in UL_LoopList:
-            underlay_int_config = underlay_int_config + '''        
+                                <name>default</name>
+                                <if-items>
+                                    {#loopbacks}
                                     <If-list>
-                                        <id>''' + str(key) + '''</id>
+                                        <id>{id}</id>
                                         <addr-items>
                                             <Addr-list>
-                                                <addr>''' + str(UL_LoopList[key]) + '''</addr>
+                                                <addr>{addr}</addr>
                                             </Addr-list>
                                         </addr-items>
-                                    </If-list>'''
-        for key in UL_PhysList:
-            underlay_int_config = underlay_int_config + '''
+                                    </If-list>
+                                    {/loopbacks}
+                                    {#physical}
                                     <If-list>
-                                        <id>''' + str(key) + '''</id>
+                                        <id>{id}</id>
                                         <addr-items>
                                             <Addr-list>
-                                                <addr>''' + str(UL_PhysList[key]) + '''</addr>
+                                                <addr>{addr}</addr>
                                             </Addr-list>
                                         </addr-items>
-                                    </If-list>'''
-        underlay_int_config = underlay_int_config + '''                            
+                                    </If-list>
+                                    {/physical}
                                 </if-items>
-                            </Dom-list>   
+                            </Dom-list>
                         </dom-items>
                     </inst-items>
                 </ipv4-items>
             </System>
-        </config>
-        '''
+        </config>''')
+
+def feature_check(SESSION):
+    ###############################################################################################
+    # This routine checks the running configuration of the device for the following features:
+    # feature interface-vlan ! ifvlan-items
+    # feature bgp ! bgp-items
+    # feature ospf ! ospf-items
+    # feature pim ! pim-items
+    # feature vn-segment-vlan-based ! vnsegment-items
+    # nv overlay evpn ! evpn-items
+    # feature nv overlay ! nvo-items
+    ################################################################################################
+    with SESSION.netconf_session() as device:
+        # Only the fm-items containers of the VXLAN features are requested, the reply is read in one pass by the
+        # table driven parser in nexusprog.features.
+        vxlan_feature_check = features.feature_filter(features.VXLAN_FEATURES)
+        rcfeatures = device.get(('subtree', vxlan_feature_check))
+        # print (xml_.to_xml(rcfeatures.data_ele, pretty_print=True))
+        try:
+            featurestate = features.parse_features(rcfeatures.data_ele, features.VXLAN_FEATURES)
+        except ValueError:
+            sys.exit("Features Unable to be checked, Terminating without further actions")
+        featuresforenablement = features.disabled(featurestate)
+        return featuresforenablement
+
+def feature_enable(SESSION, FEATURELIST):
+    ################################################################################################
+    # This routine edits the running configuration of the device and enables the following features:
+    # feature interface-vlan ! ifvlan-items
+    # feature bgp ! bgp-items
+    # feature ospf ! ospf-items
+    # feature pim ! pim-items
+    # feature vn-segment-vlan-based ! vnsegment-items
+    # nv overlay evpn ! evpn-items
+    # feature nv overlay ! nvo-items
+    # Feature enablement is based on the list of features that where checked and found to be not
+    # Active in the check routine.
+    ################################################################################################
+    
+    with SESSION.netconf_session() as device:
+        # One fm-items entry per feature, in the order the check lists them
+        vxlan_feature_update = FEATURE_TEMPLATE.render(features=[{'name': name} for name in FEATURE_ORDER if name in FEATURELIST])
+        # print vxlan_feature_update
+        res = readiness.retry_busy(lambda: device.edit_config(target='running', config=vxlan_feature_update))
+        if res.ok:
+            # print("Features Configured")
+            return True
+        else:
+            return False
+
+def configure_underlay(SESSION, UL_Protocol, UL_Protocol_Area, UL_PhysList, UL_LoopList):
+    with SESSION.netconf_session() as device:
+        # Create a Loopback for the Underlay to be used as the Router ID ; Configure the Designated Ethernet Ports for L3 mode and assign IP addressing
+        loopbacks = [{'id': key, 'addr': UL_LoopList[key]} for key in UL_LoopList]
+        physical = [{'id': key, 'addr': UL_PhysList[key]} for key in UL_PhysList]
+        underlay_int_config = UNDERLAY_TEMPLATE.render(loopbacks=loopbacks, physical=physical)
         # print underlay_int_config
-        res = device.edit_config(target='running', config=underlay_int_config)
+        res = readiness.retry_busy(lambda: device.edit_config(target='running', config=underlay_int_config))
         if res.ok:
-            print "Underlay Interfaces Configured"
-            sleep 3
-            device 
+            print("Underlay Interfaces Configured")
         # Create OSPF Instance Called Underlay. Attach to Loopback for router ID and the connections to the Spine
         underlay_rp_config = '''
         <config>
@@ -312,16 +227,14 @@ def configure_underlay(HOST, USER, PASS, UL_Protocol, UL_Protocol_Area, UL_PhysL
             </ospf-items>
         </System>
         '''
-        #time.sleep(5)
         #res2 = device.edit_config(target='running', config=underlay_rp_config)
-        #time.sleep(5)
         # res3 = device.get(('subtree', get_ospf_details))
         # print (xml_.to_xml(res3.data_ele, pretty_print=True))
 
-    return()
+    return(res.ok)
 
-def config_mcast_underlay(HOST, PORT, USER, PASS, SpineULList, UL_RP_Address):
-    with manager.connect(host=HOST, port=PORT, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
+def config_mcast_underlay(SESSION, SpineULList, UL_RP_Address):
+    with SESSION.netconf_session() as device:
         # Configure PIM and Multicast Connectivity from Leaf to Spine on loopback and uplink ports
         underlay_mc_config = '''
         <config>
@@ -372,8 +285,7 @@ def config_mcast_underlay(HOST, PORT, USER, PASS, SpineULList, UL_RP_Address):
             </pim-items>
         </System>
         '''
-        res = device.edit_config(target='running', config=underlay_mc_config)
-        time.sleep(5)
+        res = readiness.retry_busy(lambda: device.edit_config(target='running', config=underlay_mc_config))
         # res2 = device.get(('subtree', get_mc_details))
         # print (xml_.to_xml(res2.data_ele, pretty_print=True))
         # file = open('nxconfig_vxlan.xml','w') 
@@ -381,8 +293,8 @@ def config_mcast_underlay(HOST, PORT, USER, PASS, SpineULList, UL_RP_Address):
         # file.close() 
     return()
 
-def create_l2fabric(HOST, PORT, USER, PASS, SpineULList, UL_RP_Address):
-    with manager.connect(host=HOST, port=PORT, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
+def create_l2fabric(SESSION, SpineULList, UL_RP_Address):
+    with SESSION.netconf_session() as device:
         # Configure PIM and Multicast Connectivity from Leaf to Spine on loopback and uplink ports
         fabric_vxlan_config = '''
         <config>
@@ -493,9 +405,8 @@ def create_l2fabric(HOST, PORT, USER, PASS, SpineULList, UL_RP_Address):
             </inst-items>
         </System>
         '''
-        res = device.edit_config(target='running', config=fabric_vxlan_config)
-        time.sleep(5)
-        res2 = device.edit_config(target='running', config=tenant_vxlan_config)
+        res = readiness.retry_busy(lambda: device.edit_config(target='running', config=fabric_vxlan_config))
+        res2 = readiness.retry_busy(lambda: device.edit_config(target='running', config=tenant_vxlan_config))
         #res3 = device.get(('subtree', get_fabric_details))
         #print (xml_.to_xml(res3.data_ele, pretty_print=True))
         #file = open('nxconfig_vxlan.xml','w') 
@@ -503,8 +414,8 @@ def create_l2fabric(HOST, PORT, USER, PASS, SpineULList, UL_RP_Address):
         #file.close() 
     return()
 
-def create_l3fabric(HOST, PORT, USER, PASS, SpineULList, UL_RP_Address):
-    with manager.connect(host=HOST, port=PORT, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
+def create_l3fabric(SESSION, SpineULList, UL_RP_Address):
+    with SESSION.netconf_session() as device:
         # Configure PIM and Multicast Connectivity from Leaf to Spine on loopback and uplink ports
         fabric_l3vni_config = '''
         <config>
@@ -643,13 +554,10 @@ def create_l3fabric(HOST, PORT, USER, PASS, SpineULList, UL_RP_Address):
         <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
         </System>
         '''
-        res = device.edit_config(target='running', config=fabric_l2vni_config)
-        time.sleep(5)
-        res2 = device.edit_config(target='running', config=fabric_l3vni_config)
-        time.sleep(5)
-        res3 = device.edit_config(target='running', config=overlay_tunnelint_config)
-        time.sleep(5)
-        res3a = device.edit_config(target='running', config=overlay_tunnelint_enable)
+        res = readiness.retry_busy(lambda: device.edit_config(target='running', config=fabric_l2vni_config))
+        res2 = readiness.retry_busy(lambda: device.edit_config(target='running', config=fabric_l3vni_config))
+        res3 = readiness.retry_busy(lambda: device.edit_config(target='running', config=overlay_tunnelint_config))
+        res3a = readiness.retry_busy(lambda: device.edit_config(target='running', config=overlay_tunnelint_enable))
         # res4 = device.get(('subtree', get_fabric_details))
         # print (xml_.to_xml(res3.data_ele, pretty_print=True))
         # file = open('nxconfig_vxlan.xml','w') 
@@ -657,8 +565,8 @@ def create_l3fabric(HOST, PORT, USER, PASS, SpineULList, UL_RP_Address):
         # file.close() 
     return()
 
-def create_evpn_ctrl(HOST, PORT, USER, PASS, SpineULList, UL_RP_Address):
-    with manager.connect(host=HOST, port=PORT, username=USER, password=PASS, hostkey_verify=False,device_params={'name':'nexus',"ssh_subsystem_name": "netconf"}, look_for_keys=False, allow_agent=False) as device:
+def create_evpn_ctrl(SESSION, SpineULList, UL_RP_Address):
+    with SESSION.netconf_session() as device:
         # Configure PIM and Multicast Connectivity from Leaf to Spine on loopback and uplink ports
         evpn_bgp_config = '''
         <config>
@@ -736,10 +644,8 @@ def create_evpn_ctrl(HOST, PORT, USER, PASS, SpineULList, UL_RP_Address):
             <evpn-items/>
         </System>
         '''
-        res = device.edit_config(target='running', config=evpn_bgp_config)
-        time.sleep(5)
-        res2 = device.edit_config(target='running', config=evpn_cp_config)
-        time.sleep(5)
+        res = readiness.retry_busy(lambda: device.edit_config(target='running', config=evpn_bgp_config))
+        res2 = readiness.retry_busy(lambda: device.edit_config(target='running', config=evpn_cp_config))
         # res4 = device.get(('subtree', get_fabric_details))
         # print (xml_.to_xml(res4.data_ele, pretty_print=True))
         # file = open('nxconfig_vxlan.xml','w') 
@@ -762,6 +668,7 @@ def main():
     parser.add_argument('-ULA', '--underlayArea', type=str, dest='ULArea', help='Underlay Area ID - ex 1 or 2 or 3', required=False)    
     parser.add_argument('-ULI', '--underlayPhys', type=json.loads, dest='ULPhysList', help='Underlay Physical Interfaces and IPs to Spines', required=False)
     parser.add_argument('-ULL', '--underlayLoop', type=json.loads, dest='ULLoopList', help='Underlay Logical Interfaces and IPs (LO0)', required=False)
+    parser.add_argument('-LEAF', '--leaf_bringup', action='store_true', default=False, dest='LeafON', help='Full leaf bring-up (features, underlay, multicast, L2/L3 fabric, EVPN) over one session and one transaction', required=False)
     parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
     args = parser.parse_args()
     if(args.Debug):
@@ -787,50 +694,75 @@ def main():
     else:
         Pwd = input("Please Enter the Password that has NetConf access to your Device > ")
 
-    if(args.FeatureON):
-        print("Enable Needed Features for VXLAN Node")
-        featurelist = feature_check(Host, User, Pwd)
-        if featurelist == []:
-            print "All needed features are enabled."
-        else:
-            print 'enabling features'
-            if(feature_enable(Host, User, Pwd, featurelist) == False):
-                sys.exit("Features Unable to be configured, Terminating without further actions")
-    else:
-        # Features not set to be enabled, check that needed features are turned on.
-        if feature_check(Host, User, Pwd) == []:
-            print "features passed"
-        else:
-            print "feature check failed"
-
-    if(args.UnderlayConfigON):
-        if feature_check(Host, User, Pwd) == []:
-            if args.ULProto:
-                UL_Protocol = str(args.ULProto)
+    # One NETCONF session for the whole run. The features are checked once and that result is used by every
+    # step below instead of checking again before each one.
+    run_start = time.time()
+    with NxSession(Host, User, Pwd, debug=DebugON) as session:
+        featurelist = feature_check(session)
+        if(args.FeatureON or args.LeafON):
+            print("Enable Needed Features for VXLAN Node")
+            if featurelist == []:
+                print("All needed features are enabled.")
             else:
-                UL_Protocol = input("Please Enter the desired Underlay Protocol of the device (put in OSPF here!) > ")
-            
-            if args.ULArea:
-                UL_Protocol_Area = str(args.ULArea)
+                print('enabling features')
+                # Features go out in their own RPC ahead of everything else, the rest of the configuration is only
+                # accepted once they are enabled.
+                if(feature_enable(session, featurelist) == False):
+                    sys.exit("Features Unable to be configured, Terminating without further actions")
+                featurelist = []
+        else:
+            # Features not set to be enabled, check that needed features are turned on.
+            if featurelist == []:
+                print("features passed")
             else:
-                UL_Protocol_Area = input("Please Enter the desired OSPF Area ID for the Pod > ")
-            
-            if args.ULPhysList:
-                UL_PhysList = args.ULPhysList
+                print("feature check failed")
+
+        if(args.UnderlayConfigON or args.LeafON):
+            if featurelist == []:
+                if args.ULProto:
+                    UL_Protocol = str(args.ULProto)
+                else:
+                    UL_Protocol = input("Please Enter the desired Underlay Protocol of the device (put in OSPF here!) > ")
+                
+                if args.ULArea:
+                    UL_Protocol_Area = str(args.ULArea)
+                else:
+                    UL_Protocol_Area = input("Please Enter the desired OSPF Area ID for the Pod > ")
+                
+                if args.ULPhysList:
+                    UL_PhysList = args.ULPhysList
+                else:
+                    UL_PhysList = json.loads(input("Please enter the physical interface list of the L3 uplinks to the Spines w IPs Ex: '{\"eth1/1\":\"10.1.1.2/30\",\"eth1/2\":\"10.1.1.6/30\"}' > "))
+                
+                if args.ULLoopList:
+                    UL_LoopList = args.ULLoopList
+                else:
+                    UL_LoopList = json.loads(input("Please enter the logical interface list of the RTRID IP Ex: '{\"lo0\":\"192.168.1.1/32\"}' "))
             else:
-                UL_PhysList = dict(input("Please enter the physical interface list of the L3 uplinks to the Spines w IPs Ex: '{\"eth1/1\":\"10.1.1.2/30\",\"eth1/2\":\"10.1.1.6/30\"}' > "))
-            
-            if args.ULLoopList:
-                UL_LoopList = args.ULLoopList
+                exit("feature check failed unable to configure underlay")
+
+        if(args.LeafON):
+            # Leaf bring-up: the steps queue their payloads on the batch, the merged payload is then sent over the
+            # session of the run as a single edit_config with at most one commit.
+            batch = yangxml.ConfigBatch()
+            configure_underlay(batch, UL_Protocol, UL_Protocol_Area, UL_PhysList, UL_LoopList)
+            config_mcast_underlay(batch, None, None)
+            create_l2fabric(batch, None, None)
+            create_l3fabric(batch, None, None)
+            create_evpn_ctrl(batch, None, None)
+            if(DebugON):
+                print(batch.merged())
+            res = batch.push(session.netconf)
+            if res is not None and res.ok:
+                print("Leaf configured with " + str(len(batch.configs)) + " step payloads in one transaction")
             else:
-                UL_LoopList = dict(input("Please enter the logical interface list of the RTRID IP Ex: '{\"lo0\":\"192.168.1.1/32\"}' "))
-            
-            if configure_underlay(Host, User, Pwd, UL_Protocol, UL_Protocol_Area, UL_PhysList, UL_LoopList):
-                print "Underlay Configured"
+                exit("Error Configuring Leaf - Exiting")
+        elif(args.UnderlayConfigON):
+            if configure_underlay(session, UL_Protocol, UL_Protocol_Area, UL_PhysList, UL_LoopList):
+                print("Underlay Configured")
             else:
                 exit("Error Configuring Underlay - Exiting")
-        else:
-            exit("feature check failed unable to configure underlay")
+    print("Run completed in %.1fs using %d connection(s)" % (time.time() - run_start, session.connects))
         
     #PORT = 830
     #SpineULList = {'eth1/1' : '10.1.1.1/30','eth1/2' : '10.1.1.5/30', 'lo0' : '10.0.0.10/32'}
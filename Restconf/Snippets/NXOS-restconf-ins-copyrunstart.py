@@ -1,6 +1,10 @@
 #!/bin/env python3
 
-import argparse, requests, json, logging
+import argparse, logging
+import sys, os
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import nxapi, restconf
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -17,21 +21,12 @@ def copy_run_start(HOST, USER, PASS):
     # and wait two seconds after sending the command. I did it this way since the startup config isnt exposed in yang (yet)
     # where a copy configuration would work. Port 22 or 830 should work for the xmlagent subsystem but left the port 22 as
     # that port should work regardless of the restconf service being activated on port 830.
-    url="https://" + HOST + "/ins"
-    myheaders={'content-type':'application/json-rpc'}
-    payload=[
-        {
-            "jsonrpc": "2.0",
-            "method": "cli_ascii",
-            "params": {
-            "cmd": "copy running-config startup-config",
-            "version": 1
-            },
-            "id": 1
-        }
-    ]
-    response = requests.post(url,data=json.dumps(payload), headers=myheaders,auth=(USER,PASS), verify=False)
-    print(str(response.status_code))
+    # NX-API calls go over the same pooled client as the RESTCONF snippets
+    rc = restconf.client(HOST, USER, PASS)
+    result = nxapi.run(rc, ["copy running-config startup-config"])[0]
+    if(not result.ok):
+        sys.exit("copy running-config startup-config failed: " + result.error)
+    print(result.output)
     return()
     
 def main():
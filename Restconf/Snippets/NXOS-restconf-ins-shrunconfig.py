@@ -1,6 +1,10 @@
 #!/bin/env python3
 
-import argparse, requests, json, time, logging
+import argparse, time, logging
+import sys, os
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import nxapi, restconf
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -12,31 +16,19 @@ __email__ = "jproano@cisco.com"
 __status__ = "Beta"
 
 def show_run_all_human(HOST, USER, PASS):
-    # This routine will sleep for 10 seconds to ensure any previous RESTCONF sessions are cleaned up then will connect
+    # This routine will retry while the device answers busy to ensure any previous RESTCONF sessions are cleaned up. It will connect
     # via the XML Manager interface and retrieve the full running configuration of the Nexus Device. A file will be created
     # with the hostname-<year><month><day>-<hour><minute><second>.log format and the running configuration will be saved to
     # that log file. This routing allows for human readable differences to be compared or retrived during routines for audit
     # purposes. 
-    time.sleep(10)
     # Connect to NX device via XML Manager Interface (Port 22) and execute a copy run to start
-    url="https://" + HOST + "/ins"
-    myheaders={'content-type':'application/json-rpc'}
-    payload=[
-        {
-            "jsonrpc": "2.0",
-            "method": "cli_ascii",
-            "params": {
-            "cmd": "show running-config",
-            "version": 1
-            },
-            "id": 1
-        }
-    ]
-    response = requests.post(url,data=json.dumps(payload), headers=myheaders, auth=(USER,PASS), verify=False).json()
+    # NX-API calls go over the same pooled client as the RESTCONF snippets
+    rc = restconf.client(HOST, USER, PASS)
+    config = nxapi.run_one(rc, "show running-config")
     timestr = time.strftime("%Y%m%d-%H%M%S")
     filename = HOST + "-" + timestr + ".log"
     file = open(filename,'w') 
-    file.write(response["result"]["msg"])
+    file.write(config)
     file.close()
     print("File saved to: " + filename) 
     return()
@@ -1,6 +1,10 @@
 #!/bin/env python3
 
-import argparse, requests, json, time, logging, base64
+import argparse, json, time, logging
+import sys, os
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import restconf, template
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -16,21 +20,19 @@ def check_vlan_yang(HOST, USER, PASS, NEWVLAN):
     # be created. If the VLAN ID already exists we will return a false to the main routine. If the VLAN doesnt exist
     # a True value will be returned. 
 
-    # Prep username and password as a B64 encoded ASCII string for use in the HTML header. Encoding and Decoding in the b64 module
-    # are needed to make the function interoperable between Python2 and Python3
-    user_creds = USER + ':' + PASS
-    user_credsb64 = base64.b64encode(bytes(user_creds.encode('utf_8'))).decode('ascii')
+    # Use the shared pooled RESTCONF client for this device. The connection and the authorization header are reused
+    # across the check and configure calls instead of being rebuilt for every request.
+    rc = restconf.client(HOST, USER, PASS)
 
     # Use Top Level XPath in the NX-OS-Device Yang model for tree retrieval. The syntax for the use of the YANG model
     # in NX is http(s)://HOST/restconf/data/<YANG MODEL>:XPath. The XPath is similar to the structure of a Netconf filter
     # but requires key values in certain containers and leafs for proper resolution. pyang can show the model in tree form
     # and where Key values are needed. Searching for a VLAN is an example of a Key where BD-list= *ID in the yang model.
     # and the ID field is in the "vlan-###" format for the designated vlan.
-    url = 'https://' + HOST + '/restconf/data/Cisco-NX-OS-device:System/bd-items/bd-items/BD-list=vlan-' + str(NEWVLAN)
+    path = 'bd-items/bd-items/BD-list=vlan-' + str(NEWVLAN)
 
-    # Build Headers and use an HTTP get to retrieve all readable configuration elements. 
-    http_headers = { 'content-type': 'application/yang.data+xml', 'accept': 'application/yang.data+xml', 'authorization': 'Basic %s' % user_credsb64, 'cache-control': 'no-cache'}
-    response = requests.request("GET", url, headers= http_headers, verify=False)
+    # Use the pooled client and an HTTP get to retrieve all readable configuration elements. 
+    response = rc.get(path)
     # If the VLAN exists, will get a 200 response code. If not will get a 204 reponse code (No-Content)
     if(response.status_code == 200):
         return True
@@ -43,10 +45,9 @@ def check_interface_yang(HOST,USER,PASS,INTERFACEID):
     # Any number of additional checks could be made in place of admin down (Ex. OperStatus, TCAM Entries, etc).
     # Programatically this is an example of fields in the intf-items tree that can be looked at.
     
-    # Prep username and password as a B64 encoded ASCII string for use in the HTML header. Encoding and Decoding in the b64 module
-    # are needed to make the function interoperable between Python2 and Python3
-    user_creds = USER + ':' + PASS
-    user_credsb64 = base64.b64encode(bytes(user_creds.encode('utf_8'))).decode('ascii')
+    # Use the shared pooled RESTCONF client for this device. The connection and the authorization header are reused
+    # across the check and configure calls instead of being rebuilt for every request.
+    rc = restconf.client(HOST, USER, PASS)
 
     # Use Top Level XPath in the NX-OS-Device Yang model for tree retrieval. The syntax for the use of the YANG model
     # in NX is http(s)://HOST/restconf/data/<YANG MODEL>:XPath. The XPath is similar to the structure of a Netconf filter
@@ -55,13 +56,12 @@ def check_interface_yang(HOST,USER,PASS,INTERFACEID):
     # in the yang model and the ID field is in the "eth###/###" format for the designated interface. Its also important that the /
     # in the Eth intformation get changed to html escape characters so the correct XPath is used.
     INTERFACEID = INTERFACEID.replace("/", "%2F")
-    url = 'https://' + HOST + '/restconf/data/Cisco-NX-OS-device:System/intf-items/phys-items/PhysIf-list=' + INTERFACEID
+    path = 'intf-items/phys-items/PhysIf-list=' + INTERFACEID
 
-    # Build Headers and use an HTTP get to retrieve all readable configuration elements. NOTE the content type an accept is yang.data+json
-    http_headers = { 'content-type': 'application/yang.data+json', 'accept': 'application/yang.data+json', 'authorization': 'Basic %s' % user_credsb64, 'cache-control': 'no-cache'}
-    response = requests.request("GET", url, headers= http_headers, verify=False)
-    if(response.status_code == 200):
-        responsedata = response.json()
+    # Use the pooled client and an HTTP get to retrieve all readable configuration elements. The reply (XML or JSON,
+    # depending on the encoding of the client) is read into the same tree: {'PhysIf-list': [{'adminSt': ...}]}
+    responsedata = rc.read(path)
+    if(responsedata and responsedata.get('PhysIf-list')):
         if(responsedata['PhysIf-list'][0]['adminSt'] == "down"):
             return True
         else:
@@ -70,22 +70,17 @@ def check_interface_yang(HOST,USER,PASS,INTERFACEID):
         print("error unexpected result")
         return False
 
-def configure_interface_yang(HOST,USER,PASS,INTERFACEID,VLANID,DESC):
-    # This routine will connect to the RESTCONF interface of an NX device and configure a designated port. The designated
-    # port will also have its description edited (DESC), Be set in access mode <mode>, have an access vlan configured (VLANID), and
-    # have the relevent STP items configured such as spanning-tree port type edge [<mode>edge], and spanning-tree bpduguard enabled 
-    # [<bpduguard>enable]. The Programatically cool part here is we are combining disparate XPaths in the same rest call and bringing
-    # back the URL to the closest common denominator. In this case "System".
-    int_update = '''
+# Body of the configure_interface_yang PATCH, compiled once. The parameters are XML escaped when it is rendered.
+INTERFACE_TEMPLATE = template.compile('''
     <intf-items>
         <phys-items>
             <PhysIf-list>
-                <id>'''+ INTERFACEID +'''</id>
+                <id>{interface}</id>
                 <layer>Layer2</layer>
                 <mode>access</mode>
-                <accessVlan>vlan-'''+ str(VLANID) + '''</accessVlan>
+                <accessVlan>vlan-{vlan}</accessVlan>
                 <adminSt>up</adminSt>
-                <descr>''' + str(DESC) + '''</descr>
+                <descr>{descr}</descr>
             </PhysIf-list>
         </phys-items>
     </intf-items>
@@ -93,18 +88,25 @@ def configure_interface_yang(HOST,USER,PASS,INTERFACEID,VLANID,DESC):
         <inst-items>
             <if-items>
                 <If-list>
-                    <id>'''+ INTERFACEID +'''</id>
+                    <id>{interface}</id>
                     <mode>edge</mode>
                     <bpduguard>enable</bpduguard>
                 </If-list>
-            </if-items> 
+            </if-items>
         </inst-items>
-    </stp-items>'''
+    </stp-items>''')
 
-    # Prep username and password as a B64 encoded ASCII string for use in the HTML header. Encoding and Decoding in the b64 module
-    # are needed to make the function interoperable between Python2 and Python3
-    user_creds = USER + ':' + PASS
-    user_credsb64 = base64.b64encode(bytes(user_creds.encode('utf_8'))).decode('ascii')
+def configure_interface_yang(HOST,USER,PASS,INTERFACEID,VLANID,DESC):
+    # This routine will connect to the RESTCONF interface of an NX device and configure a designated port. The designated
+    # port will also have its description edited (DESC), Be set in access mode <mode>, have an access vlan configured (VLANID), and
+    # have the relevent STP items configured such as spanning-tree port type edge [<mode>edge], and spanning-tree bpduguard enabled 
+    # [<bpduguard>enable]. The Programatically cool part here is we are combining disparate XPaths in the same rest call and bringing
+    # back the URL to the closest common denominator. In this case "System".
+    int_update = INTERFACE_TEMPLATE.render_bytes(interface=INTERFACEID, vlan=VLANID, descr=DESC)
+
+    # Use the shared pooled RESTCONF client for this device. The connection and the authorization header are reused
+    # across the check and configure calls instead of being rebuilt for every request.
+    rc = restconf.client(HOST, USER, PASS)
 
     # Use Top Level XPath in the NX-OS-Device Yang model for tree retrieval. The syntax for the use of the YANG model
     # in NX is http(s)://HOST/restconf/data/<YANG MODEL>:XPath. The XPath is similar to the structure of a Netconf filter
@@ -112,11 +114,11 @@ def configure_interface_yang(HOST,USER,PASS,INTERFACEID,VLANID,DESC):
     # and where Key values are needed. Searching for specific interface details is an example of a Key where PhysIf-list= *ID 
     # in the yang model and the ID field is in the "eth###/###" format for the designated interface. Its also important that the /
     # in the Eth intformation get changed to html escape characters so the correct XPath is used.
-    url = 'https://' + HOST + '/restconf/data/Cisco-NX-OS-device:System'
+    path = ''
 
-    # Build Headers and use an HTTP PATCH to add/modify the STP info. NOTE: we are sending XML and acepting back JSON! 
-    http_headers = { 'content-type': 'application/yang.data+xml', 'accept': 'application/yang.data+json', 'authorization': 'Basic %s' % user_credsb64, 'cache-control': 'no-cache'}
-    response = requests.request("PATCH", url, headers= http_headers, data=int_update, verify=False)
+    # Use the pooled client and an HTTP PATCH to add/modify the STP info. With the JSON encoding the rendered XML is sent
+    # as the equivalent JSON document.
+    response = rc.patch(path, int_update)
     if(response.status_code == 201 or 204):
         print("Interface " + str(INTERFACEID) + " successfully configured for L2 on VLAN: " + str(VLANID) + ".")
     else:
@@ -135,6 +137,7 @@ def main():
     parser.add_argument('-V', '--VlanAssignment', type=str,  dest='VlanAssignment', help='Vlan-ID to be assigned to the interface (must be an already existing VLAN')
     parser.add_argument('-D', '--InterfaceDesc', type=str,  dest='InterfaceDesc', help='Interface Description')
     parser.add_argument('-F', '--Force', action='store_true', default=False, dest='Force', help='Force Interface Config - Even with an online port')
+    parser.add_argument('-E', '--Encoding', choices=['xml', 'json'], default='xml', dest='Encoding', help='RESTCONF encoding of the requests and replies (Default xml)')
     parser.add_argument('-d', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
     args = parser.parse_args()
     if(args.Debug):
@@ -155,6 +158,9 @@ def main():
         passwd = args.Password
     else:
         passwd = input("Please Enter the Password for NETCONF/XMLAGENT Device Access > ")
+
+    # Every request to the device goes out in the chosen encoding
+    restconf.set_encoding(ip, args.Encoding)
     
     if(args.Interface):
         interf = args.Interface
@@ -1,6 +1,10 @@
 #!/bin/env python3
 
-import argparse, requests, json, time, logging, base64
+import argparse, json, time, logging
+import sys, os
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import readiness, restconf, snapshot
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -11,36 +15,34 @@ __date__ = "2017-12-02"
 __email__ = "jproano@cisco.com"
 __status__ = "Beta"
 
-def show_run_all_yang(HOST, USER, PASS):
-    # This routine will sleep for 2 seconds to ensure any previous RESTCONF/XML sessions are cleaned up then will connect
+def show_run_all_yang(HOST, USER, PASS, COMPRESS=None, PRETTY=False):
+    # This routine will retry while the device answers busy to ensure any previous RESTCONF/XML sessions are cleaned up. It will connect
     # via the RESTCONF/YANG interface and retrieve the full yang modeled configuration of the Nexus Device. A file will be created
     # with the hostname-<year><month><day>-<hour><minute><second>.xml format and the running configuration will be saved to
     # that log file. This routing allows for human readable differences to be compared or retrived during routines for audit
     # purposes. IMPORTANT: The netcnfctrl service has to be started for this to work!!
-    time.sleep(2)
 
-    # Prep username and password as a B64 encoded ASCII string for use in the HTML header. Encoding and Decoding in the b64 module
-    # are needed to make the function interoperable between Python2 and Python3
-    user_creds = USER + ':' + PASS
-    user_credsb64 = base64.b64encode(bytes(user_creds.encode('utf_8'))).decode('ascii')
+    # Use the shared pooled RESTCONF client for this device. The authorization header is built once per client.
+    rc = restconf.client(HOST, USER, PASS)
 
     # Use Top Level XPath in the NX-OS-Device Yang model for tree retrieval. The syntax for the use of the YANG model
     # in NX is http(s)://HOST/restconf/data/<YANG MODEL>:XPath. The XPath is similar to the structure of a Netconf filter
     # but requires key values in certain containers and leafs for proper resolution. pyang can show the model in tree form
     # and where Key values are needed. 
-    url = 'https://' + HOST + '/restconf/data/Cisco-NX-OS-device:System/'
+    path = ''
  
-    # Build Headers and use an HTTP get to retrieve all readable configuration elements. 
-    http_headers = { 'content-type': 'application/yang.data+xml', 'accept': 'application/yang.data+xml', 'authorization': 'Basic %s' % user_credsb64, 'cache-control': 'no-cache'}
-    response = requests.request("GET", url, headers= http_headers, verify=False)
+    # Use the pooled client and an HTTP get to retrieve all readable configuration elements. stream=True leaves the body
+    # on the connection so it can be written to disk in chunks instead of being held in memory.
+    response = readiness.retry_busy(lambda: rc.get(path, stream=True), busy_result=readiness.http_busy)
 
-    # Save the RAW Config into a File derived from Host + TimeStamp of Run and save as log file type.
+    # Save the RAW Config into a File derived from Host + TimeStamp of Run and save as log file type. COMPRESS ('gz' or
+    # 'xz') compresses the file, the file only shows up once complete. PRETTY re-indents it after the download.
     timestr = time.strftime("%Y%m%d-%H%M%S")
     filename = HOST + "-" + timestr + ".xml"
-    file = open(filename,'w')
-    file.write(response.content.decode("ascii"))
-    file.close()
-    print("File saved to: " + filename) 
+    snap = snapshot.write_response(response, filename, COMPRESS)
+    if(PRETTY):
+        snapshot.pretty_print(snap.path)
+    print("File saved to: " + snap.path) 
     return()
 
 def main():
@@ -51,6 +53,8 @@ def main():
     parser.add_argument('-H', '--HostIP', type=str, dest='HostIP', help='IP Address of the Device')
     parser.add_argument('-U', '--Username', type=str,  dest='Username', help='Username for RESTCONF Access')
     parser.add_argument('-P', '--Password', type=str,  dest='Password', help='Password for RESTCONF Access')
+    parser.add_argument('-C', '--Compress', choices=['gz', 'xz'], dest='Compress', help='Compress the saved file with gzip or xz (Optional)')
+    parser.add_argument('-PP', '--PrettyPrint', action='store_true', default=False, dest='Pretty', help='Re-indent the saved XML after the download (Optional)')
     parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
     args = parser.parse_args()
     if(args.Debug):
@@ -72,7 +76,7 @@ def main():
     else:
         passwd = input("Please Enter the Password for RESTCONF Device Access > ")
     
-    show_run_all_yang(ip,user,passwd)
+    show_run_all_yang(ip,user,passwd,args.Compress,args.Pretty)
     return()
 
 if __name__ == "__main__":
@@ -1,6 +1,10 @@
 #!/bin/env python3
 
-import argparse, requests, json, time, logging, base64
+import argparse, json, time, logging
+import sys, os
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import changefile, restconf, template, usersync
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -11,26 +15,43 @@ __date__ = "2017-12-06"
 __email__ = "jproano@cisco.com"
 __status__ = "Beta"
 
+# Body of the create_user_yang PATCH, compiled once. The user name, password and role are XML escaped when it is
+# rendered.
+USER_TEMPLATE = template.compile('''
+    <User-list>
+        <name>{user}</name>
+        <pwd>{passwd}</pwd>
+        <pwdEncryptType>0</pwdEncryptType>
+        <userdomain-items>
+            <UserDomain-list>
+                <name>all</name>
+                <role-items>
+                    <UserRole-list>
+                        <name>{role}</name>
+                    </UserRole-list>
+                </role-items>
+            </UserDomain-list>
+        </userdomain-items>
+    </User-list>''')
+
 def check_user_yang(HOST, USER, PASS, NEWUSER):
     # This routine will connect to the RESTCONF interface and check the new user against the existing user information. If a user is
     # matched then we will expect data in the RPC reply. The Filter is configured so that only a matching user (CaSe SenSetive) will
     # be returned vs all users. 
 
-    # Prep username and password as a B64 encoded ASCII string for use in the HTML header. Encoding and Decoding in the b64 module
-    # are needed to make the function interoperable between Python2 and Python3
-    user_creds = USER + ':' + PASS
-    user_credsb64 = base64.b64encode(bytes(user_creds.encode('utf_8'))).decode('ascii')
+    # Use the shared pooled RESTCONF client for this device. The connection and the authorization header are reused
+    # across the check and configure calls instead of being rebuilt for every request.
+    rc = restconf.client(HOST, USER, PASS)
 
     # Use Top Level XPath in the NX-OS-Device Yang model for tree retrieval. The syntax for the use of the YANG model
     # in NX is http(s)://HOST/restconf/data/<YANG MODEL>:XPath. The XPath is similar to the structure of a Netconf filter
     # but requires key values in certain containers and leafs for proper resolution. pyang can show the model in tree form
     # and where Key values are needed. Searching for a VLAN is an example of a Key where User-List= *ID in the yang model.
     # and the ID field is in the "UserNaMe" string format for the designated vlan.
-    url = 'https://' + HOST + '/restconf/data/Cisco-NX-OS-device:System/userext-items/user-items/User-list=' + str(NEWUSER)
+    path = 'userext-items/user-items/User-list=' + str(NEWUSER)
 
-    # Build Headers and use an HTTP get to retrieve all readable configuration elements. 
-    http_headers = { 'content-type': 'application/yang.data+xml', 'accept': 'application/yang.data+xml', 'authorization': 'Basic %s' % user_credsb64, 'cache-control': 'no-cache'}
-    response = requests.request("GET", url, headers= http_headers, verify=False)
+    # Use the pooled client and an HTTP get to retrieve all readable configuration elements. 
+    response = rc.get(path)
     # If the person exists, will get a 200 response code. If not will get a 204 reponse code (No-Content). 
     if(response.status_code == 200):
         return False
@@ -43,21 +64,19 @@ def check_role_yang(HOST, USER, PASS, NEWROLE):
     # (CaSe SenSetive) will be returned. Since the role data is a pre-req to the creation of a user if no match is found the script will exit
     # from within this function. 
 
-    # Prep username and password as a B64 encoded ASCII string for use in the HTML header. Encoding and Decoding in the b64 module
-    # are needed to make the function interoperable between Python2 and Python3
-    user_creds = USER + ':' + PASS
-    user_credsb64 = base64.b64encode(bytes(user_creds.encode('utf_8'))).decode('ascii')
+    # Use the shared pooled RESTCONF client for this device. The connection and the authorization header are reused
+    # across the check and configure calls instead of being rebuilt for every request.
+    rc = restconf.client(HOST, USER, PASS)
 
     # Use Top Level XPath in the NX-OS-Device Yang model for tree retrieval. The syntax for the use of the YANG model
     # in NX is http(s)://HOST/restconf/data/<YANG MODEL>:XPath. The XPath is similar to the structure of a Netconf filter
     # but requires key values in certain containers and leafs for proper resolution. pyang can show the model in tree form
     # and where Key values are needed. Searching for a VLAN is an example of a Key where User-List= *ID in the yang model.
     # and the ID field is in the "UserNaMe" string format for the designated vlan.
-    url = 'https://' + HOST + '/restconf/data/Cisco-NX-OS-device:System/userext-items/role-items/Role-list=' + str(NEWROLE)
+    path = 'userext-items/role-items/Role-list=' + str(NEWROLE)
 
-    # Build Headers and use an HTTP get to retrieve all readable configuration elements. 
-    http_headers = { 'content-type': 'application/yang.data+xml', 'accept': 'application/yang.data+xml', 'authorization': 'Basic %s' % user_credsb64, 'cache-control': 'no-cache'}
-    response = requests.request("GET", url, headers= http_headers, verify=False)
+    # Use the pooled client and an HTTP get to retrieve all readable configuration elements. 
+    response = rc.get(path)
     # If the role exists, will get a 200 response code. If not will get a 204 reponse code (No-Content). 
     if(response.status_code == 200):
         return 
@@ -72,38 +91,21 @@ def create_user_yang(HOST, USER, PASS, NEWUSER, NEWPASSWD, NEWROLE):
     # goodjuju being the NEWPASSWORD variable and the network-admin being the NEWROLE variable. The pwdEncryptType being set to 0 is required
     # during existing user overwrites. 
 
-    # Prep username and password as a B64 encoded ASCII string for use in the HTML header. Encoding and Decoding in the b64 module
-    # are needed to make the function interoperable between Python2 and Python3
-    user_creds = USER + ':' + PASS
-    user_credsb64 = base64.b64encode(bytes(user_creds.encode('utf_8'))).decode('ascii')
+    # Use the shared pooled RESTCONF client for this device. The connection and the authorization header are reused
+    # across the check and configure calls instead of being rebuilt for every request.
+    rc = restconf.client(HOST, USER, PASS)
 
     # Use Top Level XPath in the NX-OS-Device Yang model for tree retrieval. The syntax for the use of the YANG model
     # in NX is http(s)://HOST/restconf/data/<YANG MODEL>:XPath. The XPath is similar to the structure of a Netconf filter
     # but requires key values in certain containers and leafs for proper resolution. pyang can show the model in tree form
     # and where Key values are needed. Searching for a VLAN is an example of a Key where User-List= *ID in the yang model.
     # and the ID field is in the "UserNaMe" string format for the designated vlan.
-    url = 'https://' + HOST + '/restconf/data/Cisco-NX-OS-device:System/userext-items/user-items'
+    path = 'userext-items/user-items'
 
-    user_create = '''
-    <User-list>
-        <name>''' + NEWUSER + '''</name>
-        <pwd>''' + NEWPASSWD + '''</pwd>
-        <pwdEncryptType>0</pwdEncryptType>
-        <userdomain-items>
-            <UserDomain-list>
-                <name>all</name>
-                <role-items>
-                    <UserRole-list>
-                        <name>''' + NEWROLE + '''</name>
-                    </UserRole-list>
-                </role-items>
-            </UserDomain-list>
-        </userdomain-items>
-    </User-list>'''
+    user_create = USER_TEMPLATE.render_bytes(user=NEWUSER, passwd=NEWPASSWD, role=NEWROLE)
 
-    # Build Headers and use an HTTP get to retrieve all readable configuration elements. 
-    http_headers = { 'content-type': 'application/yang.data+xml', 'accept': 'application/yang.data+xml', 'authorization': 'Basic %s' % user_credsb64, 'cache-control': 'no-cache'}
-    response = requests.request("PATCH", url, headers= http_headers, data=user_create, verify=False)
+    # Use the pooled client and an HTTP PATCH to create/modify the user. 
+    response = rc.patch(path, user_create)
     # If the user patch operation is successful will get a 204 response code.
     if(response.status_code == 204):
         print("User " + NEWUSER + " successfully created/modified.")
@@ -112,6 +114,26 @@ def create_user_yang(HOST, USER, PASS, NEWUSER, NEWPASSWD, NEWROLE):
         print("Something went wrong.. DOH!")
         return
 
+def sync_users_yang(HOST, USER, PASS, USERFILE, PRUNE=False, ROTATE=False):
+    # This routine brings the users of the device in line with a user file (name,password,roles rows) instead of one user per run.
+    # One GET of userext-items reads every user with its roles and every role, the difference is worked out locally and every add,
+    # role change and password goes out in a single PATCH. A PATCH can only merge, so dropped roles and (with PRUNE) users the file
+    # does not list are removed with one DELETE each. The login user and admin are never removed. ROTATE sets the password from the
+    # file on existing users as well.
+    try:
+        desired = usersync.load_users(USERFILE)
+    except changefile.ChangeFileError as e:
+        exit("User file " + USERFILE + " has errors, no changes made:\n" + str(e))
+    rc = restconf.client(HOST, USER, PASS)
+    users, roles = usersync.fetch_accounts_restconf(rc)
+    try:
+        user_plan = usersync.plan(desired, users, roles, PRUNE, [USER], ROTATE)
+    except ValueError as e:
+        exit(str(e) + "\nExiting without changes.")
+    requests_sent = usersync.apply_restconf(rc, user_plan)
+    print(HOST + ": " + user_plan.summary() + " (" + str(requests_sent) + " request(s))")
+    return()
+
 def main():
     # Setup Arguments to be processed at runtime. This will prevent any stagnant settings 
     # Example syntax for runtime "python3 NXOS-restconf-yang-usercreate.py -H 10.1.1.1 -U admin -P password -NU newusername -NP newpassword -NR Role -F"
@@ -123,8 +145,12 @@ def main():
     parser.add_argument('-NU', '--NewUsername', type=str,  dest='NewUsername', help='New Username Desired')
     parser.add_argument('-NP', '--NewPassword', type=str,  dest='NewPassword', help='New Password')
     parser.add_argument('-NR', '--NewRole', type=str,  dest='NewRole', help='Role for New user ex: network-admin')
+    parser.add_argument('-E', '--Encoding', choices=['xml', 'json'], default='xml', dest='Encoding', help='RESTCONF encoding of the requests and replies (Default xml)')
     parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
     parser.add_argument('-F', '--Force', action='store_true', default=False, dest='Force', help='Force User Config over an Existing User')
+    parser.add_argument('-S', '--SyncFile', type=str, dest='SyncFile', help='Sync the users of the device with this CSV/JSON user file (name,password,roles) instead of creating one user')
+    parser.add_argument('-X', '--Prune', action='store_true', default=False, dest='Prune', help='With --SyncFile remove users the file does not list')
+    parser.add_argument('-R', '--RotatePasswords', action='store_true', default=False, dest='RotatePasswords', help='With --SyncFile set the password from the file on existing users as well')
     args = parser.parse_args()
     if(args.Debug):
         print("Debug Mode On")
@@ -144,7 +170,15 @@ def main():
         passwd = args.Password
     else:
         passwd = input("Please Enter the Password for NETCONF/XMLAGENT Device Access > ")
+
+    # Every request to the device goes out in the chosen encoding
+    restconf.set_encoding(ip, args.Encoding)
     
+    if(args.SyncFile):
+        # Sync mode, the whole user file in one pass instead of the single user checks below
+        sync_users_yang(ip,user,passwd,args.SyncFile,args.Prune,args.RotatePasswords)
+        return()
+
     if(args.NewUsername):
         newuser = args.NewUsername
     else:
@@ -1,6 +1,10 @@
 #!/bin/env python3
 
-import argparse, requests, json, time, logging, base64
+import argparse, json, time, logging
+import sys, os
+# Make the shared nexusprog package at the root of the repository importable when run as a script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from nexusprog import restconf, statecache, vlanbulk, vlanset
 # Fix input vs raw_input between Python 2.x and 3.x
 try: input = raw_input
 except NameError: pass
@@ -11,84 +15,57 @@ __date__ = "2017-12-02"
 __email__ = "jproano@cisco.com"
 __status__ = "Beta"
 
-def check_vlan_yang(HOST, USER, PASS, NEWVLAN):
-    # This routine will connect via the RESTCONF interface and query the VLANs for a match against the VLAN ID to
-    # be created. If the VLAN ID already exists we will return a false to the main routine. If the VLAN doesnt exist
-    # a True value will be returned. 
+# VLANs read by check_vlan_yang, kept per device so configure_vlan_yang (and further checks from the fleet runner) do
+# not read them again. configure_vlan_yang drops the VLANs of the device it changed.
+STATE_CACHE = statecache.StateCache()
 
-    # Prep username and password as a B64 encoded ASCII string for use in the HTML header. Encoding and Decoding in the b64 module
-    # are needed to make the function interoperable between Python2 and Python3
-    user_creds = USER + ':' + PASS
-    user_credsb64 = base64.b64encode(bytes(user_creds.encode('utf_8'))).decode('ascii')
+def existing_vlans(HOST, USER, PASS):
+    # Use the shared pooled RESTCONF client for this device. The connection and the authorization header are reused
+    # across the check and configure calls instead of being rebuilt for every request.
+    rc = restconf.client(HOST, USER, PASS)
 
     # Use Top Level XPath in the NX-OS-Device Yang model for tree retrieval. The syntax for the use of the YANG model
     # in NX is http(s)://HOST/restconf/data/<YANG MODEL>:XPath. The XPath is similar to the structure of a Netconf filter
     # but requires key values in certain containers and leafs for proper resolution. pyang can show the model in tree form
-    # and where Key values are needed. Searching for a VLAN is an example of a Key where BD-list= *ID in the yang model.
-    # and the ID field is in the "vlan-###" format for the designated vlan.
-    url = 'https://' + HOST + '/restconf/data/Cisco-NX-OS-device:System/bd-items/bd-items/BD-list=vlan-' + str(NEWVLAN)
+    # and where Key values are needed. A single VLAN could be read as bd-items/bd-items/BD-list=vlan-###, for a range
+    # the whole bd-items list is read once and the fabEncap (vlan-###) of every entry is kept.
+    vlans = STATE_CACHE.get(HOST, statecache.VLANS, lambda: vlanbulk.existing_restconf(rc).names())
+    return vlanset.VlanSet.of(vlans)
 
-    # Build Headers and use an HTTP get to retrieve all readable configuration elements. 
-    http_headers = { 'content-type': 'application/yang.data+xml', 'accept': 'application/yang.data+xml', 'authorization': 'Basic %s' % user_credsb64, 'cache-control': 'no-cache'}
-    response = requests.request("GET", url, headers= http_headers, verify=False)
-    # If the VLAN exists, will get a 200 response code. If not will get a 204 reponse code (No-Content)
-    if(response.status_code == 200):
-        return False
-    else:
-        return True
-        
+def check_vlan_yang(HOST, USER, PASS, NEWVLAN):
+    # This routine will connect via the RESTCONF interface and query the VLANs for a match against the VLAN ID to
+    # be created. If the VLAN ID already exists we will return a false to the main routine. If the VLAN doesnt exist
+    # a True value will be returned. NEWVLAN may be a range ("100-199,300"), True is returned while at least one VLAN
+    # of it is missing.
+    return(not vlanset.parse(str(NEWVLAN)).issubset(existing_vlans(HOST, USER, PASS)))
 
-def configure_vlan_yang(HOST, USER, PASS, NEWVLAN, NEWVLNAME, VNI, STPPRI):
-    # This routine will connect to the RESTCONF interface and configure the new vlan based on the credentials provided. If a vlan was matched
-    # its assumed we should not arrive at this point. 
+def configure_vlan_yang(HOST, USER, PASS, NEWVLAN, NEWVLNAME, VNI, STPPRI, VNIOFFSET=None, CHUNKBYTES=vlanbulk.DEFAULT_CHUNK_BYTES):
+    # This routine will connect to the RESTCONF interface and configure the new vlans based on the credentials provided. VLANs
+    # that already exist are left as they are.
     # The following characteristics will be set by this filter. vlanID number, vlan name, vnsegmentID (for VXLAN), and the STP priority for 
     # the vlan. This is effecivly the same command set as "vlan xx; (in vlan config) name some_name ; vn-segment xxxx ; 
     # (Back at global) ; spanning-tree vlan xx priorit xxxx".
+    # NEWVLAN may be a range ("100-199,300"). NEWVLNAME may then be a template ("TENANT1-{vlan}") and VNIOFFSET gives
+    # every VLAN the vn-segment VNIOFFSET + VLAN ID.
+    vlans = vlanset.parse(str(NEWVLAN))
+    entries = vlanbulk.plan(vlans, existing_vlans(HOST, USER, PASS), NEWVLNAME, VNI, VNIOFFSET, STPPRI)
+    created = vlanset.VlanSet.of(entry.vlan for entry in entries)
+    if(vlans - created):
+        print("VLAN(s) " + str(vlans - created) + " already exist - No Changes made to them.")
+    if(not entries):
+        return()
 
-    # Prep username and password as a B64 encoded ASCII string for use in the HTML header. Encoding and Decoding in the b64 module
-    # are needed to make the function interoperable between Python2 and Python3
-    user_creds = USER + ':' + PASS
-    user_credsb64 = base64.b64encode(bytes(user_creds.encode('utf_8'))).decode('ascii')
-
-    vlan_update_body = '<BD-list>\n\t<fabEncap>vlan-' + str(NEWVLAN) + '</fabEncap>\n\t'
-    if(NEWVLNAME):
-        vlan_update_body = vlan_update_body + '<name>' + str(NEWVLNAME) + '</name>\n\t'
-    if(VNI):
-        vlan_update_body = vlan_update_body + '<accEncap>vxlan-' + str(VNI) + '</accEncap>\n\t'
-    vlan_update_body = vlan_update_body + '<mode>CE</mode>\n</BD-list>'
+    # Use the shared pooled RESTCONF client for this device. The connection and the authorization header are reused
+    # across the check and configure calls instead of being rebuilt for every request.
+    rc = restconf.client(HOST, USER, PASS)
 
-    # Use Top Level XPath in the NX-OS-Device Yang model for tree retrieval. The syntax for the use of the YANG model
-    # in NX is http(s)://HOST/restconf/data/<YANG MODEL>:XPath. The XPath is similar to the structure of a Netconf filter
-    # but requires key values in certain containers and leafs for proper resolution. pyang can show the model in tree form
-    # and where Key values are needed. Searching for a VLAN is an example of a Key where BD-list= *ID in the yang model.
-    # and the ID field is in the "vlan-###" format for the designated vlan.
-    url = 'https://' + HOST + '/restconf/data/Cisco-NX-OS-device:System/bd-items/bd-items'
-    
-    # Build Headers and use an HTTP PATCH to add the vlan. 
-    http_headers = { 'content-type': 'application/yang.data+xml', 'accept': 'application/yang.data+xml', 'authorization': 'Basic %s' % user_credsb64, 'cache-control': 'no-cache'}
-    response = requests.request("PATCH", url, headers= http_headers, data=vlan_update_body, verify=False)
-    
-    # If the VLAN is created, will get a 201 response code, added a 204 reponse code (No-Content) in case the VLAN is modified.
-    if(response.status_code == 201 or 204):
-        print("Vlan " + str(NEWVLAN) + " created/modified.")
-    else:
-        print("Error recieved code: " + str(response.status_code) + "from server. Unexpected.")
-    
-    # Second call is to update the STP info. This could concivably be combined with the VLAN method and placed into a higher XPath
-    # programatically it was desired to show additional XPath examples. 
-    if(STPPRI):
-        stp_update_body = '<Vlan-list>\n\t<id>' + str(NEWVLAN) + '</id>\n\t<priority>' + str(STPPRI) + '</priority>\n</Vlan-list>'
-        url = 'https://' + HOST + '/restconf/data/Cisco-NX-OS-device:System/stp-items/inst-items/vlan-items'
-        
-        # Build Headers and use an HTTP PATCH to add/modify the STP info. 
-        http_headers = { 'content-type': 'application/yang.data+xml', 'accept': 'application/yang.data+xml', 'authorization': 'Basic %s' % user_credsb64, 'cache-control': 'no-cache'}
-        response = requests.request("PATCH", url, headers= http_headers, data=stp_update_body, verify=False)
-        
-        # If the STP content is modified then we should expect a 204 no content response.. added 201 just in case.
-        if(response.status_code == 201 or 204):
-            print("STP for VLAN" + str(NEWVLAN) + " modified.")
-        else:
-            print("Error recieved code: " + str(response.status_code) + "from server. Unexpected.")
+    # The BD-list entries and the STP Vlan-list entries of all new VLANs are combined into one body and PATCHed at the
+    # top of the System tree (bd-items and stp-items both sit below it), split in CHUNKBYTES sized bodies for very large
+    # ranges. If the VLANs are created, will get a 201 response code, or a 204 reponse code (No-Content) in case they
+    # are modified. Any error code raises an exception.
+    requests_sent = vlanbulk.create_restconf(rc, entries, CHUNKBYTES)
+    STATE_CACHE.invalidate(HOST, [statecache.VLANS])
+    print("Vlan(s) " + str(created) + " created/modified in " + str(requests_sent) + " request(s).")
     return()
 
 def main():
@@ -99,11 +76,14 @@ def main():
     parser.add_argument('-H', '--HostIP', type=str, dest='HostIP', help='IP Address of the Device')
     parser.add_argument('-U', '--Username', type=str,  dest='Username', help='Username for RESTCONF Access')
     parser.add_argument('-P', '--Password', type=str,  dest='Password', help='Password for RESTCONF Access')
-    parser.add_argument('-NV', '--NewVlan', type=str,  dest='NewVlan', help='New VLAN ID Desired')
-    parser.add_argument('-NN', '--NewVlanName', type=str,  dest='NewVlanName', help='Vlan Name for the New ID (Optional, Use NI mode to avoid prompt)')
+    parser.add_argument('-NV', '--NewVlan', type=str,  dest='NewVlan', help='New VLAN ID Desired, or a range of them Ex. 100-199,300')
+    parser.add_argument('-NN', '--NewVlanName', type=str,  dest='NewVlanName', help='Vlan Name for the New ID, {vlan} and {index} are replaced per VLAN Ex. TENANT1-{vlan} (Optional, Use NI mode to avoid prompt)')
     parser.add_argument('-VN', '--VNSegmentID', type=str,  dest='VxlanVNID', help='Overlay vn-segment ID (Optional, Use NI mode to avoid prompt)')
+    parser.add_argument('-VO', '--VNIOffset', type=str,  dest='VniOffset', help='vn-segment ID of every VLAN is this offset plus the VLAN ID, for ranges (Optional, Use NI mode to avoid prompt)')
     parser.add_argument('-SP', '--STPPriority', type=str,  dest='StpPri', help='Spanning Tree Priority (Optional, Use NI mode to avoid prompt)')
+    parser.add_argument('-CB', '--ChunkKB', type=int, default=vlanbulk.DEFAULT_CHUNK_BYTES // 1024, dest='ChunkKB', help='Split the request for large ranges in requests of at most this many KB (Default 128)')
     parser.add_argument('-NI', '--NonInteractive', action='store_false', default=True, dest='NonInteractive', help='Enable Non-Interactive Mode. Dont Prompt for Optional Input')
+    parser.add_argument('-E', '--Encoding', choices=['xml', 'json'], default='xml', dest='Encoding', help='RESTCONF encoding of the requests and replies (Default xml)')
     parser.add_argument('-D', '--Debug', action='store_true', default=False, dest='Debug', help='Enable Debugging')
     args = parser.parse_args()
     if(args.Debug):
@@ -124,11 +104,18 @@ def main():
         passwd = args.Password
     else:
         passwd = input("Please Enter the Password for RESTCONF Device Access > ")
+
+    # Every request to the device goes out in the chosen encoding
+    restconf.set_encoding(ip, args.Encoding)
     
     if(args.NewVlan):
         newvlan = args.NewVlan
     else:
         newvlan = input("Please Enter the New VlanID for creation > ")
+    try:
+        vlans = vlanset.parse(newvlan)
+    except ValueError as e:
+        sys.exit("VLAN ID " + str(newvlan) + " is not valid: " + str(e))
     # Check for Non-Interactive Flag. That will determin to ask for input in the absense of additional
     # input or just set optional variables to None for processing te subsequent functions. 
     if(args.NonInteractive):
@@ -137,8 +124,14 @@ def main():
         else:
             newvlanname = input("Please Enter the New VLAN Name for creation (Enter for none) > ")
     
+        # A range of VLANs gets its vn-segments from an offset, a single VLAN its vn-segment ID
+        newvnioffset = args.VniOffset
         if(args.VxlanVNID):
             newvnid = args.VxlanVNID
+        elif(len(vlans) > 1):
+            newvnid = None
+            if(not newvnioffset):
+                newvnioffset = input("If an VXLAN overlay Please Enter the VNID offset, VNID = offset + VLAN ID (Or enter for none which will default to CE mode > ")
         else:
             newvnid = input("If an VXLAN overlay Please Enter the desired VNID (Or enter for none which will default to CE mode > ")
         
@@ -156,14 +149,19 @@ def main():
             newvnid = args.VxlanVNID
         else:
             newvnid = None
+        newvnioffset = args.VniOffset
         
         if(args.StpPri):
             stppri = args.StpPri
         else:
             stppri = None
     # The routine check VLAN should return True if no conflict exists or false if there already is a VLAN with that ID
+    # (for a range, if every VLAN of it exists already). The existing VLANs are read once and reused by configure.
     if(check_vlan_yang(ip,user,passwd,newvlan)):
-        configure_vlan_yang(ip,user,passwd,newvlan,newvlanname,newvnid,stppri)
+        try:
+            configure_vlan_yang(ip,user,passwd,newvlan,newvlanname,newvnid,stppri,newvnioffset,args.ChunkKB * 1024)
+        except ValueError as e:
+            sys.exit(str(e) + " - No Changes made.")
     else:
         print('VLAN Already Exists - No Changes made.')
     return()
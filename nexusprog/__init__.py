@@ -0,0 +1,6 @@
+# Shared building blocks for the Nexus Programmability scripts. The scripts under Netconf/, Restconf/ and the other
+# top level folders stay runnable on their own; anything that more than one of them needs (session handling, wait
+# logic, clients, parsers) lives in this package so it is written once. Nothing heavy is imported here on purpose,
+# each module pulls in ncclient/requests/lxml only when it is actually used.
+
+__version__ = "0.1"
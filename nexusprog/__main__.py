@@ -0,0 +1,6 @@
+# python3 -m nexusprog <command> ..., see nexusprog/cli.py
+
+import sys
+from nexusprog import cli
+
+sys.exit(cli.main())
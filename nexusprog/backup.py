@@ -0,0 +1,89 @@
+# Configuration backup of one device over any of the four interfaces the backup snippets use. The fetch functions do
+# the same calls as show_run_all_human / show_run_all_yang and the /ins snippet, but take a timeout and stream the
+# configuration into the snapshot writer they are given, so a fleet backup can run them in parallel and count what
+# was fetched:
+#   - xmlagent : "show running-config" over the XML Agent (port 22), human readable
+#   - netconf  : get of the System tree over NETCONF (port 830), YANG XML
+#   - restconf : GET of the System tree over RESTCONF, YANG XML
+#   - nxapi    : "show running-config" over NX-API /ins, human readable
+# ncclient and requests are imported by the fetch functions that use them, a RESTCONF backup never loads ncclient and
+# an XML Agent backup never loads requests.
+
+import os, time
+from lxml import etree
+from nexusprog import nxapi, readiness, snapshot, xmlstream
+
+TRANSPORTS = ('xmlagent', 'netconf', 'restconf', 'nxapi')
+EXTENSIONS = {'xmlagent': '.log', 'netconf': '.xml', 'restconf': '.xml', 'nxapi': '.log'}
+
+SYSTEM_FILTER = '''
+<System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device">
+</System>'''
+
+
+def _connect(host, user, passwd, port, subsystem, timeout):
+    from ncclient import manager
+    device = manager.connect(host=host, port=port, username=user, password=passwd, timeout=timeout, hostkey_verify=False,
+                             device_params={'name': 'nexus', "ssh_subsystem_name": subsystem}, look_for_keys=False, allow_agent=False)
+    # Applies to every RPC on the session, a device that stops answering fails after timeout instead of hanging the run
+    device.timeout = timeout
+    return device
+
+
+def fetch_xmlagent(host, user, passwd, out, timeout=60, all_defaults=False):
+    command = 'show running-config all' if all_defaults else 'show running-config'
+    with _connect(host, user, passwd, 22, "xmlagent", timeout) as device:
+        readiness.settle(device)
+        res = device.exec_command({command})
+        xmlstream.write_data_text(res.xml, out)
+
+
+def fetch_netconf(host, user, passwd, out, timeout=60, all_defaults=False):
+    with _connect(host, user, passwd, 830, "netconf", timeout) as device:
+        res = readiness.retry_busy(lambda: device.get(('subtree', SYSTEM_FILTER)), timeout=timeout)
+        etree.ElementTree(res.data_ele).write(out, encoding='utf-8')
+
+
+def fetch_restconf(host, user, passwd, out, timeout=60, all_defaults=False):
+    from nexusprog import restconf
+    rc = restconf.client(host, user, passwd, timeout=timeout)
+    response = readiness.retry_busy(lambda: rc.get('', stream=True), timeout=timeout, busy_result=readiness.http_busy)
+    response.raise_for_status()
+    for chunk in response.iter_content(chunk_size=snapshot.CHUNK_SIZE):
+        out.write(chunk)
+
+
+def fetch_nxapi(host, user, passwd, out, timeout=60, all_defaults=False):
+    # The configuration is a string inside the JSON-RPC reply, so this one has to be parsed as a whole
+    from nexusprog import restconf
+    rc = restconf.client(host, user, passwd, timeout=timeout)
+    command = 'show running-config all' if all_defaults else 'show running-config'
+    out.write(nxapi.run_one(rc, command, timeout=timeout))
+
+
+FETCHERS = {'xmlagent': fetch_xmlagent, 'netconf': fetch_netconf, 'restconf': fetch_restconf, 'nxapi': fetch_nxapi}
+
+
+def backup_filename(host, transport, directory='.', timestr=None):
+    # Same hostname-<year><month><day>-<hour><minute><second> naming as the single device snippets.
+    if timestr is None:
+        timestr = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directory, host + "-" + timestr + EXTENSIONS[transport])
+
+
+def backup_device(host, user, passwd, transport='xmlagent', directory='.', timeout=60, all_defaults=False, compress=None, pretty=False, store=None):
+    # Fetch the configuration of one device and stream it into a snapshot file (compressed with compress 'gz' or 'xz').
+    # The XML transports can be re-indented with pretty, after the pull. With a BackupStore (or a ConfigHistory) in
+    # store the backup goes into the store instead, where only content it does not hold yet takes space. Returns a dict with the file name
+    # (or store reference), the bytes of configuration fetched and the bytes stored on disk.
+    if store is not None:
+        with store.writer(host, label=transport) as writer:
+            FETCHERS[transport](host, user, passwd, writer, timeout, all_defaults)
+        return {'file': writer.path, 'bytes': writer.bytes_written, 'stored': writer.bytes_stored}
+    filename = backup_filename(host, transport, directory)
+    with snapshot.SnapshotWriter(filename, compress) as writer:
+        FETCHERS[transport](host, user, passwd, writer, timeout, all_defaults)
+    stored = writer.bytes_stored
+    if pretty and EXTENSIONS[transport] == '.xml':
+        stored = snapshot.pretty_print(writer.path).bytes_stored
+    return {'file': writer.path, 'bytes': writer.bytes_written, 'stored': stored}
@@ -0,0 +1,84 @@
+# Change files for bulk port provisioning. One row per port, either as CSV with a header line
+#
+#   host,interface,vlan,description
+#   10.1.1.1,eth1/1,22,Server A
+#
+# or as JSON, a list of objects with the same fields. The description is optional. load_ports() checks every row before
+# anything is sent (known columns, a valid VLAN id, no interface listed twice for a device) and reports all bad rows at
+# once, by_host() groups the rows so every device is worked on once with all of its ports.
+
+import collections, csv, io, json
+from nexusprog import vlanset
+
+PortChange = collections.namedtuple('PortChange', 'host interface vlan description')
+
+FIELDS = ('host', 'interface', 'vlan', 'description')
+REQUIRED = ('host', 'interface', 'vlan')
+
+
+class ChangeFileError(ValueError):
+    # Every problem found in the file, one "row N: reason" line each
+    def __init__(self, problems):
+        ValueError.__init__(self, '\n'.join(problems))
+        self.problems = problems
+
+
+def records(text, filename='', key='ports'):
+    # (row number, dict) of every row. Row numbers are file lines for CSV (header is line 1) and list positions
+    # counted from 1 for JSON.
+    if filename.lower().endswith('.json') or text.lstrip()[:1] in ('[', '{'):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            # {"ports": [...]} (or whatever key names the rows) is accepted as well
+            data = data.get(key, [])
+        return [(number, record) for number, record in enumerate(data, 1)]
+    reader = csv.DictReader(io.StringIO(text))
+    reader.fieldnames = [(name or '').strip().lower() for name in (reader.fieldnames or [])]
+    return [(reader.line_num, record) for record in reader]
+
+
+def parse_ports(text, filename=''):
+    problems = []
+    ports = []
+    seen = set()
+    for number, record in records(text, filename):
+        if not isinstance(record, dict):
+            problems.append('row %d: not an object with %s' % (number, ', '.join(FIELDS)))
+            continue
+        record = dict((str(key).strip().lower(), '' if value is None else str(value).strip()) for key, value in record.items() if key is not None)
+        unknown = [key for key in record if key not in FIELDS]
+        if unknown:
+            problems.append('row %d: unknown column(s) %s' % (number, ', '.join(sorted(unknown))))
+            continue
+        missing = [field for field in REQUIRED if not record.get(field)]
+        if missing:
+            problems.append('row %d: %s missing' % (number, ', '.join(missing)))
+            continue
+        try:
+            vlan = vlanset.vlan_id(record['vlan'])
+        except ValueError as e:
+            problems.append('row %d: %s' % (number, e))
+            continue
+        key = (record['host'], record['interface'].lower())
+        if key in seen:
+            problems.append('row %d: %s is listed more than once for %s' % (number, record['interface'], record['host']))
+            continue
+        seen.add(key)
+        ports.append(PortChange(record['host'], record['interface'], vlan, record.get('description') or None))
+    if problems:
+        raise ChangeFileError(problems)
+    return ports
+
+
+def load_ports(filename):
+    # PortChange rows of a CSV or JSON change file, raises ChangeFileError listing every bad row
+    with open(filename) as handle:
+        return parse_ports(handle.read(), filename)
+
+
+def by_host(ports):
+    # host -> [PortChange, ...] in the order the hosts first appear in the file
+    hosts = collections.OrderedDict()
+    for port in ports:
+        hosts.setdefault(port.host, []).append(port)
+    return hosts
@@ -0,0 +1,267 @@
+# One command line for the single device scripts: python3 -m nexusprog <command> ... The scripts under Netconf/ and
+# Restconf/ have dashes in their names so they can not be imported, and each of them parses its own arguments, asks
+# for what is missing and imports ncclient, requests and lxml at the top whether the run needs them or not. A cron job
+# calling them thousands of times pays that import time on every call. The commands below share one parser and one
+# set of prompts, and this module imports nothing but argparse and the script loader. The function of a command
+# imports the script or the nexusprog module it calls once the command is known, and with it only the libraries of
+# the transport the run uses: "vlan -T restconf" never loads ncclient, "save" over the XML Agent never loads requests
+# and --help loads neither.
+# The commands call the functions of the scripts, so they behave like the scripts do:
+#   backup - running configuration over xmlagent, netconf, restconf or nxapi (nexusprog.backup)
+#   vlan   - check_vlan_yang / configure_vlan_yang of the vlancreate snippets
+#   user   - one user of the usercreate snippets, or a sync of the users of a user file
+#   port   - access port or trunk edge port workflow of the provisioning scripts
+#   vxlan  - feature check/enable, underlay and leaf bring-up of the VXLAN EVPN leaf script
+#   save   - copy running-config startup-config over the XML Agent or NX-API
+#
+#   python3 -m nexusprog vlan -H 10.1.1.1 -U admin -P password -T restconf -NV 100-199 -NN TENANT1-{vlan}
+
+import argparse, json, os, sys, time
+from nexusprog import scripts
+
+# Same as nexusprog.backup.TRANSPORTS, written out so the parser does not import the backup code
+BACKUP_TRANSPORTS = ('xmlagent', 'netconf', 'restconf', 'nxapi')
+TRANSPORTS = ('netconf', 'restconf')
+
+
+def ask(value, prompt):
+    # Value given on the command line, otherwise typed in
+    if value:
+        return value
+    return input(prompt + " > ")
+
+
+def transport_script(args, netconf_script, restconf_script):
+    # Script of the transport of the run. The RESTCONF client of the device gets the encoding of the run first.
+    if args.Transport == 'restconf':
+        from nexusprog import restconf
+        restconf.set_encoding(args.HostIP, args.Encoding)
+        return scripts.load(restconf_script)
+    return scripts.load(netconf_script)
+
+
+def cmd_backup(args):
+    from nexusprog import backup
+    store = None
+    if args.Store:
+        from nexusprog.store import BackupStore
+        store = BackupStore(args.Store)
+    elif not os.path.isdir(args.Directory):
+        os.makedirs(args.Directory)
+    result = backup.backup_device(args.HostIP, args.Username, args.Password, args.Transport, args.Directory, args.Timeout,
+                                  args.All, args.Compress, args.Pretty, store)
+    print("Configuration backed up to " + result['file'] + " (" + str(result['bytes']) + " bytes)")
+
+
+def cmd_vlan(args):
+    from nexusprog import vlanbulk, vlanset
+    try:
+        vlanset.parse(args.NewVlan)
+    except ValueError as e:
+        sys.exit("VLAN ID " + str(args.NewVlan) + " is not valid: " + str(e))
+    snippet = transport_script(args, scripts.NETCONF_VLAN, scripts.RESTCONF_VLAN)
+    if not snippet.check_vlan_yang(args.HostIP, args.Username, args.Password, args.NewVlan):
+        print('VLAN Already Exists - No Changes made.')
+        return
+    try:
+        snippet.configure_vlan_yang(args.HostIP, args.Username, args.Password, args.NewVlan, args.NewVlanName, args.VxlanVNID,
+                                    args.StpPri, args.VniOffset, args.ChunkKB * 1024 if args.ChunkKB else vlanbulk.DEFAULT_CHUNK_BYTES)
+    except ValueError as e:
+        sys.exit(str(e) + " - No Changes made.")
+    if args.Save:
+        cmd_save(args)
+
+
+def cmd_user(args):
+    snippet = transport_script(args, scripts.NETCONF_USER, scripts.RESTCONF_USER)
+    if args.SyncFile:
+        snippet.sync_users_yang(args.HostIP, args.Username, args.Password, args.SyncFile, args.Prune, args.RotatePasswords)
+        return
+    newuser = ask(args.NewUsername, "Please Enter the New Username for creation")
+    newpasswd = ask(args.NewPassword, "Please Enter the New Password for creation")
+    newrole = ask(args.NewRole, "Please Enter the New Role for creation")
+    snippet.check_role_yang(args.HostIP, args.Username, args.Password, newrole)
+    if snippet.check_user_yang(args.HostIP, args.Username, args.Password, newuser) or args.Force:
+        snippet.create_user_yang(args.HostIP, args.Username, args.Password, newuser, newpasswd, newrole)
+    else:
+        print("Duplicate User - No Changes Made. Use the Force switch -F if you want to override the user info.")
+
+
+def cmd_port(args):
+    from nexusprog import statecache
+    from nexusprog.session import NxSession
+    prov = scripts.load(scripts.ACCESS_PORT if args.Mode == 'access' else scripts.TRUNKEDGE_PORT)
+    if args.Store:
+        from nexusprog.store import BackupStore
+        prov.BACKUP_STORE = BackupStore(args.Store)
+    cache = statecache.StateCache(args.Cache) if args.Cache else None
+    run_start = time.time()
+    with NxSession(args.HostIP, args.Username, args.Password, debug=args.Debug, cache=cache, probe=bool(args.Cache)) as session:
+        prov.nx_config_precheck(session, args.Interface, args.InterfaceVLAN, args.Debug)
+        prov.nx_config_backup_pre(session, args.Debug)
+        pre_yang = prov.nx_config_rollback_capture(session, args.Interface, args.Debug)
+        try:
+            prov.nx_config_accessport(session, args.Interface, args.InterfaceVLAN, args.Debug)
+        except Exception as e:
+            print("Configuration change failed: " + str(e))
+            prov.nx_config_rollback(session, args.Interface, pre_yang, args.Debug)
+            raise
+        prov.nx_config_wrme(session, args.Debug)
+        prov.nx_config_backup_post(session, args.Debug)
+    print("Run completed in %.1fs using %d connection(s)" % (time.time() - run_start, session.connects))
+
+
+def cmd_vxlan(args):
+    from nexusprog import yangxml
+    from nexusprog.session import NxSession
+    leaf = scripts.load(scripts.VXLAN_LEAF)
+    if args.UnderlayConfigON or args.LeafON:
+        # Asked before connecting, not half way through the run
+        args.ULProto = ask(args.ULProto, "Please Enter the desired Underlay Protocol of the device (put in OSPF here!)")
+        args.ULArea = ask(args.ULArea, "Please Enter the desired OSPF Area ID for the Pod")
+        args.ULPhysList = args.ULPhysList or json.loads(input("Please enter the physical interface list of the L3 uplinks to the Spines w IPs Ex: '{\"eth1/1\":\"10.1.1.2/30\",\"eth1/2\":\"10.1.1.6/30\"}' > "))
+        args.ULLoopList = args.ULLoopList or json.loads(input("Please enter the logical interface list of the RTRID IP Ex: '{\"lo0\":\"192.168.1.1/32\"}' > "))
+    run_start = time.time()
+    with NxSession(args.HostIP, args.Username, args.Password, debug=args.Debug) as session:
+        featurelist = leaf.feature_check(session)
+        if featurelist and (args.FeatureON or args.LeafON):
+            print('enabling features')
+            if leaf.feature_enable(session, featurelist) == False:
+                sys.exit("Features Unable to be configured, Terminating without further actions")
+            featurelist = []
+        print("feature check failed" if featurelist else "features passed")
+        if featurelist and (args.LeafON or args.UnderlayConfigON):
+            sys.exit("feature check failed unable to configure underlay")
+        if args.LeafON:
+            batch = yangxml.ConfigBatch()
+            leaf.configure_underlay(batch, args.ULProto, args.ULArea, args.ULPhysList, args.ULLoopList)
+            leaf.config_mcast_underlay(batch, None, None)
+            leaf.create_l2fabric(batch, None, None)
+            leaf.create_l3fabric(batch, None, None)
+            leaf.create_evpn_ctrl(batch, None, None)
+            if args.Debug:
+                print(batch.merged())
+            res = batch.push(session.netconf)
+            if res is None or not res.ok:
+                sys.exit("Error Configuring Leaf - Exiting")
+            print("Leaf configured with " + str(len(batch.configs)) + " step payloads in one transaction")
+        elif args.UnderlayConfigON:
+            if not leaf.configure_underlay(session, args.ULProto, args.ULArea, args.ULPhysList, args.ULLoopList):
+                sys.exit("Error Configuring Underlay - Exiting")
+            print("Underlay Configured")
+    print("Run completed in %.1fs using %d connection(s)" % (time.time() - run_start, session.connects))
+
+
+def cmd_save(args):
+    # XML Agent (netconf) or NX-API (restconf) copy_run_start, like the copyrunstart operation of the fleet runner
+    if args.Transport == 'restconf':
+        scripts.load(scripts.RESTCONF_COPYRUNSTART).copy_run_start(args.HostIP, args.Username, args.Password)
+    else:
+        scripts.load(scripts.NETCONF_COPYRUNSTART).copy_run_start(args.HostIP, args.Username, args.Password)
+
+
+def common_arguments():
+    # Options every command takes
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('-H', '--HostIP', type=str, help='IP Address of the Device')
+    parser.add_argument('-U', '--Username', type=str, help='Username for Device Access')
+    parser.add_argument('-P', '--Password', type=str, help='Password for Device Access')
+    parser.add_argument('-MF', '--MetricsFile', type=str, help='Write connect, request and parse times per operation to this Prometheus text file')
+    parser.add_argument('-TF', '--TraceFile', type=str, help='Write every connect and request of the run to this JSON trace (chrome://tracing, ui.perfetto.dev)')
+    parser.add_argument('-D', '--Debug', action='store_true', default=False, help='Enable Debugging')
+    return parser
+
+
+def transport_arguments():
+    # -T/-E of the commands that run over NETCONF or RESTCONF
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('-T', '--Transport', choices=TRANSPORTS, default='netconf', help='NETCONF/XML Agent or RESTCONF/NX-API (Default netconf)')
+    parser.add_argument('-E', '--Encoding', choices=['xml', 'json'], default='xml', help='RESTCONF encoding with -T restconf (Default xml)')
+    return parser
+
+
+def build_parser():
+    common = common_arguments()
+    transport = transport_arguments()
+    parser = argparse.ArgumentParser(prog='python3 -m nexusprog', description='Nexus Programmability')
+    commands = parser.add_subparsers(dest='Command', metavar='{backup,vlan,user,port,vxlan,save}')
+
+    backup = commands.add_parser('backup', parents=[common], help='Back up the running configuration')
+    backup.add_argument('-T', '--Transport', choices=BACKUP_TRANSPORTS, default='xmlagent', help='Interface the configuration is read over (Default xmlagent)')
+    backup.add_argument('-A', '--All', action='store_true', default=False, help='Include defaults (show running-config all) with xmlagent and nxapi')
+    backup.add_argument('-C', '--Compress', choices=['gz', 'xz'], help='Compress the backup with gzip or xz')
+    backup.add_argument('-PP', '--Pretty', action='store_true', default=False, help='Re-indent the XML backups of netconf and restconf')
+    backup.add_argument('-d', '--Directory', type=str, default='.', help='Directory the backup is written to (Default current directory)')
+    backup.add_argument('-S', '--Store', type=str, help='Put the backup into the deduplicating backup store in this directory instead of a file')
+    backup.add_argument('-t', '--Timeout', type=int, default=60, help='Connect and request timeout in seconds (Default 60)')
+    backup.set_defaults(func=cmd_backup)
+
+    vlan = commands.add_parser('vlan', parents=[common, transport], help='Create a VLAN or a range of VLANs')
+    vlan.add_argument('-NV', '--NewVlan', type=str, required=True, help='New VLAN ID Desired, or a range of them Ex. 100-199,300')
+    vlan.add_argument('-NN', '--NewVlanName', type=str, help='Vlan Name for the New ID, {vlan} and {index} are replaced per VLAN Ex. TENANT1-{vlan} (Optional)')
+    vlan.add_argument('-VN', '--VNSegmentID', type=str, dest='VxlanVNID', help='Overlay vn-segment ID (Optional)')
+    vlan.add_argument('-VO', '--VNIOffset', type=str, dest='VniOffset', help='vn-segment ID of every VLAN is this offset plus the VLAN ID, for ranges (Optional)')
+    vlan.add_argument('-SP', '--STPPriority', type=str, dest='StpPri', help='Spanning Tree Priority (Optional)')
+    vlan.add_argument('-CB', '--ChunkKB', type=int, help='Split the request for large ranges in requests of at most this many KB (Default 128)')
+    vlan.add_argument('-S', '--Save', action='store_true', default=False, help='Copy running to startup after the change')
+    vlan.set_defaults(func=cmd_vlan)
+
+    user = commands.add_parser('user', parents=[common, transport], help='Create a local user or sync the users of a user file')
+    user.add_argument('-NU', '--NewUsername', type=str, help='New Username Desired')
+    user.add_argument('-NP', '--NewPassword', type=str, help='New Password')
+    user.add_argument('-NR', '--NewRole', type=str, help='Role for New user ex: network-admin')
+    user.add_argument('-F', '--Force', action='store_true', default=False, help='Force User Config over an Existing User')
+    user.add_argument('-S', '--SyncFile', type=str, help='Sync the users of the device with this CSV/JSON user file (name,password,roles) instead of creating one user')
+    user.add_argument('-X', '--Prune', action='store_true', default=False, help='With --SyncFile remove users the file does not list')
+    user.add_argument('-R', '--RotatePasswords', action='store_true', default=False, help='With --SyncFile set the password from the file on existing users as well')
+    user.set_defaults(func=cmd_user)
+
+    port = commands.add_parser('port', parents=[common], help='Provision an access or trunk edge port (pre-check, backup, change, save, backup)')
+    port.add_argument('-M', '--Mode', choices=['access', 'trunk'], default='access', help='Access port or trunk edge port (Default access)')
+    port.add_argument('-I', '--Interface', type=str, required=True, help='Interface for Configuration')
+    port.add_argument('-V', '--InterfaceVLAN', type=str, required=True, help='VLAN of the access port, VLAN range of the trunk port')
+    port.add_argument('-S', '--Store', type=str, help='Keep the pre/post change backups in the deduplicating backup store in this directory')
+    port.add_argument('-K', '--Cache', type=str, help='Keep the VLAN table and interface states read by the pre-checks in this directory for the next runs')
+    port.set_defaults(func=cmd_port)
+
+    vxlan = commands.add_parser('vxlan', parents=[common], help='VXLAN EVPN leaf features, underlay and bring-up')
+    vxlan.add_argument('-F', '--feature_enable', action='store_true', default=False, dest='FeatureON', help='Enable all Needed Features for NX-OS to Run VXLAN EVPN')
+    vxlan.add_argument('-UL', '--underlay_config', action='store_true', default=False, dest='UnderlayConfigON', help='Configure Underlay')
+    vxlan.add_argument('-ULP', '--underlayproto', type=str, dest='ULProto', help="Desired Underlay protocol -- NOTE Only 'ospf' is supported right now")
+    vxlan.add_argument('-ULA', '--underlayArea', type=str, dest='ULArea', help='Underlay Area ID - ex 1 or 2 or 3')
+    vxlan.add_argument('-ULI', '--underlayPhys', type=json.loads, dest='ULPhysList', help='Underlay Physical Interfaces and IPs to Spines')
+    vxlan.add_argument('-ULL', '--underlayLoop', type=json.loads, dest='ULLoopList', help='Underlay Logical Interfaces and IPs (LO0)')
+    vxlan.add_argument('-LEAF', '--leaf_bringup', action='store_true', default=False, dest='LeafON', help='Full leaf bring-up (features, underlay, multicast, L2/L3 fabric, EVPN) over one session and one transaction')
+    vxlan.set_defaults(func=cmd_vxlan)
+
+    save = commands.add_parser('save', parents=[common, transport], help='Copy the running configuration to startup')
+    save.set_defaults(func=cmd_save)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.Command is None:
+        parser.print_help()
+        return 2
+    if args.Debug:
+        print("Debug Mode On")
+        import logging
+        logging.basicConfig(level=logging.DEBUG)
+    args.HostIP = ask(args.HostIP, "Please Enter the IP Address or Hostname of your Device")
+    args.Username = ask(args.Username, "Please Enter the Username for Device Access")
+    args.Password = ask(args.Password, "Please Enter the Password for Device Access")
+    if args.MetricsFile or args.TraceFile:
+        from nexusprog import metrics
+        metrics.enable()
+    try:
+        args.func(args)
+    finally:
+        if args.MetricsFile or args.TraceFile:
+            metrics.export(args.MetricsFile, args.TraceFile)
+        # Pooled RESTCONF/NX-API connections, only if the command used them
+        restconf = sys.modules.get('nexusprog.restconf')
+        if restconf is not None:
+            restconf.close_all()
+    return 0
@@ -0,0 +1,1158 @@
+# Local stand-in for NX-OS devices, so the scripts can be run, timed and regression tested without switches. Every
+# EmulatedDevice holds an NX-OS shaped System tree (interfaces, VLANs, spanning tree, users, features; the size is a
+# parameter) and serves it over the three interfaces the scripts use, on the ports the scripts connect to:
+#   - NETCONF over SSH, port 830 ("netconf" and "xmlagent" subsystems) and port 22 ("xmlagent"): get/get-config with
+#     subtree filters, edit-config (merge, replace, create, delete, remove), lock/unlock, the candidate datastore with
+#     commit/discard-changes, and the Nexus exec-command for CLI (show running-config, copy run start, ...)
+#   - RESTCONF over HTTPS, /restconf/data/Cisco-NX-OS-device:System/..., GET/PATCH/DELETE in XML or JSON
+#   - NX-API JSON-RPC over HTTPS, POST /ins, cli and cli_ascii, one reply per command
+# Changes are merged into the tree, so a check after a change sees it and the CLI configuration rendered for show
+# running-config follows the tree. Each device takes a latency (plus jitter) added to every reply, a limit of SSH
+# sessions and of HTTP requests in flight (over it a session is refused and a request answered 503, like a busy
+# switch), and counts RPCs, requests and bytes for the benchmarks.
+#
+# Since the scripts always use ports 22, 830 and 443, a fleet of emulated devices is one address per device from the
+# loopback range (127.0.1.1, 127.0.1.2, ...). Linux answers on all of 127.0.0.0/8 without any configuration, binding
+# the ports below 1024 needs root (or CAP_NET_BIND_SERVICE).
+#
+#   emulator = Emulator([EmulatedDevice('127.0.1.1', vlans=200)])
+#   emulator.start()
+#   ... run the scripts against 127.0.1.1 ...
+#   emulator.stop()
+
+import base64, collections, copy, datetime, hashlib, http.server, ipaddress, itertools, json, os, random, socket, socketserver
+import ssl, tempfile, threading, time
+from urllib.parse import unquote, urlsplit
+from lxml import etree
+from nexusprog import restconf, template, yangjson, yangxml
+
+NXOS_NS = yangxml.NXOS_NS
+BASE_NS = 'urn:ietf:params:xml:ns:netconf:base:1.0'
+NFCLI_NS = 'http://www.cisco.com/nxos:1.0:nfcli'
+MONITORING_NS = 'urn:ietf:params:xml:ns:yang:ietf-netconf-monitoring'
+OPERATION = '{%s}operation' % BASE_NS
+BASE_1_0 = 'urn:ietf:params:netconf:base:1.0'
+BASE_1_1 = 'urn:ietf:params:netconf:base:1.1'
+CANDIDATE = 'urn:ietf:params:netconf:capability:candidate:1.0'
+NXOS_MODEL = NXOS_NS + '?module=Cisco-NX-OS-device&revision=2019-02-15'
+EOM = b']]>]]>'
+
+PORTS = collections.OrderedDict([('xmlagent', 22), ('netconf', 830), ('https', 443)])
+# SSH subsystems served on each SSH port
+SUBSYSTEMS = {'xmlagent': ('xmlagent',), 'netconf': ('netconf', 'xmlagent')}
+DEFAULT_MAX_SESSIONS = 8
+DEFAULT_MAX_REQUESTS = 16
+NXOS_VERSION = '9.3(8)'
+
+# Key leaf of the lists the scripts touch. Lists not named here are keyed by their first leaf, which is how the
+# payloads in this repository are written.
+LIST_KEYS = {'BD-list': 'fabEncap', 'PhysIf-list': 'id', 'If-list': 'id', 'Vlan-list': 'id', 'User-list': 'name',
+             'UserDomain-list': 'name', 'UserRole-list': 'name', 'Role-list': 'name', 'LbRtdIf-list': 'id'}
+# fm-items container -> the CLI line of the feature in show running-config
+FEATURE_CLI = collections.OrderedDict([
+    ('ifvlan-items', 'feature interface-vlan'), ('bgp-items', 'feature bgp'), ('ospf-items', 'feature ospf'),
+    ('pim-items', 'feature pim'), ('vnsegment-items', 'feature vn-segment-vlan-based'), ('evpn-items', 'nv overlay evpn'),
+    ('nvo-items', 'feature nv overlay'), ('isis-items', 'feature isis'), ('lacp-items', 'feature lacp'),
+    ('lldp-items', 'feature lldp'), ('hsrp-items', 'feature hsrp'), ('vpc-items', 'feature vpc'),
+    ('nxapi-items', 'feature nxapi'),
+])
+ROLES = ('network-admin', 'network-operator', 'vdc-admin', 'vdc-operator', 'priv-15', 'priv-0')
+
+_session_ids = itertools.count(1000)
+
+
+class RpcError(Exception):
+    # Error of a NETCONF RPC, a RESTCONF request or a CLI command, with the NETCONF error-tag it maps to
+
+    def __init__(self, message, tag='operation-failed', status=400, info=None):
+        Exception.__init__(self, message)
+        self.tag = tag
+        self.status = status
+        # Content of the NETCONF error-info element
+        self.info = info
+
+
+def _local(elem):
+    return etree.QName(elem).localname
+
+
+def _q(name):
+    return '{%s}%s' % (NXOS_NS, name)
+
+
+def build_system(hostname='nxos-emulator', interfaces=48, vlans=100, users=2, features=('nxapi',)):
+    # XML text of a System tree: interfaces Ethernet1/1.. (admin and oper down, access mode), VLANs 1..vlans with
+    # their spanning tree entries, admin plus users-1 more users and the standard roles, every feature of
+    # FEATURE_CLI (the ones in features enabled)
+    out = ['<System xmlns="', NXOS_NS, '"><name>', template.xml_text(hostname), '</name><fm-items>']
+    for container in FEATURE_CLI:
+        enabled = container[:-len('-items')] in features
+        out.append('<%s><adminSt>%s</adminSt></%s>' % (container, 'enabled' if enabled else 'disabled', container))
+    out.append('</fm-items><intf-items><phys-items>')
+    for port in range(1, interfaces + 1):
+        out.append('<PhysIf-list><id>eth1/%d</id><adminSt>down</adminSt><layer>Layer2</layer><mode>access</mode>'
+                   '<accessVlan>vlan-1</accessVlan><trunkVlans>1-4094</trunkVlans><mtu>1500</mtu><speed>auto</speed>'
+                   '<descr></descr><phys-items><operSt>down</operSt><operSpeed>auto</operSpeed></phys-items></PhysIf-list>' % port)
+    out.append('</phys-items></intf-items><bd-items><bd-items>')
+    for vlan in range(1, vlans + 1):
+        name = 'default' if vlan == 1 else 'VLAN%04d' % vlan
+        out.append('<BD-list><fabEncap>vlan-%d</fabEncap><name>%s</name><adminSt>active</adminSt><BdState>active</BdState>'
+                   '<accEncap>unknown</accEncap></BD-list>' % (vlan, name))
+    out.append('</bd-items></bd-items><stp-items><inst-items><vlan-items>')
+    for vlan in range(1, vlans + 1):
+        out.append('<Vlan-list><id>%d</id><priority>32768</priority></Vlan-list>' % vlan)
+    out.append('</vlan-items><if-items></if-items></inst-items></stp-items><userext-items><user-items>')
+    for index in range(users):
+        name = 'admin' if index == 0 else 'user%d' % index
+        role = 'network-admin' if index == 0 else 'network-operator'
+        out.append('<User-list><name>%s</name><pwd>$5$emulated$%08x</pwd><pwdEncryptType>5</pwdEncryptType><userdomain-items>'
+                   '<UserDomain-list><name>all</name><role-items><UserRole-list><name>%s</name></UserRole-list></role-items>'
+                   '</UserDomain-list></userdomain-items></User-list>' % (name, index, role))
+    out.append('</user-items><role-items>')
+    for role in ROLES:
+        out.append('<Role-list><name>%s</name></Role-list>' % role)
+    out.append('</role-items></userext-items></System>')
+    return ''.join(out)
+
+
+def normalize(elem):
+    # Put every element of a payload into the device model namespace, the payloads come with the namespace on the root
+    # only (XML), without any (JSON) or with NETCONF prefixes on the attributes
+    for node in elem.iter():
+        if isinstance(node.tag, str):
+            node.tag = _q(etree.QName(node).localname)
+    return elem
+
+
+def _clean(elem):
+    # Copy of elem for the tree, without nc:operation attributes
+    elem = copy.deepcopy(elem)
+    for node in elem.iter():
+        if isinstance(node.tag, str) and OPERATION in node.attrib:
+            del node.attrib[OPERATION]
+    return elem
+
+
+def list_key(entry):
+    # (key leaf name, value) of a list entry
+    name = LIST_KEYS.get(_local(entry))
+    if name is not None:
+        return name, (entry.findtext(_q(name)) or '').strip()
+    for child in entry:
+        if isinstance(child.tag, str) and len(child) == 0:
+            return _local(child), (child.text or '').strip()
+    return None, None
+
+
+def merge(target, source, operation='merge'):
+    # Merge the children of source into target with the NETCONF edit-config rules (RFC 6241 7.2). Returns the number of
+    # nodes changed. Raises RpcError for create of something that exists and delete of something that does not.
+    changed = 0
+    index = {}
+    for child in source:
+        if not isinstance(child.tag, str):
+            continue
+        op = child.get(OPERATION, operation)
+        name = _local(child)
+        if name.endswith('-list'):
+            key_name, key = list_key(child)
+            if child.tag not in index:
+                index[child.tag] = dict((list_key(entry)[1], entry) for entry in target.iterchildren(child.tag))
+            existing = index[child.tag].get(key)
+        else:
+            existing = target.find(child.tag)
+        if op in ('delete', 'remove'):
+            if existing is None:
+                if op == 'delete':
+                    raise RpcError('%s does not exist' % name, 'data-missing')
+                continue
+            target.remove(existing)
+            if name.endswith('-list'):
+                index[child.tag].pop(key, None)
+            changed += 1
+            continue
+        if op == 'create' and existing is not None:
+            raise RpcError('%s already exists' % name, 'data-exists')
+        if op == 'replace' and existing is not None:
+            replacement = _clean(child)
+            target.replace(existing, replacement)
+            if name.endswith('-list'):
+                index[child.tag][key] = replacement
+            changed += 1
+            continue
+        if existing is None:
+            added = _clean(child)
+            target.append(added)
+            if name.endswith('-list'):
+                index[child.tag][key] = added
+            changed += 1
+        elif len(child) == 0:
+            if existing.text != child.text:
+                existing.text = child.text
+                changed += 1
+        else:
+            changed += merge(existing, child, 'merge' if op in ('replace', 'create') else op)
+    return changed
+
+
+def subtree(data, selector):
+    # Copy of data reduced to the subtree filter selector (RFC 6241 6.2), None when nothing matches
+    nodes = [child for child in selector if isinstance(child.tag, str)]
+    if not nodes:
+        return copy.deepcopy(data)
+    content = {}
+    select = collections.OrderedDict()
+    for node in nodes:
+        if len(node) == 0 and (node.text or '').strip():
+            content[_local(node)] = node.text.strip()
+        else:
+            select.setdefault(_local(node), []).append(node)
+    for name, value in content.items():
+        if not any((leaf.text or '').strip() == value for leaf in data.iterchildren(_q(name))):
+            return None
+    if not select:
+        return copy.deepcopy(data)
+    result = etree.Element(data.tag)
+    selected = 0
+    for child in data:
+        if not isinstance(child.tag, str):
+            continue
+        name = _local(child)
+        if name in content:
+            result.append(copy.deepcopy(child))
+            continue
+        for node in select.get(name, ()):
+            reduced = copy.deepcopy(child) if len(node) == 0 else subtree(child, node)
+            if reduced is not None:
+                result.append(reduced)
+                selected += 1
+                break
+    if not selected and not content:
+        # The containment nodes matched nothing below data
+        return None
+    return result
+
+
+def _leaf(elem, name, default=''):
+    text = elem.findtext(_q(name))
+    return default if text is None else text
+
+
+def _vlan_number(fab_encap):
+    number = fab_encap.split('-')[-1]
+    return int(number) if number.isdigit() else 0
+
+
+def _ranges(numbers):
+    # "1,10-20,30" of a sorted list of numbers
+    parts = []
+    for _, group in itertools.groupby(enumerate(numbers), lambda pair: pair[1] - pair[0]):
+        group = [number for _, number in group]
+        parts.append(str(group[0]) if len(group) == 1 else '%d-%d' % (group[0], group[-1]))
+    return ','.join(parts)
+
+
+def _interface_name(name):
+    return 'Ethernet' + name[3:] if name.startswith('eth') else name
+
+
+def _password_hash(pwd):
+    # The device never shows a clear text password, it stores the type 5 hash of what it was given
+    if pwd.startswith('$'):
+        return pwd
+    return '$5$emulated$' + hashlib.sha256(pwd.encode('utf-8')).hexdigest()[:43]
+
+
+def running_config(system, all_defaults=False, when=None):
+    # show running-config of a System tree. The parts the scripts configure (features, users, VLANs, spanning tree,
+    # access and trunk ports) are rendered as CLI, other containers are left out.
+    now = time.strftime('%a %b %d %H:%M:%S %Y', time.localtime(when))
+    lines = ['', '!Command: show running-config' + (' all' if all_defaults else ''),
+             '!Running configuration last done at: ' + now, '!Time: ' + now, '', 'version ' + NXOS_VERSION + ' Bios:version 05.45',
+             'hostname ' + _leaf(system, 'name')]
+    fm_items = system.find(_q('fm-items'))
+    if fm_items is not None:
+        for container in fm_items:
+            if isinstance(container.tag, str) and _leaf(container, 'adminSt') == 'enabled' and _local(container) in FEATURE_CLI:
+                lines.append(FEATURE_CLI[_local(container)])
+    lines.append('')
+    for role in system.iterfind('%s/%s/%s' % (_q('userext-items'), _q('role-items'), _q('Role-list'))):
+        if _leaf(role, 'name') not in ROLES:
+            lines.append('role name ' + _leaf(role, 'name'))
+    for user in system.iterfind('%s/%s/%s' % (_q('userext-items'), _q('user-items'), _q('User-list'))):
+        roles = [_leaf(role, 'name') for role in user.iter(_q('UserRole-list'))]
+        lines.append('username %s password 5 %s  role %s' % (_leaf(user, 'name'), _password_hash(_leaf(user, 'pwd')), roles[0] if roles else 'network-operator'))
+        lines.extend('username %s role %s' % (_leaf(user, 'name'), role) for role in roles[1:])
+    lines.append('')
+    bds = sorted(system.iterfind('%s/%s/%s' % (_q('bd-items'), _q('bd-items'), _q('BD-list'))), key=lambda bd: _vlan_number(_leaf(bd, 'fabEncap')))
+    if bds:
+        lines.append('vlan ' + _ranges([_vlan_number(_leaf(bd, 'fabEncap')) for bd in bds]))
+    for bd in bds:
+        vlan = _vlan_number(_leaf(bd, 'fabEncap'))
+        name = _leaf(bd, 'name')
+        encap = _leaf(bd, 'accEncap')
+        if vlan == 1 or (not name and not encap.startswith('vxlan-') and not all_defaults):
+            continue
+        lines.append('vlan %d' % vlan)
+        if name:
+            lines.append('  name ' + name)
+        if encap.startswith('vxlan-'):
+            lines.append('  vn-segment ' + encap[len('vxlan-'):])
+    lines.append('')
+    for vlan in system.iterfind('%s/%s/%s/%s' % (_q('stp-items'), _q('inst-items'), _q('vlan-items'), _q('Vlan-list'))):
+        if all_defaults or _leaf(vlan, 'priority', '32768') != '32768':
+            lines.append('spanning-tree vlan %s priority %s' % (_leaf(vlan, 'id'), _leaf(vlan, 'priority', '32768')))
+    stp_ports = dict((_leaf(port, 'id'), port) for port in system.iterfind('%s/%s/%s/%s' % (_q('stp-items'), _q('inst-items'), _q('if-items'), _q('If-list'))))
+    lines.append('')
+    for port in system.iterfind('%s/%s/%s' % (_q('intf-items'), _q('phys-items'), _q('PhysIf-list'))):
+        name = _leaf(port, 'id')
+        lines.append('')
+        lines.append('interface ' + _interface_name(name))
+        if _leaf(port, 'descr'):
+            lines.append('  description ' + _leaf(port, 'descr'))
+        if _leaf(port, 'layer') == 'Layer2':
+            lines.append('  switchport')
+            mode = _leaf(port, 'mode', 'access')
+            if mode != 'access' or all_defaults:
+                lines.append('  switchport mode ' + mode)
+            if mode == 'access' and (_leaf(port, 'accessVlan') not in ('', 'vlan-1') or all_defaults):
+                lines.append('  switchport access vlan %d' % _vlan_number(_leaf(port, 'accessVlan', 'vlan-1')))
+            if mode == 'trunk' and (_leaf(port, 'trunkVlans') not in ('', '1-4094') or all_defaults):
+                lines.append('  switchport trunk allowed vlan ' + _leaf(port, 'trunkVlans', '1-4094'))
+        stp = stp_ports.get(name)
+        if stp is not None:
+            if _leaf(stp, 'mode') in ('edge', 'trunk'):
+                lines.append('  spanning-tree port type edge' + (' trunk' if _leaf(port, 'mode') == 'trunk' else ''))
+            if _leaf(stp, 'bpduguard') == 'enable':
+                lines.append('  spanning-tree bpduguard enable')
+        if all_defaults:
+            lines.extend(['  mtu ' + _leaf(port, 'mtu', '1500'), '  speed ' + _leaf(port, 'speed', 'auto'), '  duplex auto',
+                          '  snmp trap link-status', '  logging event port link-status default', '  no switchport monitor',
+                          '  load-interval counter 1 30', '  medium broadcast', '  delay 1', '  bandwidth inherit'])
+        lines.append('  no shutdown' if _leaf(port, 'adminSt') == 'up' else '  shutdown')
+    lines.append('')
+    return '\n'.join(lines)
+
+
+class EmulatedDevice(object):
+    # One emulated switch: its configuration tree, datastores, sessions and counters. Thread safe, the servers call it
+    # from one thread per session or request.
+
+    def __init__(self, address, hostname=None, interfaces=48, vlans=100, users=2, features=('nxapi',), credentials=None,
+                 latency=0.0, jitter=0.0, max_sessions=DEFAULT_MAX_SESSIONS, max_requests=DEFAULT_MAX_REQUESTS,
+                 copy_time=0.0, candidate=True):
+        self.address = address
+        self.hostname = hostname or 'nxos-' + address.replace('.', '-').replace(':', '-')
+        # user -> password accepted on every interface, None accepts any login
+        self.credentials = credentials
+        self.latency = latency
+        self.jitter = jitter
+        self.max_sessions = max_sessions
+        self.max_requests = max_requests
+        self.copy_time = copy_time
+        self.candidate_enabled = candidate
+        self.lock = threading.RLock()
+        self.tree_size = (interfaces, vlans, users, tuple(features))
+        self.sessions = collections.OrderedDict()
+        self.requests = 0
+        self.counters = collections.Counter()
+        self.reset()
+
+    def reset(self):
+        # Back to the configuration the device started with (open sessions and counters are kept)
+        interfaces, vlans, users, features = self.tree_size
+        with self.lock:
+            self.system = etree.fromstring(build_system(self.hostname, interfaces, vlans, users, features))
+            self.startup = copy.deepcopy(self.system)
+            self.candidate = None
+            self.locks = {'running': None, 'candidate': None}
+            self.locked_at = {}
+            self.checkpoints = collections.OrderedDict()
+            self.accounting = 1
+            self.changed_at = time.time()
+
+    # Counters and timing
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def reset_stats(self):
+        with self.lock:
+            self.counters.clear()
+
+    def delay(self):
+        # The latency of one reply
+        wait = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if wait > 0:
+            time.sleep(wait)
+
+    def authenticate(self, user, passwd):
+        return self.credentials is None or self.credentials.get(user) == passwd
+
+    # Sessions
+
+    def open_session(self, subsystem, user):
+        # Session id of a new NETCONF/XML Agent session, None when the device is at its session limit
+        with self.lock:
+            if len(self.sessions) >= self.max_sessions:
+                self.counters['sessions_refused'] += 1
+                return None
+            session_id = next(_session_ids)
+            self.sessions[session_id] = (subsystem, user, time.time())
+            self.counters[subsystem + '_sessions'] += 1
+            return session_id
+
+    def close_session(self, session_id):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+            for datastore, holder in self.locks.items():
+                if holder == session_id:
+                    self.locks[datastore] = None
+                    if datastore == 'candidate':
+                        self.candidate = None
+
+    def begin_request(self):
+        with self.lock:
+            if self.requests >= self.max_requests:
+                self.counters['requests_refused'] += 1
+                return False
+            self.requests += 1
+            return True
+
+    def end_request(self):
+        with self.lock:
+            self.requests -= 1
+
+    # Datastores
+
+    def _changed(self):
+        self.accounting += 1
+        self.changed_at = time.time()
+
+    def _check_lock(self, datastore, session_id):
+        holder = self.locks.get(datastore)
+        if holder is not None and holder != session_id:
+            raise RpcError('Lock denied, the %s configuration is locked by session %d' % (datastore, holder), 'lock-denied', 409,
+                           '<session-id>%d</session-id>' % holder)
+
+    def datastore(self, name):
+        if name == 'candidate':
+            if not self.candidate_enabled:
+                raise RpcError('candidate datastore is not supported', 'operation-not-supported')
+            return self.candidate if self.candidate is not None else self.system
+        return self.system
+
+    def get(self, selector=None, datastore='running', state=False):
+        # Copy of the datastore reduced to a subtree filter (the <filter> element), the whole System without one. With
+        # state (a get, not a get-config) the filter may also select the netconf-state of the device.
+        with self.lock:
+            system = self.datastore(datastore)
+            if selector is None:
+                return [copy.deepcopy(system)]
+            results = []
+            for node in selector:
+                if not isinstance(node.tag, str):
+                    continue
+                reduced = None
+                if _local(node) == 'System':
+                    reduced = subtree(system, node)
+                elif state and _local(node) == 'netconf-state':
+                    reduced = subtree(self.monitoring(), node)
+                if reduced is not None:
+                    results.append(reduced)
+            return results
+
+    def monitoring(self):
+        # ietf-netconf-monitoring state (RFC 6022) of the datastores and their global locks
+        with self.lock:
+            state = etree.Element('{%s}netconf-state' % MONITORING_NS, nsmap={None: MONITORING_NS})
+            datastores = etree.SubElement(state, '{%s}datastores' % MONITORING_NS)
+            for name, holder in self.locks.items():
+                datastore = etree.SubElement(datastores, '{%s}datastore' % MONITORING_NS)
+                etree.SubElement(datastore, '{%s}name' % MONITORING_NS).text = name
+                if holder is not None:
+                    lock = etree.SubElement(etree.SubElement(datastore, '{%s}locks' % MONITORING_NS), '{%s}global-lock' % MONITORING_NS)
+                    etree.SubElement(lock, '{%s}locked-by-session' % MONITORING_NS).text = str(holder)
+                    etree.SubElement(lock, '{%s}locked-time' % MONITORING_NS).text = time.strftime(
+                        '%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.locked_at.get(name, 0)))
+            return state
+
+    def edit(self, config, datastore='running', operation='merge', session_id=None):
+        # edit-config of a <config> element (its System child is merged into the datastore)
+        with self.lock:
+            self._check_lock(datastore, session_id)
+            if datastore == 'candidate':
+                if not self.candidate_enabled:
+                    raise RpcError('candidate datastore is not supported', 'operation-not-supported')
+                if self.candidate is None:
+                    self.candidate = copy.deepcopy(self.system)
+                target = self.candidate
+            else:
+                target = self.system
+            changed = 0
+            for node in config:
+                if not isinstance(node.tag, str):
+                    continue
+                if _local(node) != 'System':
+                    raise RpcError('unknown element %s in config' % _local(node), 'unknown-element')
+                normalize(node)
+                changed += merge(target, node, node.get(OPERATION, operation))
+            if changed and datastore == 'running':
+                self._changed()
+            return changed
+
+    def lock_datastore(self, datastore, session_id, release=False):
+        with self.lock:
+            if release:
+                if self.locks.get(datastore) == session_id:
+                    self.locks[datastore] = None
+                return
+            self._check_lock(datastore, session_id)
+            self.locks[datastore] = session_id
+            self.locked_at[datastore] = time.time()
+
+    def commit(self, session_id=None):
+        with self.lock:
+            self._check_lock('running', session_id)
+            if self.candidate is not None:
+                self.system = self.candidate
+                self.candidate = None
+                self._changed()
+
+    def discard(self):
+        with self.lock:
+            self.candidate = None
+
+    # RESTCONF
+
+    def resolve(self, path):
+        # Elements at a RESTCONF path relative to System ("bd-items/bd-items/BD-list=vlan-10")
+        nodes = [self.system]
+        for segment in [part for part in path.split('/') if part]:
+            name, _, key = segment.partition('=')
+            name = name.split(':', 1)[-1]
+            key = unquote(key).split(',')[0] if key else None
+            found = []
+            for node in nodes:
+                for child in node.iterchildren(_q(name)):
+                    if key is None or list_key(child)[1] == key:
+                        found.append(child)
+            nodes = found
+            if not nodes:
+                break
+        return nodes
+
+    def restconf_get(self, path, encoding=restconf.XML):
+        # (status, body) of a GET, 204 without a body when the path holds nothing
+        with self.lock:
+            nodes = self.resolve(path)
+            if not nodes:
+                return 204, b''
+            text = b''.join(etree.tostring(node) for node in nodes)
+        if encoding == restconf.JSON:
+            return 200, yangjson.dumps(yangjson.from_xml(text)).encode('utf-8')
+        return 200, text
+
+    def restconf_patch(self, path, body, encoding=restconf.XML):
+        # Merge of a PATCH body (XML fragment or JSON document) at path. A root element named like the target is the
+        # target itself, any other root is a child of it.
+        if encoding == restconf.JSON:
+            try:
+                members = json.loads(body.decode('utf-8') if isinstance(body, bytes) else body) if body.strip() else {}
+            except ValueError as e:
+                raise RpcError('malformed body: %s' % e, 'malformed-message')
+            if not isinstance(members, dict):
+                raise RpcError('the body is not a JSON object', 'malformed-message')
+            # RFC 7951: top level members are qualified with their module
+            for name in members:
+                if name.split(':', 1)[0] != yangjson.MODULE or ':' not in name:
+                    raise RpcError('member %s is not qualified with module %s' % (name, yangjson.MODULE), 'unknown-element')
+            tree = yangjson.loads(body)
+            body = yangjson.to_xml(tree or {})
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        try:
+            wrapper = normalize(etree.fromstring('<patch>' + body.strip() + '</patch>'))
+        except etree.XMLSyntaxError as e:
+            raise RpcError('malformed body: %s' % e, 'malformed-message')
+        with self.lock:
+            self._check_lock('running', None)
+            nodes = self.resolve(path)
+            if not nodes:
+                raise RpcError('%s does not exist' % path, 'invalid-value', 404)
+            target = nodes[0]
+            changed = 0
+            for root in list(wrapper):
+                if not isinstance(root.tag, str):
+                    continue
+                if root.tag == target.tag:
+                    changed += merge(target, root)
+                else:
+                    holder = etree.Element('patch')
+                    holder.append(root)
+                    changed += merge(target, holder)
+            if changed:
+                self._changed()
+            return changed
+
+    def restconf_delete(self, path):
+        with self.lock:
+            self._check_lock('running', None)
+            nodes = [node for node in self.resolve(path) if node is not self.system]
+            if not nodes:
+                raise RpcError('%s does not exist' % path, 'data-missing', 404)
+            for node in nodes:
+                node.getparent().remove(node)
+            self._changed()
+
+    # CLI (XML Agent exec-command and NX-API)
+
+    def cli(self, cmd, session_id=None):
+        # (text, structured body) of one command, raises RpcError for a command the emulator does not know
+        command = ' '.join(cmd.split())
+        self.count('cli_commands')
+        with self.lock:
+            if command in ('show running-config', 'show running-config all'):
+                text = running_config(self.system, command.endswith(' all'), self.changed_at)
+                return text, {'nf:source': text}
+            if command == 'show startup-config':
+                text = running_config(self.startup).replace('show running-config', 'show startup-config')
+                return text, {'nf:source': text}
+            if command == 'show version':
+                body = collections.OrderedDict([('host_name', _leaf(self.system, 'name')), ('nxos_ver_str', NXOS_VERSION),
+                                                ('chassis_id', 'Nexus9000 C9300v Chassis (emulated)'),
+                                                ('kern_uptm_secs', int(time.time() - self.changed_at))])
+                text = ('Cisco Nexus Operating System (NX-OS) Software\n  NXOS: version %s\n  cisco %s\n  Device name: %s\n'
+                        % (NXOS_VERSION, body['chassis_id'], body['host_name']))
+                return text, body
+            if command == 'show hostname':
+                return _leaf(self.system, 'name') + '\n', {'hostname': _leaf(self.system, 'name')}
+            if command == 'show clock':
+                now = datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3] + ' UTC ' + time.strftime('%a %b %d %Y')
+                return now + '\n', {'simple_time': now}
+            if command == 'show xml server status':
+                lines = ['operational status is enabled', 'maximum session configured is %d' % self.max_sessions]
+                for session_id, (subsystem, user, started) in self.sessions.items():
+                    lines.append('  session_id: %d' % session_id)
+                    lines.append('    user: %s' % user)
+                    lines.append('    subsystem: %s' % subsystem)
+                    lines.append('    start: %s' % time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started)))
+                return '\n'.join(lines) + '\n', {'sessions': list(self.sessions)}
+            if command == 'show accounting log last-index':
+                return 'accounting-log last-index : %d\n' % self.accounting, {'last-index': self.accounting}
+            if command == 'show interface status':
+                rows = []
+                text = ['Port           Name               Status    Vlan      Duplex  Speed   Type']
+                for port in self.system.iterfind('%s/%s/%s' % (_q('intf-items'), _q('phys-items'), _q('PhysIf-list'))):
+                    status = 'disabled' if _leaf(port, 'adminSt') == 'down' else 'notconnect'
+                    vlan = 'trunk' if _leaf(port, 'mode') == 'trunk' else str(_vlan_number(_leaf(port, 'accessVlan', 'vlan-1')))
+                    rows.append({'interface': _interface_name(_leaf(port, 'id')), 'name': _leaf(port, 'descr'), 'state': status, 'vlan': vlan})
+                    text.append('%-14s %-18s %-9s %-9s auto    auto    10g' % (rows[-1]['interface'][:14], rows[-1]['name'][:18], status, vlan))
+                return '\n'.join(text) + '\n', {'TABLE_interface': {'ROW_interface': rows}}
+            if command == 'show vlan brief':
+                rows = []
+                text = ['VLAN Name                             Status    Ports']
+                for bd in self.system.iterfind('%s/%s/%s' % (_q('bd-items'), _q('bd-items'), _q('BD-list'))):
+                    rows.append({'vlanshowbr-vlanid': _vlan_number(_leaf(bd, 'fabEncap')), 'vlanshowbr-vlanname': _leaf(bd, 'name'), 'vlanshowbr-vlanstate': _leaf(bd, 'adminSt')})
+                    text.append('%-4d %-32s %-9s' % (rows[-1]['vlanshowbr-vlanid'], rows[-1]['vlanshowbr-vlanname'][:32], rows[-1]['vlanshowbr-vlanstate']))
+                return '\n'.join(text) + '\n', {'TABLE_vlanbriefxbrief': {'ROW_vlanbriefxbrief': rows}}
+            if command == 'show feature':
+                rows = []
+                for container in self.system.find(_q('fm-items')):
+                    if isinstance(container.tag, str):
+                        rows.append({'cfcFeatureCtrlName2': _local(container)[:-len('-items')], 'cfcFeatureCtrlOpStatus2': _leaf(container, 'adminSt')})
+                text = '\n'.join('%-20s 1          %s' % (row['cfcFeatureCtrlName2'], row['cfcFeatureCtrlOpStatus2']) for row in rows)
+                return text + '\n', {'TABLE_cfcFeatureCtrlTable': {'ROW_cfcFeatureCtrlTable': rows}}
+            if command == 'show checkpoint summary':
+                text = ''.join('%d) %s:\nCreated at %s\n' % (index + 1, name, created) for index, (name, (created, _)) in enumerate(self.checkpoints.items()))
+                return text, {'checkpoints': list(self.checkpoints)}
+            if command.startswith('checkpoint '):
+                name = command[len('checkpoint '):].strip()
+                if name in self.checkpoints:
+                    raise RpcError('Checkpoint name %s is already in use' % name)
+                self.checkpoints[name] = (time.strftime('%a, %H:%M:%S %d %b %Y'), copy.deepcopy(self.system))
+                return 'Done\n', None
+            if command.startswith('no checkpoint '):
+                if self.checkpoints.pop(command[len('no checkpoint '):].strip(), None) is None:
+                    raise RpcError('No such checkpoint')
+                return 'Done\n', None
+            if command.startswith('rollback running-config checkpoint '):
+                name = command[len('rollback running-config checkpoint '):].strip()
+                if name not in self.checkpoints:
+                    raise RpcError('No such checkpoint')
+                self.system = copy.deepcopy(self.checkpoints[name][1])
+                self._changed()
+                return 'Rollback completed successfully.\n', None
+        if command in ('copy running-config startup-config', 'copy run start'):
+            # Outside the lock, a save takes copy_time while the device keeps answering
+            if self.copy_time:
+                time.sleep(self.copy_time)
+            with self.lock:
+                self.startup = copy.deepcopy(self.system)
+            return '[########################################] 100%\nCopy complete.\n', None
+        raise RpcError('% Invalid command at \'^\' marker.', 'invalid-value')
+
+
+def _message_id(rpc):
+    return rpc.get('message-id', '')
+
+
+def rpc_reply(rpc, content):
+    return ('<rpc-reply xmlns="%s" message-id="%s">%s</rpc-reply>' % (BASE_NS, template.xml_text(_message_id(rpc)), content)).encode('utf-8')
+
+
+def rpc_error(rpc, error):
+    return rpc_reply(rpc, '<rpc-error><error-type>application</error-type><error-tag>%s</error-tag><error-severity>error'
+                          '</error-severity><error-message xml:lang="en">%s</error-message>%s</rpc-error>'
+                          % (error.tag, template.xml_text(str(error)), '<error-info>%s</error-info>' % error.info if error.info else ''))
+
+
+def handle_rpc(device, message, session_id):
+    # Reply (bytes) to one NETCONF message, and whether the session ends with it
+    try:
+        rpc = etree.fromstring(message, etree.XMLParser(huge_tree=True, resolve_entities=False))
+    except etree.XMLSyntaxError as e:
+        return rpc_error(etree.Element('rpc'), RpcError('malformed message: %s' % e, 'malformed-message')), False
+    operation = next((child for child in rpc if isinstance(child.tag, str)), None)
+    if operation is None:
+        return rpc_error(rpc, RpcError('empty rpc', 'missing-element')), False
+    name = _local(operation)
+    device.count('rpc:' + name)
+    device.delay()
+    try:
+        if name in ('get', 'get-config'):
+            selector = operation.find('{%s}filter' % BASE_NS)
+            if selector is None:
+                selector = operation.find('filter')
+            source = operation.find('{%s}source' % BASE_NS)
+            datastore = _local(source[0]) if source is not None and len(source) else 'running'
+            data = b''.join(etree.tostring(node) for node in device.get(selector, datastore, name == 'get'))
+            return rpc_reply(rpc, '<data>' + data.decode('utf-8') + '</data>'), False
+        if name == 'edit-config':
+            target = operation.find('{%s}target' % BASE_NS)
+            datastore = _local(target[0]) if target is not None and len(target) else 'running'
+            default = operation.findtext('{%s}default-operation' % BASE_NS) or 'merge'
+            config = next((child for child in operation if isinstance(child.tag, str) and _local(child) == 'config'), None)
+            if config is None:
+                raise RpcError('edit-config without config', 'missing-element')
+            device.edit(config, datastore, 'merge' if default == 'none' else default, session_id)
+            return rpc_reply(rpc, '<ok/>'), False
+        if name in ('lock', 'unlock'):
+            target = operation.find('{%s}target' % BASE_NS)
+            device.lock_datastore(_local(target[0]) if target is not None and len(target) else 'running', session_id, name == 'unlock')
+            return rpc_reply(rpc, '<ok/>'), False
+        if name == 'commit':
+            device.commit(session_id)
+            return rpc_reply(rpc, '<ok/>'), False
+        if name == 'discard-changes':
+            device.discard()
+            return rpc_reply(rpc, '<ok/>'), False
+        if name == 'close-session':
+            return rpc_reply(rpc, '<ok/>'), True
+        if name == 'exec-command':
+            texts = [device.cli(cmd.text or '', session_id)[0] for cmd in operation if isinstance(cmd.tag, str)]
+            return ('<nf:rpc-reply xmlns:nf="%s" xmlns="%s" message-id="%s"><nf:data>%s</nf:data></nf:rpc-reply>'
+                    % (BASE_NS, NFCLI_NS, template.xml_text(_message_id(rpc)), template.xml_text(''.join(texts)))).encode('utf-8'), False
+        raise RpcError('operation %s is not supported' % name, 'operation-not-supported')
+    except RpcError as e:
+        device.count('rpc_errors')
+        return rpc_error(rpc, e), False
+
+
+class NetconfSession(object):
+    # NETCONF over one SSH channel: hello exchange, then one reply per RPC. Framing is end-of-message (base:1.0) unless
+    # both sides announce base:1.1, then chunked.
+
+    def __init__(self, device, channel, subsystem, session_id):
+        self.device = device
+        self.channel = channel
+        self.subsystem = subsystem
+        self.session_id = session_id
+        self.buffer = b''
+        self.chunked = False
+
+    def hello(self):
+        capabilities = [BASE_1_0]
+        if self.subsystem == 'netconf':
+            capabilities += [BASE_1_1, NXOS_MODEL]
+            if self.device.candidate_enabled:
+                capabilities.append(CANDIDATE)
+        return ('<?xml version="1.0" encoding="UTF-8"?><hello xmlns="%s"><capabilities>%s</capabilities><session-id>%d</session-id></hello>'
+                % (BASE_NS, ''.join('<capability>%s</capability>' % template.xml_text(capability) for capability in capabilities), self.session_id)).encode('utf-8')
+
+    def _recv(self):
+        data = self.channel.recv(65536)
+        if not data:
+            raise EOFError()
+        self.buffer += data
+
+    def read_eom(self):
+        while EOM not in self.buffer:
+            self._recv()
+        message, self.buffer = self.buffer.split(EOM, 1)
+        return message
+
+    def read_chunked(self):
+        parts = []
+        while True:
+            while b'\n' not in self.buffer[1:] or len(self.buffer) < 4:
+                self._recv()
+            if self.buffer.startswith(b'\n##\n'):
+                self.buffer = self.buffer[4:]
+                return b''.join(parts)
+            header, _, rest = self.buffer[2:].partition(b'\n')
+            size = int(header)
+            while len(rest) < size:
+                self._recv()
+                header, _, rest = self.buffer[2:].partition(b'\n')
+            parts.append(rest[:size])
+            self.buffer = rest[size:]
+
+    def send(self, message):
+        self.device.count('bytes_out', len(message))
+        if self.chunked:
+            self.channel.sendall(b'\n#%d\n' % len(message) + message + b'\n##\n')
+        else:
+            self.channel.sendall(message + EOM)
+
+    def run(self):
+        try:
+            self.send(self.hello())
+            client = self.read_eom()
+            self.chunked = self.subsystem == 'netconf' and BASE_1_1.encode('ascii') in client
+            while True:
+                message = self.read_chunked() if self.chunked else self.read_eom()
+                self.device.count('bytes_in', len(message))
+                reply, closing = handle_rpc(self.device, message, self.session_id)
+                self.send(reply)
+                if closing:
+                    break
+        except (EOFError, OSError, ValueError):
+            pass
+        finally:
+            self.device.close_session(self.session_id)
+            try:
+                self.channel.close()
+            except Exception:
+                pass
+
+
+_host_key = []
+_host_key_lock = threading.Lock()
+
+
+def host_key():
+    # One SSH host key for every emulated device of the process, the clients do not verify it
+    import paramiko
+    with _host_key_lock:
+        if not _host_key:
+            _host_key.append(paramiko.ECDSAKey.generate())
+        return _host_key[0]
+
+
+def _ssh_server(device, subsystems):
+    import paramiko
+
+    class SshServer(paramiko.ServerInterface):
+        # Password login and the NETCONF subsystems of one SSH connection
+
+        def __init__(self):
+            self.user = None
+
+        def get_allowed_auths(self, username):
+            return 'password'
+
+        def check_auth_password(self, username, password):
+            if device.authenticate(username, password):
+                self.user = username
+                return paramiko.AUTH_SUCCESSFUL
+            device.count('auth_failures')
+            return paramiko.AUTH_FAILED
+
+        def check_channel_request(self, kind, chanid):
+            if kind == 'session':
+                return paramiko.OPEN_SUCCEEDED
+            return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+        def check_channel_subsystem_request(self, channel, name):
+            if name not in subsystems:
+                return False
+            session_id = device.open_session(name, self.user)
+            if session_id is None:
+                return False
+            session = NetconfSession(device, channel, name, session_id)
+            threading.Thread(target=session.run, name='netconf-%d' % session_id, daemon=True).start()
+            return True
+
+    return SshServer()
+
+
+_certificate = []
+
+
+def certificate():
+    # (certificate file, key file) of a self signed certificate, created once per process
+    with _host_key_lock:
+        if not _certificate:
+            from cryptography import x509
+            from cryptography.hazmat.primitives import hashes, serialization
+            from cryptography.hazmat.primitives.asymmetric import ec
+            from cryptography.x509.oid import NameOID
+            key = ec.generate_private_key(ec.SECP256R1())
+            name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, u'nxos-emulator')])
+            now = datetime.datetime.now(datetime.timezone.utc)
+            cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+                    .serial_number(x509.random_serial_number()).not_valid_before(now - datetime.timedelta(days=1))
+                    .not_valid_after(now + datetime.timedelta(days=365)).sign(key, hashes.SHA256()))
+            directory = tempfile.mkdtemp(prefix='nxos-emulator-')
+            cert_file = os.path.join(directory, 'cert.pem')
+            key_file = os.path.join(directory, 'key.pem')
+            with open(cert_file, 'wb') as handle:
+                handle.write(cert.public_bytes(serialization.Encoding.PEM))
+            with open(key_file, 'wb') as handle:
+                handle.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+            _certificate.extend([cert_file, key_file])
+        return _certificate[0], _certificate[1]
+
+
+class _HttpHandler(http.server.BaseHTTPRequestHandler):
+    # RESTCONF and NX-API requests of one device, keep-alive connections like the device's web server
+    protocol_version = 'HTTP/1.1'
+    server_version = 'nginx'
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body=b'', content_type=None):
+        self.server.device.count('bytes_out', len(body))
+        self.send_response(status)
+        if content_type and body:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def handle_request(self, method):
+        device = self.server.device
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        device.count('bytes_in', len(body))
+        if not device.begin_request():
+            return self.reply(503, b'{"error": "too many requests"}', 'application/json')
+        try:
+            if not self._authorized():
+                device.count('auth_failures')
+                return self.reply(401, b'', None)
+            path = urlsplit(self.path).path
+            if path == restconf.INS_PATH and method == 'POST':
+                device.count('http:ins')
+                device.delay()
+                status, reply = nxapi_reply(device, body)
+                return self.reply(status, reply, 'application/json-rpc; charset=UTF-8')
+            if path == restconf.SYSTEM_PATH or path.startswith(restconf.SYSTEM_PATH + '/'):
+                device.count('http:' + method)
+                device.delay()
+                return self.restconf(method, path[len(restconf.SYSTEM_PATH):], body)
+            return self.reply(404, b'', None)
+        finally:
+            device.end_request()
+
+    def restconf(self, method, path, body):
+        device = self.server.device
+        accept = restconf.JSON if 'json' in (self.headers.get('Accept') or '') else restconf.XML
+        content_type = restconf.JSON if 'json' in (self.headers.get('Content-Type') or '') else restconf.XML
+        try:
+            if method == 'GET':
+                status, reply = device.restconf_get(path, accept)
+                return self.reply(status, reply, accept)
+            if method == 'PATCH':
+                device.restconf_patch(path, body, content_type)
+                return self.reply(204)
+            if method == 'DELETE':
+                device.restconf_delete(path)
+                return self.reply(204)
+            return self.reply(405)
+        except RpcError as e:
+            device.count('restconf_errors')
+            error = {'errors': {'error': [{'error-type': 'application', 'error-tag': e.tag, 'error-message': str(e)}]}}
+            return self.reply(e.status, json.dumps(error).encode('utf-8'), restconf.JSON)
+
+    def _authorized(self):
+        header = self.headers.get('Authorization') or ''
+        if not header.lower().startswith('basic '):
+            return self.server.device.credentials is None
+        try:
+            user, _, passwd = base64.b64decode(header[6:]).decode('utf-8').partition(':')
+        except (ValueError, UnicodeDecodeError):
+            return False
+        return self.server.device.authenticate(user, passwd)
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_PATCH(self):
+        self.handle_request('PATCH')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+
+def nxapi_reply(device, body):
+    # (HTTP status, body) of a JSON-RPC request, one result or error per command in the order of the request. Like
+    # the device the batch stops at the first failed command.
+    try:
+        request = json.loads(body.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return 500, json.dumps({'jsonrpc': '2.0', 'error': {'code': -32700, 'message': 'Parse error'}, 'id': None}).encode('utf-8')
+    commands = request if isinstance(request, list) else [request]
+    replies = []
+    status = 200
+    for command in commands:
+        params = command.get('params') or {}
+        method = command.get('method')
+        if method not in ('cli', 'cli_ascii'):
+            replies.append({'jsonrpc': '2.0', 'error': {'code': -32601, 'message': 'Method not found'}, 'id': command.get('id')})
+            status = 500
+            break
+        try:
+            text, structured = device.cli(params.get('cmd', ''))
+        except RpcError as e:
+            replies.append({'jsonrpc': '2.0', 'error': {'code': -32602, 'message': 'Invalid params', 'data': {'msg': str(e) + '\n'}}, 'id': command.get('id')})
+            status = 500
+            break
+        device.count('nxapi_commands')
+        if method == 'cli_ascii':
+            result = {'msg': text}
+        else:
+            result = {'body': structured} if structured is not None else None
+        replies.append({'jsonrpc': '2.0', 'result': result, 'id': command.get('id')})
+    reply = replies[0] if len(commands) == 1 else replies
+    return status, json.dumps(reply).encode('utf-8')
+
+
+class _HttpsServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, device, context):
+        self.device = device
+        self.context = context
+        http.server.HTTPServer.__init__(self, address, _HttpHandler)
+
+    def finish_request(self, request, client_address):
+        # The TLS handshake runs in the thread of the connection, a slow client does not hold up the others
+        self.device.count('https_connects')
+        # Headers and body go out in two writes, without TCP_NODELAY the body waits for the delayed ACK of the client
+        request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        request = self.context.wrap_socket(request, server_side=True)
+        self.RequestHandlerClass(request, client_address, self)
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+class Emulator(object):
+    # Servers of a set of EmulatedDevices. start() binds the SSH and HTTPS ports of every device on its address.
+
+    def __init__(self, devices, ports=None):
+        self.devices = list(devices)
+        self.ports = dict(PORTS, **(ports or {}))
+        self._sockets = []
+        self._servers = []
+        self._transports = []
+        self._running = False
+
+    def start(self):
+        self._running = True
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certificate())
+        try:
+            for device in self.devices:
+                for interface in ('xmlagent', 'netconf'):
+                    sock = socket.socket(socket.AF_INET6 if ':' in device.address else socket.AF_INET, socket.SOCK_STREAM)
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                    sock.bind((device.address, self.ports[interface]))
+                    sock.listen(64)
+                    self._sockets.append(sock)
+                    threading.Thread(target=self._accept, args=(sock, device, SUBSYSTEMS[interface]), daemon=True).start()
+                server = _HttpsServer((device.address, self.ports['https']), device, context)
+                self._servers.append(server)
+                threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.2}, daemon=True).start()
+        except Exception:
+            self.stop()
+            raise
+        return self
+
+    def _accept(self, sock, device, subsystems):
+        import paramiko
+        while self._running:
+            try:
+                client, _ = sock.accept()
+            except OSError:
+                return
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            device.count('ssh_connects')
+            transport = paramiko.Transport(client)
+            transport.add_server_key(host_key())
+            try:
+                transport.start_server(server=_ssh_server(device, subsystems))
+            except (paramiko.SSHException, EOFError, OSError):
+                continue
+            self._transports = [t for t in self._transports if t.is_active()] + [transport]
+
+    def stop(self):
+        self._running = False
+        for sock in self._sockets:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        for transport in self._transports:
+            transport.close()
+        self._sockets, self._servers, self._transports = [], [], []
+
+    def stats(self):
+        # address -> counters of every device, plus the sum over all of them under 'total'
+        result = collections.OrderedDict((device.address, device.stats()) for device in self.devices)
+        total = collections.Counter()
+        for counters in result.values():
+            total.update(counters)
+        result['total'] = dict(total)
+        return result
+
+    def reset_stats(self):
+        for device in self.devices:
+            device.reset_stats()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+
+def addresses(first, count):
+    # count consecutive addresses starting at first
+    start = ipaddress.ip_address(first)
+    return [str(start + offset) for offset in range(count)]
+
+
+def write_inventory(devices, filename, group='nxos'):
+    # Ansible INI inventory of the emulated devices for the fleet tools (-i)
+    with open(filename, 'w') as handle:
+        handle.write('[' + group + ']\n')
+        for device in devices:
+            handle.write('%s ansible_host=%s\n' % (device.hostname, device.address))
@@ -0,0 +1,107 @@
+# Feature state of NX-OS devices. Features live under System/fm-items, one <xxx-items> container per feature with an
+# adminSt leaf. The table below maps the short names the scripts use to those containers, parse_features() reads all of
+# fm-items in a single pass over its children and hands back one record for the device.
+
+import collections
+from lxml import etree
+
+NXOS_NS = 'http://cisco.com/ns/yang/cisco-nx-os-device'
+
+# Short name -> fm-items container, with the CLI it corresponds to
+FEATURES = collections.OrderedDict([
+    ('ifvlan', 'ifvlan-items'),        # feature interface-vlan
+    ('bgp', 'bgp-items'),              # feature bgp
+    ('ospf', 'ospf-items'),            # feature ospf
+    ('pim', 'pim-items'),              # feature pim
+    ('vnsegment', 'vnsegment-items'),  # feature vn-segment-vlan-based
+    ('evpn', 'evpn-items'),            # nv overlay evpn
+    ('nvo', 'nvo-items'),              # feature nv overlay
+    ('isis', 'isis-items'),            # feature isis
+    ('lacp', 'lacp-items'),            # feature lacp
+    ('lldp', 'lldp-items'),            # feature lldp
+    ('hsrp', 'hsrp-items'),            # feature hsrp
+    ('vpc', 'vpc-items'),              # feature vpc
+    ('nxapi', 'nxapi-items'),          # feature nxapi
+])
+BY_CONTAINER = dict((container, name) for name, container in FEATURES.items())
+
+# Features a VXLAN EVPN leaf needs, the set NXOS-ncclient-vxlanevpn-leaf.py checks and enables
+VXLAN_FEATURES = ('ifvlan', 'bgp', 'ospf', 'pim', 'vnsegment', 'evpn', 'nvo')
+
+ENABLED = 'enabled'
+# RESTCONF path of fm-items, relative to the System root
+RESTCONF_PATH = 'fm-items'
+
+
+def feature_filter(features=VXLAN_FEATURES):
+    # Subtree filter that returns only the fm-items containers of the requested features.
+    items = ''.join('\n        <' + FEATURES[name] + '/>' for name in features)
+    return '''
+<System xmlns="''' + NXOS_NS + '''">
+    <fm-items>''' + items + '''
+    </fm-items>
+</System>'''
+
+
+def parse_features(data, features=VXLAN_FEATURES):
+    # Read the adminSt of every requested feature from a reply (NETCONF data_ele, RESTCONF XML body or the fm-items
+    # element itself) in one pass over the fm-items children. Returns an OrderedDict of name -> adminSt, None for a
+    # feature the device did not report. Raises ValueError if the reply has no fm-items at all.
+    if not isinstance(data, etree._Element):
+        data = etree.fromstring(data if isinstance(data, bytes) else data.encode('utf-8'))
+    fm_items = next(data.iter('{%s}fm-items' % NXOS_NS, 'fm-items'), None)
+    if fm_items is None:
+        raise ValueError('reply does not contain fm-items')
+    wanted = set(features)
+    state = collections.OrderedDict((name, None) for name in features)
+    for container in fm_items:
+        if not isinstance(container.tag, str):
+            continue
+        name = BY_CONTAINER.get(etree.QName(container).localname)
+        if name not in wanted:
+            continue
+        for leaf in container:
+            if isinstance(leaf.tag, str) and etree.QName(leaf).localname == 'adminSt':
+                state[name] = (leaf.text or '').strip()
+                break
+    return state
+
+
+def disabled(state):
+    # Features the device reported as anything but enabled, in table order. Features the device did not report are
+    # left out, they cannot be enabled through fm-items on that device anyway.
+    return [name for name, admin_state in state.items() if admin_state is not None and admin_state != ENABLED]
+
+
+def missing(state):
+    # Features that are not enabled, including the ones the device did not report.
+    return [name for name, admin_state in state.items() if admin_state != ENABLED]
+
+
+def fetch_netconf(device, features=VXLAN_FEATURES):
+    res = device.get(('subtree', feature_filter(features)))
+    return parse_features(res.data_ele, features)
+
+
+def fetch_restconf(rc, features=VXLAN_FEATURES):
+    response = rc.get(RESTCONF_PATH)
+    response.raise_for_status()
+    return parse_features(response.content, features)
+
+
+def matrix(rows, features):
+    # Text matrix of devices against features. rows is a list of (device, state or error string).
+    # Y = enabled, - = disabled, ? = not reported by the device.
+    width = max([len('Device')] + [len(device) for device, _ in rows])
+    lines = ['Device'.ljust(width) + '  ' + ' '.join(features)]
+    for device, state in rows:
+        if not isinstance(state, dict):
+            lines.append(device.ljust(width) + '  ERROR ' + str(state))
+            continue
+        cells = []
+        for name in features:
+            admin_state = state.get(name)
+            mark = '?' if admin_state is None else ('Y' if admin_state == ENABLED else '-')
+            cells.append(mark.rjust(len(name)))
+        lines.append(device.ljust(width) + '  ' + ' '.join(cells))
+    return '\n'.join(lines)
@@ -0,0 +1,108 @@
+# Concurrent execution of a per-device task across a fleet. The existing functions are written for one device and
+# are mostly bound by network round trips, so a bounded thread pool drives them in parallel: workers caps the number
+# of devices in flight. Every device gets a DeviceResult with the return value or the error, the time it took and
+# everything the task printed. Output is captured per thread so the lines of 300 devices do not interleave.
+
+import io, json, sys, threading, time, traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_WORKERS = 16
+
+
+class DeviceResult(object):
+
+    def __init__(self, host, ok, value=None, error=None, elapsed=0.0, output=''):
+        self.host = host
+        self.ok = ok
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+        self.output = output
+
+    def as_dict(self):
+        return {'host': self.host, 'ok': self.ok, 'value': self.value, 'error': self.error, 'elapsed': round(self.elapsed, 3), 'output': self.output}
+
+
+class _ThreadOutput(object):
+    # Stand-in for sys.stdout while a fleet run is active. Writes from a worker thread go to that thread's buffer,
+    # writes from any other thread go to the real stdout.
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def start(self):
+        self.local.buffer = io.StringIO()
+
+    def stop(self):
+        buffer = getattr(self.local, 'buffer', None)
+        self.local.buffer = None
+        return buffer.getvalue() if buffer is not None else ''
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is not None:
+            return buffer.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def _run_one(output, host, task, args):
+    output.start()
+    start = time.time()
+    try:
+        value = task(host, *args)
+        ok, error = True, None
+    except SystemExit as e:
+        # The pre-checks of the single device scripts end with sys.exit("reason"), that is a failed device here and
+        # must not take the whole fleet run down.
+        value, ok, error = None, False, str(e.code)
+    except Exception as e:
+        value, ok, error = None, False, '%s: %s' % (type(e).__name__, e)
+        if getattr(task, 'debug', False):
+            print(traceback.format_exc())
+    elapsed = time.time() - start
+    return DeviceResult(getattr(host, 'name', host), ok, value, error, elapsed, output.stop())
+
+
+def run_fleet(hosts, task, workers=DEFAULT_WORKERS, args=(), progress=None):
+    # Run task(host, *args) for every host with at most workers devices in flight. Returns the DeviceResults in
+    # the order of hosts. progress(result) is called from the main thread as each device finishes.
+    results = {}
+    output = _ThreadOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = dict((pool.submit(_run_one, output, host, task, args), index) for index, host in enumerate(hosts))
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                if progress is not None:
+                    progress(result)
+    finally:
+        sys.stdout = output.stream
+    return [results[index] for index in range(len(hosts))]
+
+
+def print_progress(result):
+    status = 'OK  ' if result.ok else 'FAIL'
+    detail = result.value if result.ok else result.error
+    print('%s %-20s %6.1fs  %s' % (status, result.host, result.elapsed, '' if detail is None else detail))
+
+
+def print_summary(results, started):
+    ok = [r for r in results if r.ok]
+    failed = [r for r in results if not r.ok]
+    print('%d devices, %d succeeded, %d failed in %.1fs' % (len(results), len(ok), len(failed), time.time() - started))
+    for result in failed:
+        print('  ' + result.host + ': ' + str(result.error))
+
+
+def write_results(results, filename):
+    with open(filename, 'w') as handle:
+        json.dump([result.as_dict() for result in results], handle, indent=2)
@@ -0,0 +1,253 @@
+# Point in time configuration history. Hourly full copies of every device for a year are mostly the same text over and
+# over and nothing relates one backup to the next. ConfigHistory keeps, per device, a chain of versions:
+#   - every base_every versions (and for the first one) the full configuration is stored, compressed
+#   - the versions in between only store the line level delta against the version before them (difflib opcodes)
+# Rebuilding any version starts from the base at or before it and applies at most base_every - 1 deltas, so the cost
+# of a point in time lookup is bounded no matter how long the history gets.
+#
+# Every delta also records the lines it added and removed in an indexed table, so "when did this line change" is one
+# index lookup instead of a scan through every backup.
+#
+# YANG XML snapshots (anything starting with "<") are normalised to one element per line before they are compared,
+# so a change to one leaf or list entry is a small delta of the lines of that subtree.
+#
+# Everything lives in one SQLite database (history.db under the root directory).
+
+import difflib, hashlib, json, os, sqlite3, threading, time, zlib
+from lxml import etree
+
+BASE_EVERY = 24
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS versions (
+    device TEXT NOT NULL, version INTEGER NOT NULL, time REAL NOT NULL, label TEXT, base INTEGER NOT NULL,
+    size INTEGER NOT NULL, sha256 TEXT NOT NULL, data BLOB NOT NULL, PRIMARY KEY (device, version));
+CREATE INDEX IF NOT EXISTS versions_time ON versions (device, time);
+CREATE TABLE IF NOT EXISTS changes (
+    device TEXT NOT NULL, version INTEGER NOT NULL, op TEXT NOT NULL, line TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS changes_line ON changes (line, device);
+'''
+
+
+def normalize(text):
+    # Text to compare line by line. XML is re-indented with one element per line, show running-config is kept as is.
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    if text.lstrip().startswith('<'):
+        parser = etree.XMLParser(remove_blank_text=True, huge_tree=True, resolve_entities=False)
+        root = etree.fromstring(text.lstrip().encode('utf-8'), parser)
+        text = etree.tostring(root, encoding='unicode', pretty_print=True)
+    return text
+
+
+def make_delta(old, new):
+    # Opcodes that turn the list of lines old into new: [start, end, replacement lines] against old. Consecutive
+    # snapshots are mostly equal, the common head and tail are skipped before difflib looks at what is left.
+    head = 0
+    limit = min(len(old), len(new))
+    while head < limit and old[head] == new[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and old[-1 - tail] == new[-1 - tail]:
+        tail += 1
+    old_mid = old[head:len(old) - tail]
+    new_mid = new[head:len(new) - tail]
+    if not old_mid or not new_mid:
+        return [[head, head + len(old_mid), new_mid]] if old_mid or new_mid else []
+    matcher = difflib.SequenceMatcher(None, old_mid, new_mid)
+    return [[head + i1, head + i2, new_mid[j1:j2]] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+
+def apply_delta(lines, delta):
+    # Applied back to front so the offsets of the earlier opcodes stay valid
+    lines = list(lines)
+    for start, end, replacement in reversed(delta):
+        lines[start:end] = replacement
+    return lines
+
+
+class ConfigHistory(object):
+
+    def __init__(self, root, base_every=BASE_EVERY, level=6):
+        self.root = root
+        self.base_every = base_every
+        self.level = level
+        if not os.path.isdir(root):
+            os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, 'history.db')
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        # Lines of the newest version of each device, so adding a version does not rebuild the previous one
+        self._latest = {}
+
+    def close(self):
+        self._db.close()
+
+    # Adding versions
+
+    def add(self, device, text, label='', timestamp=None):
+        # Record a new version of the configuration of device. Returns the version number.
+        lines = normalize(text).splitlines(True)
+        encoded = ''.join(lines).encode('utf-8')
+        digest = hashlib.sha256(encoded).hexdigest()
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            last = self._db.execute('SELECT version, base FROM versions WHERE device = ? ORDER BY version DESC LIMIT 1', (device,)).fetchone()
+            if last is None:
+                version, previous = 1, []
+            else:
+                version, previous = last[0] + 1, self._lines(device, last[0])
+            delta = make_delta(previous, lines)
+            if last is None or version - last[1] >= self.base_every:
+                base, payload = version, encoded
+            else:
+                base, payload = last[1], json.dumps(delta, separators=(',', ':')).encode('utf-8')
+            with self._db:
+                self._db.execute('INSERT INTO versions VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                 (device, version, timestamp, label, base, len(encoded), digest, zlib.compress(payload, self.level)))
+                self._db.executemany('INSERT INTO changes VALUES (?, ?, ?, ?)', self._changes(device, version, previous, delta))
+            self._latest[device] = (version, lines)
+        return version
+
+    def _changes(self, device, version, previous, delta):
+        for start, end, replacement in delta:
+            for line in previous[start:end]:
+                if line.strip():
+                    yield (device, version, '-', line.strip())
+            for line in replacement:
+                if line.strip():
+                    yield (device, version, '+', line.strip())
+
+    def writer(self, device, label='', timestamp=None):
+        return HistoryWriter(self, device, label, timestamp)
+
+    # Reading versions
+
+    def _lines(self, device, version):
+        cached = self._latest.get(device)
+        if cached and cached[0] == version:
+            return cached[1]
+        row = self._db.execute('SELECT base FROM versions WHERE device = ? AND version = ?', (device, version)).fetchone()
+        if row is None:
+            raise KeyError('no version ' + str(version) + ' of ' + device)
+        rows = self._db.execute('SELECT version, data FROM versions WHERE device = ? AND version BETWEEN ? AND ? ORDER BY version',
+                                (device, row[0], version)).fetchall()
+        lines = zlib.decompress(rows[0][1]).decode('utf-8').splitlines(True)
+        for _, data in rows[1:]:
+            lines = apply_delta(lines, json.loads(zlib.decompress(data).decode('utf-8')))
+        return lines
+
+    def get(self, device, version):
+        # Configuration text of a version, checked against the hash recorded when it was added
+        with self._lock:
+            text = ''.join(self._lines(device, version))
+            digest = self._db.execute('SELECT sha256 FROM versions WHERE device = ? AND version = ?', (device, version)).fetchone()[0]
+        if hashlib.sha256(text.encode('utf-8')).hexdigest() != digest:
+            raise ValueError('version ' + str(version) + ' of ' + device + ' does not match its hash')
+        return text
+
+    def version_at(self, device, timestamp):
+        # Newest version recorded at or before timestamp, None if the history starts later
+        with self._lock:
+            row = self._db.execute('SELECT version FROM versions WHERE device = ? AND time <= ? ORDER BY time DESC, version DESC LIMIT 1',
+                                   (device, timestamp)).fetchone()
+        return row[0] if row else None
+
+    def at(self, device, timestamp):
+        version = self.version_at(device, timestamp)
+        if version is None:
+            raise KeyError('no version of ' + device + ' at or before ' + time.ctime(timestamp))
+        return self.get(device, version)
+
+    def log(self, device):
+        # (version, time, label, size, is base, number of changed lines) for every version, oldest first
+        with self._lock:
+            return self._db.execute('''SELECT v.version, v.time, v.label, v.size, v.version = v.base,
+                (SELECT COUNT(*) FROM changes c WHERE c.device = v.device AND c.version = v.version)
+                FROM versions v WHERE v.device = ? ORDER BY v.version''', (device,)).fetchall()
+
+    def stored_size(self, device, version):
+        with self._lock:
+            row = self._db.execute('SELECT LENGTH(data) FROM versions WHERE device = ? AND version = ?', (device, version)).fetchone()
+        return row[0] if row else 0
+
+    def devices(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute('SELECT DISTINCT device FROM versions ORDER BY device')]
+
+    def changes(self, line, device=None, substring=False):
+        # When was a line added or removed: (device, version, time, op, line) rows, oldest first. Lines are compared
+        # without their indentation. The exact match is answered from the index, substring=True matches anywhere in
+        # the line.
+        if substring:
+            query, value = 'c.line LIKE ?', '%' + line.strip().replace('%', '\\%').replace('_', '\\_') + '%'
+            query += " ESCAPE '\\'"
+        else:
+            query, value = 'c.line = ?', line.strip()
+        params = [value]
+        if device is not None:
+            query += ' AND c.device = ?'
+            params.append(device)
+        with self._lock:
+            return self._db.execute('SELECT c.device, c.version, v.time, c.op, c.line FROM changes c JOIN versions v '
+                                    'ON v.device = c.device AND v.version = c.version WHERE ' + query +
+                                    ' ORDER BY v.time, c.version', params).fetchall()
+
+    def stats(self):
+        with self._lock:
+            row = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0), '
+                                   'COALESCE(SUM(version = base), 0) FROM versions').fetchone()
+        return {'versions': row[0], 'logical_bytes': row[1], 'stored_bytes': row[2], 'bases': row[3],
+                'file_bytes': os.path.getsize(self.path)}
+
+
+class HistoryWriter(object):
+    # File like object for the backup code: collects what is written and adds it as a version on commit, the same
+    # interface as snapshot.SnapshotWriter and store.StoreWriter. The delta needs the whole text, so it is buffered.
+
+    def __init__(self, history, device, label='', timestamp=None):
+        self.history = history
+        self.device = device
+        self.label = label
+        self.timestamp = timestamp
+        self.parts = []
+        self.bytes_written = 0
+        self.bytes_stored = 0
+        self.version = None
+        self.path = None
+        self.closed = False
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.parts.append(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def commit(self):
+        if self.closed:
+            return self.version
+        self.version = self.history.add(self.device, b''.join(self.parts), self.label, self.timestamp)
+        self.parts = []
+        self.bytes_stored = self.history.stored_size(self.device, self.version)
+        self.path = 'history:' + self.device + '@v' + str(self.version)
+        self.closed = True
+        return self.version
+
+    def close(self):
+        self.commit()
+
+    def abort(self):
+        self.parts = []
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
@@ -0,0 +1,106 @@
+# Device inventory handling for the fleet tools. Two formats are accepted:
+#   - the Ansible INI inventory used by Ansible/Snippets/device-inventory, a [nxos] header followed by one host per line
+#     with optional key=value variables (ansible_host, ansible_user and ansible_password are honoured)
+#   - a plain host list, hosts separated by commas, spaces or new lines.
+# "#" starts a comment in both formats at the start of a line or after a space, outside of quotes, so a password like
+# ansible_password=ab#12 is kept whole.
+
+import collections, os, re, shlex
+
+InventoryHost = collections.namedtuple('InventoryHost', 'name address vars')
+
+SECTION = re.compile(r'^\[([^\]]+)\]$')
+
+
+def _strip_comment(line):
+    # line without its comment, see above
+    quote = None
+    for index, char in enumerate(line):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '#' and (index == 0 or line[index - 1].isspace()):
+            return line[:index]
+    return line
+
+
+def _host_line(line):
+    # Host name and key=value variables, quoted values may hold spaces like Ansible allows
+    try:
+        fields = shlex.split(line)
+    except ValueError:
+        fields = [field.strip('"\'') for field in line.split()]
+    hostvars = {}
+    for field in fields[1:]:
+        if '=' in field:
+            key, value = field.split('=', 1)
+            hostvars[key] = value
+    return InventoryHost(fields[0], hostvars.get('ansible_host', fields[0]), hostvars)
+
+
+def parse_inventory(text, group='nxos'):
+    # Return the hosts of one group of an Ansible INI inventory. Child groups ([group:children]) are followed so a
+    # [nxos] group made of [leafs] and [spines] works too. A file without any section header is read as a host list.
+    sections = collections.OrderedDict()
+    current = None
+    for raw in text.splitlines():
+        line = _strip_comment(raw).strip()
+        if not line:
+            continue
+        header = SECTION.match(line)
+        if header:
+            current = sections.setdefault(header.group(1), [])
+            continue
+        if current is None:
+            # No section header seen yet, treat the whole file as a plain host list
+            return parse_hostlist(text)
+        current.append(line)
+    if not sections:
+        return []
+    return _group_hosts(sections, group, set())
+
+
+def _group_hosts(sections, group, seen):
+    if group in seen:
+        return []
+    seen.add(group)
+    hosts = [_host_line(line) for line in sections.get(group, [])]
+    for child in sections.get(group + ':children', []):
+        hosts.extend(_group_hosts(sections, child.split()[0], seen))
+    return hosts
+
+
+def parse_hostlist(text):
+    hosts = []
+    for raw in text.splitlines():
+        line = _strip_comment(raw)
+        for name in re.split(r'[,\s]+', line.strip()):
+            if name:
+                hosts.append(InventoryHost(name, name, {}))
+    return hosts
+
+
+def load_hosts(inventory=None, hostlist=None, group='nxos'):
+    # Build the device list for a fleet run from an inventory file and/or a host list. The host list may be the name
+    # of a file or the hosts themselves ("10.1.1.1,10.1.1.2"). Duplicates are dropped, the first occurrence wins.
+    hosts = []
+    if inventory:
+        with open(inventory) as handle:
+            hosts.extend(parse_inventory(handle.read(), group))
+    if hostlist:
+        if os.path.isfile(hostlist):
+            with open(hostlist) as handle:
+                hosts.extend(parse_hostlist(handle.read()))
+        else:
+            hosts.extend(parse_hostlist(hostlist))
+    unique = collections.OrderedDict()
+    for host in hosts:
+        unique.setdefault(host.name, host)
+    return list(unique.values())
+
+
+def credentials(host, user, passwd):
+    # Per host credentials from the inventory win over the ones given on the command line.
+    return host.vars.get('ansible_user', user), host.vars.get('ansible_password', host.vars.get('ansible_ssh_pass', passwd))
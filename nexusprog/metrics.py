@@ -0,0 +1,380 @@
+# RPC level instrumentation. Debug output so far is print(str(res)) under DebugON or logging.DEBUG, which dumps every
+# payload but says nothing about where the time of a change window goes. enable() puts a thin timing layer around
+# every session and every request the scripts make, with no change to the scripts themselves:
+#   - ncclient manager.connect    : connect time (SSH, authentication, NETCONF hello) per device and subsystem
+#   - every ncclient RPC          : get, get_config, edit_config, exec_command, lock, commit, ... round trip time,
+#                                   request and reply size, time spent parsing the reply, errors
+#   - RestconfClient requests     : the same for RESTCONF and NX-API (/ins), the TLS handshakes of the pool as connects
+#                                   and the decoding of the replies (read, leaf_values, nxapi.post) as parse time
+# Everything is recorded per device, transport and operation by a Recorder and exported as a Prometheus text file
+# (node_exporter textfile collector or promtool) and as a JSON trace in the Chrome trace event format, one row per
+# device and thread in chrome://tracing or ui.perfetto.dev. Without enable() the hooks cost one global lookup.
+# enable() does not import ncclient: when a run has not loaded it yet, the ncclient hooks go in right after its first
+# import, so a RESTCONF run with metrics on still never loads ncclient.
+#
+#   metrics.enable()
+#   ... run the workflow or the fleet ...
+#   metrics.export('run.prom', 'run-trace.json')
+
+import contextlib, importlib.util, json, re, sys, threading, time
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Trace events kept in memory, a long fleet run drops the ones over this (the counters keep counting)
+MAX_EVENTS = 200000
+
+_recorder = None
+_installed = False
+_install_lock = threading.Lock()
+
+
+class _Series(object):
+    # Counters of one device/transport/operation
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.request_bytes = 0
+        self.reply_bytes = 0
+        self.parse_count = 0
+        self.parse_seconds = 0.0
+
+    def observe(self, elapsed, error):
+        self.count += 1
+        self.seconds += elapsed
+        self.max = max(self.max, elapsed)
+        if error is not None:
+            self.errors += 1
+        for index, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                self.buckets[index] += 1
+                break
+
+
+class Recorder(object):
+    # Thread safe store of the connects, requests and parses of a run. Timestamps are time.time() values, the trace
+    # shows them relative to the creation of the recorder.
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.started = time.time()
+        self.max_events = max_events
+        self.connects = {}
+        self.requests = {}
+        self.events = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def _event(self, name, category, device, start, elapsed, args):
+        if len(self.events) >= self.max_events:
+            self.dropped += 1
+            return
+        self.events.append((name, category, device, threading.current_thread().name, start, elapsed, args))
+
+    def connect(self, device, transport, start, elapsed, error=None):
+        with self._lock:
+            series = self.connects.get((device, transport))
+            if series is None:
+                series = self.connects[(device, transport)] = _Series()
+            series.observe(elapsed, error)
+            self._event('connect', transport, device, start, elapsed, {'error': error} if error is not None else {})
+
+    def request(self, device, transport, operation, start, elapsed, request_bytes=0, reply_bytes=0, parse=0.0, error=None):
+        # elapsed is the round trip without the parse time, so the two add up to the wall clock time of the call
+        with self._lock:
+            series = self.requests.get((device, transport, operation))
+            if series is None:
+                series = self.requests[(device, transport, operation)] = _Series()
+            series.observe(elapsed, error)
+            series.request_bytes += request_bytes
+            series.reply_bytes += reply_bytes
+            if parse:
+                series.parse_count += 1
+                series.parse_seconds += parse
+            args = {'request_bytes': request_bytes, 'reply_bytes': reply_bytes}
+            if parse:
+                args['parse_ms'] = round(parse * 1000, 3)
+            if error is not None:
+                args['error'] = error
+            self._event(operation, transport, device, start, elapsed, args)
+
+    def parse(self, device, transport, operation, start, elapsed):
+        # Decoding of a reply done after the request returned (RESTCONF and NX-API replies)
+        with self._lock:
+            series = self.requests.get((device, transport, operation))
+            if series is None:
+                series = self.requests[(device, transport, operation)] = _Series()
+            series.parse_count += 1
+            series.parse_seconds += elapsed
+            self._event('parse ' + operation, transport, device, start, elapsed, {})
+
+    def report(self):
+        # Totals per transport and operation over all devices, the most expensive first. Connects are reported as
+        # operation "connect".
+        rows = {}
+        with self._lock:
+            items = [((transport, 'connect'), series) for (device, transport), series in self.connects.items()]
+            items.extend(((transport, operation), series) for (device, transport, operation), series in self.requests.items())
+            for key, series in items:
+                row = rows.get(key)
+                if row is None:
+                    row = rows[key] = {'transport': key[0], 'operation': key[1], 'devices': 0, 'count': 0, 'errors': 0, 'seconds': 0.0,
+                                       'max': 0.0, 'request_bytes': 0, 'reply_bytes': 0, 'parse_seconds': 0.0}
+                row['devices'] += 1
+                row['count'] += series.count
+                row['errors'] += series.errors
+                row['seconds'] += series.seconds
+                row['max'] = max(row['max'], series.max)
+                row['request_bytes'] += series.request_bytes
+                row['reply_bytes'] += series.reply_bytes
+                row['parse_seconds'] += series.parse_seconds
+        return sorted(rows.values(), key=lambda row: row['seconds'] + row['parse_seconds'], reverse=True)
+
+    def print_report(self):
+        rows = self.report()
+        print("%-10s %-16s %7s %7s %7s %10s %9s %9s %12s %12s %9s" % ('transport', 'operation', 'devices', 'calls', 'errors', 'total s',
+                                                                     'avg ms', 'max ms', 'sent', 'received', 'parse s'))
+        for row in rows:
+            print("%-10s %-16s %7d %7d %7d %10.3f %9.1f %9.1f %12d %12d %9.3f" % (row['transport'], row['operation'], row['devices'], row['count'],
+                  row['errors'], row['seconds'], row['seconds'] * 1000 / row['count'] if row['count'] else 0.0, row['max'] * 1000,
+                  row['request_bytes'], row['reply_bytes'], row['parse_seconds']))
+
+    def prometheus(self):
+        # Prometheus text exposition format (version 0.0.4)
+        lines = []
+        with self._lock:
+            connects = sorted(self.connects.items())
+            requests = sorted(self.requests.items())
+
+            def family(name, kind, text):
+                lines.append('# HELP ' + name + ' ' + text)
+                lines.append('# TYPE ' + name + ' ' + kind)
+
+            family('nxos_connect_seconds', 'histogram', 'Time to open a session: SSH, authentication and NETCONF hello, or the TLS handshake for HTTPS')
+            for (device, transport), series in connects:
+                _histogram(lines, 'nxos_connect_seconds', {'device': device, 'transport': transport}, series)
+            family('nxos_connect_errors_total', 'counter', 'Sessions that could not be opened')
+            for (device, transport), series in connects:
+                lines.append(_sample('nxos_connect_errors_total', {'device': device, 'transport': transport}, series.errors))
+            family('nxos_request_seconds', 'histogram', 'Round trip time of an RPC or HTTP request, without parsing the reply')
+            for (device, transport, operation), series in requests:
+                _histogram(lines, 'nxos_request_seconds', {'device': device, 'transport': transport, 'operation': operation}, series)
+            for name, attribute, kind, text in (('nxos_request_errors_total', 'errors', 'counter', 'RPC errors, HTTP error replies, timeouts and dropped sessions'),
+                                                ('nxos_request_bytes_total', 'request_bytes', 'counter', 'Bytes of the RPCs and request bodies sent'),
+                                                ('nxos_reply_bytes_total', 'reply_bytes', 'counter', 'Bytes of the RPC and HTTP replies received'),
+                                                ('nxos_parse_seconds_total', 'parse_seconds', 'counter', 'Time spent parsing replies'),
+                                                ('nxos_parse_total', 'parse_count', 'counter', 'Replies parsed')):
+                family(name, kind, text)
+                for (device, transport, operation), series in requests:
+                    lines.append(_sample(name, {'device': device, 'transport': transport, 'operation': operation}, getattr(series, attribute)))
+        return '\n'.join(lines) + '\n'
+
+    def trace(self):
+        # Chrome trace event format: a complete event ("X") per connect, request and parse, a process per device and a
+        # thread per worker thread
+        with self._lock:
+            events = list(self.events)
+            dropped = self.dropped
+        pids = {}
+        tids = {}
+        trace = []
+        for name, category, device, thread, start, elapsed, args in events:
+            if device not in pids:
+                pids[device] = len(pids) + 1
+                trace.append({'name': 'process_name', 'ph': 'M', 'pid': pids[device], 'args': {'name': device}})
+            if (device, thread) not in tids:
+                tids[(device, thread)] = len(tids) + 1
+                trace.append({'name': 'thread_name', 'ph': 'M', 'pid': pids[device], 'tid': tids[(device, thread)], 'args': {'name': thread}})
+            trace.append({'name': name, 'cat': category, 'ph': 'X', 'pid': pids[device], 'tid': tids[(device, thread)],
+                          'ts': round((start - self.started) * 1000000), 'dur': round(elapsed * 1000000), 'args': args})
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms',
+                'otherData': {'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)), 'dropped_events': dropped}}
+
+    def write_prometheus(self, filename):
+        with open(filename, 'w') as handle:
+            handle.write(self.prometheus())
+
+    def write_trace(self, filename):
+        with open(filename, 'w') as handle:
+            json.dump(self.trace(), handle)
+
+
+def _labels(labels):
+    return ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                    for name, value in sorted(labels.items()))
+
+
+def _sample(name, labels, value):
+    return name + '{' + _labels(labels) + '} ' + repr(value)
+
+
+def _histogram(lines, name, labels, series):
+    cumulative = 0
+    for bound, count in zip(BUCKETS, series.buckets):
+        cumulative += count
+        lines.append(_sample(name + '_bucket', dict(labels, le=repr(bound)), cumulative))
+    lines.append(_sample(name + '_bucket', dict(labels, le='+Inf'), series.count))
+    lines.append(_sample(name + '_sum', labels, series.seconds))
+    lines.append(_sample(name + '_count', labels, series.count))
+
+
+def error_text(e):
+    return '%s: %s' % (type(e).__name__, e)
+
+
+def operation_name(rpc):
+    # GetConfig -> get_config, ExecCommand -> exec_command, the names the scripts call them by
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', type(rpc).__name__).lower()
+
+
+def _install():
+    # Wrap the ncclient entry points once. The wrappers pass straight through when no recorder is active.
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        from ncclient import manager
+        from ncclient.operations import rpc
+        connect = manager.connect
+        wrap = rpc.RPC._wrap
+        request = rpc.RPC._request
+        parse = rpc.RPCReply.parse
+
+        def timed_connect(*args, **kwds):
+            recorder = _recorder
+            if recorder is None:
+                return connect(*args, **kwds)
+            host = kwds.get('host', args[0] if args else None)
+            transport = kwds.get('device_params', {}).get('ssh_subsystem_name', 'netconf')
+            start = time.time()
+            try:
+                device = connect(*args, **kwds)
+            except Exception as e:
+                recorder.connect(host, transport, start, time.time() - start, error_text(e))
+                raise
+            recorder.connect(host, transport, start, time.time() - start)
+            # Every RPC of the session finds its device and transport here
+            device._session.nx_metrics = (host, transport)
+            return device
+
+        def timed_wrap(self, subele):
+            req = wrap(self, subele)
+            self.nx_request_bytes = len(req)
+            return req
+
+        def timed_request(self, op):
+            recorder = _recorder
+            labels = getattr(self._session, 'nx_metrics', None)
+            if recorder is None or labels is None or self._async:
+                return request(self, op)
+            start = time.time()
+            error = None
+            try:
+                return request(self, op)
+            except Exception as e:
+                error = error_text(e)
+                raise
+            finally:
+                elapsed = time.time() - start
+                reply = self._reply
+                parse_time = getattr(reply, 'nx_parse_time', 0.0) if reply is not None else 0.0
+                reply_bytes = len(reply._raw) if reply is not None and reply._raw else 0
+                if error is None and reply is not None and reply.error is not None:
+                    # rpc-error the raise mode let through
+                    error = reply.error.message
+                recorder.request(labels[0], labels[1], operation_name(self), start, elapsed - parse_time,
+                                 getattr(self, 'nx_request_bytes', 0), reply_bytes, parse_time, error)
+
+        def timed_parse(self):
+            if _recorder is None or self._parsed:
+                return parse(self)
+            start = time.time()
+            try:
+                return parse(self)
+            finally:
+                self.nx_parse_time = time.time() - start
+
+        manager.connect = timed_connect
+        rpc.RPC._wrap = timed_wrap
+        rpc.RPC._request = timed_request
+        rpc.RPCReply.parse = timed_parse
+        _installed = True
+
+
+class _InstallOnImport(object):
+    # Import hook (sys.meta_path) that installs the ncclient wrappers once ncclient.manager has been imported
+
+    def find_spec(self, name, path, target=None):
+        if name != 'ncclient.manager':
+            return None
+        # Out of the way first, the lookup below and _install() import through sys.meta_path again
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(name)
+        if spec is None or spec.loader is None or not hasattr(spec.loader, 'exec_module'):
+            return spec
+        exec_module = spec.loader.exec_module
+
+        def exec_and_install(module):
+            exec_module(module)
+            _install()
+        spec.loader.exec_module = exec_and_install
+        return spec
+
+
+_install_on_import = _InstallOnImport()
+
+
+def enable(max_events=MAX_EVENTS):
+    # Start recording into a new Recorder and return it
+    global _recorder
+    if 'ncclient.manager' in sys.modules:
+        _install()
+    elif not _installed and _install_on_import not in sys.meta_path:
+        sys.meta_path.insert(0, _install_on_import)
+    _recorder = Recorder(max_events)
+    return _recorder
+
+
+def disable():
+    # Stop recording, returns the recorder that was active
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def active():
+    # Recorder in use or None, the hooks in restconf/nxapi check this before they take any time
+    return _recorder
+
+
+@contextlib.contextmanager
+def parsing(device, transport, operation):
+    # Time the decoding of a reply, for code that parses after the request returned
+    recorder = _recorder
+    if recorder is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        recorder.parse(device, transport, operation, start, time.time() - start)
+
+
+def export(prometheus=None, trace=None, report=True):
+    # Write the files of the active recorder and print the per operation totals. Nothing happens without enable().
+    recorder = _recorder
+    if recorder is None:
+        return None
+    if report:
+        recorder.print_report()
+    if prometheus:
+        recorder.write_prometheus(prometheus)
+        print("Metrics written to " + prometheus)
+    if trace:
+        recorder.write_trace(trace)
+        print("Trace written to " + trace + (" (" + str(recorder.dropped) + " events dropped)" if recorder.dropped else ""))
+    return recorder
@@ -0,0 +1,172 @@
+# Batched NX-API (/ins) execution. The /ins snippets post a JSON-RPC array holding a single command, one HTTP request
+# per command. NX-API takes the whole array in one request and answers with one result or error per command, each
+# carrying the id of its command. A Batch collects the commands of a job (the show commands of a pre-check, show
+# running-config for the backup, a checkpoint) and run() sends them as one POST over the pooled client of the device
+# (nexusprog.restconf), then matches the replies to the commands by id:
+#   - cli_ascii commands come back as text (result.msg), cli commands as structured data (result.body)
+#   - a command that failed, or that the device did not get to because an earlier one failed, has ok False and the
+#     error of the device
+#   - batches longer than max_batch commands are split into consecutive POSTs over the same connection. Like the device
+#     does within one POST, a failure stops the batch: the POSTs after it are not sent.
+#
+#   batch = nxapi.Batch()
+#   batch.extend(['show version', 'show interface status'])
+#   config = batch.add('show running-config')
+#   results = nxapi.run(rc, batch)
+#   results[config].output
+
+import json
+from nexusprog import metrics, readiness
+
+CLI = 'cli'
+CLI_ASCII = 'cli_ascii'
+METHODS = (CLI, CLI_ASCII)
+JSONRPC_VERSION = '2.0'
+# NX-API only answers a batch once every command in it has run, a very long one is split so a single reply does not
+# run into the request timeout
+MAX_BATCH = 50
+NOT_EXECUTED = 'not executed, an earlier command of the batch failed'
+
+
+class NxapiError(RuntimeError):
+    pass
+
+
+class CommandResult(object):
+
+    def __init__(self, id, cmd, method, ok, output=None, error=None, code=None):
+        self.id = id
+        self.cmd = cmd
+        self.method = method
+        self.ok = ok
+        # Text (cli_ascii) or structured data (cli) the device returned, None for a command without output
+        self.output = output
+        self.error = error
+        self.code = code
+
+    def as_dict(self):
+        return {'id': self.id, 'cmd': self.cmd, 'method': self.method, 'ok': self.ok, 'output': self.output, 'error': self.error}
+
+    def __repr__(self):
+        return 'CommandResult(%r, %r, ok=%r)' % (self.id, self.cmd, self.ok)
+
+
+class Batch(object):
+    # Commands sent in one JSON-RPC array. Every command gets the next id, add() returns its position in the results
+    # of run().
+
+    def __init__(self, method=CLI_ASCII):
+        if method not in METHODS:
+            raise ValueError('Unknown NX-API method %r, use one of %s' % (method, ', '.join(METHODS)))
+        self.method = method
+        self.commands = []
+
+    def add(self, cmd, method=None):
+        method = method or self.method
+        if method not in METHODS:
+            raise ValueError('Unknown NX-API method %r, use one of %s' % (method, ', '.join(METHODS)))
+        self.commands.append((len(self.commands) + 1, cmd, method))
+        return len(self.commands) - 1
+
+    def extend(self, commands, method=None):
+        return [self.add(cmd, method) for cmd in commands]
+
+    def __len__(self):
+        return len(self.commands)
+
+    def payload(self, start=0, stop=None):
+        # The JSON-RPC array of the commands start to stop
+        return [{"jsonrpc": JSONRPC_VERSION, "method": method, "params": {"cmd": cmd, "version": 1}, "id": id}
+                for id, cmd, method in self.commands[start:stop]]
+
+
+def _output(result):
+    if not isinstance(result, dict):
+        return result
+    if 'msg' in result:
+        return result['msg']
+    return result.get('body', result)
+
+
+def _error(error):
+    # The message of a JSON-RPC error object, with the CLI output NX-API puts in data.msg ("% Invalid command")
+    if not isinstance(error, dict):
+        return str(error)
+    message = error.get('message') or 'error'
+    data = error.get('data')
+    detail = data.get('msg') if isinstance(data, dict) else data
+    if detail:
+        message = message + ': ' + str(detail).strip()
+    return message
+
+
+def parse_reply(commands, reply):
+    # CommandResults of commands (the (id, cmd, method) tuples of a Batch) from the decoded JSON-RPC reply. The reply
+    # is a list, or a single object when the batch held one command or the whole request was refused (id null).
+    replies = reply if isinstance(reply, list) else [reply]
+    by_id = {}
+    refused = None
+    for item in replies:
+        if not isinstance(item, dict):
+            continue
+        if item.get('id') is None and 'error' in item:
+            refused = item['error']
+        else:
+            by_id[item.get('id')] = item
+    results = []
+    for id, cmd, method in commands:
+        item = by_id.get(id)
+        if item is None:
+            error = _error(refused) if refused is not None else NOT_EXECUTED
+            results.append(CommandResult(id, cmd, method, False, error=error))
+        elif 'error' in item:
+            code = item['error'].get('code') if isinstance(item['error'], dict) else None
+            results.append(CommandResult(id, cmd, method, False, error=_error(item['error']), code=code))
+        else:
+            results.append(CommandResult(id, cmd, method, True, output=_output(item.get('result'))))
+    return results
+
+
+def post(rc, payload, timeout=None):
+    # One JSON-RPC POST, retried while the device answers busy. NX-API answers a batch with failed commands with an
+    # HTTP error and the JSON-RPC errors in the body, so the body is decoded whenever it is JSON.
+    kwargs = {'timeout': timeout} if timeout else {}
+    response = readiness.retry_busy(lambda: rc.ins(json.dumps(payload), **kwargs), timeout=timeout or rc.timeout, busy_result=readiness.http_busy)
+    try:
+        with metrics.parsing(rc.host, 'nxapi', 'post'):
+            return response.json()
+    except ValueError:
+        response.raise_for_status()
+        raise NxapiError('NX-API reply is not JSON (HTTP %d)' % response.status_code)
+
+
+def run(rc, commands, method=CLI_ASCII, max_batch=MAX_BATCH, timeout=None):
+    # Run a Batch (or a list of commands, all sent with method) on the device of rc, max_batch commands per POST.
+    # Returns one CommandResult per command in the order they were added. After a POST with a failed command the
+    # rest of the batch is not sent and its commands are NOT_EXECUTED, a failed pre-check must stop the checkpoint
+    # and config commands behind it whether or not they landed in the same POST.
+    if not isinstance(commands, Batch):
+        batch = Batch(method)
+        batch.extend(commands)
+        commands = batch
+    size = max(1, max_batch)
+    results = []
+    for start in range(0, len(commands), size):
+        chunk = commands.commands[start:start + size]
+        results.extend(parse_reply(chunk, post(rc, commands.payload(start, start + size), timeout)))
+        if failed(results):
+            results.extend(CommandResult(id, cmd, method, False, error=NOT_EXECUTED) for id, cmd, method in commands.commands[start + size:])
+            break
+    return results
+
+
+def run_one(rc, cmd, method=CLI_ASCII, timeout=None):
+    # Output of a single command, raises NxapiError with the message of the device when it fails
+    result = run(rc, [cmd], method, timeout=timeout)[0]
+    if not result.ok:
+        raise NxapiError(cmd + ': ' + result.error)
+    return result.output
+
+
+def failed(results):
+    return [result for result in results if not result.ok]
@@ -0,0 +1,163 @@
+# Device readiness polling. The scripts used to sleep a fixed 2-10 seconds before and after every backup, save and
+# show run "just to be sure" earlier sessions and config changes were complete. The helpers below replace those
+# sleeps with cheap checks that normally pass on the first try, and only wait (with a growing back-off and a hard
+# timeout) when a check says the device is still busy. The signals used are:
+#   - the config lock of the running datastore (another session holding it is still changing the configuration), read
+#     from the ietf-netconf-monitoring state, never by taking the lock
+#   - the list of XML/NETCONF sessions on the device (a session that ends between two looks was still finishing its
+#     work, sessions that stay, like a monitoring or automation system logged in for good, are not waited for)
+#   - the completion status of copy running-config startup-config in the exec_command reply, else the startup
+#     configuration itself
+#   - the RPC / HTTP reply itself, retried only when the device answers that it is busy or locked
+
+import re, time
+from lxml import etree
+from nexusprog import xmlstream
+
+# Error strings NX-OS returns while a datastore is locked or another operation is still running.
+BUSY_PATTERN = re.compile(r'in use|locked|lock denied|busy|in progress|try again|resource denied', re.I)
+# HTTP status codes RESTCONF/NX-API return for the same conditions.
+BUSY_STATUS = (409, 423, 429, 503)
+SESSION_ID_PATTERN = re.compile(r'session[ _-]?id\s*[:=>]?\s*(\d+)', re.I)
+# Cap of settle(), about the fixed sleep it replaces
+SETTLE_TIMEOUT = 10
+MONITORING_NS = 'urn:ietf:params:xml:ns:yang:ietf-netconf-monitoring'
+LOCKS_FILTER = ('<netconf-state xmlns="' + MONITORING_NS + '"><datastores><datastore><name/><locks/></datastore></datastores>'
+                '</netconf-state>')
+
+
+def poll(check, timeout=30, interval=0.25, max_interval=4.0):
+    # Call check() until it returns something truthy or timeout seconds have passed. The first call is made right
+    # away so an already settled device costs a single check and no sleep at all. Between checks the delay doubles
+    # up to max_interval. Returns the last value returned by check().
+    deadline = time.time() + timeout
+    delay = interval
+    while True:
+        result = check()
+        if result:
+            return result
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return result
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_interval)
+
+
+def other_sessions(xmlagent, exclude=()):
+    # Return the ids of XML/NETCONF sessions on the device that are not ours. The session list comes from
+    # "show xml server status" over the XML Agent; our own session id (plus any id in exclude) is filtered out.
+    res = xmlagent.exec_command({'show xml server status'})
+    own = set(str(x) for x in exclude)
+    own.add(str(xmlagent.session_id))
+    return sorted(set(SESSION_ID_PATTERN.findall(res.xml)) - own)
+
+
+def lock_holder(xmlagent, exclude=()):
+    # Id of the other session that holds the lock of the running configuration, None when it is free. Read from the
+    # datastore locks of ietf-netconf-monitoring with a get, so asking never takes the lock from another session's
+    # edit. A device that does not serve the model cannot tell, that counts as free.
+    try:
+        res = xmlagent.get(('subtree', LOCKS_FILTER))
+        state = etree.fromstring(res.xml.encode('utf-8'))
+    except Exception:
+        return None
+    own = set(str(x) for x in exclude)
+    own.add(str(xmlagent.session_id))
+    for datastore in state.iter('{%s}datastore' % MONITORING_NS):
+        if datastore.findtext('{%s}name' % MONITORING_NS) != 'running':
+            continue
+        for holder in datastore.iterfind('{%s}locks//{%s}locked-by-session' % (MONITORING_NS, MONITORING_NS)):
+            if holder.text and holder.text.strip() not in own:
+                return holder.text.strip()
+    return None
+
+
+def settle(xmlagent, exclude=(), timeout=SETTLE_TIMEOUT, debug=False):
+    # Wait until no other session holds the config lock and no other session is still ending. Replaces the fixed
+    # "sleep 10 to be sure previous sessions are complete" waits, so the wait is capped near those 10 seconds. An idle
+    # device costs one check; sessions that stay logged in cost a second look to see that none of them went away.
+    # Returns True when the device settled. On timeout it reports who kept it busy and returns False, it is up to the
+    # caller to carry on or not.
+    state = {'seen': None, 'holder': None, 'ending': []}
+
+    def check():
+        current = set(other_sessions(xmlagent, exclude))
+        seen, state['seen'] = state['seen'], current
+        if not current:
+            return True
+        state['holder'] = lock_holder(xmlagent, exclude)
+        state['ending'] = sorted(seen - current) if seen is not None else []
+        return seen is not None and state['holder'] is None and not state['ending']
+
+    if poll(check, timeout, max_interval=2.0):
+        if debug and state['seen']:
+            print("Device settled, sessions " + ", ".join(sorted(state['seen'])) + " stay logged in")
+        return True
+    if state['holder'] is not None:
+        reason = "session " + state['holder'] + " holds the configuration lock"
+    else:
+        reason = "sessions are still ending"
+    print("Device not settled after " + str(timeout) + "s (" + reason + "), continuing")
+    return False
+
+
+def copy_complete(reply):
+    # NX-OS only answers the exec_command for copy running-config startup-config once the copy has finished, the
+    # reply then carries the "Copy complete" message.
+    return reply.ok and 'copy complete' in reply.xml.lower()
+
+
+def _config_lines(reply):
+    # Configuration lines of a show running-config / startup-config reply, without the "!" header and comment lines
+    # that differ between the two (command, time, last change, saved at)
+    if not reply.ok:
+        return None
+    text = xmlstream.data_text(reply.xml)
+    return [line.rstrip() for line in text.splitlines() if line.strip() and not line.startswith('!')]
+
+
+def startup_matches_running(xmlagent):
+    # True when the startup configuration holds the running configuration, i.e. it has been saved
+    startup = _config_lines(xmlagent.exec_command({'show startup-config'}))
+    return startup is not None and startup == _config_lines(xmlagent.exec_command({'show running-config'}))
+
+
+def wait_for_copy(xmlagent, reply, timeout=SETTLE_TIMEOUT, debug=False):
+    # True when the save is confirmed. The reply normally confirms it already. A failed reply is not waited for. An ok
+    # reply without the message is only confirmed once the startup configuration is seen to match the running one,
+    # polled until timeout. Callers report a False, the configuration may not be saved.
+    if copy_complete(reply):
+        return True
+    if not reply.ok:
+        return False
+    if debug:
+        print("Copy not confirmed in the reply, comparing the startup with the running configuration")
+    return bool(poll(lambda: startup_matches_running(xmlagent), timeout, max_interval=2.0))
+
+
+def is_busy_error(error):
+    return BUSY_PATTERN.search(str(error)) is not None
+
+
+def retry_busy(call, timeout=30, interval=0.5, max_interval=4.0, busy_result=None):
+    # Run call() and hand back its result. If it raises an error that says the device is busy/locked, or if
+    # busy_result(result) says so (used for HTTP status codes), retry with back-off until timeout. Any other error is
+    # raised straight away, and the last busy error is raised once the timeout expires.
+    deadline = time.time() + timeout
+    delay = interval
+    while True:
+        try:
+            result = call()
+        except Exception as error:
+            if not is_busy_error(error) or time.time() + delay > deadline:
+                raise
+        else:
+            if busy_result is None or not busy_result(result) or time.time() + delay > deadline:
+                return result
+        time.sleep(delay)
+        delay = min(delay * 2, max_interval)
+
+
+def http_busy(response):
+    # busy_result helper for requests responses.
+    return response.status_code in BUSY_STATUS
@@ -0,0 +1,249 @@
+# Shared RESTCONF/NX-API client for the Restconf snippets. The snippets used to call requests.request() directly which
+# opens a new TCP connection and a full TLS handshake for every call and rebuilds the base64 Authorization header each
+# time. RestconfClient keeps one pooled requests.Session per device instead:
+#   - keep-alive connections from a pool sized per device (pool_connections / pool_maxsize)
+#   - TLS session resumption for the connections the pool has to (re)open
+#   - the Authorization and content type headers are built once when the client is created
+# client() hands back the same client for the same device and credentials, so a check followed by one or two PATCHes
+# from separate functions all run over one warm connection.
+#
+# Requests and replies are XML unless the client is switched to JSON (encoding=JSON, or set_encoding() per device before
+# the client is created). With JSON, XML bodies the snippets render are sent as the equivalent JSON document and read()
+# and leaf_values() parse the JSON replies, so the same snippet code runs in either encoding.
+
+import base64, ssl, threading, time, weakref
+import requests
+from requests.adapters import HTTPAdapter
+from nexusprog import metrics, xmlstream, yangjson
+
+SYSTEM_PATH = '/restconf/data/Cisco-NX-OS-device:System'
+INS_PATH = '/ins'
+XML = 'application/yang.data+xml'
+JSON = 'application/yang.data+json'
+JSON_RPC = 'application/json-rpc'
+
+DEFAULT_POOL_CONNECTIONS = 1
+DEFAULT_POOL_MAXSIZE = 4
+ENCODINGS = {'xml': XML, 'json': JSON}
+
+
+class _ResumingContext(ssl.SSLContext):
+    # SSLContext that offers the TLS session of the last connection it wrapped when a new connection is opened, so the
+    # device can resume the session instead of doing a full handshake. One context is used per device/client, a session
+    # is never offered to another host.
+
+    def wrap_socket(self, *args, **kwargs):
+        if kwargs.get('session') is None:
+            session = self._last_session()
+            if session is not None:
+                kwargs['session'] = session
+        recorder = metrics.active()
+        if recorder is None:
+            sock = ssl.SSLContext.wrap_socket(self, *args, **kwargs)
+        else:
+            # The handshake is the connect time of an HTTPS connection, the pool opens one per connection it needs
+            start = time.time()
+            try:
+                sock = ssl.SSLContext.wrap_socket(self, *args, **kwargs)
+            except Exception as e:
+                recorder.connect(kwargs.get('server_hostname'), 'https', start, time.time() - start, metrics.error_text(e))
+                raise
+            recorder.connect(kwargs.get('server_hostname'), 'https', start, time.time() - start)
+        # With TLS 1.3 the session ticket only arrives after the handshake, so keep a weak reference to the socket and
+        # read the session from it when the next connection is made.
+        self._last_sock = weakref.ref(sock)
+        self._session = sock.session or getattr(self, '_session', None)
+        return sock
+
+    def _last_session(self):
+        last_sock = getattr(self, '_last_sock', None)
+        sock = last_sock() if last_sock is not None else None
+        if sock is not None:
+            try:
+                if sock.session is not None:
+                    self._session = sock.session
+            except (OSError, ValueError):
+                pass
+        return getattr(self, '_session', None)
+
+
+def _ssl_context(verify):
+    context = _ResumingContext(ssl.PROTOCOL_TLS_CLIENT)
+    if(verify):
+        context.load_default_certs()
+    else:
+        # Same behaviour as the verify=False the snippets always used, lab devices mostly run self signed certificates
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class _PoolAdapter(HTTPAdapter):
+    # HTTPAdapter that hands our resuming SSL context to the urllib3 connection pools.
+
+    def __init__(self, ssl_context, **kwargs):
+        self._ssl_context = ssl_context
+        HTTPAdapter.__init__(self, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+
+
+class RestconfClient(object):
+    # Pooled client for one device. Paths that do not start with "/" are relative to the NX-OS device model root
+    # (/restconf/data/Cisco-NX-OS-device:System), so "bd-items/bd-items" is the same XPath the snippets document.
+
+    def __init__(self, host, user, passwd, verify=False, timeout=60, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE, max_retries=0, encoding=XML):
+        self.host = host
+        # Media type of the request bodies and replies when a call does not name one
+        self.encoding = ENCODINGS.get(encoding, encoding)
+        self.base_url = 'https://' + host
+        self.timeout = timeout
+        # Prep username and password as a B64 encoded ASCII string for use in the HTML header, once per client.
+        user_creds = user + ':' + passwd
+        user_credsb64 = base64.b64encode(bytes(user_creds.encode('utf_8'))).decode('ascii')
+        self.session = requests.Session()
+        self.session.verify = verify
+        self.session.headers.update({'authorization': 'Basic %s' % user_credsb64, 'cache-control': 'no-cache', 'connection': 'keep-alive'})
+        self.ssl_context = _ssl_context(verify)
+        self.session.mount('https://', _PoolAdapter(self.ssl_context, pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=max_retries))
+        # Content-type/accept header pairs are built on first use and then reused for every request.
+        self._headers = {}
+
+    def headers(self, content_type=XML, accept=XML):
+        key = (content_type, accept)
+        if key not in self._headers:
+            self._headers[key] = {'content-type': content_type, 'accept': accept}
+        return self._headers[key]
+
+    def url(self, path=''):
+        if path.startswith('/'):
+            return self.base_url + path
+        if path:
+            return self.base_url + SYSTEM_PATH + '/' + path
+        return self.base_url + SYSTEM_PATH
+
+    def encode(self, data, content_type):
+        # Request body in content_type. Trees (dicts) are written in either encoding, an XML body is converted when
+        # the request is JSON.
+        if isinstance(data, dict):
+            return yangjson.dumps(data) if content_type == JSON else yangjson.to_xml(data)
+        if content_type == JSON and data and (data.lstrip()[:1] in ('<', b'<')):
+            return yangjson.xml_to_json(data)
+        return data
+
+    def request(self, method, path='', data=None, content_type=None, accept=None, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        # verify has to be passed per request, a REQUESTS_CA_BUNDLE in the environment would otherwise override the
+        # session setting
+        kwargs.setdefault('verify', self.session.verify)
+        content_type = content_type or self.encoding
+        if data is not None:
+            data = self.encode(data, content_type)
+        recorder = metrics.active()
+        if recorder is None:
+            return self.session.request(method, self.url(path), data=data, headers=self.headers(content_type, accept or self.encoding), **kwargs)
+        start = time.time()
+        try:
+            response = self.session.request(method, self.url(path), data=data, headers=self.headers(content_type, accept or self.encoding), **kwargs)
+        except Exception as e:
+            recorder.request(self.host, self.transport(path), method.lower(), start, time.time() - start, len(data or ''), error=metrics.error_text(e))
+            raise
+        # A streamed reply is not read yet, its size is what the device announced
+        reply_bytes = int(response.headers.get('content-length', 0)) if kwargs.get('stream') else len(response.content)
+        recorder.request(self.host, self.transport(path), method.lower(), start, time.time() - start, len(data or ''), reply_bytes,
+                         error='HTTP %d' % response.status_code if response.status_code >= 400 else None)
+        return response
+
+    def transport(self, path):
+        # Transport name a request is recorded under by nexusprog.metrics
+        return 'nxapi' if path == INS_PATH else 'restconf'
+
+    def get(self, path='', accept=None, **kwargs):
+        return self.request("GET", path, accept=accept, **kwargs)
+
+    def patch(self, path, data, content_type=None, accept=None, **kwargs):
+        return self.request("PATCH", path, data=data, content_type=content_type, accept=accept, **kwargs)
+
+    def delete(self, path, accept=None, **kwargs):
+        return self.request("DELETE", path, accept=accept, **kwargs)
+
+    def read(self, path='', **kwargs):
+        # Tree (see yangjson) of path in the encoding of the client, None when the device has nothing there (204).
+        # Raises requests.HTTPError on an error reply.
+        response = self.get(path, **kwargs)
+        if response.status_code == 204 or not response.content:
+            return None
+        response.raise_for_status()
+        with metrics.parsing(self.host, 'restconf', 'get'):
+            if JSON in response.headers.get('content-type', self.encoding):
+                return yangjson.loads(response.content)
+            return yangjson.from_xml(response.content)
+
+    def leaf_values(self, path, name, **kwargs):
+        # Text of every <name> leaf below path. XML replies are streamed (xmlstream), JSON replies are walked as a tree.
+        response = self.get(path, **kwargs)
+        if response.status_code == 204 or not response.content:
+            return []
+        response.raise_for_status()
+        with metrics.parsing(self.host, 'restconf', 'get'):
+            if JSON in response.headers.get('content-type', self.encoding):
+                return yangjson.leaf_values(yangjson.loads(response.content), name)
+            return xmlstream.leaf_texts(response.content, name)
+
+    def write(self, path, data, **kwargs):
+        # PATCH of a tree or an XML body in the encoding of the client, raises requests.HTTPError when refused
+        response = self.patch(path, data, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def ins(self, data, **kwargs):
+        # NX-API JSON-RPC endpoint. Shares the pool and the authorization header with the RESTCONF calls.
+        return self.request("POST", INS_PATH, data=data, content_type=JSON_RPC, accept=JSON_RPC, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_pool_sizes = {}
+_encodings = {}
+_lock = threading.Lock()
+
+
+def set_pool_size(host, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE):
+    # Configure the connection pool for one device before its client is created. Devices without an entry use the
+    # defaults above, which is plenty for the sequential snippets.
+    _pool_sizes[host] = (pool_connections, pool_maxsize)
+
+
+def set_encoding(host, encoding):
+    # Encoding ('xml'/'json' or the media type) of the client of one device, applied to a client that exists already
+    encoding = ENCODINGS.get(encoding, encoding)
+    _encodings[host] = encoding
+    with _lock:
+        for key, rc in _clients.items():
+            if key[0] == host:
+                rc.encoding = encoding
+
+
+def client(host, user, passwd, **kwargs):
+    # Return the shared client for this device and these credentials, creating it on first use.
+    key = (host, user, passwd)
+    with _lock:
+        rc = _clients.get(key)
+        if rc is None:
+            pool_connections, pool_maxsize = _pool_sizes.get(host, (DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE))
+            kwargs.setdefault('pool_connections', pool_connections)
+            kwargs.setdefault('pool_maxsize', pool_maxsize)
+            kwargs.setdefault('encoding', _encodings.get(host, XML))
+            rc = _clients[key] = RestconfClient(host, user, passwd, **kwargs)
+        return rc
+
+
+def close_all():
+    with _lock:
+        for rc in _clients.values():
+            rc.close()
+        _clients.clear()
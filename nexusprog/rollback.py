@@ -0,0 +1,191 @@
+# Rollback payloads from a pre change YANG snapshot. The provisioning scripts save the configuration before a change
+# but undoing a failed change meant a full configuration replace or fixing it by hand on the CLI. build_rollback()
+# compares the pre change snapshot with the current state (yangdiff hash trees, only the subtrees that differ are
+# visited) and writes the smallest edit_config payload that brings the device back:
+#   - leaves that were changed or removed are merged back with their old value
+#   - leaves and list entries that the change added are deleted (nc:operation="delete"), containers are never deleted
+#     as a whole, only what the change put in them
+#   - containers and list entries that the change removed are merged back with their full pre change content
+#   - a list entry where most leaves changed is sent whole with nc:operation="replace"
+# Operational leaves (operSt, counters, timestamps) that a get returns next to the configuration are ignored, they
+# can not be configured. apply() sends the payload as one RPC, through the candidate datastore when the device has it.
+
+from lxml import etree
+from nexusprog import readiness, template, yangdiff, yangxml
+
+NETCONF_NS = 'urn:ietf:params:xml:ns:netconf:base:1.0'
+OPERATION = '{%s}operation' % NETCONF_NS
+
+# Leaves that are state, not configuration. Anything starting with "oper" is state as well.
+STATE_LEAVES = frozenset(['modTs', 'createTs', 'lastChg', 'lastStChg', 'status', 'childAction', 'persistentOnReload',
+                          'monPolDn', 'bundleIndex', 'iod', 'ifIndex', 'vdcId', 'pcIfId', 'resetCtr'])
+# A list entry is replaced as a whole when more than this share of its configuration leaves changed
+REPLACE_RATIO = 0.5
+
+SYSTEM_FILTER = '<System xmlns="' + yangxml.NXOS_NS + '"/>'
+
+
+def is_state(leaf):
+    return leaf.startswith('oper') or leaf.split('#', 1)[0] in STATE_LEAVES
+
+
+def config_leaves(node):
+    return dict((leaf, value) for leaf, value in node.leaves.items() if not is_state(leaf))
+
+
+def _leaf_tag(name):
+    # Repeated leaves (leaf-list values) carry a #n suffix in the leaves table
+    return '{%s}%s' % (yangxml.NXOS_NS, name.split('#', 1)[0])
+
+
+def _add_leaf(parent, name, value):
+    leaf = etree.SubElement(parent, _leaf_tag(name))
+    leaf.text = value
+    return leaf
+
+
+def _entry(parent, node):
+    # Element for node under parent carrying only the key leaves of a list entry
+    elem = etree.SubElement(parent, '{%s}%s' % (yangxml.NXOS_NS, node.name))
+    for leaf, value in node.key_leaves():
+        _add_leaf(elem, leaf, value)
+    return elem
+
+
+def _full(parent, node):
+    # Element for node under parent with all of its configuration, keys first
+    elem = _entry(parent, node)
+    keys = set(leaf for leaf, _ in node.key_leaves())
+    for leaf, value in config_leaves(node).items():
+        if leaf not in keys:
+            _add_leaf(elem, leaf, value)
+    for _, child in node.children():
+        _full(elem, child)
+    return elem
+
+
+def _rollback(pre, post, make):
+    # Add to the payload what turns post back into pre. make() returns the payload element of this node and creates
+    # it (with its ancestors) the first time, so subtrees without a configuration difference leave no trace.
+    if pre.digest == post.digest:
+        return
+    pre_leaves = config_leaves(pre)
+    post_leaves = config_leaves(post)
+    keys = set(leaf for leaf, _ in pre.key_leaves())
+    restore = [(leaf, value) for leaf, value in pre_leaves.items() if leaf not in keys and post_leaves.get(leaf) != value]
+    delete = [leaf for leaf in post_leaves if leaf not in pre_leaves and leaf not in keys]
+    if keys and pre_leaves and len(restore) + len(delete) > REPLACE_RATIO * len(pre_leaves):
+        make().set(OPERATION, 'replace')
+        elem = make()
+        for leaf, value in pre_leaves.items():
+            if leaf not in keys:
+                _add_leaf(elem, leaf, value)
+        for _, child in pre.children():
+            _full(elem, child)
+        return
+    for leaf, value in restore:
+        _add_leaf(make(), leaf, value)
+    for leaf in delete:
+        _add_leaf(make(), leaf, None).set(OPERATION, 'delete')
+    for old, new in yangdiff.differing_children(pre, post):
+        if old is None and new.key_leaves():
+            _entry(make(), new).set(OPERATION, 'delete')
+        elif old is None:
+            _rollback(_empty(new.name), new, _maker(make, new))
+        elif new is None:
+            _full(make(), old)
+        else:
+            _rollback(old, new, _maker(make, old))
+
+
+def _maker(make_parent, node):
+    cache = []
+
+    def make():
+        if not cache:
+            cache.append(_entry(make_parent(), node))
+        return cache[0]
+    return make
+
+
+def _empty(name):
+    return yangdiff.Node(name, (name,), etree.tostring(etree.Element('{%s}%s' % (yangxml.NXOS_NS, name))), ())
+
+
+def _system(source):
+    # The System container of a snapshot. A reply without one (nothing matched the filter) is an empty System.
+    if not isinstance(source, yangdiff.Node):
+        source = yangdiff.build(source)
+    return yangdiff.find(source, 'System') or _empty('System')
+
+
+def build_rollback(pre, post):
+    # edit_config payload (string) that returns the device from post to pre, None when there is nothing to undo. pre
+    # and post are yangdiff trees or anything yangdiff.build() takes (file name, XML reply text).
+    pre = _system(pre)
+    post = _system(post)
+    config = etree.Element('config', nsmap={'nc': NETCONF_NS})
+    system = []
+
+    def make_system():
+        if not system:
+            system.append(etree.SubElement(config, '{%s}System' % yangxml.NXOS_NS, nsmap={None: yangxml.NXOS_NS}))
+        return system[0]
+    _rollback(pre, post, make_system)
+    if not system:
+        return None
+    return etree.tostring(config, pretty_print=True).decode('utf-8')
+
+
+def scope_filter(pre):
+    # Subtree filter that fetches the same part of the configuration as the pre change snapshot: containers down to
+    # the list entries it holds, each list entry selected by its keys. Entries the snapshot did not cover are not
+    # fetched and so never deleted by the rollback.
+    pre = _system(pre)
+    if not pre.buckets:
+        # An empty scope would be the whole System tree, and everything in it would look added by the change
+        raise ValueError('the pre change snapshot is empty, give the subtree to compare explicitly')
+
+    def scope(parent, node):
+        elem = _entry(parent, node) if parent is not None else etree.Element('{%s}System' % yangxml.NXOS_NS, nsmap={None: yangxml.NXOS_NS})
+        if node.key_leaves():
+            return elem
+        for _, child in node.children():
+            scope(elem, child)
+        return elem
+    return etree.tostring(scope(None, pre)).decode('utf-8')
+
+
+def interface_filter(interface):
+    # Subtree filter for what the port provisioning scripts change on an interface: its PhysIf-list entry and its
+    # spanning tree If-list entry. interface may also be a list of interfaces (bulk provisioning).
+    interfaces = [interface] if isinstance(interface, str) else list(interface)
+    phys = ''.join('<PhysIf-list><id>' + template.xml_text(name) + '</id></PhysIf-list>' for name in interfaces)
+    stp = ''.join('<If-list><id>' + template.xml_text(name) + '</id></If-list>' for name in interfaces)
+    return '''<System xmlns="''' + yangxml.NXOS_NS + '''">
+    <intf-items><phys-items>''' + phys + '''</phys-items></intf-items>
+    <stp-items><inst-items><if-items>''' + stp + '''</if-items></inst-items></stp-items>
+</System>'''
+
+
+def capture(device, subtree=SYSTEM_FILTER):
+    # Running configuration under a subtree filter, as the XML of the reply. Take it before a change and hand it
+    # to rollback() if the change has to be undone.
+    res = readiness.retry_busy(lambda: device.get_config(source='running', filter=('subtree', subtree)))
+    return res.xml
+
+
+def apply(device, payload, use_candidate=None):
+    return yangxml.push_config(device, payload, use_candidate)
+
+
+def rollback(device, pre, subtree=None, use_candidate=None, dry_run=False):
+    # Undo everything that changed since pre, within subtree (the filter pre was captured with) or else the scope of
+    # pre itself. Returns the payload that was (or with dry_run would have been) sent, None when the device already
+    # matches pre.
+    pre = _system(pre)
+    post = capture(device, subtree or scope_filter(pre))
+    payload = build_rollback(pre, post)
+    if payload is not None and not dry_run:
+        apply(device, payload, use_candidate)
+    return payload
@@ -0,0 +1,38 @@
+# Loader for the single device scripts. The script file names contain dashes so they cannot be imported with a plain
+# import statement, load() imports them by path instead so the fleet tools can call their functions directly. The
+# scripts only run main() under "if __name__ == '__main__'" so importing them has no side effects.
+
+import importlib.util, os, re, sys, threading
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+ACCESS_PORT = 'Netconf/Provisioning/NXOS-Access-Port-Provision.py'
+TRUNKEDGE_PORT = 'Netconf/Provisioning/NXOS-TrunkEdge-Port-Provision.py'
+NETCONF_VLAN = 'Netconf/Snippets/NXOS-ncclient-YANG-vlancreate.py'
+NETCONF_COPYRUNSTART = 'Netconf/Snippets/NXOS-ncclient-XMLMGR-copyrunstart.py'
+NETCONF_INTERFACE = 'Netconf/Snippets/NXOS-ncclient-YANG-interfaceaccess.py'
+NETCONF_USER = 'Netconf/Snippets/NXOS-ncclient-YANG-usercreate.py'
+VXLAN_LEAF = 'Netconf/VXLAN/NXOS-ncclient-vxlanevpn-leaf.py'
+RESTCONF_VLAN = 'Restconf/Snippets/NXOS-restconf-yang-vlancreate.py'
+RESTCONF_COPYRUNSTART = 'Restconf/Snippets/NXOS-restconf-ins-copyrunstart.py'
+RESTCONF_INTERFACE = 'Restconf/Snippets/NXOS-restconf-yang-interfaceaccess.py'
+RESTCONF_USER = 'Restconf/Snippets/NXOS-restconf-yang-usercreate.py'
+
+_lock = threading.Lock()
+
+
+def module_name(relpath):
+    return 'nxscript_' + re.sub(r'\W', '_', os.path.splitext(relpath)[0]).lower()
+
+
+def load(relpath):
+    # Import the script at relpath (relative to the repository root) once and return the module.
+    name = module_name(relpath)
+    with _lock:
+        module = sys.modules.get(name)
+        if module is None:
+            spec = importlib.util.spec_from_file_location(name, os.path.join(REPO_ROOT, relpath))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            sys.modules[name] = module
+        return module
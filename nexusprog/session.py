@@ -0,0 +1,111 @@
+# Session handling for Nexus devices. A provisioning run used to call manager.connect once per step which means a
+# full SSH handshake, authentication and NETCONF hello exchange for every check, backup, change and save. NxSession
+# opens each of the two interfaces a workflow needs at most once and hands the same connection to every step:
+#   - netconf  : port 830, "netconf" subsystem, used for the YANG get/edit_config operations
+#   - xmlagent : port 22, "xmlagent" subsystem, used for exec_command (show run, copy run start)
+
+import time, contextlib
+from ncclient import manager
+
+
+class NxSession(object):
+    # Both sessions are opened lazily the first time they are asked for, so a workflow that only needs the YANG
+    # interface never pays for the XML Agent login and vice versa. Use it as a context manager so the sessions are
+    # closed at the end of the run even when a pre-check calls sys.exit().
+
+    def __init__(self, host, user, passwd, netconf_port=830, xmlagent_port=22, timeout=30, debug=False, cache=None, probe=False):
+        self.host = host
+        self.user = user
+        self.passwd = passwd
+        self.netconf_port = netconf_port
+        self.xmlagent_port = xmlagent_port
+        self.timeout = timeout
+        self.debug = debug
+        # Bookkeeping for the handshakes that were actually made so a run can report what it saved.
+        self.connects = 0
+        self.connect_time = 0.0
+        self._netconf = None
+        self._xmlagent = None
+        # State read by the checks (VLANs, interfaces, ...) goes through a statecache.StateCache, pass one in to share
+        # it between sessions or keep it on disk between runs. probe checks the accounting log before using it.
+        self.cache = cache
+        self.probe = probe
+        self._state = None
+
+    def _connect(self, port, subsystem):
+        start = time.time()
+        device = manager.connect(host=self.host, port=port, username=self.user, password=self.passwd, timeout=self.timeout,
+                                 hostkey_verify=False, device_params={'name': 'nexus', "ssh_subsystem_name": subsystem},
+                                 look_for_keys=False, allow_agent=False)
+        elapsed = time.time() - start
+        self.connects += 1
+        self.connect_time += elapsed
+        if(self.debug):
+            print("Connected to " + self.host + ":" + str(port) + " (" + subsystem + ") in %.2fs" % elapsed)
+        return device
+
+    @property
+    def netconf(self):
+        # YANG/NETCONF session on port 830. Reconnect only if the previous session was dropped by the device.
+        if self._netconf is None or not self._netconf.connected:
+            self._netconf = self._connect(self.netconf_port, "netconf")
+        return self._netconf
+
+    @property
+    def xmlagent(self):
+        # XML Agent session used for the CLI style exec_command calls.
+        if self._xmlagent is None or not self._xmlagent.connected:
+            self._xmlagent = self._connect(self.xmlagent_port, "xmlagent")
+        return self._xmlagent
+
+    @property
+    def state(self):
+        # Cached device state (statecache.DeviceState) fetched over the sessions of this object
+        if self._state is None:
+            from nexusprog.statecache import DeviceState
+            self._state = DeviceState(self, self.cache, self.probe)
+        return self._state
+
+    @contextlib.contextmanager
+    def netconf_session(self):
+        # Borrow the shared NETCONF session for a block of work. Unlike "with manager.connect(...)" leaving the block
+        # does not close the session, the next step of the workflow picks it up where this one left off.
+        yield self.netconf
+
+    @contextlib.contextmanager
+    def xmlagent_session(self):
+        # Same as netconf_session() for the XML Agent session.
+        yield self.xmlagent
+
+    def session_ids(self):
+        # Session ids of the sessions this object currently holds, used by the readiness checks so our own sessions
+        # are not mistaken for another operation that is still running on the device.
+        return [device.session_id for device in (self._netconf, self._xmlagent) if device is not None and device.connected]
+
+    def avg_connect_time(self):
+        if self.connects == 0:
+            return 0.0
+        return self.connect_time / self.connects
+
+    def handshake_savings(self, legacy_connects):
+        # Estimate of the wall clock time saved compared to a run that opened legacy_connects separate sessions. The
+        # estimate uses the average handshake time measured for this device during this run.
+        return max(legacy_connects - self.connects, 0) * self.avg_connect_time()
+
+    def close(self):
+        for device in (self._netconf, self._xmlagent):
+            if device is not None and device.connected:
+                try:
+                    device.close_session()
+                except Exception:
+                    # The device may already have torn the session down, nothing left to clean up in that case.
+                    pass
+        self._netconf = None
+        self._xmlagent = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
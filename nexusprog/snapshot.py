@@ -0,0 +1,132 @@
+# Snapshot files of device configuration. The backup snippets built the whole configuration as one string (a pretty
+# printed copy of the reply tree, or the decoded HTTP body) and then wrote it out, so a full tree pull of a large chassis
+# held the reply plus one or two more copies of it in memory. SnapshotWriter takes the data in chunks as it arrives
+# and writes it straight to disk:
+#   - optionally compressed with gzip or xz (".gz" / ".xz" is added to the file name)
+#   - into a temporary file next to the target that is renamed over it once complete, so a reader never sees a
+#     half written snapshot and a failed pull leaves no file behind
+# Pretty printing is kept off the hot path: the reply is written as it came and pretty_print() reformats the file
+# afterwards, once the device session is closed.
+
+import gzip, lzma, os, threading
+from lxml import etree
+
+COMPRESSION = (None, 'gz', 'xz')
+EXTENSIONS = {None: '', 'gz': '.gz', 'xz': '.xz'}
+CHUNK_SIZE = 65536
+
+
+def compression_of(path):
+    for compress, extension in EXTENSIONS.items():
+        if compress and path.endswith(extension):
+            return compress
+    return None
+
+
+def open_snapshot(path):
+    # Open a snapshot for reading (binary), decompressing on the fly according to the file extension.
+    compress = compression_of(path)
+    if compress == 'gz':
+        return gzip.open(path, 'rb')
+    if compress == 'xz':
+        return lzma.open(path, 'rb')
+    return open(path, 'rb')
+
+
+class SnapshotWriter(object):
+    # Use as a context manager: the snapshot is committed (renamed into place) when the block ends normally and
+    # discarded when it raises. write() takes str (encoded as UTF-8) or bytes.
+
+    def __init__(self, filename, compress=None, level=None):
+        if compress not in COMPRESSION:
+            raise ValueError("compression must be one of gz, xz or None")
+        self.path = filename + EXTENSIONS[compress]
+        self.tmp_path = '%s.%d.%d.tmp' % (self.path, os.getpid(), threading.current_thread().ident)
+        self.raw = open(self.tmp_path, 'xb')
+        if compress == 'gz':
+            self.file = gzip.GzipFile(filename=os.path.basename(filename), mode='wb', fileobj=self.raw, compresslevel=6 if level is None else level)
+        elif compress == 'xz':
+            self.file = lzma.LZMAFile(self.raw, 'wb', preset=level)
+        else:
+            self.file = self.raw
+        # Bytes of configuration written (before compression) and bytes stored on disk (known after commit)
+        self.bytes_written = 0
+        self.bytes_stored = 0
+        self.closed = False
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.file.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def writelines(self, chunks):
+        for chunk in chunks:
+            self.write(chunk)
+
+    def commit(self):
+        if self.closed:
+            return self.path
+        if self.file is not self.raw:
+            self.file.close()
+        self.raw.flush()
+        os.fsync(self.raw.fileno())
+        self.raw.close()
+        os.replace(self.tmp_path, self.path)
+        self.bytes_stored = os.path.getsize(self.path)
+        self.closed = True
+        return self.path
+
+    def abort(self):
+        if self.closed:
+            return
+        try:
+            if self.file is not self.raw:
+                self.file.close()
+            self.raw.close()
+        finally:
+            self.closed = True
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+
+def write_response(response, filename, compress=None, chunk_size=CHUNK_SIZE):
+    # Stream an HTTP response (requests, made with stream=True) to a snapshot. The body is never held in memory as a
+    # whole. Returns the committed writer.
+    with SnapshotWriter(filename, compress) as writer:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if chunk:
+                writer.write(chunk)
+    return writer
+
+
+def write_element(element, filename, compress=None):
+    # Serialise an lxml element (e.g. res.data_ele of a NETCONF get) straight into a snapshot. lxml writes to the file
+    # object as it serialises, no string of the whole tree is built.
+    with SnapshotWriter(filename, compress) as writer:
+        etree.ElementTree(element).write(writer, encoding='utf-8')
+    return writer
+
+
+def pretty_print(path):
+    # Re-indent an XML snapshot in place (keeping its compression). Meant to run after the pull, so the device session
+    # is not held open while the reply is reformatted.
+    compress = compression_of(path)
+    parser = etree.XMLParser(remove_blank_text=True, huge_tree=True)
+    with open_snapshot(path) as source:
+        tree = etree.parse(source, parser)
+    filename = path[:len(path) - len(EXTENSIONS[compress])]
+    with SnapshotWriter(filename, compress) as writer:
+        tree.write(writer, encoding='utf-8', pretty_print=True)
+    return writer
@@ -0,0 +1,274 @@
+# Cache of device state read by the pre-checks. Every run fetched the VLAN table, the interface states and so on
+# again, provisioning 48 ports on one switch meant 48 pulls of the same VLAN table. StateCache keeps what was read:
+#   - in memory for the life of the process, and optionally on disk (one JSON file per device) so the next run of a
+#     script can use it as well
+#   - each kind of state has a TTL, past it the state is fetched again
+#   - our own writes drop the kinds they change (DeviceState.changed()), so a check after a change never sees the
+#     state from before it
+#   - a cheap probe of the device (the index of the last entry of the accounting log, which moves on every
+#     configuration change) is recorded whenever state is fetched and drops everything cached for a device when it
+#     moved since, someone else changed the configuration
+#   - the probe only sees configuration changes, not links going up or down, so the operational state of interfaces
+#     is never cached (DeviceState.oper_states())
+#
+# DeviceState binds a cache to the sessions of one device (NxSession.state) and knows how to fetch each kind.
+
+import json, os, re, threading, time
+from nexusprog import features, readiness, template, xmlstream, yangxml
+from nexusprog.vlanset import VlanSet
+
+VLANS = 'vlans'
+INTERFACES = 'interfaces'
+USERS = 'users'
+ROLES = 'roles'
+FEATURES = 'features'
+CAPABILITIES = 'capabilities'
+
+# Seconds each kind stays valid without a probe telling otherwise. Interface state moves on its own (links go up
+# and down), so it is kept short. Capabilities only change with the software.
+TTLS = {VLANS: 300, INTERFACES: 30, USERS: 300, ROLES: 300, FEATURES: 600, CAPABILITIES: 3600}
+DEFAULT_TTL = 60
+# The change probe runs at most this often per device
+PROBE_INTERVAL = 5
+
+ACCOUNTING_INDEX = re.compile(r'(\d+)')
+
+
+def _atomic_write(path, data):
+    tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.current_thread().ident)
+    with open(tmp, 'w') as handle:
+        handle.write(data)
+    os.replace(tmp, path)
+
+
+class StateCache(object):
+    # Entries are (host, kind) -> {'time', 'expires', 'value'}. Values must be JSON serialisable when a directory is
+    # given. The probe token of each device is kept next to its entries.
+
+    def __init__(self, directory=None, ttls=None, probe_interval=PROBE_INTERVAL):
+        self.directory = directory
+        self.ttls = dict(TTLS)
+        self.ttls.update(ttls or {})
+        self.probe_interval = probe_interval
+        self._hosts = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, host):
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', host) + '.json')
+
+    def _host(self, host):
+        # State of one device, loaded from disk the first time it is asked for
+        state = self._hosts.get(host)
+        if state is None:
+            state = {'token': None, 'probed': 0, 'entries': {}}
+            if self.directory and os.path.exists(self._path(host)):
+                try:
+                    with open(self._path(host)) as handle:
+                        saved = json.load(handle)
+                    state['token'] = saved.get('token')
+                    state['entries'] = saved.get('entries', {})
+                except (IOError, OSError, ValueError):
+                    pass
+            self._hosts[host] = state
+        return state
+
+    def _save(self, host):
+        if self.directory:
+            state = self._hosts[host]
+            _atomic_write(self._path(host), json.dumps({'token': state['token'], 'entries': state['entries']}))
+
+    def lookup(self, host, kind, now=None):
+        # Cached value, or None when there is none or it expired
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._host(host)['entries'].get(kind)
+            if entry is None or entry['expires'] < now:
+                return None
+            return entry['value']
+
+    def put(self, host, kind, value, ttl=None):
+        now = time.time()
+        ttl = self.ttls.get(kind, DEFAULT_TTL) if ttl is None else ttl
+        with self._lock:
+            self._host(host)['entries'][kind] = {'time': now, 'expires': now + ttl, 'value': value}
+            self._save(host)
+        return value
+
+    def get(self, host, kind, fetch, ttl=None):
+        # Cached value of kind for host, fetch() when there is none
+        value = self.lookup(host, kind)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        return self.put(host, kind, fetch(), ttl)
+
+    def invalidate(self, host, kinds=None):
+        # Drop the given kinds (everything when None) of a device
+        with self._lock:
+            entries = self._host(host)['entries']
+            for kind in list(entries if kinds is None else kinds):
+                entries.pop(kind, None)
+            self._save(host)
+
+    def check(self, host, probe):
+        # Run probe() (at most every probe_interval seconds) and record the token it returns, state fetched after it
+        # goes with that token. Everything cached for the device is dropped when the token is not the recorded one, or
+        # when the probe could not read one. Returns True when cached state was dropped.
+        now = time.time()
+        with self._lock:
+            state = self._host(host)
+            if now - state['probed'] < self.probe_interval:
+                return False
+        token = probe()
+        with self._lock:
+            state['probed'] = now
+            changed = False
+            if token is None or token != state['token']:
+                changed = bool(state['entries'])
+                state['entries'] = {}
+            state['token'] = token
+            self._save(host)
+        return changed
+
+    def record(self, host, token):
+        # Token probed right after our own write, the state still cached stays valid with it
+        with self._lock:
+            state = self._host(host)
+            state['token'] = token
+            state['probed'] = time.time()
+            self._save(host)
+
+
+def accounting_probe(xmlagent):
+    # Index of the last accounting log entry. Every configuration change is logged, so the index moving means the
+    # configuration may have changed.
+    res = xmlagent.exec_command({'show accounting log last-index'})
+    match = ACCOUNTING_INDEX.search(xmlstream.data_text(res.xml))
+    return match.group(1) if match else None
+
+
+VLAN_FILTER = '''<System xmlns="''' + yangxml.NXOS_NS + '''"><bd-items><bd-items><BD-list><fabEncap/></BD-list></bd-items></bd-items></System>'''
+INTERFACE_FILTER = '''<System xmlns="''' + yangxml.NXOS_NS + '''"><intf-items><phys-items><PhysIf-list/></phys-items></intf-items></System>'''
+USER_FILTER = '''<System xmlns="''' + yangxml.NXOS_NS + '''"><userext-items><user-items><User-list><name/></User-list></user-items></userext-items></System>'''
+ROLE_FILTER = '''<System xmlns="''' + yangxml.NXOS_NS + '''"><userext-items><role-items><Role-list><name/></Role-list></role-items></userext-items></System>'''
+
+
+def fetch_vlans(device):
+    # fabEncap of every BD-list entry ("vlan-10"), sorted by VLAN id
+    res = readiness.retry_busy(lambda: device.get(('subtree', VLAN_FILTER)))
+    return sorted(set(xmlstream.leaf_texts(res.xml, 'fabEncap')), key=lambda vlan: int(vlan.split('-')[-1]) if vlan.split('-')[-1].isdigit() else 0)
+
+
+# Leaves of every physical interface kept in the cache, the configuration leaves of the PhysIf-list entry (port mode
+# and VLANs)
+INTERFACE_LEAVES = ('adminSt', 'mode', 'layer', 'accessVlan', 'trunkVlans')
+# operSt of one (id given) or every physical interface, from the operational phys-items below the PhysIf-list entry
+OPER_TEMPLATE = template.compile('''<System xmlns="''' + yangxml.NXOS_NS + '''"><intf-items><phys-items><PhysIf-list>'''
+                                 '''{?interface}<id>{interface}</id>{/interface}{^interface}<id/>{/interface}'''
+                                 '''<phys-items><operSt/></phys-items></PhysIf-list></phys-items></intf-items></System>''')
+
+
+def fetch_interfaces(device):
+    # id -> {'adminSt', 'mode', ...} of every physical interface
+    res = readiness.retry_busy(lambda: device.get(('subtree', INTERFACE_FILTER)))
+    interfaces = {}
+    for entry in xmlstream.iter_elements(res.xml, 'PhysIf-list'):
+        interfaces[entry.findtext('{*}id')] = dict((leaf, entry.findtext('{*}' + leaf)) for leaf in INTERFACE_LEAVES)
+    return interfaces
+
+
+def fetch_oper_states(device, interface=None):
+    # id -> operSt of every physical interface, or of the one named
+    res = readiness.retry_busy(lambda: device.get(('subtree', OPER_TEMPLATE.render(interface=interface))))
+    return dict((entry.findtext('{*}id'), entry.findtext('.//{*}operSt')) for entry in xmlstream.iter_elements(res.xml, 'PhysIf-list'))
+
+
+def fetch_users(device):
+    res = readiness.retry_busy(lambda: device.get(('subtree', USER_FILTER)))
+    return sorted(set(xmlstream.leaf_texts(res.xml, 'name')))
+
+
+def fetch_roles(device):
+    res = readiness.retry_busy(lambda: device.get(('subtree', ROLE_FILTER)))
+    return sorted(set(xmlstream.leaf_texts(res.xml, 'name')))
+
+
+class DeviceState(object):
+    # Cached state of the device behind an NxSession. Every accessor fetches over the shared NETCONF session on a
+    # miss. With probe=True the accounting log index is checked (over the XML Agent session) before cached state is
+    # used or fetched, at most every probe_interval seconds.
+
+    def __init__(self, session, cache=None, probe=False):
+        self.session = session
+        self.cache = cache if cache is not None else StateCache()
+        self.probe = probe
+        self._vlan_set = None
+
+    def _get(self, kind, fetch):
+        host = self.session.host
+        if self.probe:
+            self.cache.check(host, lambda: accounting_probe(self.session.xmlagent))
+        return self.cache.get(host, kind, lambda: fetch(self.session.netconf))
+
+    def vlans(self):
+        return self._get(VLANS, fetch_vlans)
+
+    def vlan_set(self):
+        # The VLAN table as a vlanset.VlanSet, built again only when the table was fetched again
+        vlans = self.vlans()
+        if self._vlan_set is None or self._vlan_set[0] is not vlans:
+            self._vlan_set = (vlans, VlanSet.of(vlans))
+        return self._vlan_set[1]
+
+    def has_vlans(self, vlans):
+        # True when every VLAN in vlans (a VlanSet, or VLAN ids / "vlan-N" names) exists on the device
+        if not isinstance(vlans, VlanSet):
+            vlans = VlanSet.of(vlans)
+        return vlans.issubset(self.vlan_set())
+
+    def interfaces(self):
+        return self._get(INTERFACES, fetch_interfaces)
+
+    def interface(self, name):
+        # Configuration leaves of one interface, None when the device has no such interface
+        return self.interfaces().get(name)
+
+    def oper_states(self, names=None):
+        # id -> operSt, read from the device on every call for the "interface is UP" pre-checks. One interface is
+        # asked for on its own, more get one reply for all interfaces.
+        names = list(names) if names is not None else None
+        if names is not None and len(names) == 1:
+            return fetch_oper_states(self.session.netconf, names[0])
+        states = fetch_oper_states(self.session.netconf)
+        return states if names is None else dict((name, states.get(name)) for name in names)
+
+    def oper_state(self, name):
+        return self.oper_states([name]).get(name)
+
+    def users(self):
+        return self._get(USERS, fetch_users)
+
+    def roles(self):
+        return self._get(ROLES, fetch_roles)
+
+    def features(self, names=None):
+        # name -> True/False/None as features.parse_features(), JSON keeps the OrderedDict order
+        names = list(names or features.FEATURES)
+        state = self._get(FEATURES, lambda device: dict(features.fetch_netconf(device, list(features.FEATURES))))
+        return dict((name, state.get(name)) for name in names)
+
+    def capabilities(self):
+        return self._get(CAPABILITIES, lambda device: sorted(device.server_capabilities))
+
+    def changed(self, *kinds):
+        # Call after our own write: drops the kinds it changed (everything without arguments) and records the
+        # accounting index the write moved to, so the rest is not flushed by the next probe
+        self.cache.invalidate(self.session.host, kinds or None)
+        if self.probe:
+            self.cache.record(self.session.host, accounting_probe(self.session.xmlagent))
+
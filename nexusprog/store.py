@@ -0,0 +1,367 @@
+# Content addressed backup store. Every pre/post change backup and every shrunconfig run used to write a new full file
+# even when the configuration had not changed, so the backup volume was mostly identical configs. BackupStore keeps
+# each piece of content once:
+#   - a snapshot is cut into chunks at line boundaries picked from the content itself (a line whose CRC matches a
+#     mask ends a chunk), so an edit in one place only changes the chunks around it and the rest deduplicates
+#   - chunks are stored zlib compressed under their SHA-256, written once and never modified
+#   - the list of chunks of a snapshot (its manifest) is stored the same way, its hash is the snapshot id, so two
+#     identical configs are one snapshot
+#   - a per device index maps the time of every backup to its snapshot id
+# prune() applies retention policies to the indexes and collect() removes the objects nothing refers to any more.
+#
+# A cron backup may write to the store while NXOS-backup-store.py prunes it, so the index appends, prune() and
+# collect() take a file lock on the store, held across processes. A writer only indexes its snapshot at the end, so
+# collect() leaves objects younger than a grace period alone, and a writer that reuses an object refreshes its time.
+#
+# Layout under the store root:
+#   objects/ab/cdef...   zlib compressed chunk or manifest, named after the SHA-256 of the uncompressed content
+#   index/<device>.jsonl one JSON line per backup: {"time": ..., "label": ..., "snapshot": ..., "size": ...}
+#   lock                 the store lock
+
+import contextlib, hashlib, json, os, re, threading, time, zlib
+try:
+    import fcntl
+except ImportError:
+    # No fcntl on Windows, the store lock then only holds between the threads of one process
+    fcntl = None
+
+MIN_CHUNK = 2048
+MAX_CHUNK = 65536
+# A line whose CRC32 has these bits clear ends a chunk, on average every 64 lines
+BOUNDARY_MASK = 0x3f
+# collect() keeps objects written or reused this recently, a backup in progress has not indexed them yet
+GRACE_SECONDS = 3600
+
+
+def _atomic_write(path, data):
+    tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.current_thread().ident)
+    with open(tmp, 'wb') as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp, path)
+
+
+def device_key(device):
+    # File system safe name of a device for its index file
+    return re.sub(r'[^\w.-]', '_', device)
+
+
+class StoreWriter(object):
+    # File like object that chunks what is written to it on the fly, so a backup can be streamed into the store the
+    # same way it is streamed into a SnapshotWriter. Use as a context manager or call commit() at the end.
+
+    def __init__(self, store, device, label='', timestamp=None):
+        self.store = store
+        self.device = device
+        self.label = label
+        self.timestamp = timestamp
+        self.chunks = []
+        self.pending = bytearray()
+        self.scanned = 0
+        self.bytes_written = 0
+        self.bytes_stored = 0
+        self.snapshot = None
+        self.path = None
+        self.closed = False
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.bytes_written += len(data)
+        self.pending.extend(data)
+        self._cut(final=False)
+        return len(data)
+
+    def _cut(self, final):
+        # Emit every complete chunk found in the pending data. A chunk ends after a boundary line once it is at least
+        # MIN_CHUNK long, or at the end of the line that takes it past MAX_CHUNK. Lines already looked at by an earlier
+        # call are not scanned again.
+        start = 0
+        pos = self.scanned
+        pending = self.pending
+        while True:
+            newline = pending.find(b'\n', pos)
+            if newline < 0:
+                break
+            line_end = newline + 1
+            size = line_end - start
+            if size >= MAX_CHUNK or (size >= MIN_CHUNK and zlib.crc32(pending[pos:line_end]) & BOUNDARY_MASK == 0):
+                self._emit(bytes(pending[start:line_end]))
+                start = line_end
+            pos = line_end
+        if final and start < len(pending):
+            self._emit(bytes(pending[start:]))
+            start = pos = len(pending)
+        elif not final and len(pending) - start > MAX_CHUNK:
+            # One very long line, cut it anyway so the buffer stays bounded
+            self._emit(bytes(pending[start:]))
+            start = pos = len(pending)
+        del pending[:start]
+        self.scanned = pos - start
+
+    def _emit(self, chunk):
+        digest, stored = self.store.put_object(chunk)
+        self.bytes_stored += stored
+        self.chunks.append(digest)
+
+    def commit(self):
+        if self.closed:
+            return self.snapshot
+        self._cut(final=True)
+        manifest = json.dumps({'chunks': self.chunks, 'size': self.bytes_written}, separators=(',', ':')).encode('utf-8')
+        self.snapshot, stored = self.store.put_object(manifest)
+        self.bytes_stored += stored
+        self.path = self.store.uri(self.device, self.snapshot)
+        self.store.add_index(self.device, self.snapshot, self.bytes_written, self.label, self.timestamp)
+        self.closed = True
+        return self.snapshot
+
+    def close(self):
+        # Closing commits, so a StoreWriter can stand in for a plain file opened for writing
+        self.commit()
+
+    def abort(self):
+        # Chunks already written stay in the store, collect() removes them as nothing refers to them
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+
+class BackupStore(object):
+
+    def __init__(self, root, level=6):
+        self.root = root
+        self.level = level
+        self.objects_dir = os.path.join(root, 'objects')
+        self.index_dir = os.path.join(root, 'index')
+        for directory in (self.objects_dir, self.index_dir):
+            if not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
+        self.lock_path = os.path.join(root, 'lock')
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def locked(self, shared=False):
+        # Store lock. Exclusive for changes to the indexes and for collect(), shared while a writer relies on an object
+        # that is already in the store. Every call opens the lock file, flock locks of separate opens exclude each
+        # other between threads too.
+        if fcntl is None:
+            if shared:
+                yield
+            else:
+                with self._lock:
+                    yield
+            return
+        with open(self.lock_path, 'ab') as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+
+    # Objects
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def put_object(self, data):
+        # Store data once. Returns its digest and the number of bytes that were written to disk (0 when the content
+        # was already there).
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        with self.locked(shared=True):
+            try:
+                # Fresh again, so collect() does not take it before this snapshot is indexed
+                os.utime(path)
+                return digest, 0
+            except FileNotFoundError:
+                pass
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        compressed = zlib.compress(data, self.level)
+        _atomic_write(path, compressed)
+        return digest, len(compressed)
+
+    def get_object(self, digest):
+        with open(self.object_path(digest), 'rb') as handle:
+            data = zlib.decompress(handle.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError('object ' + digest + ' is corrupt')
+        return data
+
+    # Snapshots
+
+    def writer(self, device, label='', timestamp=None):
+        return StoreWriter(self, device, label, timestamp)
+
+    def put(self, device, data, label='', timestamp=None):
+        # Store a complete snapshot (str or bytes). Returns the snapshot id.
+        with self.writer(device, label, timestamp) as writer:
+            writer.write(data)
+        return writer.snapshot
+
+    def manifest(self, snapshot):
+        return json.loads(self.get_object(snapshot).decode('utf-8'))
+
+    def iter_snapshot(self, snapshot):
+        for digest in self.manifest(snapshot)['chunks']:
+            yield self.get_object(digest)
+
+    def get(self, snapshot):
+        return b''.join(self.iter_snapshot(snapshot))
+
+    def restore(self, snapshot, out):
+        # Write a snapshot to an open (binary) file object, chunk by chunk
+        size = 0
+        for chunk in self.iter_snapshot(snapshot):
+            out.write(chunk)
+            size += len(chunk)
+        return size
+
+    def uri(self, device, snapshot):
+        return 'store:' + device + '@' + snapshot[:12]
+
+    # Per device index
+
+    def index_path(self, device):
+        return os.path.join(self.index_dir, device_key(device) + '.jsonl')
+
+    def add_index(self, device, snapshot, size, label='', timestamp=None):
+        entry = {'time': time.time() if timestamp is None else timestamp, 'device': device, 'label': label, 'snapshot': snapshot, 'size': size}
+        line = (json.dumps(entry, sort_keys=True) + '\n').encode('utf-8')
+        with self.locked():
+            with open(self.index_path(device), 'ab') as handle:
+                handle.write(line)
+        return entry
+
+    def history(self, device):
+        # Index entries of a device, oldest first
+        path = self.index_path(device)
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path, 'rb') as handle:
+            for line in handle:
+                if line.strip():
+                    entries.append(json.loads(line.decode('utf-8')))
+        entries.sort(key=lambda entry: entry['time'])
+        return entries
+
+    def devices(self):
+        names = []
+        for filename in sorted(os.listdir(self.index_dir)):
+            if filename.endswith('.jsonl'):
+                entries = self.history_file(os.path.join(self.index_dir, filename))
+                if entries:
+                    names.append(entries[0]['device'])
+        return names
+
+    def history_file(self, path):
+        with open(path, 'rb') as handle:
+            return [json.loads(line.decode('utf-8')) for line in handle if line.strip()]
+
+    def latest(self, device):
+        entries = self.history(device)
+        return entries[-1] if entries else None
+
+    def resolve(self, device, ref):
+        # Snapshot id for a full id, a unique prefix of one, or "latest"
+        entries = self.history(device)
+        if ref == 'latest' and entries:
+            return entries[-1]['snapshot']
+        matches = sorted(set(entry['snapshot'] for entry in entries if entry['snapshot'].startswith(ref)))
+        if len(matches) == 1:
+            return matches[0]
+        raise KeyError('no unique snapshot ' + ref + ' for ' + device)
+
+    # Retention
+
+    def prune(self, device, keep_last=None, max_age_days=None, keep_daily=None, now=None):
+        # Drop index entries that no policy keeps. An entry is kept when it is one of the keep_last newest, younger than
+        # max_age_days, or the newest of its day for the keep_daily most recent days that have backups. Without any
+        # policy nothing is dropped. Returns the removed entries, run collect() afterwards to free the space.
+        if keep_last is None and max_age_days is None and keep_daily is None:
+            return []
+        now = time.time() if now is None else now
+        with self.locked():
+            entries = self.history(device)
+            keep = set()
+            if keep_last:
+                keep.update(range(max(0, len(entries) - keep_last), len(entries)))
+            if max_age_days is not None:
+                cutoff = now - max_age_days * 86400
+                keep.update(index for index, entry in enumerate(entries) if entry['time'] >= cutoff)
+            if keep_daily:
+                days = {}
+                for index, entry in enumerate(entries):
+                    days[time.strftime('%Y-%m-%d', time.localtime(entry['time']))] = index
+                keep.update(days[day] for day in sorted(days)[-keep_daily:])
+            kept = [entry for index, entry in enumerate(entries) if index in keep]
+            removed = [entry for index, entry in enumerate(entries) if index not in keep]
+            data = ''.join(json.dumps(entry, sort_keys=True) + '\n' for entry in kept).encode('utf-8')
+            _atomic_write(self.index_path(device), data)
+        return removed
+
+    def collect(self, grace=GRACE_SECONDS):
+        # Remove objects no index entry refers to and that were not written or reused in the last grace seconds.
+        # Returns (objects removed, bytes freed). A manifest that cannot be read would make its chunks look dead, so
+        # that raises ValueError before anything is removed.
+        with self.locked():
+            live = set()
+            for filename in os.listdir(self.index_dir):
+                if not filename.endswith('.jsonl'):
+                    continue
+                for entry in self.history_file(os.path.join(self.index_dir, filename)):
+                    if entry['snapshot'] in live:
+                        continue
+                    live.add(entry['snapshot'])
+                    try:
+                        live.update(self.manifest(entry['snapshot'])['chunks'])
+                    except (IOError, OSError, ValueError) as e:
+                        raise ValueError('snapshot ' + entry['snapshot'] + ' of ' + entry['device'] + ' cannot be read (' + str(e) +
+                                         '), nothing collected')
+            cutoff = time.time() - grace
+            removed = 0
+            freed = 0
+            for digest, path in self._all_objects():
+                if digest in live:
+                    continue
+                info = os.stat(path)
+                if info.st_mtime > cutoff:
+                    continue
+                freed += info.st_size
+                os.remove(path)
+                removed += 1
+        return removed, freed
+
+    def _all_objects(self):
+        for prefix in os.listdir(self.objects_dir):
+            directory = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if not name.endswith('.tmp'):
+                    yield prefix + name, os.path.join(directory, name)
+
+    def stats(self):
+        # Number of objects, bytes on disk, and the bytes the indexed backups would take as plain files
+        objects = 0
+        stored = 0
+        for _, path in self._all_objects():
+            objects += 1
+            stored += os.path.getsize(path)
+        logical = 0
+        backups = 0
+        for filename in os.listdir(self.index_dir):
+            if filename.endswith('.jsonl'):
+                for entry in self.history_file(os.path.join(self.index_dir, filename)):
+                    logical += entry['size']
+                    backups += 1
+        return {'objects': objects, 'stored_bytes': stored, 'backups': backups, 'logical_bytes': logical}
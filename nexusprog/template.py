@@ -0,0 +1,191 @@
+# Precompiled XML payload templates. The scripts built every payload by concatenating string literals and parameters
+# ('''<id>''' + INTERFACE + '''</id>'''), re-doing the work for every port and sending the indentation of the source
+# code to the device. A Template is compiled once, usually at import time:
+#   - the indentation between tags is dropped, so the payload on the wire is compact
+#   - {name} is replaced by the parameter, XML escaped (None renders as nothing)
+#   - {#name}...{/name} repeats the block for every item of a list parameter. Items are dicts or objects with
+#     attributes (namedtuples), names not found on the item come from the enclosing parameters.
+#   - {?name}...{/name} renders the block only when the parameter is set, {^name}...{/name} only when it is not. Set
+#     means not None and not empty, a VLAN, priority or flag of 0 or False is set.
+# Each block is compiled to a Python function concatenating its text with the escaped parameters, rendering a list of
+# 48 ports is 48 calls of the function of the repeated block and one join.
+#
+#   PORT = template.compile('''
+#       <phys-items>
+#           {#ports}<PhysIf-list><id>{id}</id>{?descr}<descr>{descr}</descr>{/descr}</PhysIf-list>{/ports}
+#       </phys-items>''')
+#   PORT.render(ports=[{'id': 'eth1/1', 'descr': 'A & B'}])
+
+import re
+
+_TOKEN = re.compile(r'\{([#?^/]?)([A-Za-z_][A-Za-z0-9_]*)\}')
+# Whitespace holding a line break between two tags or template markers is indentation, not content
+_INDENT = re.compile(r'(?<=[>}])\s*\n\s*(?=[<{])')
+
+_MISSING = object()
+
+
+class TemplateError(ValueError):
+    pass
+
+
+def xml_text(value):
+    # A parameter as XML text. Most values (interface names, VLAN ids) have nothing to escape and come back as they are.
+    if value.__class__ is str:
+        if '&' in value:
+            value = value.replace('&', '&amp;')
+        if '<' in value:
+            value = value.replace('<', '&lt;')
+        if '>' in value:
+            value = value.replace('>', '&gt;')
+        if '"' in value:
+            value = value.replace('"', '&quot;')
+        return value
+    if value.__class__ is int:
+        return str(value)
+    if value is None:
+        return ''
+    if value is True or value is False:
+        return 'true' if value else 'false'
+    return xml_text(str(value))
+
+
+def present(value):
+    # Whether a {?name} block is rendered for value
+    if value is None:
+        return False
+    try:
+        return len(value) > 0
+    except TypeError:
+        return True
+
+
+def lookup(item, parents, name):
+    # Value of name on item (a dict or an object with attributes), else on the enclosing parameters
+    for scope in (item,) + parents:
+        if isinstance(scope, dict):
+            value = scope.get(name, _MISSING)
+        else:
+            value = getattr(scope, name, _MISSING)
+        if value is not _MISSING:
+            return value
+    raise KeyError(name)
+
+
+class _Block(object):
+    # A run of text, parameters and nested blocks. Compiled to one Python function that takes the parameters
+    # (item) and the enclosing parameters (parents) and returns the text, so rendering does no parsing or dispatch
+    # beyond one lookup per parameter.
+
+    def __init__(self, kind=None, name=None):
+        self.kind = kind
+        self.name = name
+        self.parts = []
+
+    def names(self):
+        # Parameters the text of this block reads itself, not counting nested blocks
+        return set(part[1] for part in self.parts if not isinstance(part, _Block) and part[0] == 'name')
+
+    def inline(self, names):
+        # A {?name} block whose parameters are all read by the enclosing block is rendered inside its function
+        # instead of by a call of its own, as long as its value is not a dict that it would read its parameters from
+        return self.kind == '?' and not any(isinstance(part, _Block) for part in self.parts) and self.names() <= names
+
+    def compile(self, namespace):
+        # Name of the function rendering this block, defined in namespace together with the ones of nested blocks
+        names = []
+        for part in self.parts:
+            name = part.name if isinstance(part, _Block) else (part[1] if part[0] == 'name' else None)
+            if name is not None and name not in names:
+                names.append(name)
+        pieces = []
+        for part in self.parts:
+            if isinstance(part, _Block):
+                inner = part.compile(namespace)
+                value = 'v%d' % names.index(part.name)
+                if part.kind == '#':
+                    pieces.append("(''.join([%s(entry, scopes) for entry in %s]) if %s else '')" % (inner, value, value))
+                elif part.inline(set(names)):
+                    pieces.append("((%s(%s, scopes) if %s.__class__ is dict else %s) if present(%s) else '')" % (inner, value, value, part.expression(names), value))
+                elif part.kind == '?':
+                    # A dict value is the parameters of the block, otherwise the block reads the same ones as this one
+                    pieces.append("((%s(%s, scopes) if %s.__class__ is dict else %s(item, parents)) if present(%s) else '')" % (inner, value, value, inner, value))
+                else:
+                    pieces.append("('' if present(%s) else %s(item, parents))" % (value, inner))
+            elif part[0] == 'text':
+                pieces.append(repr(part[1]))
+            else:
+                pieces.append('xml_text(v%d)' % names.index(part[1]))
+        function = '_block%d' % len(namespace)
+        namespace[function] = None
+        code = ['def %s(item, parents):' % function]
+        if any(isinstance(part, _Block) for part in self.parts):
+            code.append('    scopes = (item,) + parents')
+        if names:
+            # Parameters of a dict item are read directly, anything else (attributes, names of the enclosing
+            # parameters) goes through lookup()
+            code.append('    try:')
+            code.extend('        v%d = item[%r]' % (index, name) for index, name in enumerate(names))
+            code.append('    except (KeyError, TypeError, IndexError):')
+            code.extend('        v%d = lookup(item, parents, %r)' % (index, name) for index, name in enumerate(names))
+        code.append('    return ' + (' + '.join(pieces) if pieces else "''"))
+        exec('\n'.join(code), namespace)
+        return function
+
+    def expression(self, names):
+        # The text of an inlined block as an expression over the variables of the enclosing function
+        pieces = [repr(part[1]) if part[0] == 'text' else 'xml_text(v%d)' % names.index(part[1]) for part in self.parts]
+        return '(' + (' + '.join(pieces) if pieces else "''") + ')'
+
+
+class Template(object):
+
+    def __init__(self, source):
+        self.source = source
+        text = _INDENT.sub('', source.strip())
+        root = _Block()
+        stack = [root]
+        position = 0
+        for match in _TOKEN.finditer(text):
+            if match.start() > position:
+                stack[-1].parts.append(('text', text[position:match.start()]))
+            position = match.end()
+            kind, name = match.group(1), match.group(2)
+            if kind in ('#', '?', '^'):
+                block = _Block(kind, name)
+                stack[-1].parts.append(block)
+                stack.append(block)
+            elif kind == '/':
+                if len(stack) == 1 or stack[-1].name != name:
+                    raise TemplateError('{/%s} does not close an open block' % name)
+                stack.pop()
+            else:
+                stack[-1].parts.append(('name', name))
+        if position < len(text):
+            stack[-1].parts.append(('text', text[position:]))
+        if len(stack) > 1:
+            raise TemplateError('{%s%s} is never closed' % (stack[-1].kind, stack[-1].name))
+        namespace = {'xml_text': xml_text, 'lookup': lookup, 'present': present}
+        self._render = namespace[root.compile(namespace)]
+
+    def render(self, params=None, **kwargs):
+        # The payload as text. Parameters come as a dict, keyword arguments or both. Raises KeyError naming a
+        # parameter the template needs and was not given.
+        if kwargs:
+            params = dict(params or {}, **kwargs)
+        return self._render(params if params is not None else {}, ())
+
+    def render_bytes(self, params=None, **kwargs):
+        # The payload as UTF-8 bytes, ready for the wire
+        return self.render(params, **kwargs).encode('utf-8')
+
+
+_COMPILED = {}
+
+
+def compile(source):
+    # Template of source, compiled once per distinct source text
+    template = _COMPILED.get(source)
+    if template is None:
+        template = _COMPILED[source] = Template(source)
+    return template
@@ -0,0 +1,266 @@
+# User and role reconciliation. The usercreate scripts checked the role, checked the user and created the user, three
+# connections for one user on one device. Here the users of a device are brought in line with a desired user file:
+#   - one get reads every User-list entry (with its roles) and every Role-list name
+#   - plan() diffs them against the file: users to add, roles to add to or drop from existing users, passwords to set
+#     and, when pruning, users the file does not list
+#   - every add, role change and removal goes out in one edit_config (RESTCONF: one PATCH, plus a DELETE per removal
+#     since a plain PATCH can only merge)
+#
+# The user file is CSV with a header line
+#
+#   name,password,roles
+#   breakglass,S3cret!,network-admin
+#   ops,0psPass,network-operator;priv-5
+#
+# or JSON, a list of objects with the same fields ({"users": [...]} is accepted as well, roles may be a list). Roles
+# are separated by ";" or spaces. The password is only needed for users a device does not have yet, existing users get
+# it set only when passwords are rotated: the device keeps hashes, so a password can not be compared.
+
+import collections
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+from nexusprog import changefile, readiness, xmlstream, yangxml
+from nexusprog.rollback import NETCONF_NS
+
+UserSpec = collections.namedtuple('UserSpec', 'name password roles')
+UserChange = collections.namedtuple('UserChange', 'name password add_roles remove_roles')
+
+FIELDS = ('name', 'password', 'roles')
+
+# Never removed when pruning, whatever the file says
+PROTECTED_USERS = ('admin',)
+# Roles are assigned in the "all" user domain, as "username x role y" on the CLI does
+USER_DOMAIN = 'all'
+
+ACCOUNT_FILTER = ('<System xmlns="' + yangxml.NXOS_NS + '"><userext-items>'
+                  '<user-items><User-list><name/><userdomain-items/></User-list></user-items>'
+                  '<role-items><Role-list><name/></Role-list></role-items>'
+                  '</userext-items></System>')
+
+
+def _roles(value):
+    if isinstance(value, (list, tuple)):
+        value = ' '.join(str(role) for role in value)
+    return tuple(role for role in str(value or '').replace(';', ' ').replace(',', ' ').split() if role)
+
+
+def parse_users(text, filename=''):
+    # UserSpec of every row, raises changefile.ChangeFileError listing every bad row
+    problems = []
+    users = []
+    seen = set()
+    for number, record in changefile.records(text, filename, 'users'):
+        if not isinstance(record, dict):
+            problems.append('row %d: not an object with %s' % (number, ', '.join(FIELDS)))
+            continue
+        record = dict((str(key).strip().lower(), value) for key, value in record.items() if key is not None)
+        unknown = [key for key in record if key not in FIELDS]
+        if unknown:
+            problems.append('row %d: unknown column(s) %s' % (number, ', '.join(sorted(unknown))))
+            continue
+        name = str(record.get('name') or '').strip()
+        roles = _roles(record.get('roles'))
+        missing = [field for field, value in (('name', name), ('roles', roles)) if not value]
+        if missing:
+            problems.append('row %d: %s missing' % (number, ', '.join(missing)))
+            continue
+        # Usernames are case sensitive on NX-OS
+        if name in seen:
+            problems.append('row %d: %s is listed more than once' % (number, name))
+            continue
+        seen.add(name)
+        users.append(UserSpec(name, str(record.get('password') or '') or None, roles))
+    if problems:
+        raise changefile.ChangeFileError(problems)
+    return users
+
+
+def load_users(filename):
+    with open(filename) as handle:
+        return parse_users(handle.read(), filename)
+
+
+def _user_roles(entry):
+    # Roles of one User-list element in the "all" domain
+    roles = set()
+    for domain in entry.iterfind('.//{*}UserDomain-list'):
+        if domain.findtext('{*}name') == USER_DOMAIN:
+            roles.update(role.findtext('{*}name') for role in domain.iterfind('.//{*}UserRole-list'))
+    return roles
+
+
+def parse_accounts(source):
+    # ({user: set of roles}, set of role names) from a reply or document holding userext-items
+    users = {}
+    for entry in xmlstream.iter_elements(source, 'User-list'):
+        users[entry.findtext('{*}name')] = _user_roles(entry)
+    roles = set()
+    for entry in xmlstream.iter_elements(source, 'Role-list'):
+        roles.add(entry.findtext('{*}name'))
+    return users, roles
+
+
+def fetch_accounts(device):
+    # Users and roles of the device in one get
+    res = readiness.retry_busy(lambda: device.get(('subtree', ACCOUNT_FILTER)))
+    return parse_accounts(res.xml)
+
+
+def _entries(value):
+    if isinstance(value, list):
+        return value
+    return [value] if isinstance(value, dict) else []
+
+
+def _child(value, name):
+    # Member of a container, {} when it is missing or empty (an empty container has no members, only '')
+    child = value.get(name) if isinstance(value, dict) else None
+    return child if isinstance(child, dict) else {}
+
+
+def accounts_from_tree(tree):
+    # parse_accounts() for a yangjson tree of userext-items (a RESTCONF reply in either encoding)
+    users = {}
+    roles = set()
+    ext = _child(tree, 'userext-items') or tree or {}
+    for entry in _entries(_child(ext, 'user-items').get('User-list')):
+        assigned = set()
+        for domain in _entries(_child(entry, 'userdomain-items').get('UserDomain-list')):
+            if domain.get('name') == USER_DOMAIN:
+                assigned.update(role.get('name') for role in _entries(_child(domain, 'role-items').get('UserRole-list')))
+        users[entry.get('name')] = assigned
+    for entry in _entries(_child(ext, 'role-items').get('Role-list')):
+        roles.add(entry.get('name'))
+    return users, roles
+
+
+def fetch_accounts_restconf(rc):
+    # Users and roles of the device in one GET of userext-items, in the encoding of the client
+    return accounts_from_tree(rc.read('userext-items'))
+
+
+class UserPlan(object):
+    # What one device needs to match the user file
+
+    def __init__(self, add=None, update=None, remove=None):
+        self.add = add or []
+        self.update = update or []
+        self.remove = remove or []
+
+    def __len__(self):
+        return len(self.add) + len(self.update) + len(self.remove)
+
+    def summary(self):
+        parts = []
+        if self.add:
+            parts.append('add ' + ', '.join(user.name for user in self.add))
+        for change in self.update:
+            done = []
+            if change.add_roles:
+                done.append('+' + ' +'.join(change.add_roles))
+            if change.remove_roles:
+                done.append('-' + ' -'.join(change.remove_roles))
+            if change.password:
+                done.append('password')
+            parts.append('update ' + change.name + ' (' + ' '.join(done) + ')')
+        if self.remove:
+            parts.append('remove ' + ', '.join(self.remove))
+        return '; '.join(parts) or 'in sync'
+
+
+def plan(desired, users, roles, prune=False, keep=(), rotate=False):
+    # UserPlan bringing a device with users ({name: set of roles}) and roles (set of names) in line with desired
+    # (UserSpec list). rotate sets the password of every listed user that has one in the file, prune removes the users
+    # the file does not list except PROTECTED_USERS and keep. Raises ValueError when the file needs a role the device
+    # does not have or a new user has no password, nothing is planned then.
+    problems = []
+    result = UserPlan()
+    for user in desired:
+        unknown = [role for role in user.roles if role not in roles]
+        if unknown:
+            problems.append('%s: role(s) %s do not exist on the device' % (user.name, ', '.join(unknown)))
+            continue
+        if user.name not in users:
+            if not user.password:
+                problems.append('%s: new user without a password' % user.name)
+                continue
+            result.add.append(user)
+            continue
+        current = users[user.name]
+        add_roles = tuple(role for role in user.roles if role not in current)
+        remove_roles = tuple(sorted(current - set(user.roles)))
+        password = user.password if rotate else None
+        if add_roles or remove_roles or password:
+            result.update.append(UserChange(user.name, password, add_roles, remove_roles))
+    if problems:
+        raise ValueError('\n'.join(problems))
+    if prune:
+        listed = set(user.name for user in desired) | set(PROTECTED_USERS) | set(keep)
+        result.remove = sorted(name for name in users if name not in listed)
+    return result
+
+
+def _user_entry(name, password, add_roles, remove_roles=(), deletes=True):
+    # One User-list entry, None when there is nothing to send for the user
+    xml = '<User-list><name>' + escape(name) + '</name>'
+    if not (password or add_roles or (deletes and remove_roles)):
+        return None
+    if password:
+        # Type 0 (clear text) on entry, the device stores the hash
+        xml += '<pwd>' + escape(password) + '</pwd><pwdEncryptType>0</pwdEncryptType>'
+    role_xml = ''.join('<UserRole-list><name>' + escape(role) + '</name></UserRole-list>' for role in add_roles)
+    if deletes:
+        role_xml += ''.join('<UserRole-list nc:operation="delete"><name>' + escape(role) + '</name></UserRole-list>' for role in remove_roles)
+    if role_xml:
+        xml += ('<userdomain-items><UserDomain-list><name>' + USER_DOMAIN + '</name><role-items>' + role_xml +
+                '</role-items></UserDomain-list></userdomain-items>')
+    return xml + '</User-list>'
+
+
+def system_body(user_plan, deletes=True):
+    # <System> document with every change of the plan. Without deletes the role and user removals are left out
+    # (RESTCONF PATCH), they are then done with delete_paths().
+    entries = [_user_entry(user.name, user.password, user.roles) for user in user_plan.add]
+    entries += [_user_entry(change.name, change.password, change.add_roles, change.remove_roles, deletes) for change in user_plan.update]
+    if deletes:
+        entries += ['<User-list nc:operation="delete"><name>' + escape(name) + '</name></User-list>' for name in user_plan.remove]
+    entries = [entry for entry in entries if entry]
+    if not entries:
+        return None
+    return ('<System xmlns="' + yangxml.NXOS_NS + '" xmlns:nc="' + NETCONF_NS + '"><userext-items><user-items>' +
+            ''.join(entries) + '</user-items></userext-items></System>')
+
+
+def delete_paths(user_plan):
+    # RESTCONF paths of the role assignments and users the plan removes. List keys are percent-encoded, a name may hold
+    # characters that mean something in a URL.
+    paths = []
+    for change in user_plan.update:
+        for role in change.remove_roles:
+            paths.append('userext-items/user-items/User-list=' + quote(change.name, safe='') + '/userdomain-items/UserDomain-list=' +
+                         quote(USER_DOMAIN, safe='') + '/role-items/UserRole-list=' + quote(role, safe=''))
+    paths += ['userext-items/user-items/User-list=' + quote(name, safe='') for name in user_plan.remove]
+    return paths
+
+
+def apply_netconf(device, user_plan):
+    # The whole plan as one edit_config of the running configuration, returns the number of RPCs sent
+    body = system_body(user_plan)
+    if body is None:
+        return 0
+    readiness.retry_busy(lambda: device.edit_config(target='running', config='<config>' + body + '</config>'))
+    return 1
+
+
+def apply_restconf(rc, user_plan):
+    # Adds, role additions and passwords as one PATCH, then one DELETE per removed role assignment or user. Returns the
+    # number of requests sent, raises requests.HTTPError when the device refuses one.
+    sent = 0
+    body = system_body(user_plan, deletes=False)
+    if body is not None:
+        rc.patch('', body).raise_for_status()
+        sent += 1
+    for path in delete_paths(user_plan):
+        rc.delete(path).raise_for_status()
+        sent += 1
+    return sent
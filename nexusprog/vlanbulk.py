@@ -0,0 +1,117 @@
+# Bulk VLAN creation. configure_vlan_yang created one VLAN per run with up to two round trips (BD-list, then the
+# spanning tree Vlan-list). Here a whole range ("100-199,300") is planned against one read of the VLANs the device
+# already has and every missing BD-list and Vlan-list entry goes out in one System payload:
+#   - the name may be a template, "{vlan}" is replaced by the VLAN id and "{index}" by its position in the range
+#     (from 1), so "TENANT1-{vlan}" names VLAN 100 TENANT1-100
+#   - the vn-segment is either given for a single VLAN or as an offset added to every VLAN id (offset 300000 maps
+#     VLAN 100 to VNI 300100)
+#   - payloads bigger than max_bytes are split between VLANs, the BD-list and Vlan-list entries of one VLAN always
+#     travel together
+# The same System payloads are sent as a NETCONF edit_config (inside <config>) or a RESTCONF PATCH of the System root.
+
+import collections
+from nexusprog import readiness, statecache, template, yangxml
+from nexusprog.vlanset import VlanSet
+
+# About 250 bytes per VLAN with a name and an STP priority, so a few hundred VLANs fit in one payload
+DEFAULT_CHUNK_BYTES = 128 * 1024
+
+VlanEntry = collections.namedtuple('VlanEntry', 'vlan name vni stp_priority')
+
+SYSTEM_OPEN = '<System xmlns="' + yangxml.NXOS_NS + '">'
+
+
+def render_name(template, vlan, index):
+    # Name of one VLAN from a name template. Only {vlan} and {index} are replaced, any other brace is part of the name.
+    if not template:
+        return None
+    return template.replace('{vlan}', str(vlan)).replace('{index}', str(index))
+
+
+def plan(vlans, existing=None, name=None, vni=None, vni_offset=None, stp_priority=None):
+    # VlanEntry of every VLAN of vlans (a VlanSet) that existing (VlanSet of the device) does not have, in VLAN order.
+    # Raises ValueError on a fixed vni for more than one VLAN or a VNI out of range.
+    if vni and len(vlans) > 1:
+        raise ValueError('a fixed vn-segment can only be given for a single VLAN, use a VNI offset for a range')
+    entries = []
+    todo = vlans - existing if existing is not None else vlans
+    for index, vlan in enumerate(vlans, 1):
+        if vlan not in todo:
+            continue
+        segment = None
+        if vni:
+            segment = int(vni)
+        elif vni_offset is not None and vni_offset != '':
+            segment = int(vni_offset) + vlan
+        if segment is not None and not 4096 <= segment <= 16777215:
+            raise ValueError('vn-segment %d of VLAN %d is out of range 4096-16777215' % (segment, vlan))
+        entries.append(VlanEntry(vlan, render_name(name, vlan, index), segment, stp_priority if stp_priority != '' else None))
+    return entries
+
+
+BD_TEMPLATE = template.compile('<BD-list><fabEncap>vlan-{vlan}</fabEncap>{?name}<name>{name}</name>{/name}'
+                               '{?vni}<accEncap>vxlan-{vni}</accEncap>{/vni}<mode>CE</mode></BD-list>')
+STP_TEMPLATE = template.compile('{?stp_priority}<Vlan-list><id>{vlan}</id><priority>{stp_priority}</priority></Vlan-list>{/stp_priority}')
+
+
+def bd_entry(entry):
+    return BD_TEMPLATE.render(entry)
+
+
+def stp_entry(entry):
+    return STP_TEMPLATE.render(entry)
+
+
+def _system(bd, stp):
+    body = SYSTEM_OPEN + '<bd-items><bd-items>' + ''.join(bd) + '</bd-items></bd-items>'
+    if any(stp):
+        body += '<stp-items><inst-items><vlan-items>' + ''.join(stp) + '</vlan-items></inst-items></stp-items>'
+    return body + '</System>'
+
+
+def system_bodies(entries, max_bytes=DEFAULT_CHUNK_BYTES):
+    # <System> documents carrying all entries, each at most about max_bytes (a single VLAN is never split)
+    bodies = []
+    bd, stp, size = [], [], 0
+    for entry in entries:
+        bd_xml, stp_xml = bd_entry(entry), stp_entry(entry)
+        if bd and size + len(bd_xml) + len(stp_xml) > max_bytes:
+            bodies.append(_system(bd, stp))
+            bd, stp, size = [], [], 0
+        bd.append(bd_xml)
+        stp.append(stp_xml)
+        size += len(bd_xml) + len(stp_xml)
+    if bd:
+        bodies.append(_system(bd, stp))
+    return bodies
+
+
+def netconf_payloads(entries, max_bytes=DEFAULT_CHUNK_BYTES):
+    return ['<config>' + body + '</config>' for body in system_bodies(entries, max_bytes)]
+
+
+def existing_netconf(device):
+    # VLANs of the device, one get of every fabEncap
+    return VlanSet.of(statecache.fetch_vlans(device))
+
+
+def existing_restconf(rc):
+    # VLANs of the device, one GET of bd-items in the encoding of the client. 204 (No-Content) means no VLANs at all.
+    return VlanSet.of(rc.leaf_values('bd-items/bd-items', 'fabEncap'))
+
+
+def create_netconf(device, entries, max_bytes=DEFAULT_CHUNK_BYTES):
+    # Send the entries as edit_configs of the running configuration, returns the number of RPCs sent
+    payloads = netconf_payloads(entries, max_bytes)
+    for payload in payloads:
+        readiness.retry_busy(lambda: device.edit_config(target='running', config=payload))
+    return len(payloads)
+
+
+def create_restconf(rc, entries, max_bytes=DEFAULT_CHUNK_BYTES):
+    # Send the entries as PATCHes of the System root, returns the number of requests sent. Raises requests.HTTPError
+    # when the device refuses one.
+    bodies = system_bodies(entries, max_bytes)
+    for body in bodies:
+        rc.patch('', body).raise_for_status()
+    return len(bodies)
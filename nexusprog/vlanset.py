@@ -0,0 +1,183 @@
+# VLAN sets as a 4096 bit bitmap. The trunk pre-check split the range string into a Python set, built two dicts of
+# 'vlan-N' strings from it and the VLAN table of the switch and compared those. A VlanSet is a single int with bit N set
+# for VLAN N:
+#   - a range "10-20" is one shift and mask, not a loop over its VLANs
+#   - union, intersection, difference and subset are one int operation each, whatever the size of the sets
+#   - format() turns the set back into the compact "1-5,7,10-20" form NX-OS uses for trunkVlans
+# VlanSet is immutable and hashable, the operators return new sets.
+
+import re
+
+MIN_VLAN = 1
+MAX_VLAN = 4094
+BITS = 4096
+# Every valid VLAN, 1-4094 (0 and 4095 are reserved)
+_VALID = ((1 << (MAX_VLAN + 1)) - 1) ^ 1
+_RUNS = re.compile('1+')
+
+
+def _range_bits(low, high):
+    return ((1 << (high - low + 1)) - 1) << low
+
+
+def vlan_id(token):
+    # "10", " 10 " or "vlan-10" as an int
+    token = token.strip()
+    if token.startswith('vlan-'):
+        token = token[5:]
+    if not token.isdigit():
+        raise ValueError('not a VLAN id: %r' % token)
+    vlan = int(token)
+    if vlan < MIN_VLAN or vlan > MAX_VLAN:
+        raise ValueError('VLAN %d is out of range %d-%d' % (vlan, MIN_VLAN, MAX_VLAN))
+    return vlan
+
+
+class VlanSet(object):
+    __slots__ = ('bits',)
+
+    def __init__(self, bits=0):
+        if bits & ~_VALID:
+            raise ValueError('bitmap holds VLANs out of range %d-%d' % (MIN_VLAN, MAX_VLAN))
+        self.bits = bits
+
+    @classmethod
+    def parse(cls, text):
+        # "10,20-30, 40" (also "vlan-10", "none" / "" for the empty set and "all" for 1-4094) as a VlanSet. Raises
+        # ValueError on anything else.
+        text = (text or '').strip().lower()
+        if text in ('', 'none'):
+            return cls()
+        if text == 'all':
+            return cls(_VALID)
+        bits = 0
+        for part in text.split(','):
+            if '-' in part.replace('vlan-', ''):
+                low, _, high = part.replace('vlan-', '').partition('-')
+                low, high = vlan_id(low), vlan_id(high)
+                if low > high:
+                    raise ValueError('VLAN range %r runs backwards' % part.strip())
+                bits |= _range_bits(low, high)
+            else:
+                bits |= 1 << vlan_id(part)
+        return cls(bits)
+
+    @classmethod
+    def of(cls, vlans):
+        # VlanSet of an iterable of VLAN ids, ints or "vlan-N" strings (the fabEncap values of the VLAN table)
+        bits = 0
+        for vlan in vlans:
+            bits |= 1 << (vlan if isinstance(vlan, int) and MIN_VLAN <= vlan <= MAX_VLAN else vlan_id(str(vlan)))
+        return cls(bits)
+
+    def ranges(self):
+        # (first, last) of every run of consecutive VLANs, in order
+        text = bin(self.bits)[:1:-1]
+        return [(match.start(), match.end() - 1) for match in _RUNS.finditer(text)]
+
+    def format(self, prefix=''):
+        # Compact "1-5,7,10-20" form, prefix is put in front of every VLAN ("vlan-" for fabEncap style)
+        parts = []
+        for low, high in self.ranges():
+            if low == high:
+                parts.append(prefix + str(low))
+            else:
+                parts.append('%s%d-%s%d' % (prefix, low, prefix, high))
+        return ','.join(parts)
+
+    def missing(self, other):
+        # VLANs of this set that other does not have, as a sorted list of ints
+        return list(VlanSet(self.bits & ~other.bits))
+
+    def issubset(self, other):
+        return self.bits & ~other.bits == 0
+
+    def issuperset(self, other):
+        return other.bits & ~self.bits == 0
+
+    def names(self):
+        # ["vlan-N", ...], the fabEncap form
+        return ['vlan-%d' % vlan for vlan in self]
+
+    def __iter__(self):
+        for low, high in self.ranges():
+            for vlan in range(low, high + 1):
+                yield vlan
+
+    def __contains__(self, vlan):
+        if not isinstance(vlan, int):
+            vlan = vlan_id(str(vlan))
+        return 0 <= vlan < BITS and bool(self.bits >> vlan & 1)
+
+    def __len__(self):
+        return bin(self.bits).count('1')
+
+    def __bool__(self):
+        return self.bits != 0
+    __nonzero__ = __bool__
+
+    def __or__(self, other):
+        return VlanSet(self.bits | other.bits)
+
+    def __and__(self, other):
+        return VlanSet(self.bits & other.bits)
+
+    def __sub__(self, other):
+        return VlanSet(self.bits & ~other.bits)
+
+    def __xor__(self, other):
+        return VlanSet(self.bits ^ other.bits)
+
+    def __invert__(self):
+        return VlanSet(_VALID & ~self.bits)
+
+    __le__ = issubset
+    __ge__ = issuperset
+
+    def __lt__(self, other):
+        return self.issubset(other) and self.bits != other.bits
+
+    def __gt__(self, other):
+        return self.issuperset(other) and self.bits != other.bits
+
+    def __eq__(self, other):
+        return isinstance(other, VlanSet) and self.bits == other.bits
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __str__(self):
+        return self.format()
+
+    def __repr__(self):
+        return 'VlanSet(%r)' % self.format()
+
+
+ALL = VlanSet(_VALID)
+EMPTY = VlanSet()
+
+
+def parse(text):
+    return VlanSet.parse(text)
+
+
+def trunk_problems(interfaces, vlans, required=EMPTY):
+    # Check the trunk ports of one device (statecache interface table: id -> {'mode', 'trunkVlans', ...}) against its
+    # VLAN table. Returns (number of trunks, {id: {'missing': VLANs allowed but not on the device, 'not_allowed':
+    # required VLANs the trunk does not carry}}) with only the ports that have a problem. A trunk allowing every VLAN
+    # (the 1-4094 default) is not reported for VLANs the device does not have.
+    trunks = 0
+    problems = {}
+    for name, state in interfaces.items():
+        if state.get('mode') != 'trunk':
+            continue
+        trunks += 1
+        allowed = VlanSet.parse(state.get('trunkVlans') or 'all')
+        missing = EMPTY if allowed == ALL else allowed - vlans
+        not_allowed = required - allowed
+        if missing or not_allowed:
+            problems[name] = {'missing': missing.format(), 'not_allowed': not_allowed.format()}
+    return trunks, problems
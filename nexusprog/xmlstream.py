@@ -0,0 +1,140 @@
+# Streaming extraction from NETCONF / XML Agent replies. The scripts used xml.dom.minidom.parseString(res.xml) to pull
+# one text node or a handful of leaves out of a reply. minidom builds a Python object for every node of the document,
+# for a "show running-config all" of several MB that is a very large object graph just to read the <data> text. The
+# helpers below feed the reply to an lxml parser in chunks with a parser target instead of a tree builder: no tree is
+# built, text is handed to the caller (or written to a file) as the parser produces it. Leaves are picked with a tag
+# filtered pull parser that throws away what it parsed before each match.
+
+from lxml import etree
+
+CHUNK_SIZE = 65536
+
+
+def _chunks(source, size=CHUNK_SIZE):
+    # Reply text (str or bytes) or an open file object, in chunks of size.
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        for offset in range(0, len(source), size):
+            yield source[offset:offset + size]
+
+
+def _localname(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+class _TextTarget(object):
+    # Parser target that passes the character data found inside elements named tag to sink(). Elements nested in a
+    # matched element are included, like the text of the matched subtree.
+
+    def __init__(self, tag, sink, first_only=False):
+        self.tag = tag
+        self.sink = sink
+        self.first_only = first_only
+        self.depth = 0
+        self.matches = 0
+        self.done = False
+
+    def start(self, tag, attrib):
+        if self.done:
+            return
+        if self.depth or _localname(tag) == self.tag:
+            if self.depth == 0:
+                self.matches += 1
+            self.depth += 1
+
+    def end(self, tag):
+        if self.depth:
+            self.depth -= 1
+            if self.depth == 0 and self.first_only:
+                self.done = True
+
+    def data(self, text):
+        if self.depth:
+            self.sink(text)
+
+    def close(self):
+        return self.matches
+
+
+def _parser(target):
+    # huge_tree lifts the libxml2 limit of 10MB for a single text node, a show running-config all can be bigger.
+    return etree.XMLParser(target=target, huge_tree=True, resolve_entities=False)
+
+
+def stream_text(source, tag, sink, first_only=True):
+    # Call sink(text) for every piece of character data inside the <tag> element(s) of source. Returns the number of
+    # matched elements.
+    target = _TextTarget(tag, sink, first_only)
+    parser = _parser(target)
+    for chunk in _chunks(source):
+        parser.feed(chunk)
+        if target.done:
+            break
+    if target.done:
+        return target.matches
+    return parser.close()
+
+
+def write_data_text(source, file, tag='data'):
+    # Stream the text of the <data> element of an XML Agent reply (the output of a show command) into file. Returns the
+    # number of characters written. Replaces xml_doc.getElementsByTagName('data')[0].firstChild.nodeValue. A reply
+    # without <data> (an rpc-error, a command the user may not run) raises ValueError instead of leaving an empty file
+    # that looks like a good backup.
+    written = [0]
+
+    def sink(text):
+        file.write(text)
+        written[0] += len(text)
+    if not stream_text(source, tag, sink):
+        message = first_leaf(source, 'error-message') if not hasattr(source, 'read') else None
+        raise ValueError('reply does not contain <' + tag + '>' + (': ' + message if message else ''))
+    return written[0]
+
+
+def data_text(source, tag='data'):
+    # Text of the <data> element as one string, for callers that need it in memory.
+    parts = []
+    stream_text(source, tag, parts.append)
+    return ''.join(parts)
+
+
+def _prune(elem):
+    # Drop everything the pull parser built before elem, so the partial tree never grows beyond the current path.
+    node = elem
+    parent = node.getparent()
+    while parent is not None:
+        while node.getprevious() is not None:
+            del parent[0]
+        node = parent
+        parent = node.getparent()
+
+
+def iter_elements(source, tag):
+    # Every complete <tag> element of source, in document order. An element is only valid until the next one is
+    # produced: the elements parsed before it are discarded as the parse goes on.
+    parser = etree.XMLPullParser(events=('end',), tag='{*}' + tag, huge_tree=True, resolve_entities=False)
+    for chunk in _chunks(source):
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            yield elem
+            _prune(elem)
+    parser.close()
+
+
+def leaf_texts(source, tag):
+    # Text of every <tag> leaf in source, in document order. Replaces getElementsByTagName(tag) followed by
+    # .firstChild.nodeValue on each element. The pull parser only reports the matching leaves and the elements
+    # parsed before each match are discarded.
+    return [(elem.text or '').strip() for elem in iter_elements(source, tag)]
+
+
+def first_leaf(source, tag, default=None):
+    values = leaf_texts(source, tag)
+    if values:
+        return values[0]
+    return default
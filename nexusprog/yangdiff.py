@@ -0,0 +1,269 @@
+# Structural diff of YANG System trees (the show_run_all_yang snapshots). A text diff of two multi MB dumps compares
+# every line and reports list entries as moved when the device returns them in another order. Instead every snapshot is
+# turned into a hash tree:
+#   - list entries are identified by their key leaves (yangxml.LIST_KEYS, e.g. BD-list/fabEncap, PhysIf-list/id,
+#     Dom-list/name), containers by their tag, so sibling order does not matter
+#   - every node carries a digest of its name, its leaves and the digests of its children, so two subtrees with the
+#     same content have the same digest whatever order their entries came in
+#   - the children of a wide container (thousands of interfaces or VLANs) are spread over buckets by a hash of their
+#     identity and every bucket has its own digest, a Merkle level in between
+# diff() compares digests from the top and only descends into buckets and children whose digests differ. A port change
+# on a 20MB tree looks at the path down to that port and one bucket of siblings along it, not at the rest of the tree.
+#
+# Leaves are not nodes of their own: the leaves of a container or list entry are hashed (and kept) as the entry
+# serialised without its child containers, they come in schema order from the device. Only the parts of the snapshot
+# not yet turned into nodes are held by the parser, not the whole document.
+
+import hashlib, io
+from lxml import etree
+from nexusprog import snapshot
+from nexusprog.yangxml import LIST_KEYS
+
+# Containers with more children than this get a bucket level, about BUCKET_SIZE children per bucket
+BUCKET_SIZE = 32
+
+
+def _hash(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part)
+    return digest.digest()
+
+
+def _localname(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _identity(name, elem):
+    # Same rule as yangxml.list_key: list entries by their key leaves (first leaf when not in LIST_KEYS)
+    if not name.endswith('-list'):
+        return (name,)
+    keys = LIST_KEYS.get(name)
+    if keys is None:
+        keys = (_localname(elem[0].tag),) if len(elem) else ()
+    tag = elem.tag
+    namespace = tag[:tag.index('}') + 1] if tag[:1] == '{' else ''
+    values = []
+    for key in keys:
+        value = elem.findtext(namespace + key)
+        values.append(value.strip() if value is not None else None)
+    return (name,) + tuple(values)
+
+
+def _bucket_count(size):
+    count = 1
+    while size > count * BUCKET_SIZE:
+        count *= 2
+    return count
+
+
+def _bucket_of(identity, count):
+    # From the blake2b digest of the identity, not Python's hash() which is seeded per process: the bucket digests
+    # (and so the digest of every wide container) are the same in every run and can be stored and compared later
+    key = _hash('\0'.join(str(part) for part in identity).encode('utf-8'))
+    return int.from_bytes(key[:8], 'big') % count
+
+
+class Node(object):
+    # raw is the element serialised with its leaves only (its child containers are nodes of their own), the leaves
+    # table is only parsed out of it when a diff needs it.
+    __slots__ = ('name', 'key', 'raw', 'digest', 'buckets', '_leaves')
+
+    def __init__(self, name, key, raw, children):
+        self.name = name
+        self.key = key
+        self.raw = raw
+        self._leaves = None
+        if not children:
+            self.buckets = ()
+            self.digest = _hash(raw)
+            return
+        # Children in buckets of identity -> Node dicts, one bucket unless the container is wide
+        table = {}
+        for child in children:
+            identity = child.key
+            if identity in table:
+                # Repeated containers or entries with the same key keep their order among themselves
+                count = 1
+                while identity + ('#%d' % count,) in table:
+                    count += 1
+                identity = identity + ('#%d' % count,)
+            table[identity] = child
+        count = _bucket_count(len(table))
+        if count == 1:
+            buckets = [table]
+        else:
+            buckets = [{} for _ in range(count)]
+            for identity, child in table.items():
+                buckets[_bucket_of(identity, count)][identity] = child
+        self.buckets = [(_hash(*sorted(child.digest for child in bucket.values())), bucket) for bucket in buckets]
+        self.digest = _hash(raw, *[digest for digest, _ in self.buckets])
+
+    @property
+    def leaves(self):
+        if self._leaves is None:
+            leaves = {}
+            for leaf in etree.fromstring(self.raw):
+                name = _localname(leaf.tag)
+                if name in leaves:
+                    # A leaf repeated under the same parent (leaf-list) keeps every value
+                    count = 1
+                    while '%s#%d' % (name, count) in leaves:
+                        count += 1
+                    name = '%s#%d' % (name, count)
+                leaves[name] = (leaf.text or '').strip()
+            self._leaves = leaves
+        return self._leaves
+
+    def children(self):
+        for _, bucket in self.buckets:
+            for identity, child in bucket.items():
+                yield identity, child
+
+    def child(self, identity):
+        if not self.buckets:
+            return None
+        if len(self.buckets) == 1:
+            return self.buckets[0][1].get(identity)
+        return self.buckets[_bucket_of(identity, len(self.buckets))][1].get(identity)
+
+    def key_leaves(self):
+        # (leaf, value) pairs identifying a list entry, empty for containers
+        if len(self.key) == 1:
+            return []
+        keys = LIST_KEYS.get(self.name) or tuple(self.leaves)[:1]
+        return list(zip(keys, self.key[1:]))
+
+    def label(self):
+        # Path component: the name, plus the key values of a list entry
+        return self.name + ''.join('[%s=%s]' % pair for pair in self.key_leaves())
+
+    def items(self, path=''):
+        # (path, value) of every leaf under this node, used to show what an added or removed subtree holds
+        path = path + '/' + self.label() if path else self.label()
+        for leaf, value in self.leaves.items():
+            yield path + '/' + leaf, value
+        for _, child in self.children():
+            for item in child.items(path):
+                yield item
+
+
+def build(source):
+    # Hash tree of an XML snapshot: a file name (plain, .gz or .xz), an open file, or the XML as str/bytes. Elements
+    # come from an iterparse; once a container is turned into a node it is removed from its parent, so when the parent
+    # ends only its leaves are left under it and the document is never held as a whole.
+    if isinstance(source, (str, bytes)) and source.lstrip()[:1] in ('<', b'<'):
+        source = io.BytesIO(source.encode('utf-8') if isinstance(source, str) else source)
+    elif isinstance(source, str) and snapshot.compression_of(source):
+        with snapshot.open_snapshot(source) as handle:
+            return build(handle)
+    pending = {}
+    root = None
+    for _, elem in etree.iterparse(source, events=('end',), huge_tree=True, resolve_entities=False, remove_blank_text=True,
+                                   remove_comments=True, remove_pis=True):
+        parent = elem.getparent()
+        children = pending.pop(elem, ())
+        if len(elem) == 0 and not children and parent is not None:
+            # A leaf, read as part of its parent
+            continue
+        name = _localname(elem.tag)
+        node = Node(name, _identity(name, elem), etree.tostring(elem, with_tail=False), children)
+        if parent is None:
+            root = node
+        else:
+            pending.setdefault(parent, []).append(node)
+            parent.remove(elem)
+    return root
+
+
+def find(node, name):
+    # First node called name, breadth first (e.g. the System container inside <rpc-reply><data>)
+    queue = [node]
+    while queue:
+        current = queue.pop(0)
+        if current.name == name:
+            return current
+        queue.extend(child for _, child in current.children())
+    return None
+
+
+class Change(object):
+    __slots__ = ('op', 'path', 'old', 'new')
+
+    def __init__(self, op, path, old=None, new=None):
+        self.op = op
+        self.path = path
+        self.old = old
+        self.new = new
+
+    def as_dict(self):
+        return {'op': self.op, 'path': self.path, 'old': self.old, 'new': self.new}
+
+    def __repr__(self):
+        return 'Change(%r, %r, %r, %r)' % (self.op, self.path, self.old, self.new)
+
+
+class DiffStats(object):
+    # Number of nodes the diff compared, to show how little of the tree it touched
+    def __init__(self):
+        self.compared = 0
+
+
+def diff(old, new, stats=None):
+    # Changes turning old into new: ('added', path, None, value), ('removed', path, value, None) and
+    # ('changed', path, old value, new value) for leaves. An added or removed container is one change with the
+    # Node as its value, use Node.items() for its content. Identical subtrees are skipped on their digest.
+    changes = []
+    _diff(old, new, old.label(), changes, stats if stats is not None else DiffStats())
+    return changes
+
+
+def _diff(old, new, path, changes, stats):
+    stats.compared += 1
+    if old.digest == new.digest:
+        return
+    if old.raw != new.raw and old.leaves != new.leaves:
+        for leaf, value in old.leaves.items():
+            if leaf not in new.leaves:
+                changes.append(Change('removed', path + '/' + leaf, value, None))
+            elif new.leaves[leaf] != value:
+                changes.append(Change('changed', path + '/' + leaf, value, new.leaves[leaf]))
+        for leaf, value in new.leaves.items():
+            if leaf not in old.leaves:
+                changes.append(Change('added', path + '/' + leaf, None, value))
+    for child, other in differing_children(old, new):
+        if other is None:
+            changes.append(Change('removed', path + '/' + child.label(), child, None))
+        elif child is None:
+            changes.append(Change('added', path + '/' + other.label(), None, other))
+        else:
+            _diff(child, other, path + '/' + child.label(), changes, stats)
+
+
+def differing_children(old, new):
+    # (old child, new child) pairs of the children of two nodes that differ, None on the side where the child does
+    # not exist. Buckets with the same digest are skipped without looking at their children.
+    if len(old.buckets) == len(new.buckets):
+        pairs = [(a, b) for (digest_a, a), (digest_b, b) in zip(old.buckets, new.buckets) if digest_a != digest_b]
+    else:
+        # The container grew or shrank past a bucket threshold, compare all children once
+        pairs = [(dict(old.children()), dict(new.children()))]
+    for old_bucket, new_bucket in pairs:
+        for identity, child in old_bucket.items():
+            other = new_bucket.get(identity)
+            if other is None or other.digest != child.digest:
+                yield child, other
+        for identity, child in new_bucket.items():
+            if identity not in old_bucket:
+                yield None, child
+
+
+def diff_files(old_source, new_source, root='System', stats=None):
+    # Build both hash trees and diff them from the root container (System by default, the whole document when the
+    # container is not found).
+    old = build(old_source)
+    new = build(new_source)
+    if root:
+        old = find(old, root) or old
+        new = find(new, root) or new
+    return diff(old, new, stats)
@@ -0,0 +1,136 @@
+# JSON encoding of the NX-OS device model for RESTCONF (application/yang.data+json). The snippets only spoke XML, the
+# device answers the same paths in JSON as well, the Postman collection has examples of both. The two encodings map
+# onto one tree of plain Python values:
+#   - a container is a dict of its children by name, a leaf is its text
+#   - a list ("-list" in the name, or a name repeated under one parent) is a list of dicts
+#   - module prefixes in JSON member names ("Cisco-NX-OS-device:System") are dropped, XML namespaces are ignored
+#   - dumps() qualifies the top level members with the module again, RFC 7951 requires it there and a device refuses
+#     {"System": ...}. Below the top every member is of the same module and goes without.
+# from_xml()/loads() read either encoding into the tree, to_xml()/dumps() write it. xml_to_json() turns the XML
+# payloads the templates render into the JSON body of the same request.
+
+import json
+from lxml import etree
+from nexusprog import template, yangxml
+
+_PARSER = etree.XMLParser(remove_blank_text=True, resolve_entities=False, huge_tree=True)
+# Compact separators, the indentation json.dumps adds by default is as useless on the wire as the one of the XML
+SEPARATORS = (',', ':')
+# YANG module of the NX-OS device model, the prefix of top level JSON members
+MODULE = 'Cisco-NX-OS-device'
+
+
+def _is_list(name):
+    return name.endswith('-list')
+
+
+def _element_value(elem):
+    if len(elem) == 0:
+        return elem.text or ''
+    value = {}
+    for child in elem:
+        if not isinstance(child.tag, str):
+            # Comments and processing instructions
+            continue
+        name = yangxml.local_name(child)
+        child_value = _element_value(child)
+        if name in value:
+            if not isinstance(value[name], list):
+                value[name] = [value[name]]
+            value[name].append(child_value)
+        elif _is_list(name):
+            value[name] = [child_value]
+        else:
+            value[name] = child_value
+    return value
+
+
+def from_xml(source):
+    # Tree of an XML document or of a fragment with several top level elements (the RESTCONF PATCH bodies)
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    source = source.strip()
+    if source.startswith(b'<?xml'):
+        source = source[source.index(b'?>') + 2:]
+    root = etree.fromstring(b'<fragment>' + source + b'</fragment>', _PARSER)
+    return _element_value(root) if len(root) else {}
+
+
+def _strip_prefixes(value):
+    if isinstance(value, dict):
+        return dict((name.split(':', 1)[-1], _strip_prefixes(child)) for name, child in value.items())
+    if isinstance(value, list):
+        return [_strip_prefixes(child) for child in value]
+    return value
+
+
+def loads(text):
+    # Tree of a JSON reply, None for an empty one (204 No-Content)
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    if not text.strip():
+        return None
+    return _strip_prefixes(json.loads(text))
+
+
+def qualify(tree, module=MODULE):
+    # The tree with every top level member name prefixed by module, names that already carry a prefix are kept
+    return dict((name if ':' in name else module + ':' + name, value) for name, value in tree.items())
+
+
+def dumps(tree):
+    return json.dumps(qualify(tree), separators=SEPARATORS)
+
+
+def _write_xml(name, value, out, namespace=None):
+    if isinstance(value, list):
+        for entry in value:
+            _write_xml(name, entry, out, namespace)
+        return
+    out.append('<' + name + (' xmlns="' + namespace + '"' if namespace else '') + '>')
+    if isinstance(value, dict):
+        for child, child_value in value.items():
+            _write_xml(child, child_value, out)
+    else:
+        out.append(template.xml_text(value))
+    out.append('</' + name + '>')
+
+
+def to_xml(tree):
+    # XML text of a tree. A System root gets the namespace of the NX-OS device model.
+    out = []
+    for name, value in tree.items():
+        _write_xml(name, value, out, yangxml.NXOS_NS if name == 'System' else None)
+    return ''.join(out)
+
+
+def xml_to_json(source):
+    return dumps(from_xml(source))
+
+
+def leaf_values(tree, name):
+    # Value of every leaf called name in the tree, in document order (the tree counterpart of xmlstream.leaf_texts)
+    values = []
+    stack = [tree]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            children = list(value.items())
+            for child_name, child in reversed(children):
+                if child_name == name and not isinstance(child, (dict, list)):
+                    stack.append(_Leaf(child))
+                else:
+                    stack.append(child)
+        elif isinstance(value, list):
+            stack.extend(reversed(value))
+        elif isinstance(value, _Leaf):
+            values.append(value.text)
+    return values
+
+
+class _Leaf(object):
+    # Marks a matching leaf on the walk stack so leaves of other names (plain strings) are skipped
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text if isinstance(text, str) else json.dumps(text)
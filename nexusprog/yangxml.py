@@ -0,0 +1,158 @@
+# Helpers for the NX-OS YANG <config> payloads the scripts build as strings. merge_configs() folds several payloads
+# into one so a multi step workflow can go out as a single edit_config RPC instead of one RPC (and one round trip
+# through the device configuration manager) per step. ConfigBatch collects the payloads of steps that were written
+# against a NETCONF session without changing the steps.
+
+import contextlib
+from lxml import etree
+from nexusprog import readiness
+
+NXOS_NS = 'http://cisco.com/ns/yang/cisco-nx-os-device'
+
+# Key leaf of the NX-OS device model lists the scripts configure. Entries of a list (tag ending in "-list") are the
+# same entry when their key matches. Lists not in this table use their first leaf, the payloads always start a list
+# entry with its key.
+LIST_KEYS = {
+    'BD-list': ('fabEncap',),
+    'BDEvi-list': ('encap',),
+    'PhysIf-list': ('id',),
+    'LbRtdIf-list': ('id',),
+    'If-list': ('id',),
+    'FwdIf-list': ('id',),
+    'InternalIf-list': ('id',),
+    'Vlan-list': ('id',),
+    'Dom-list': ('name',),
+    'Inst-list': ('name',),
+    'DomAf-list': ('type',),
+    'AfCtrl-list': ('type',),
+    'PeerAf-list': ('type',),
+    'RttP-list': ('type',),
+    'RttEntry-list': ('rtt',),
+    'Peer-list': ('addr',),
+    'Addr-list': ('addr',),
+    'StaticRP-list': ('addr',),
+    'RPGrpList-list': ('grpListName',),
+    'Ep-list': ('epId',),
+    'Nw-list': ('vni',),
+    'User-list': ('name',),
+    'UserRole-list': ('name',),
+}
+
+
+def local_name(elem):
+    return etree.QName(elem).localname
+
+
+def is_list(elem):
+    return local_name(elem).endswith('-list')
+
+
+def list_key(elem):
+    # Identity of an element among its siblings: the tag, plus the key leaf values for list entries.
+    name = local_name(elem)
+    if not is_list(elem):
+        return (elem.tag,)
+    keys = LIST_KEYS.get(name)
+    if keys is None:
+        leaves = [child for child in elem if len(child) == 0 and isinstance(child.tag, str)]
+        keys = (local_name(leaves[0]),) if leaves else ()
+    namespace = etree.QName(elem).namespace
+    values = []
+    for key in keys:
+        leaf = elem.find('{%s}%s' % (namespace, key) if namespace else key)
+        values.append(leaf.text.strip() if leaf is not None and leaf.text else None)
+    return (elem.tag,) + tuple(values)
+
+
+def merge_element(target, source):
+    # Merge the children of source into target. Containers and list entries with the same identity are merged
+    # recursively, leaves from source replace the leaf in target (the later step wins, like it did when the steps
+    # were sent one after the other). Everything else is appended in order.
+    index = {}
+    for child in target:
+        if isinstance(child.tag, str):
+            index.setdefault(list_key(child), child)
+    for child in source:
+        if not isinstance(child.tag, str):
+            continue
+        match = index.get(list_key(child))
+        if match is None:
+            target.append(child)
+            index[list_key(child)] = child
+        elif len(child) == 0:
+            match.text = child.text
+        else:
+            merge_element(match, child)
+    return target
+
+
+def parse_config(config):
+    parser = etree.XMLParser(remove_blank_text=True)
+    return etree.fromstring(config.strip().encode('utf-8'), parser)
+
+
+def merge_configs(configs):
+    # Merge <config> payload strings into one <config> payload string.
+    merged = None
+    for config in configs:
+        root = parse_config(config)
+        if merged is None:
+            merged = root
+        else:
+            merge_element(merged, root)
+    if merged is None:
+        return None
+    return etree.tostring(merged).decode('utf-8')
+
+
+def supports_candidate(device):
+    return any(':candidate' in capability for capability in device.server_capabilities)
+
+
+def push_config(device, config, use_candidate=None):
+    # Send one payload. When the device offers the candidate datastore the payload is staged there and applied with
+    # a single commit, so either all of it is applied or none of it. Otherwise it goes straight to running.
+    if use_candidate is None:
+        use_candidate = supports_candidate(device)
+    if not use_candidate:
+        return readiness.retry_busy(lambda: device.edit_config(target='running', config=config))
+    readiness.retry_busy(lambda: device.lock(target='candidate'))
+    try:
+        try:
+            readiness.retry_busy(lambda: device.edit_config(target='candidate', config=config))
+            return device.commit()
+        except Exception:
+            device.discard_changes()
+            raise
+    finally:
+        device.unlock(target='candidate')
+
+
+class _QueuedReply(object):
+    # Reply handed back to a step for a payload that was queued. The step only looks at ok.
+    ok = True
+
+
+class ConfigBatch(object):
+    # Stands in for the NETCONF session of a workflow: steps that call edit_config() on it have their payloads
+    # collected instead of sent. push() then merges them and sends a single edit_config (and at most one commit).
+
+    def __init__(self):
+        self.configs = []
+
+    def edit_config(self, target='running', config=None, **kwargs):
+        self.configs.append(config)
+        return _QueuedReply()
+
+    @contextlib.contextmanager
+    def netconf_session(self):
+        # Lets the batch be handed to steps written against NxSession.netconf_session()
+        yield self
+
+    def merged(self):
+        return merge_configs(self.configs)
+
+    def push(self, device, use_candidate=None):
+        if not self.configs:
+            return None
+        return push_config(device, self.merged(), use_candidate)
@@ -0,0 +1,36 @@
+# Shared fixtures of the tests. The tests drive the nexusprog modules against emulated devices (nexusprog/emulator.py)
+# on loopback addresses, the ports the code connects to (22, 830 and 443) need root. Without it the emulator tests are
+# skipped. Every test module sets ADDRESS, its own loopback address, so a module never sees the sessions of another.
+
+import os, sys
+import pytest
+# Make the shared nexusprog package at the root of the repository importable however pytest is started
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nexusprog import emulator
+
+USER = 'admin'
+PASSWORD = 'password'
+
+
+@pytest.fixture(scope='module')
+def emulated(request):
+    # The emulator of the module, one small device on ADDRESS
+    device = emulator.EmulatedDevice(request.module.ADDRESS, interfaces=8, vlans=20, credentials={USER: PASSWORD})
+    server = emulator.Emulator([device])
+    try:
+        server.start()
+    except PermissionError:
+        pytest.skip('binding ports 22, 830 and 443 needs root')
+    except OSError as e:
+        pytest.skip('cannot start the emulator on %s: %s' % (device.address, e))
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def device(emulated):
+    # The emulated device, back at its initial configuration for every test
+    device = emulated.devices[0]
+    device.reset()
+    device.reset_stats()
+    return device
@@ -0,0 +1,17 @@
+import os
+import pytest
+from conftest import USER, PASSWORD
+from nexusprog import backup
+
+ADDRESS = '127.0.3.4'
+pytestmark = pytest.mark.filterwarnings('ignore:Unverified HTTPS request')
+
+
+@pytest.mark.parametrize('transport', sorted(backup.FETCHERS))
+def test_backup_every_transport(device, tmp_path, transport):
+    result = backup.backup_device(ADDRESS, USER, PASSWORD, transport, directory=str(tmp_path))
+    assert os.path.basename(result['file']).startswith(ADDRESS + '-')
+    assert result['bytes'] > 0 and os.path.getsize(result['file']) == result['stored']
+    with open(result['file'], 'rb') as handle:
+        text = handle.read().decode('utf-8')
+    assert device.hostname in text
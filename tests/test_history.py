@@ -0,0 +1,36 @@
+import pytest
+from conftest import USER, PASSWORD
+from nexusprog import backup, history
+from nexusprog.session import NxSession
+
+ADDRESS = '127.0.3.10'
+pytestmark = pytest.mark.filterwarnings('ignore:Unverified HTTPS request')
+
+ADD_VLAN = '''<config><System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device"><bd-items><bd-items>
+<BD-list><fabEncap>vlan-300</fabEncap><name>core-uplink</name></BD-list></bd-items></bd-items></System></config>'''
+
+
+def test_history_of_device_backups(device, tmp_path):
+    configs = history.ConfigHistory(str(tmp_path), base_every=2)
+    try:
+        backup.backup_device(ADDRESS, USER, PASSWORD, 'nxapi', store=configs)
+        with NxSession(ADDRESS, USER, PASSWORD) as nx:
+            nx.netconf.edit_config(target='running', config=ADD_VLAN)
+        backup.backup_device(ADDRESS, USER, PASSWORD, 'nxapi', store=configs)
+        assert [row[0] for row in configs.log(ADDRESS)] == [1, 2]
+        assert 'name core-uplink' in configs.get(ADDRESS, 2) and 'name core-uplink' not in configs.get(ADDRESS, 1)
+        assert [(row[1], row[3]) for row in configs.changes('name core-uplink', ADDRESS)] == [(2, '+')]
+    finally:
+        configs.close()
+
+
+def test_versions_between_bases(tmp_path):
+    configs = history.ConfigHistory(str(tmp_path), base_every=3)
+    try:
+        texts = ['hostname sw1\nvlan 1-%d\n' % count for count in range(2, 9)]
+        for text in texts:
+            configs.add('sw1', text)
+        assert [configs.get('sw1', version) for version in range(1, 8)] == texts
+        assert [row[4] for row in configs.log('sw1')] == [1, 0, 0, 1, 0, 0, 1]
+    finally:
+        configs.close()
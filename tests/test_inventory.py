@@ -0,0 +1,17 @@
+from nexusprog import inventory
+
+
+def test_hash_in_a_password_is_not_a_comment():
+    hosts = inventory.parse_inventory('''# lab switches
+[nxos]
+sw1 ansible_host=10.1.1.1 ansible_password=ab#12 # core
+sw2 ansible_password="with space#x"
+#sw3
+''')
+    assert [(host.name, host.address) for host in hosts] == [('sw1', '10.1.1.1'), ('sw2', 'sw2')]
+    assert inventory.credentials(hosts[0], 'admin', 'default') == ('admin', 'ab#12')
+    assert inventory.credentials(hosts[1], 'admin', 'default') == ('admin', 'with space#x')
+
+
+def test_host_list_comments():
+    assert [host.name for host in inventory.parse_hostlist('sw1, sw2 # spare: sw9\n#sw3\nsw#4')] == ['sw1', 'sw2', 'sw#4']
@@ -0,0 +1,29 @@
+import os, subprocess, sys
+from conftest import USER, PASSWORD
+
+ADDRESS = '127.0.3.13'
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Runs in a new interpreter, the test process has ncclient loaded already
+RUN = '''
+import sys, warnings
+warnings.simplefilter('ignore')
+from nexusprog import metrics, restconf
+recorder = metrics.enable()
+rc = restconf.client(sys.argv[1], sys.argv[2], sys.argv[3])
+rc.read('bd-items')
+print('ncclient' in sys.modules)
+from nexusprog.session import NxSession
+with NxSession(sys.argv[1], sys.argv[2], sys.argv[3]) as nx:
+    nx.netconf.get_config(source='running')
+print(sorted(row['transport'] + ' ' + row['operation'] for row in recorder.report()))
+'''
+
+
+def test_enable_does_not_load_ncclient(device):
+    proc = subprocess.run([sys.executable, '-c', RUN, ADDRESS, USER, PASSWORD], cwd=REPO_ROOT, check=True, stdout=subprocess.PIPE)
+    loaded, operations = proc.stdout.decode('utf-8').splitlines()
+    assert loaded == 'False'
+    # ncclient imported later is still timed
+    assert 'netconf connect' in operations and 'netconf get_config' in operations
+    assert 'https connect' in operations and 'restconf get' in operations
@@ -0,0 +1,44 @@
+import pytest
+from conftest import USER, PASSWORD
+from nexusprog import nxapi, restconf
+
+ADDRESS = '127.0.3.3'
+pytestmark = pytest.mark.filterwarnings('ignore:Unverified HTTPS request')
+
+
+@pytest.fixture
+def client(device):
+    rc = restconf.client(ADDRESS, USER, PASSWORD)
+    yield rc
+    rc.close()
+
+
+def test_batch_results_in_order(client):
+    batch = nxapi.Batch()
+    batch.extend(['show hostname', 'show vlan brief'])
+    config = batch.add('show running-config')
+    results = nxapi.run(client, batch)
+    assert [result.ok for result in results] == [True, True, True]
+    assert 'hostname' in results[config].output
+
+
+def test_failure_stops_the_batch_within_one_post(client, device):
+    results = nxapi.run(client, ['show hostname', 'show bogus', 'checkpoint pre-change'])
+    assert [result.ok for result in results] == [True, False, False]
+    assert results[2].error == nxapi.NOT_EXECUTED
+    assert 'pre-change' not in device.checkpoints
+
+
+def test_failure_stops_the_later_posts(client, device):
+    # The failed pre-check is in the first POST, the checkpoint in the second one
+    results = nxapi.run(client, ['show hostname', 'show bogus', 'show vlan brief', 'checkpoint pre-change', 'show version'], max_batch=2)
+    assert [result.ok for result in results] == [True, False, False, False, False]
+    assert all(result.error == nxapi.NOT_EXECUTED for result in results[2:])
+    assert 'pre-change' not in device.checkpoints
+    assert device.stats()['http:ins'] == 1
+
+
+def test_run_one_raises_the_device_error(client):
+    with pytest.raises(nxapi.NxapiError) as error:
+        nxapi.run_one(client, 'show bogus')
+    assert 'Invalid command' in str(error.value)
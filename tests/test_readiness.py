@@ -0,0 +1,61 @@
+import time
+from conftest import USER, PASSWORD
+from nexusprog import backup, readiness
+from nexusprog.session import NxSession
+
+ADDRESS = '127.0.3.7'
+
+ADD_VLAN = '''<config><System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device"><bd-items><bd-items>
+<BD-list><fabEncap>vlan-300</fabEncap><name>core-uplink</name></BD-list></bd-items></bd-items></System></config>'''
+
+
+def test_idle_device_settles_at_once(device):
+    with NxSession(ADDRESS, USER, PASSWORD) as nx:
+        start = time.time()
+        assert readiness.settle(nx.xmlagent)
+        assert time.time() - start < 0.5
+
+
+def test_session_that_stays_is_not_waited_for(device):
+    with NxSession(ADDRESS, USER, PASSWORD) as monitor, NxSession(ADDRESS, USER, PASSWORD) as nx:
+        monitor.netconf
+        start = time.time()
+        assert readiness.settle(nx.xmlagent, timeout=5)
+        assert time.time() - start < 2
+
+
+def test_lock_holder_is_waited_for_until_the_timeout(device, capsys):
+    with NxSession(ADDRESS, USER, PASSWORD) as other, NxSession(ADDRESS, USER, PASSWORD) as nx:
+        other.netconf.lock(target='running')
+        assert readiness.lock_holder(nx.xmlagent) == str(other.netconf.session_id)
+        start = time.time()
+        assert not readiness.settle(nx.xmlagent, timeout=1)
+        assert 1 <= time.time() - start < 3
+        assert 'holds the configuration lock' in capsys.readouterr().out
+        other.netconf.unlock(target='running')
+        assert readiness.lock_holder(nx.xmlagent) is None
+        assert readiness.settle(nx.xmlagent, timeout=5)
+    # Asking who holds the lock never takes it
+    assert device.stats()['rpc:lock'] == 1
+
+
+def test_backup_next_to_another_session_takes_no_lock(device, tmp_path):
+    with NxSession(ADDRESS, USER, PASSWORD) as monitor:
+        monitor.netconf
+        backup.backup_device(ADDRESS, USER, PASSWORD, 'xmlagent', directory=str(tmp_path))
+    assert 'rpc:lock' not in device.stats()
+
+
+class Reply(object):
+    # An ok exec_command reply that does not carry "Copy complete"
+    ok = True
+    xml = '<rpc-reply><ok/></rpc-reply>'
+
+
+def test_unconfirmed_copy_is_not_reported_saved(device):
+    with NxSession(ADDRESS, USER, PASSWORD) as nx:
+        nx.netconf.edit_config(target='running', config=ADD_VLAN)
+        # No other session is logged in, only the startup configuration can confirm the save
+        assert not readiness.wait_for_copy(nx.xmlagent, Reply(), timeout=1)
+        nx.xmlagent.exec_command({'copy running-config startup-config'})
+        assert readiness.wait_for_copy(nx.xmlagent, Reply(), timeout=1)
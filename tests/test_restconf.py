@@ -0,0 +1,34 @@
+import json
+import pytest
+from conftest import USER, PASSWORD
+from nexusprog import restconf, yangjson
+
+ADDRESS = '127.0.3.2'
+# The emulator has a self signed certificate, like a switch out of the box
+pytestmark = pytest.mark.filterwarnings('ignore:Unverified HTTPS request')
+
+BD = '<bd-items xmlns="http://cisco.com/ns/yang/cisco-nx-os-device"><bd-items><BD-list><fabEncap>vlan-%d</fabEncap></BD-list></bd-items></bd-items>'
+
+
+@pytest.fixture
+def client(device):
+    rc = restconf.client(ADDRESS, USER, PASSWORD, encoding='json')
+    yield rc
+    rc.close()
+
+
+def test_json_body_is_module_qualified():
+    body = json.loads(yangjson.xml_to_json(BD % 10))
+    assert list(body) == ['Cisco-NX-OS-device:bd-items']
+    assert yangjson.loads(json.dumps(body)) == yangjson.from_xml(BD % 10)
+
+
+def test_json_patch_and_read_back(client):
+    assert client.patch('bd-items', BD % 300).status_code == 204
+    assert 'vlan-300' in client.leaf_values('bd-items', 'fabEncap')
+
+
+def test_unqualified_json_is_refused(client):
+    response = client.patch('bd-items', '{"bd-items": {"bd-items": {"BD-list": [{"fabEncap": "vlan-301"}]}}}')
+    assert response.status_code == 400
+    assert 'vlan-301' not in client.leaf_values('bd-items', 'fabEncap')
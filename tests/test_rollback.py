@@ -0,0 +1,35 @@
+from lxml import etree
+from conftest import USER, PASSWORD
+from nexusprog import rollback, yangdiff
+from nexusprog.session import NxSession
+
+ADDRESS = '127.0.3.11'
+
+ACCESS = '''<config><System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device"><intf-items><phys-items>
+<PhysIf-list><id>eth1/2</id><adminSt>up</adminSt><accessVlan>vlan-10</accessVlan><descr>printer</descr></PhysIf-list>
+</phys-items></intf-items></System></config>'''
+
+
+def descr(device, interface):
+    for port in device.system.iterfind('.//{*}PhysIf-list'):
+        if port.findtext('{*}id') == interface:
+            return port.findtext('{*}descr')
+
+
+def test_rollback_of_a_port_change(device):
+    with NxSession(ADDRESS, USER, PASSWORD) as nx:
+        subtree = rollback.interface_filter('eth1/2')
+        pre = rollback.capture(nx.netconf, subtree)
+        assert rollback.rollback(nx.netconf, pre, subtree) is None
+        nx.netconf.edit_config(target='running', config=ACCESS)
+        payload = rollback.rollback(nx.netconf, pre, subtree, dry_run=True)
+        assert 'vlan-1<' in payload and 'printer' not in payload
+        # A dry run sends nothing
+        assert descr(device, 'eth1/2') == 'printer'
+        assert rollback.rollback(nx.netconf, pre, subtree) == payload
+        assert yangdiff.diff_files(pre, rollback.capture(nx.netconf, subtree)) == []
+
+
+def test_interface_filter_escapes_names():
+    subtree = etree.fromstring(rollback.interface_filter(['eth1/1', 'a<b&c']))
+    assert [elem.text for elem in subtree.iter('{*}id')] == ['eth1/1', 'a<b&c', 'eth1/1', 'a<b&c']
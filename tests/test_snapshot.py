@@ -0,0 +1,23 @@
+import pytest
+from conftest import USER, PASSWORD
+from nexusprog import backup, snapshot
+
+ADDRESS = '127.0.3.8'
+
+
+@pytest.mark.parametrize('compress', snapshot.COMPRESSION)
+def test_compressed_backup_reads_back(device, tmp_path, compress):
+    result = backup.backup_device(ADDRESS, USER, PASSWORD, 'netconf', directory=str(tmp_path), compress=compress)
+    assert result['file'].endswith('.xml' + snapshot.EXTENSIONS[compress])
+    assert snapshot.compression_of(result['file']) == compress
+    with snapshot.open_snapshot(result['file']) as handle:
+        data = handle.read()
+    assert len(data) == result['bytes'] and device.hostname.encode('utf-8') in data
+    if compress:
+        assert result['stored'] < result['bytes']
+
+
+def test_pretty_backup(device, tmp_path):
+    result = backup.backup_device(ADDRESS, USER, PASSWORD, 'netconf', directory=str(tmp_path), pretty=True)
+    with snapshot.open_snapshot(result['file']) as handle:
+        assert b'\n  <' in handle.read()
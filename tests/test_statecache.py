@@ -0,0 +1,95 @@
+import time
+from conftest import USER, PASSWORD
+from nexusprog import scripts, statecache
+from nexusprog.session import NxSession
+
+ADDRESS = '127.0.3.1'
+
+DELETE_VLAN = '''<config><System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device"><bd-items><bd-items>
+<BD-list xmlns:nc="urn:ietf:params:xml:ns:netconf:base:1.0" nc:operation="delete"><fabEncap>vlan-%d</fabEncap></BD-list>
+</bd-items></bd-items></System></config>'''
+
+
+def session(cache):
+    return NxSession(ADDRESS, USER, PASSWORD, cache=cache, probe=True)
+
+
+def run(directory, check):
+    # One run of a script with -K: a new cache loaded from directory, a new session
+    with session(statecache.StateCache(directory)) as nx:
+        return check(nx.state)
+
+
+def test_external_change_between_runs(device, tmp_path):
+    # The first run fills the cache, VLAN 5 is deleted by someone else, the second run must not trust the cache
+    assert run(str(tmp_path), lambda state: state.has_vlans(['5']))
+    with NxSession(ADDRESS, USER, PASSWORD) as other:
+        other.netconf.edit_config(target='running', config=DELETE_VLAN % 5)
+    assert not run(str(tmp_path), lambda state: state.has_vlans(['5']))
+
+
+def test_unchanged_device_is_served_from_cache(device, tmp_path):
+    run(str(tmp_path), lambda state: state.vlans())
+    gets = device.stats().get('rpc:get', 0)
+    assert run(str(tmp_path), lambda state: state.has_vlans(['5']))
+    assert device.stats().get('rpc:get', 0) == gets
+
+
+def test_own_write_keeps_the_rest_of_the_cache(device, tmp_path):
+    cache = statecache.StateCache(str(tmp_path), probe_interval=0)
+    with session(cache) as nx:
+        nx.state.vlans()
+        nx.state.interfaces()
+        nx.netconf.edit_config(target='running', config=DELETE_VLAN % 7)
+        nx.state.changed(statecache.VLANS)
+        gets = device.stats().get('rpc:get', 0)
+        assert not nx.state.has_vlans(['7'])
+        nx.state.interfaces()
+        # The VLAN table is fetched again, the interfaces are still cached
+        assert device.stats().get('rpc:get', 0) == gets + 1
+    # The token recorded after our write is the current one, the next run keeps using the cache
+    assert not run(str(tmp_path), lambda state: state.has_vlans(['7']))
+    assert device.stats().get('rpc:get', 0) == gets + 1
+
+
+def test_external_change_after_own_write(device, tmp_path):
+    with session(statecache.StateCache(str(tmp_path))) as nx:
+        nx.state.vlans()
+        nx.netconf.edit_config(target='running', config=DELETE_VLAN % 7)
+        nx.state.changed(statecache.INTERFACES)
+    with NxSession(ADDRESS, USER, PASSWORD) as other:
+        other.netconf.edit_config(target='running', config=DELETE_VLAN % 5)
+    assert not run(str(tmp_path), lambda state: state.has_vlans(['5']))
+
+
+def test_trunk_change_keeps_the_vlan_table(device, tmp_path):
+    # The trunk port script writes the interface and then its spanning tree entry, its own change must not drop the
+    # rest of the cache
+    trunk = scripts.load(scripts.TRUNKEDGE_PORT)
+    with session(statecache.StateCache(str(tmp_path), probe_interval=0)) as nx:
+        nx.state.vlans()
+        trunk.nx_config_accessport(nx, 'eth1/3', '10-20', False)
+        gets = device.stats().get('rpc:get', 0)
+        assert nx.state.has_vlans(['10'])
+        assert device.stats().get('rpc:get', 0) == gets
+
+
+def test_oper_state_is_never_cached(device, tmp_path):
+    with session(statecache.StateCache(str(tmp_path))) as nx:
+        assert nx.state.interface('eth1/1') is not None
+        assert nx.state.oper_state('eth1/1') == 'down'
+        # A link coming up does not move the accounting log
+        with device.lock:
+            device.system.find('.//{*}PhysIf-list/{*}phys-items/{*}operSt').text = 'up'
+        assert nx.state.oper_state('eth1/1') == 'up'
+        assert nx.state.oper_states(['eth1/1', 'eth1/2']) == {'eth1/1': 'up', 'eth1/2': 'down'}
+
+
+def test_unreadable_probe_drops_the_cache():
+    cache = statecache.StateCache(probe_interval=0)
+    cache.check('sw1', lambda: '10')
+    cache.put('sw1', statecache.VLANS, ['vlan-1'])
+    assert not cache.check('sw1', lambda: '10')
+    assert cache.lookup('sw1', statecache.VLANS) == ['vlan-1']
+    assert cache.check('sw1', lambda: None)
+    assert cache.lookup('sw1', statecache.VLANS) is None
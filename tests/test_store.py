@@ -0,0 +1,40 @@
+import os, time
+import pytest
+from conftest import USER, PASSWORD
+from nexusprog import backup, store
+
+ADDRESS = '127.0.3.9'
+
+
+def test_store_keeps_unchanged_content_once(device, tmp_path):
+    backups = store.BackupStore(str(tmp_path))
+    first = backup.backup_device(ADDRESS, USER, PASSWORD, 'xmlagent', store=backups)
+    second = backup.backup_device(ADDRESS, USER, PASSWORD, 'xmlagent', store=backups)
+    assert first['stored'] > 0 and second['stored'] == 0
+    entries = backups.history(ADDRESS)
+    assert len(entries) == 2 and entries[0]['snapshot'] == entries[1]['snapshot']
+    assert backups.get(entries[0]['snapshot']) == backups.get(backups.resolve(ADDRESS, 'latest'))
+
+
+def test_prune_and_collect(tmp_path):
+    backups = store.BackupStore(str(tmp_path))
+    old = backups.put('sw1', 'hostname old\n' * 1000, timestamp=time.time() - 86400)
+    new = backups.put('sw1', 'hostname new\n' * 1000)
+    assert [entry['snapshot'] for entry in backups.prune('sw1', keep_last=1)] == [old]
+    # Objects written in the grace period stay, a backup running next to collect() may still refer to them
+    assert backups.collect() == (0, 0)
+    removed, freed = backups.collect(grace=0)
+    assert removed > 0 and freed > 0
+    assert backups.get(new) == b'hostname new\n' * 1000
+    with pytest.raises(IOError):
+        backups.get(old)
+
+
+def test_collect_stops_on_unreadable_manifest(tmp_path):
+    backups = store.BackupStore(str(tmp_path))
+    kept = backups.put('sw1', 'hostname sw1\n')
+    lost = backups.put('sw2', 'hostname sw2\n')
+    os.remove(backups.object_path(lost))
+    with pytest.raises(ValueError):
+        backups.collect(grace=0)
+    assert backups.get(kept) == b'hostname sw1\n'
@@ -0,0 +1,21 @@
+import pytest
+from nexusprog import template, vlanbulk
+
+
+def test_values_are_escaped():
+    assert template.compile('<name>{name}</name>').render(name='a<b>&"c"') == '<name>a&lt;b&gt;&amp;&quot;c&quot;</name>'
+
+
+def test_optional_section_renders_zero_and_false():
+    render = template.compile('{?v}<v>{v}</v>{/v}{^v}none{/v}').render
+    assert render(v=0) == '<v>0</v>'
+    assert render(v=False) == '<v>false</v>'
+    assert render(v=None) == 'none'
+    assert render(v='') == 'none'
+    assert render(v=[]) == 'none'
+    assert '<priority>0</priority>' in vlanbulk.stp_entry(vlanbulk.VlanEntry(10, None, None, 0))
+
+
+def test_unclosed_section_is_an_error():
+    with pytest.raises(template.TemplateError):
+        template.compile('{?v}<v>{v}</v>')
@@ -0,0 +1,45 @@
+import pytest
+from conftest import USER, PASSWORD
+from nexusprog import restconf, usersync
+from nexusprog.session import NxSession
+from nexusprog.usersync import UserChange, UserPlan, UserSpec
+
+ADDRESS = '127.0.3.12'
+pytestmark = pytest.mark.filterwarnings('ignore:Unverified HTTPS request')
+
+
+@pytest.fixture(params=['xml', 'json'])
+def client(request, device):
+    rc = restconf.client(ADDRESS, USER, PASSWORD, encoding=request.param)
+    yield rc
+    rc.close()
+
+
+def test_delete_paths_encode_names():
+    user_plan = UserPlan(update=[UserChange('a/b', None, (), ('priv 5',))], remove=['x?y#z'])
+    assert usersync.delete_paths(user_plan) == [
+        'userext-items/user-items/User-list=a%2Fb/userdomain-items/UserDomain-list=all/role-items/UserRole-list=priv%205',
+        'userext-items/user-items/User-list=x%3Fy%23z']
+
+
+def test_sync_users_with_odd_names(client, device):
+    desired = [UserSpec('ops/eu#1', 'S3cret!', ('network-operator',)), UserSpec('a b', 'x', ('network-admin',))]
+    users, roles = usersync.fetch_accounts_restconf(client)
+    assert usersync.apply_restconf(client, usersync.plan(desired, users, roles)) == 1
+    users, roles = usersync.fetch_accounts_restconf(client)
+    assert users['ops/eu#1'] == {'network-operator'} and users['a b'] == {'network-admin'}
+    # Dropping a role and pruning a user are DELETEs of paths that carry the names
+    user_plan = usersync.plan([UserSpec('ops/eu#1', None, ())], users, roles, prune=True)
+    assert user_plan.remove == sorted(name for name in users if name not in ('admin', 'ops/eu#1'))
+    assert usersync.apply_restconf(client, user_plan) == 1 + len(user_plan.remove)
+    users, roles = usersync.fetch_accounts_restconf(client)
+    assert users == {'admin': {'network-admin'}, 'ops/eu#1': set()}
+
+
+def test_sync_users_netconf(device):
+    with NxSession(ADDRESS, USER, PASSWORD) as nx:
+        users, roles = usersync.fetch_accounts(nx.netconf)
+        user_plan = usersync.plan([UserSpec('<ops>', 'pw&1', ('network-operator', 'network-admin'))], users, roles)
+        assert usersync.apply_netconf(nx.netconf, user_plan) == 1
+        users, roles = usersync.fetch_accounts(nx.netconf)
+    assert users['<ops>'] == {'network-operator', 'network-admin'}
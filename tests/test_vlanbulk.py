@@ -0,0 +1,49 @@
+import pytest
+from conftest import USER, PASSWORD
+from nexusprog import restconf, vlanbulk, vlanset
+from nexusprog.session import NxSession
+
+ADDRESS = '127.0.3.6'
+pytestmark = pytest.mark.filterwarnings('ignore:Unverified HTTPS request')
+
+
+@pytest.fixture(params=['xml', 'json'])
+def client(request, device):
+    rc = restconf.client(ADDRESS, USER, PASSWORD, encoding=request.param)
+    yield rc
+    rc.close()
+
+
+def names(device):
+    return dict((bd.findtext('{*}fabEncap'), bd.findtext('{*}name')) for bd in device.system.iterfind('.//{*}BD-list'))
+
+
+def test_plan_skips_existing_vlans():
+    entries = vlanbulk.plan(vlanset.parse('18-22'), vlanset.parse('1-20'), name='T-{vlan}-{index}', vni_offset=300000)
+    assert entries == [vlanbulk.VlanEntry(21, 'T-21-4', 300021, None), vlanbulk.VlanEntry(22, 'T-22-5', 300022, None)]
+    with pytest.raises(ValueError):
+        vlanbulk.plan(vlanset.parse('100-101'), vni=5000)
+
+
+def test_name_template_keeps_other_braces():
+    assert vlanbulk.render_name('{vlan}-{index}-{tenant}-{0}', 100, 3) == '100-3-{tenant}-{0}'
+    assert vlanbulk.render_name(None, 100, 3) is None
+
+
+def test_create_netconf_in_chunks(device):
+    with NxSession(ADDRESS, USER, PASSWORD) as nx:
+        existing = vlanbulk.existing_netconf(nx.netconf)
+        assert str(existing) == '1-20'
+        entries = vlanbulk.plan(vlanset.parse('10-110'), existing, name='{vlan}{x}')
+        assert vlanbulk.create_netconf(nx.netconf, entries, max_bytes=4096) > 1
+        assert str(vlanbulk.existing_netconf(nx.netconf)) == '1-110'
+    assert names(device)['vlan-110'] == '110{x}'
+    assert names(device)['vlan-10'] == 'VLAN0010'
+
+
+def test_create_restconf(client, device):
+    entries = vlanbulk.plan(vlanset.parse('100,200'), vlanbulk.existing_restconf(client), vni_offset=10000)
+    assert vlanbulk.create_restconf(client, entries) == 1
+    assert vlanbulk.existing_restconf(client) == vlanset.parse('1-20,100,200')
+    bd = [bd for bd in device.system.iterfind('.//{*}BD-list') if bd.findtext('{*}fabEncap') == 'vlan-200'][0]
+    assert bd.findtext('{*}accEncap') == 'vxlan-10200'
@@ -0,0 +1,16 @@
+import io
+import pytest
+from nexusprog import xmlstream
+
+
+def test_data_text_is_streamed():
+    out = io.StringIO()
+    assert xmlstream.write_data_text('<rpc-reply><data>hostname sw1\n&lt;x&gt;</data></rpc-reply>', out) == 16
+    assert out.getvalue() == 'hostname sw1\n<x>'
+
+
+def test_reply_without_data_raises():
+    reply = '<rpc-reply><rpc-error><error-message>permission denied</error-message></rpc-error></rpc-reply>'
+    with pytest.raises(ValueError) as error:
+        xmlstream.write_data_text(reply, io.StringIO())
+    assert 'permission denied' in str(error.value)
@@ -0,0 +1,41 @@
+import os, subprocess, sys
+from conftest import USER, PASSWORD
+from nexusprog import rollback, yangdiff
+from nexusprog.session import NxSession
+
+ADDRESS = '127.0.3.5'
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+ACCESS = '''<config><System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device"><intf-items><phys-items>
+<PhysIf-list><id>eth1/2</id><adminSt>up</adminSt><accessVlan>vlan-10</accessVlan><descr>printer</descr></PhysIf-list>
+</phys-items></intf-items></System></config>'''
+
+
+def test_diff_of_a_port_change(device):
+    with NxSession(ADDRESS, USER, PASSWORD) as nx:
+        pre = rollback.capture(nx.netconf)
+        nx.netconf.edit_config(target='running', config=ACCESS)
+        post = rollback.capture(nx.netconf)
+    stats = yangdiff.DiffStats()
+    changes = yangdiff.diff_files(pre, post, stats=stats)
+    assert sorted((change.op, change.path.rsplit('/', 1)[-1], change.new) for change in changes) == [
+        ('changed', 'accessVlan', 'vlan-10'), ('changed', 'adminSt', 'up'), ('changed', 'descr', 'printer')]
+    assert all('PhysIf-list[id=eth1/2]' in change.path for change in changes)
+    # Only the path down to the port is compared, not every interface and VLAN
+    assert stats.compared < 20
+    assert yangdiff.diff_files(pre, pre) == []
+
+
+
+def test_digest_is_the_same_in_every_process():
+    # A container wider than BUCKET_SIZE gets buckets, their digests must not depend on the hash seed of the process
+    tree = ('<System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device"><bd-items><bd-items>' +
+            ''.join('<BD-list><fabEncap>vlan-%d</fabEncap></BD-list>' % vlan for vlan in range(1, 4 * yangdiff.BUCKET_SIZE)) +
+            '</bd-items></bd-items></System>')
+    code = 'import sys; from nexusprog import yangdiff; print(yangdiff.build(sys.stdin.buffer.read()).digest.hex())'
+    digests = set()
+    for seed in ('1', '2'):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        digests.add(subprocess.run([sys.executable, '-c', code], input=tree.encode('utf-8'), cwd=REPO_ROOT, env=env, check=True,
+                                   stdout=subprocess.PIPE).stdout.decode('utf-8').strip())
+    assert digests == {yangdiff.build(tree.encode('utf-8')).digest.hex()}